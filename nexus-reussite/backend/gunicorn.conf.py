@@ -0,0 +1,36 @@
+"""
+Configuration gunicorn
+Nexus Réussite - Backend
+
+Lue automatiquement par gunicorn depuis le répertoire backend/ : prépare le
+mode multiprocess de prometheus_client pour que `/metrics` agrège les valeurs
+de tous les workers (services/metrics.py).
+"""
+
+import os
+import shutil
+import tempfile
+
+# Doit être défini avant le premier import de prometheus_client (chargement de
+# l'application dans le maître avec --preload, ou dans chaque worker)
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "nexus-prometheus"),
+)
+
+
+def on_starting(server):  # pylint: disable=unused-argument
+    """Repart d'un répertoire vide : les fichiers d'un ancien maître faussent
+    les compteurs"""
+    multiproc_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):  # pylint: disable=unused-argument
+    """Retire les jauges `live*` du worker terminé"""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,48 @@
+"""Compteurs des statistiques globales
+
+- global_stat_counters : une ligne par (dimension, clé), ex. ("grade",
+  "terminale") ; `total` porte la somme des valeurs des compteurs de
+  moyenne. La ligne ("meta", "initialized") marque les compteurs
+  initialisés et date la dernière réconciliation.
+
+Les compteurs sont calculés à la première lecture des statistiques globales
+ou par `flask reconcile-stats` (voir services/global_stats.py).
+
+Table déclarée sur le modèle (models/student.py) : ignorée si
+`db.create_all()` l'a déjà créée.
+
+Revision ID: a6e0b3f58c14
+Revises: f2c9d4a61b37
+Create Date: 2026-10-17 22:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6e0b3f58c14'
+down_revision = 'f2c9d4a61b37'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table('global_stat_counters'):
+        op.create_table(
+            'global_stat_counters',
+            sa.Column('dimension', sa.String(20), nullable=False),
+            sa.Column('key', sa.String(100), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.Column('total', sa.Float(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('dimension', 'key'),
+        )
+
+
+def downgrade():
+    op.drop_table('global_stat_counters')
@@ -0,0 +1,49 @@
+"""students.created_at obligatoire
+
+La pagination par curseur trie sur (created_at, id) et encode created_at
+dans le curseur : une valeur NULL rendait la page suivante inaccessible.
+Les lignes sans date reçoivent leur date de mise à jour (à défaut, la date
+de la migration), puis la colonne devient NOT NULL.
+
+Sous SQLite, la contrainte n'est pas posée : l'ALTER passerait par une
+recopie de la table, qui supprimerait les triggers de `students_fts`. Le
+modèle renseigne toujours created_at (défaut côté application).
+
+Revision ID: b3d7f0a92e45
+Revises: a6e0b3f58c14
+Create Date: 2026-10-17 23:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d7f0a92e45'
+down_revision = 'a6e0b3f58c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        'UPDATE students SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) '
+        'WHERE created_at IS NULL'
+    )
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column(
+            'students',
+            'created_at',
+            existing_type=sa.DateTime(),
+            nullable=False,
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column(
+            'students',
+            'created_at',
+            existing_type=sa.DateTime(),
+            nullable=True,
+        )
@@ -0,0 +1,103 @@
+"""Index de pagination et de recherche des étudiants
+
+Le schéma existant est créé par `db.create_all()` : cette première révision
+ne fait qu'ajouter des index, de façon idempotente (IF NOT EXISTS).
+
+- ix_students_active_created : pagination par curseur (created_at, id) ;
+- PostgreSQL : extension pg_trgm et index GIN trigrammes sur full_name et
+  email, utilisés par ILIKE '%terme%' ;
+- SQLite : table FTS5 externe `students_fts` (tokenizer trigram, SQLite
+  >= 3.34) synchronisée par triggers.
+
+Revision ID: b7d41c2e9a10
+Revises:
+Create Date: 2026-10-17 16:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d41c2e9a10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+SQLITE_FTS_TRIGGERS = {
+    'students_fts_ai': """
+        CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students
+        BEGIN
+            INSERT INTO students_fts(rowid, full_name, email)
+            VALUES (new.id, new.full_name, new.email);
+        END
+    """,
+    'students_fts_ad': """
+        CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students
+        BEGIN
+            INSERT INTO students_fts(students_fts, rowid, full_name, email)
+            VALUES ('delete', old.id, old.full_name, old.email);
+        END
+    """,
+    'students_fts_au': """
+        CREATE TRIGGER IF NOT EXISTS students_fts_au
+        AFTER UPDATE OF full_name, email ON students
+        BEGIN
+            INSERT INTO students_fts(students_fts, rowid, full_name, email)
+            VALUES ('delete', old.id, old.full_name, old.email);
+            INSERT INTO students_fts(rowid, full_name, email)
+            VALUES (new.id, new.full_name, new.email);
+        END
+    """,
+}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    op.create_index(
+        'ix_students_active_created',
+        'students',
+        ['is_active', 'created_at', 'id'],
+        if_not_exists=True,
+    )
+
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in ('full_name', 'email'):
+            op.create_index(
+                f'ix_students_{column}_trgm',
+                'students',
+                [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+                if_not_exists=True,
+            )
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5("
+            "full_name, email, content='students', content_rowid='id', "
+            "tokenize='trigram')"
+        )
+        for trigger in SQLITE_FTS_TRIGGERS.values():
+            op.execute(trigger)
+        # Indexe les étudiants déjà présents
+        op.execute("INSERT INTO students_fts(students_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        for column in ('full_name', 'email'):
+            op.drop_index(
+                f'ix_students_{column}_trgm', table_name='students', if_exists=True
+            )
+    elif dialect == 'sqlite':
+        for name in SQLITE_FTS_TRIGGERS:
+            op.execute(f'DROP TRIGGER IF EXISTS {name}')
+        op.execute('DROP TABLE IF EXISTS students_fts')
+
+    op.drop_index(
+        'ix_students_active_created', table_name='students', if_exists=True
+    )
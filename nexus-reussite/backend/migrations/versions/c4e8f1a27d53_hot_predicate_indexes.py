@@ -0,0 +1,82 @@
+"""Index composites des prédicats fréquents
+
+Index déclarés sur les modèles (`__table_args__`) et jusqu'ici créés
+seulement par `db.create_all()` ; les prédicats viennent du rapport de
+`services/index_advisor.py` (voir scripts/benchmark_indexes.py).
+
+- learning_sessions(student_id, created_at) : historique d'un étudiant ;
+- assessments(student_id, is_completed, completed_at) : évaluations
+  terminées d'un étudiant sur une période ;
+- individual_sessions(student_id, status, scheduled_at) et
+  group_sessions(group_id, status, scheduled_at) : prochaine séance prévue,
+  séances terminées du mois ;
+- individual_sessions(student_id, scheduled_at, id) et
+  group_sessions(group_id, scheduled_at, id) : chronologie paginée ;
+- session_attendances(student_id, session_id) : présences d'un étudiant
+  aux séances de groupe de sa chronologie.
+
+user_sessions(session_token) est déjà servi par l'index de sa contrainte
+unique : aucun index supplémentaire.
+
+Revision ID: c4e8f1a27d53
+Revises: b7d41c2e9a10
+Create Date: 2026-10-17 17:20:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8f1a27d53'
+down_revision = 'b7d41c2e9a10'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    (
+        'ix_learning_sessions_student_created',
+        'learning_sessions',
+        ['student_id', 'created_at'],
+    ),
+    (
+        'ix_assessments_student_completed',
+        'assessments',
+        ['student_id', 'is_completed', 'completed_at'],
+    ),
+    (
+        'ix_individual_sessions_student_status_scheduled',
+        'individual_sessions',
+        ['student_id', 'status', 'scheduled_at'],
+    ),
+    (
+        'ix_group_sessions_group_status_scheduled',
+        'group_sessions',
+        ['group_id', 'status', 'scheduled_at'],
+    ),
+    (
+        'ix_individual_sessions_student_scheduled',
+        'individual_sessions',
+        ['student_id', 'scheduled_at', 'id'],
+    ),
+    (
+        'ix_group_sessions_group_scheduled',
+        'group_sessions',
+        ['group_id', 'scheduled_at', 'id'],
+    ),
+    (
+        'ix_session_attendances_student_session',
+        'session_attendances',
+        ['student_id', 'session_id'],
+    ),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
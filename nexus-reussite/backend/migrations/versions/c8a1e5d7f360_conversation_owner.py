@@ -0,0 +1,48 @@
+"""Propriétaire des sessions de conversation
+
+- conversation_sessions.owner_id : identité JWT de l'utilisateur qui a
+  ouvert la session ; seules ses requêtes authentifiées lisent ou
+  complètent l'historique. NULL pour les sessions anonymes existantes.
+
+Revision ID: c8a1e5d7f360
+Revises: b3d7f0a92e45
+Create Date: 2026-10-17 23:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8a1e5d7f360'
+down_revision = 'b3d7f0a92e45'
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table, name):
+    columns = sa.inspect(op.get_bind()).get_columns(table)
+    return any(column['name'] == name for column in columns)
+
+
+def upgrade():
+    if not _has_column('conversation_sessions', 'owner_id'):
+        op.add_column(
+            'conversation_sessions',
+            sa.Column('owner_id', sa.String(64), nullable=True),
+        )
+    op.create_index(
+        'ix_conversation_sessions_owner_id',
+        'conversation_sessions',
+        ['owner_id'],
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'ix_conversation_sessions_owner_id',
+        table_name='conversation_sessions',
+        if_exists=True,
+    )
+    op.drop_column('conversation_sessions', 'owner_id')
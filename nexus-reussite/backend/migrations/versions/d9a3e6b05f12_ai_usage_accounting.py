@@ -0,0 +1,80 @@
+"""Comptabilité des appels OpenAI
+
+- ai_usage_events : un événement par appel (type, modèle, résultat, élève,
+  jetons, latence, coût estimé), écrit par lots ; index sur created_at pour
+  la purge des événements expirés (AI_USAGE_RETENTION_DAYS) ;
+- ai_usage_rollups : agrégats journaliers par (jour, modèle, type, résultat,
+  seau de latence), tenus à jour par UPSERT relatifs et lus par
+  /api/openai/usage/stats.
+
+Tables déclarées sur les modèles (models/ai_usage.py) : ignorées si
+`db.create_all()` les a déjà créées.
+
+Revision ID: d9a3e6b05f12
+Revises: c4e8f1a27d53
+Create Date: 2026-10-17 19:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a3e6b05f12'
+down_revision = 'c4e8f1a27d53'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table('ai_usage_events'):
+        op.create_table(
+            'ai_usage_events',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('request_type', sa.String(40), nullable=False),
+            sa.Column('model', sa.String(60), nullable=False),
+            sa.Column('outcome', sa.String(20), nullable=False),
+            sa.Column('student_id', sa.String(64), nullable=True),
+            sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+            sa.Column('completion_tokens', sa.Integer(), nullable=False),
+            sa.Column('latency_ms', sa.Float(), nullable=False),
+            sa.Column('cost_usd', sa.Float(), nullable=False),
+        )
+    op.create_index(
+        'ix_ai_usage_events_created',
+        'ai_usage_events',
+        ['created_at'],
+        if_not_exists=True,
+    )
+
+    if not _has_table('ai_usage_rollups'):
+        op.create_table(
+            'ai_usage_rollups',
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('model', sa.String(60), nullable=False),
+            sa.Column('request_type', sa.String(40), nullable=False),
+            sa.Column('outcome', sa.String(20), nullable=False),
+            sa.Column('latency_bucket', sa.SmallInteger(), nullable=False),
+            sa.Column('requests', sa.Integer(), nullable=False),
+            sa.Column('prompt_tokens', sa.BigInteger(), nullable=False),
+            sa.Column('completion_tokens', sa.BigInteger(), nullable=False),
+            sa.Column('latency_ms_total', sa.Float(), nullable=False),
+            sa.Column('cost_usd', sa.Float(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint(
+                'day', 'model', 'request_type', 'outcome', 'latency_bucket'
+            ),
+        )
+
+
+def downgrade():
+    op.drop_table('ai_usage_rollups')
+    op.drop_index(
+        'ix_ai_usage_events_created', table_name='ai_usage_events', if_exists=True
+    )
+    op.drop_table('ai_usage_events')
@@ -0,0 +1,85 @@
+"""Historique persistant des conversations avec ARIA
+
+- conversation_sessions : une ligne par session, avec le résumé glissant
+  des tours anciens et le rang du dernier message résumé ;
+- conversation_messages : journal des messages en ajout seul, rang unique
+  par session (sert aussi d'index pour lire la fenêtre récente).
+
+Tables déclarées sur les modèles (models/conversation.py) : ignorées si
+`db.create_all()` les a déjà créées.
+
+Revision ID: e1b7c4f39a26
+Revises: d9a3e6b05f12
+Create Date: 2026-10-17 21:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b7c4f39a26'
+down_revision = 'd9a3e6b05f12'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table('conversation_sessions'):
+        op.create_table(
+            'conversation_sessions',
+            sa.Column('session_id', sa.String(100), primary_key=True),
+            sa.Column('student_id', sa.String(64), nullable=False),
+            sa.Column('subject', sa.String(100), nullable=True),
+            sa.Column('topic', sa.String(200), nullable=True),
+            sa.Column('conversation_type', sa.String(30), nullable=True),
+            sa.Column('context_metadata', sa.JSON(), nullable=True),
+            sa.Column('summary', sa.Text(), nullable=True),
+            sa.Column('summary_tokens', sa.Integer(), nullable=False),
+            sa.Column('summarized_through', sa.Integer(), nullable=False),
+            sa.Column('message_count', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+    op.create_index(
+        'ix_conversation_sessions_student_id',
+        'conversation_sessions',
+        ['student_id'],
+        if_not_exists=True,
+    )
+
+    if not _has_table('conversation_messages'):
+        op.create_table(
+            'conversation_messages',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column(
+                'session_id',
+                sa.String(100),
+                sa.ForeignKey(
+                    'conversation_sessions.session_id', ondelete='CASCADE'
+                ),
+                nullable=False,
+            ),
+            sa.Column('seq', sa.Integer(), nullable=False),
+            sa.Column('role', sa.String(20), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('token_count', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint(
+                'session_id', 'seq', name='uq_conversation_messages_seq'
+            ),
+        )
+
+
+def downgrade():
+    op.drop_table('conversation_messages')
+    op.drop_index(
+        'ix_conversation_sessions_student_id',
+        table_name='conversation_sessions',
+        if_exists=True,
+    )
+    op.drop_table('conversation_sessions')
@@ -0,0 +1,73 @@
+"""Agrégats matérialisés du tableau de bord étudiant
+
+- student_stats : une ligne par étudiant (totaux, dernières sessions et
+  évaluations déjà sérialisées) ;
+- student_subject_stats : sommes et comptes par (étudiant, matière), d'où
+  sont tirées les moyennes.
+
+Les lignes sont créées par la première écriture de sessions ou
+d'évaluations de chaque étudiant (voir services/student_stats.py) : pas de
+remplissage ici.
+
+Tables déclarées sur les modèles (models/student.py) : ignorées si
+`db.create_all()` les a déjà créées.
+
+Revision ID: f2c9d4a61b37
+Revises: e1b7c4f39a26
+Create Date: 2026-10-17 22:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c9d4a61b37'
+down_revision = 'e1b7c4f39a26'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table('student_stats'):
+        op.create_table(
+            'student_stats',
+            sa.Column(
+                'student_id',
+                sa.Integer(),
+                sa.ForeignKey('students.id'),
+                primary_key=True,
+            ),
+            sa.Column('total_sessions', sa.Integer(), nullable=False),
+            sa.Column('total_minutes', sa.Integer(), nullable=False),
+            sa.Column('recent_sessions', sa.Text(), nullable=True),
+            sa.Column('recent_assessments', sa.Text(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+
+    if not _has_table('student_subject_stats'):
+        op.create_table(
+            'student_subject_stats',
+            sa.Column(
+                'student_id',
+                sa.Integer(),
+                sa.ForeignKey('student_stats.student_id'),
+                nullable=False,
+            ),
+            sa.Column('subject', sa.String(50), nullable=False),
+            sa.Column('session_count', sa.Integer(), nullable=False),
+            sa.Column('completion_sum', sa.Float(), nullable=False),
+            sa.Column('completion_count', sa.Integer(), nullable=False),
+            sa.Column('accuracy_sum', sa.Float(), nullable=False),
+            sa.Column('accuracy_count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('student_id', 'subject'),
+        )
+
+
+def downgrade():
+    op.drop_table('student_subject_stats')
+    op.drop_table('student_stats')
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Benchmark des index composites des prédicats fréquents (SQLite)
+Mesure les requêtes chaudes avant et après la création des index de la
+révision c4e8f1a27d53, sur une base en mémoire peuplée de données synthétiques
+
+Usage: python scripts/benchmark_indexes.py [--students 2000] [--repeat 200]
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Mêmes index que migrations/versions/c4e8f1a27d53_hot_predicate_indexes.py
+INDEXES = [
+    (
+        "ix_learning_sessions_student_created",
+        "learning_sessions",
+        ["student_id", "created_at"],
+    ),
+    (
+        "ix_assessments_student_completed",
+        "assessments",
+        ["student_id", "is_completed", "completed_at"],
+    ),
+    (
+        "ix_individual_sessions_student_status_scheduled",
+        "individual_sessions",
+        ["student_id", "status", "scheduled_at"],
+    ),
+    (
+        "ix_group_sessions_group_status_scheduled",
+        "group_sessions",
+        ["group_id", "status", "scheduled_at"],
+    ),
+]
+
+SCHEMA = """
+CREATE TABLE learning_sessions (
+    id INTEGER PRIMARY KEY, student_id INTEGER NOT NULL, subject VARCHAR(50),
+    duration_minutes INTEGER, created_at DATETIME
+);
+CREATE TABLE assessments (
+    id INTEGER PRIMARY KEY, student_id INTEGER NOT NULL, subject VARCHAR(50),
+    score FLOAT, is_completed BOOLEAN, completed_at DATETIME
+);
+CREATE TABLE individual_sessions (
+    id INTEGER PRIMARY KEY, student_id INTEGER NOT NULL, subject VARCHAR(50),
+    status VARCHAR(20), scheduled_at DATETIME NOT NULL
+);
+CREATE TABLE group_sessions (
+    id INTEGER PRIMARY KEY, group_id INTEGER NOT NULL, subject VARCHAR(50),
+    status VARCHAR(20), scheduled_at DATETIME NOT NULL
+);
+CREATE TABLE user_sessions (
+    id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL,
+    session_token VARCHAR(255) NOT NULL UNIQUE
+);
+"""
+
+# Requêtes telles qu'émises par les routes (formulas, students, auth)
+QUERIES = {
+    "learning_sessions récentes": (
+        "SELECT learning_sessions.id FROM learning_sessions "
+        "WHERE learning_sessions.student_id = ? "
+        "ORDER BY learning_sessions.created_at DESC LIMIT 10",
+        lambda args: (random.randrange(args.students),),
+    ),
+    "assessments terminées (30 j)": (
+        "SELECT count(*) FROM assessments WHERE assessments.student_id = ? "
+        "AND assessments.is_completed = 1 AND assessments.completed_at >= ?",
+        lambda args: (random.randrange(args.students), _now(30)),
+    ),
+    "prochaine séance individuelle": (
+        "SELECT individual_sessions.id FROM individual_sessions "
+        "WHERE individual_sessions.student_id = ? "
+        "AND individual_sessions.scheduled_at > ? "
+        "AND individual_sessions.status = 'scheduled' "
+        "ORDER BY individual_sessions.scheduled_at ASC LIMIT 1",
+        lambda args: (random.randrange(args.students), _now()),
+    ),
+    "séances de groupe du mois": (
+        "SELECT count(*) FROM group_sessions WHERE group_sessions.group_id = ? "
+        "AND group_sessions.scheduled_at >= ? "
+        "AND group_sessions.status = 'completed'",
+        lambda args: (random.randrange(args.groups), _now(30)),
+    ),
+    "session par jeton": (
+        "SELECT user_sessions.id FROM user_sessions "
+        "WHERE user_sessions.session_token = ?",
+        lambda args: (f"token-{random.randrange(args.students * 4)}",),
+    ),
+}
+
+# Gain minimal accepté (< 1 : ralentissement)
+NOISE_TOLERANCE = 0.8
+
+STATUSES = ["scheduled", "completed", "cancelled"]
+_NOW = datetime(2026, 6, 1)
+
+
+def _timestamp(moment):
+    # Format stocké par SQLAlchemy pour DateTime sous SQLite
+    return moment.isoformat(sep=" ")
+
+
+def _now(days_ago=0):
+    return _timestamp(_NOW - timedelta(days=days_ago))
+
+
+def _dates(count, days=365):
+    return [
+        _NOW - timedelta(minutes=random.randrange(days * 24 * 60)) for _ in range(count)
+    ]
+
+
+def populate(conn, args):
+    """Peuple la base : ~rows lignes par étudiant dans chaque table"""
+    conn.executescript(SCHEMA)
+    rows = args.students * args.rows
+    students = [random.randrange(args.students) for _ in range(rows)]
+    dates = _dates(rows)
+
+    conn.executemany(
+        "INSERT INTO learning_sessions (student_id, subject, duration_minutes, "
+        "created_at) VALUES (?, 'maths', 30, ?)",
+        zip(students, map(_timestamp, dates)),
+    )
+    conn.executemany(
+        "INSERT INTO assessments (student_id, subject, score, is_completed, "
+        "completed_at) VALUES (?, 'nsi', 14.5, ?, ?)",
+        ((s, random.random() < 0.7, _timestamp(d)) for s, d in zip(students, dates)),
+    )
+    conn.executemany(
+        "INSERT INTO individual_sessions (student_id, subject, status, "
+        "scheduled_at) VALUES (?, 'maths', ?, ?)",
+        (
+            (s, random.choice(STATUSES), _timestamp(d + timedelta(days=60)))
+            for s, d in zip(students, dates)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO group_sessions (group_id, subject, status, scheduled_at) "
+        "VALUES (?, 'physique', ?, ?)",
+        (
+            (random.randrange(args.groups), random.choice(STATUSES), _timestamp(d))
+            for d in dates
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO user_sessions (user_id, session_token) VALUES (?, ?)",
+        ((i % args.students, f"token-{i}") for i in range(args.students * 4)),
+    )
+    conn.commit()
+
+
+def create_indexes(conn):
+    for name, table, columns in INDEXES:
+        conn.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def query_plan(conn, sql, params):
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+
+def measure(conn, args):
+    """Durée moyenne (ms) et plan de chaque requête chaude"""
+    results = {}
+    for label, (sql, make_params) in QUERIES.items():
+        random.seed(args.seed)
+        params = [make_params(args) for _ in range(args.repeat)]
+        start = time.perf_counter()
+        for values in params:
+            conn.execute(sql, values).fetchall()
+        elapsed = (time.perf_counter() - start) / args.repeat * 1000
+        results[label] = (elapsed, query_plan(conn, sql, params[0]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=25, help="lignes par étudiant")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    conn = sqlite3.connect(":memory:")
+    print(f"📦 Peuplement : {args.students} étudiants × {args.rows} lignes...")
+    try:
+        populate(conn, args)
+        before = measure(conn, args)
+        create_indexes(conn)
+        after = measure(conn, args)
+    finally:
+        conn.close()
+
+    print()
+    print(f"{'Requête':32} {'sans index':>12} {'avec index':>12} {'gain':>8}")
+    slower = []
+    for label, (before_ms, _plan) in before.items():
+        after_ms, plan = after[label]
+        speedup = before_ms / after_ms if after_ms else float("inf")
+        print(f"{label:32} {before_ms:10.3f}ms {after_ms:10.3f}ms {speedup:7.1f}×")
+        print(f"    plan: {plan}")
+        # Marge pour le bruit de mesure des requêtes déjà indexées
+        if speedup < NOISE_TOLERANCE:
+            slower.append(label)
+
+    if slower:
+        print(f"\n❌ Plus lent avec les index : {', '.join(slower)}")
+        return 1
+    print("\n✅ Aucune requête chaude n'est ralentie par les index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Benchmark hors ligne du client OpenAI partagé
+Compare, contre un serveur HTTP factice local (latence et taux de 429
+configurables), l'ancien schéma `asyncio.to_thread(client.create)` et le
+client asynchrone à pool de connexions de services/openai_client.py
+
+Usage: python scripts/benchmark_openai_client.py [--requests 500]
+       [--concurrency 100] [--latency-ms 50] [--error-rate 0.05]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from openai import OpenAI  # noqa: E402
+from services.openai_client import PooledOpenAIClient  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "Explique le théorème de Pythagore"}]
+
+
+def completion_body(model):
+    return json.dumps(
+        {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "Réponse factice"},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15},
+        }
+    ).encode()
+
+
+def make_handler(latency, error_rate):
+    class StubHandler(BaseHTTPRequestHandler):
+        """Imite POST /v1/chat/completions, keep-alive compris"""
+
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):  # pylint: disable=invalid-name
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(latency)
+            if random.random() < error_rate:
+                body = b'{"error": {"message": "rate limited"}}'
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+            else:
+                body = completion_body(payload.get("model", "stub"))
+                self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # silence
+            pass
+
+    return StubHandler
+
+
+def summarize(label, durations, elapsed, failures=0):
+    durations.sort()
+    p50 = statistics.median(durations) if durations else 0
+    p95 = durations[max(0, int(len(durations) * 0.95) - 1)] if durations else 0
+    print(
+        f"{label:30} {len(durations) / elapsed:8.1f} req/s  "
+        f"p50 {p50 * 1000:7.1f}ms  p95 {p95 * 1000:7.1f}ms  échecs {failures}"
+    )
+
+
+async def run_to_thread(base_url, args):
+    """Ancien schéma : client synchrone dans le pool de threads par défaut"""
+    client = OpenAI(api_key="sk-stub", base_url=base_url, max_retries=args.retries)
+    durations, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(
+                client.chat.completions.create, model="stub", messages=MESSAGES
+            )
+            durations.append(time.perf_counter() - start)
+        except Exception:  # pylint: disable=broad-exception-caught
+            failures += 1
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded():
+        async with semaphore:
+            await one()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    summarize("asyncio.to_thread (avant)", durations, elapsed, failures)
+    client.close()
+
+
+async def run_pooled(client, args):
+    durations, failures = [], 0
+
+    async def one(index):
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            await client.chat_completion(
+                tenant=f"eleve-{index % args.tenants}", model="stub", messages=MESSAGES
+            )
+            durations.append(time.perf_counter() - start)
+        except RuntimeError:
+            failures += 1
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(index):
+        async with semaphore:
+            await one(index)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    summarize("client partagé (async)", durations, elapsed, failures)
+
+
+def run_pooled_sync(client, args):
+    durations, failures = [], 0
+    lock = threading.Lock()
+
+    def one(index):
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            client.chat_completion_sync(
+                tenant=f"eleve-{index % args.tenants}", model="stub", messages=MESSAGES
+            )
+            with lock:
+                durations.append(time.perf_counter() - start)
+        except RuntimeError:
+            with lock:
+                failures += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    summarize("client partagé (façade sync)", durations, elapsed, failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    # Les 429 simulés journaliseraient une ligne par nouvelle tentative
+    logging.getLogger("services.openai_client").setLevel(logging.ERROR)
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(args.latency_ms / 1000, args.error_rate)
+    )
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    print(
+        f"🧪 Serveur factice {base_url} : {args.latency_ms:.0f} ms, "
+        f"{args.error_rate:.0%} de 429, {args.requests} requêtes, "
+        f"{args.concurrency} en parallèle"
+    )
+
+    client = PooledOpenAIClient(
+        "sk-stub",
+        base_url,
+        max_concurrency=args.max_concurrency,
+        tenant_concurrency=max(1, args.concurrency // args.tenants),
+        max_retries=args.retries,
+    )
+    try:
+        asyncio.run(run_to_thread(base_url, args))
+        asyncio.run(run_pooled(client, args))
+        run_pooled_sync(client, args)
+        print(f"Statistiques du client partagé : {client.get_stats()}")
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,36 @@
 #!/usr/bin/env python3
 """Configuration NEXUS RÉUSSITE"""
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+
+def _env_budget(name, default):
+    """Budget en millisecondes ; une valeur invalide est ignorée (journalisée)"""
+    try:
+        return int(os.environ.get(name) or default)
+    except ValueError:
+        logger.warning("%s invalide, valeur par défaut %s utilisée", name, default)
+        return default
+
+
+def _env_budgets(name):
+    """Budgets par endpoint `endpoint=ms,...` ; une entrée invalide est
+    ignorée (journalisée) plutôt que d'empêcher le démarrage"""
+    budgets = {}
+    for item in (os.environ.get(name) or '').split(','):
+        if not item.strip():
+            continue
+        endpoint, _, budget = item.partition('=')
+        endpoint = endpoint.strip()
+        if endpoint and budget.strip().isdigit():
+            budgets[endpoint] = int(budget)
+        else:
+            logger.warning("%s : entrée invalide ignorée %r", name, item)
+    return budgets
+
+
 class Config:
     """Configuration de base"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key'
@@ -10,6 +39,34 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
 
+    # Cache à deux niveaux (L1 mémoire par worker devant Redis)
+    CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX') or 'nexus:cache:'
+    CACHE_L1_MAX_SIZE = int(os.environ.get('CACHE_L1_MAX_SIZE') or 1024)
+    CACHE_L1_TTL = int(os.environ.get('CACHE_L1_TTL') or 60)
+
+    # Réconciliation périodique des statistiques globales (secondes, 0 = désactivée)
+    GLOBAL_STATS_RECONCILE_INTERVAL = int(
+        os.environ.get('GLOBAL_STATS_RECONCILE_INTERVAL') or 3600
+    )
+
+    # Comptabilité des appels OpenAI (services/ai_usage.py) : écriture par lots
+    # toutes les N secondes et conservation des événements bruts (jours,
+    # 0 = illimitée ; les agrégats journaliers sont toujours conservés)
+    AI_USAGE_FLUSH_INTERVAL = float(os.environ.get('AI_USAGE_FLUSH_INTERVAL') or 10)
+    AI_USAGE_RETENTION_DAYS = int(os.environ.get('AI_USAGE_RETENTION_DAYS') or 90)
+
+    # Profiling SQL (services/sql_profiler.py)
+    ENABLE_SQL_PROFILING = os.environ.get('ENABLE_SQL_PROFILING', 'false').lower() in ['true', 'on', '1']
+    SQL_SLOW_QUERY_THRESHOLD = float(os.environ.get('SQL_SLOW_QUERY_THRESHOLD') or 0.5)
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD') or 10)
+
+    # Traçage des requêtes (services/request_trace.py) : budget par défaut et
+    # budgets par endpoint, ex.
+    # REQUEST_BUDGETS_MS="students.list_students=300,aria.chat_with_aria=3000"
+    REQUEST_BUDGET_MS = _env_budget('REQUEST_BUDGET_MS', 1000)
+    REQUEST_BUDGETS_MS = _env_budgets('REQUEST_BUDGETS_MS')
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() in ['true', 'on', '1']
+
     # Configuration JWT
     JWT_SECRET_KEY = SECRET_KEY
     JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour
@@ -51,6 +108,7 @@ class TestingConfig(Config):
     DATABASE_URL = 'sqlite:///:memory:'
     SQLALCHEMY_DATABASE_URI = DATABASE_URL
     WTF_CSRF_ENABLED = False
+    GLOBAL_STATS_RECONCILE_INTERVAL = 0
 
 
 class ProductionConfig(Config):
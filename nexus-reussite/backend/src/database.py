@@ -4,30 +4,42 @@ Instance SQLAlchemy partagée entre tous les modules
 """
 
 import logging
+import os
 import time
+import weakref
 from functools import wraps
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
-from flask import g
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import event
-from sqlalchemy.engine import Engine
 from sqlalchemy.exc import InterfaceError, SQLAlchemyError
 
+from services.sql_profiler import sql_profiler
+
 # Instance SQLAlchemy centralisée
 db = SQLAlchemy()
 migrate = Migrate()
 
 logger = logging.getLogger(__name__)
 
-# Query profiling storage
-query_stats = {
-    "slow_queries": [],
-    "total_queries": 0,
-    "total_time": 0.0,
-    "slowest_query": None,
-}
+# Applications dont le pool est renouvelé dans les processus forkés
+_fork_safe_apps: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def _dispose_engines_after_fork():
+    """Pool neuf dans le processus fils (workers `gunicorn --preload`)
+
+    Les connexions héritées du maître sont abandonnées sans être fermées :
+    les fermer couperait celles que le maître utilise encore.
+    """
+    for app in list(_fork_safe_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_engines_after_fork)
 
 
 def init_app(app):
@@ -44,13 +56,14 @@ def init_app(app):
 
     # Initialisation SQLAlchemy
     db.init_app(app)
+    _fork_safe_apps.add(app)
 
     # Initialisation Flask-Migrate pour Alembic
     migrate.init_app(app, db)
 
     # Configuration du profiling SQL si activé
     if app.config.get("ENABLE_SQL_PROFILING", False):
-        setup_sql_profiling()
+        setup_sql_profiling(app)
 
     # Import de tous les modèles pour l'enregistrement
     _import_all_models()
@@ -136,99 +149,47 @@ def _configure_database_performance(app):
     )
 
 
-def setup_sql_profiling():
+def setup_sql_profiling(app=None):
     """
-    Configure le profiling des requêtes SQL
+    Configure le profiling des requêtes SQL (voir services/sql_profiler.py)
+
+    Args:
+        app: Instance Flask ; sans elle, les requêtes ne sont ni attribuées
+            à un endpoint ni analysées pour les motifs N+1
     """
-    logger.info("🔍 Activation du profiling SQL...")
-
-    @event.listens_for(Engine, "before_cursor_execute")
-    def receive_before_cursor_execute(
-        conn, cursor, statement, parameters, context, executemany
-    ):
-        """Événement déclenché avant l'exécution d'une requête"""
-        context._query_start_time = time.time()
-
-    @event.listens_for(Engine, "after_cursor_execute")
-    def receive_after_cursor_execute(
-        conn, cursor, statement, parameters, context, executemany
-    ):
-        """Événement déclenché après l'exécution d'une requête"""
-        total_time = time.time() - context._query_start_time
-
-        # Mise à jour des statistiques globales
-        query_stats["total_queries"] += 1
-        query_stats["total_time"] += total_time
-
-        # Seuil pour considérer une requête comme lente (configurable)
-        slow_query_threshold = 0.5  # 500ms
-
-        if total_time > slow_query_threshold:
-            query_info = {
-                "statement": statement,
-                "parameters": parameters,
-                "duration": total_time,
-                "timestamp": time.time(),
-                "context": (
-                    getattr(g, "request_id", "unknown")
-                    if hasattr(g, "request_id")
-                    else "unknown"
-                ),
-            }
+    if app is not None:
+        sql_profiler.init_app(app)
+    else:
+        sql_profiler.install()
 
-            query_stats["slow_queries"].append(query_info)
 
-            # Garder seulement les 100 dernières requêtes lentes
-            if len(query_stats["slow_queries"]) > 100:
-                query_stats["slow_queries"] = query_stats["slow_queries"][-100:]
+def get_query_stats() -> Dict[str, Any]:
+    """
+    Retourne les statistiques des requêtes SQL
+    """
+    return sql_profiler.summary()
 
-            # Mettre à jour la requête la plus lente
-            if (
-                not query_stats["slowest_query"]
-                or total_time > query_stats["slowest_query"]["duration"]
-            ):
-                query_stats["slowest_query"] = query_info
 
-            logger.warning(
-                "🐌 Requête lente détectée (%.3fs): %s...",
-                total_time,
-                statement[:100],
-            )
+def get_statement_stats(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Retourne les statistiques agrégées par empreinte d'instruction SQL, de la
+    plus coûteuse (temps cumulé) à la moins coûteuse
+    """
+    return sql_profiler.fingerprint_stats(limit)
 
 
-def get_query_stats() -> Dict[str, Any]:
+def get_n_plus_one_report(limit: int = 20) -> Dict[str, Any]:
     """
-    Retourne les statistiques des requêtes SQL
+    Retourne les motifs N+1 détectés (même empreinte répétée dans une requête)
     """
-    avg_time = (
-        query_stats["total_time"] / query_stats["total_queries"]
-        if query_stats["total_queries"] > 0
-        else 0
-    )
-
-    return {
-        "total_queries": query_stats["total_queries"],
-        "total_time": query_stats["total_time"],
-        "average_time": avg_time,
-        "slow_queries_count": len(query_stats["slow_queries"]),
-        "slowest_query": query_stats["slowest_query"],
-        "recent_slow_queries": query_stats["slow_queries"][
-            -10:
-        ],  # 10 dernières requêtes lentes
-    }
+    return sql_profiler.n_plus_one_report(limit)
 
 
 def reset_query_stats():
     """
     Remet à zéro les statistiques des requêtes
     """
-    global query_stats
-    query_stats = {
-        "slow_queries": [],
-        "total_queries": 0,
-        "total_time": 0.0,
-        "slowest_query": None,
-    }
+    sql_profiler.reset()
     logger.info("📊 Statistiques des requêtes réinitialisées")
 
 
@@ -257,48 +218,34 @@ def profile_query(func):
 
 def create_database_indices():
     """
-    Crée les indices de base de données pour optimiser les performances
-    Cette fonction doit être appelée après la création des tables
+    Crée les indices déclarés sur les modèles (`index=True`, `__table_args__`)
+    qui manquent dans la base de données
+
+    Les migrations Alembic (migrations/versions) restent la voie normale ;
+    cette fonction rattrape une base créée par `db.create_all()` avant l'ajout
+    d'un index au modèle.
     """
     try:
         with db.engine.connect() as conn:
-            # Indices pour la table users (si elle existe)
-            indices_sql = [
-                "CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);",
-                "CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);",
-                "CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);",
-                "CREATE INDEX IF NOT EXISTS idx_users_last_login ON users(last_login);",
-                # Indices pour la table students (si elle existe)
-                "CREATE INDEX IF NOT EXISTS idx_students_user_id ON students(user_id);",
-                "CREATE INDEX IF NOT EXISTS idx_students_level ON students(level);",
-                "CREATE INDEX IF NOT EXISTS idx_students_created_at ON "
-                + "students(created_at);",
-                # Indices pour les tables de contenu (si elles existent)
-                "CREATE INDEX IF NOT EXISTS idx_content_created_at ON "
-                + "content_items(created_at);",
-                "CREATE INDEX IF NOT EXISTS idx_content_type ON "
-                + "content_items(content_type);",
-                "CREATE INDEX IF NOT EXISTS idx_content_status ON "
-                + "content_items(status);",
-                # Indices pour les formules (si la table existe)
-                "CREATE INDEX IF NOT EXISTS idx_formulas_subject ON "
-                + "formulas(subject);",
-                "CREATE INDEX IF NOT EXISTS idx_formulas_level ON formulas(level);",
-                "CREATE INDEX IF NOT EXISTS idx_formulas_created_at ON "
-                + "formulas(created_at);",
-            ]
-
+            inspector = db.inspect(conn)
             created_indices = 0
-            for sql in indices_sql:
-                try:
-                    conn.execute(db.text(sql))
-                    created_indices += 1
-                except (SQLAlchemyError, InterfaceError) as exception:
-                    # L'indice existe déjà ou la table n'existe pas
-                    logger.debug("Indice non créé: %s", exception)
+            for table in db.metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                existing = {
+                    index["name"] for index in inspector.get_indexes(table.name)
+                }
+                for index in table.indexes:
+                    if index.name in existing:
+                        continue
+                    try:
+                        index.create(conn)
+                        created_indices += 1
+                    except (SQLAlchemyError, InterfaceError) as exception:
+                        logger.debug("Indice %s non créé: %s", index.name, exception)
 
             conn.commit()
-            logger.info("📈 %s indices de performance créés/vérifiés", created_indices)
+            logger.info("📈 %s indices de performance créés", created_indices)
 
     except (ValueError, TypeError, RuntimeError) as exception:
         logger.error("❌ Erreur lors de la création des indices: %s", exception)
@@ -352,6 +299,8 @@ __all__ = [
     "create_tables",
     "drop_tables",
     "get_query_stats",
+    "get_statement_stats",
+    "get_n_plus_one_report",
     "reset_query_stats",
     "profile_query",
     "create_database_indices",
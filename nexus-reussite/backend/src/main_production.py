@@ -1,6 +1,7 @@
 """Point d'entrée principal de Nexus Réussite Backend Version production-ready avec
 architecture modulaire."""
 
+import json
 import os
 from datetime import datetime
 from typing import Any, Dict
@@ -12,6 +13,7 @@ import structlog
 
 # Configuration et initialisation
 from config import get_config, validate_config
+from database import get_statement_stats
 from database import init_app as init_database
 from flask import Flask, jsonify, request, send_from_directory
 from flask_compress import Compress
@@ -37,32 +39,27 @@ structlog.configure(
 logger = structlog.get_logger()
 
 # Service de cache
+from services.ai_usage import init_usage_accounting
 from services.cache_service import init_cache
+from services.global_stats import init_global_stats, reconcile_global_stats
+from services.index_advisor import advise
+from services.index_advisor import write_migration as write_migration_file
+from services.metrics import init_metrics, metrics
+from services.request_trace import init_request_tracing
 
 
 # Prometheus client pour monitoring
 def setup_prometheus_metrics(app):
-    from prometheus_client import (
-        Counter,
-        generate_latest,
-    )
-    from prometheus_client.exposition import CONTENT_TYPE_LATEST
-
-    # Exemple de métriques simples
-    REQUEST_COUNT = Counter(
-        "request_count", "Nombre de requêtes", ["method", "endpoint"]
-    )
-    # REQUEST_LATENCY = Summary(
-    #     "request_latency_seconds", "Latence des requêtes", ["endpoint"]
-    # )
-
-    @app.before_request
-    def before_request():
-        REQUEST_COUNT.labels(method=request.method, endpoint=request.path).inc()
+    """Métriques par endpoint, agrégées sur tous les workers gunicorn"""
+    init_metrics(app)
+    if not metrics.enabled:
+        return
 
     @app.route("/metrics")
+    @limiter.exempt
     def prometheus_metrics():
-        return generate_latest(), 200, {"Content-Type": CONTENT_TYPE_LATEST}
+        body, content_type = metrics.render()
+        return body, 200, {"Content-Type": content_type}
 
     logger.info("✅ Metrics Prometheus configurés")
 
@@ -119,6 +116,9 @@ def create_app(config_name=None):  # pylint: disable=unused-argument
     # Initialisation des extensions
     init_database(flask_app)  # Point d'entrée unique pour la base de données
     init_cache(flask_app)  # Initialisation du service de cache
+    init_global_stats(flask_app)  # Réconciliation des statistiques globales
+    init_usage_accounting(flask_app)  # Consommation OpenAI écrite par lots
+    init_request_tracing(flask_app)  # Spans par requête et en-tête Server-Timing
     jwt.init_app(flask_app)
     limiter.init_app(flask_app)
 
@@ -661,6 +661,51 @@ def register_cli_commands(flask_app):
 
         click.echo("\n=== Fin du diagnostic ===")
 
+    @flask_app.cli.command("reconcile-stats")
+    def reconcile_stats():
+        """Recalcule les compteurs des statistiques globales"""
+        report = reconcile_global_stats()
+        if report is None:
+            click.echo("Réconciliation déjà en cours dans un autre processus")
+            return
+        click.echo(f"{report['counters']} compteurs recalculés")
+        for counter, (stored, fresh) in sorted(report["drift"].items()):
+            click.echo(f"  {counter}: {stored} -> {fresh}")
+
+    @flask_app.cli.command("index-advice")
+    @click.option(
+        "--stats-file",
+        type=click.Path(exists=True, dir_okay=False),
+        help="Export JSON de GET /api/database/statements",
+    )
+    @click.option("--limit", default=20, show_default=True)
+    @click.option("--write-migration", is_flag=True, help="Génère la révision Alembic")
+    def index_advice(stats_file, limit, write_migration):
+        """Prédicats SQL les plus lents et index composites manquants"""
+        if stats_file:
+            with open(stats_file, encoding="utf-8") as f:
+                statement_stats = json.load(f)
+        else:
+            statement_stats = get_statement_stats()
+
+        recommendations = advise(statement_stats)[:limit]
+        if not recommendations:
+            click.echo("Aucune donnée du profiler SQL (ENABLE_SQL_PROFILING)")
+            return
+        for recommendation in recommendations:
+            status = recommendation.covered_by or "MANQUANT"
+            click.echo(
+                f"{recommendation.total_time * 1000:10.1f} ms "
+                f"{recommendation.calls:8d} appels  "
+                f"{recommendation.table}({', '.join(recommendation.columns)})"
+                f"  [{status}]"
+            )
+
+        missing = [r for r in recommendations if r.covered_by is None]
+        if write_migration and missing:
+            path = write_migration_file(missing)
+            click.echo(f"\nRévision écrite: {path}")
+
     logger.info("✓ Commandes CLI enregistrées")
 
 
@@ -6,6 +6,12 @@ Architecture SQLAlchemy optimisée pour production
 # Classes de base
 from .base import AuditMixin, BaseModel, SoftDeleteMixin, TimestampMixin
 
+# Consommation de l'API OpenAI
+from .ai_usage import AIUsageEvent, AIUsageRollup
+
+# Sessions de conversation avec ARIA
+from .conversation import ConversationMessage, ConversationSession
+
 # Modèles système de contenu
 from .content_system import (
     BrickType,
@@ -44,7 +50,15 @@ from .formulas import (
 )
 
 # Modèles étudiant
-from .student import ARIAInteraction, Assessment, LearningSession, Student
+from .student import (
+    ARIAInteraction,
+    Assessment,
+    GlobalStatCounter,
+    LearningSession,
+    Student,
+    StudentStats,
+    StudentSubjectStats,
+)
 
 # Modèles utilisateur
 from .user import (
@@ -87,6 +101,9 @@ __all__ = [
     "LearningSession",
     "Assessment",
     "ARIAInteraction",
+    "GlobalStatCounter",
+    "StudentStats",
+    "StudentSubjectStats",
     # Modèles formules et cours
     "Formula",
     "FormulaType",
@@ -118,4 +135,10 @@ __all__ = [
     "Subject",
     "TargetProfile",
     "LearningStep",
+    # Consommation de l'API OpenAI
+    "AIUsageEvent",
+    "AIUsageRollup",
+    # Sessions de conversation avec ARIA
+    "ConversationSession",
+    "ConversationMessage",
 ]
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from database import db
+
+
+class AIUsageEvent(db.Model):
+    """Appel à l'API OpenAI (complétion, document, quiz, image, analyse...)
+
+    Écrit par lots depuis le tampon de services/ai_usage.py ; les agrégats
+    sont lus dans `ai_usage_rollups`, jamais en parcourant cette table.
+    """
+
+    __tablename__ = "ai_usage_events"
+    __table_args__ = (db.Index("ix_ai_usage_events_created", "created_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    request_type = db.Column(db.String(40), nullable=False)
+    model = db.Column(db.String(60), nullable=False)
+    outcome = db.Column(db.String(20), nullable=False)  # success, error
+    student_id = db.Column(db.String(64), nullable=True)
+    prompt_tokens = db.Column(db.Integer, default=0, nullable=False)
+    completion_tokens = db.Column(db.Integer, default=0, nullable=False)
+    latency_ms = db.Column(db.Float, nullable=False)
+    cost_usd = db.Column(db.Float, default=0.0, nullable=False)
+
+
+class AIUsageRollup(db.Model):
+    """Agrégat journalier des appels OpenAI
+
+    Une ligne par (jour, modèle, type, résultat, seau de latence) : les seaux
+    donnent le p95 sans relire les événements. Tenu à jour par UPSERT
+    relatifs à chaque écriture d'un lot (voir services/ai_usage.py).
+    """
+
+    __tablename__ = "ai_usage_rollups"
+
+    day = db.Column(db.Date, primary_key=True)
+    model = db.Column(db.String(60), primary_key=True)
+    request_type = db.Column(db.String(40), primary_key=True)
+    outcome = db.Column(db.String(20), primary_key=True)
+    latency_bucket = db.Column(db.SmallInteger, primary_key=True)
+    requests = db.Column(db.Integer, default=0, nullable=False)
+    prompt_tokens = db.Column(db.BigInteger, default=0, nullable=False)
+    completion_tokens = db.Column(db.BigInteger, default=0, nullable=False)
+    latency_ms_total = db.Column(db.Float, default=0.0, nullable=False)
+    cost_usd = db.Column(db.Float, default=0.0, nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+from database import db
+
+
+class ConversationSession(db.Model):
+    """Session de conversation avec ARIA
+
+    Les messages sont en ajout seul (`conversation_messages`) ; les tours
+    sortis de la fenêtre du prompt sont condensés dans `summary`, qui couvre
+    tous les messages de rang <= `summarized_through`.
+    """
+
+    __tablename__ = "conversation_sessions"
+
+    session_id = db.Column(db.String(100), primary_key=True)
+    student_id = db.Column(db.String(64), nullable=False, index=True)
+    # Utilisateur authentifié propriétaire (identité JWT) ; NULL : session
+    # anonyme, accessible par son seul identifiant aléatoire
+    owner_id = db.Column(db.String(64), nullable=True, index=True)
+    subject = db.Column(db.String(100), nullable=True)
+    topic = db.Column(db.String(200), nullable=True)
+    conversation_type = db.Column(db.String(30), nullable=True)
+    context_metadata = db.Column(db.JSON, nullable=True)
+
+    # Résumé glissant des tours les plus anciens
+    summary = db.Column(db.Text, nullable=True)
+    summary_tokens = db.Column(db.Integer, default=0, nullable=False)
+    summarized_through = db.Column(db.Integer, default=0, nullable=False)
+    # Rang du dernier message (les rangs commencent à 1)
+    message_count = db.Column(db.Integer, default=0, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    messages = db.relationship(
+        "ConversationMessage",
+        backref="session",
+        lazy="dynamic",
+        cascade="all, delete-orphan",
+        order_by="ConversationMessage.seq",
+    )
+
+    def to_dict(self):
+        """Convertit l'objet ConversationSession en dictionnaire"""
+        return {
+            "session_id": self.session_id,
+            "student_id": self.student_id,
+            "metadata": {
+                **(self.context_metadata or {}),
+                "subject": self.subject,
+                "topic": self.topic,
+                "conversation_type": self.conversation_type,
+            },
+            "summary": self.summary,
+            "summarized_through": self.summarized_through,
+            "message_count": self.message_count,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "last_updated": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class ConversationMessage(db.Model):
+    """Message d'une session de conversation (journal en ajout seul)"""
+
+    __tablename__ = "conversation_messages"
+    __table_args__ = (
+        db.UniqueConstraint("session_id", "seq", name="uq_conversation_messages_seq"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(
+        db.String(100),
+        db.ForeignKey("conversation_sessions.session_id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    seq = db.Column(db.Integer, nullable=False)
+    role = db.Column(db.String(20), nullable=False)  # user, assistant
+    content = db.Column(db.Text, nullable=False)
+    token_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convertit l'objet ConversationMessage en dictionnaire"""
+        return {
+            "seq": self.seq,
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.created_at.isoformat() if self.created_at else None,
+        }
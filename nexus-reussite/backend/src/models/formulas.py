@@ -381,6 +381,23 @@ class IndividualSession(db.Model):
     meeting_url = db.Column(db.String(500), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Chronologie d'un étudiant (pagination par scheduled_at) ; séances
+    # prévues ou terminées d'un étudiant (filtre sur status)
+    __table_args__ = (
+        db.Index(
+            "ix_individual_sessions_student_scheduled",
+            "student_id",
+            "scheduled_at",
+            "id",
+        ),
+        db.Index(
+            "ix_individual_sessions_student_status_scheduled",
+            "student_id",
+            "status",
+            "scheduled_at",
+        ),
+    )
+
 
 class GroupSession(db.Model):
     __tablename__ = "group_sessions"
@@ -402,6 +419,18 @@ class GroupSession(db.Model):
     # Relations
     attendances = db.relationship("SessionAttendance", backref="session", lazy=True)
 
+    # Séances d'un groupe par date (pagination par scheduled_at) ; séances
+    # prévues ou terminées d'un groupe (filtre sur status)
+    __table_args__ = (
+        db.Index("ix_group_sessions_group_scheduled", "group_id", "scheduled_at", "id"),
+        db.Index(
+            "ix_group_sessions_group_status_scheduled",
+            "group_id",
+            "status",
+            "scheduled_at",
+        ),
+    )
+
 
 class SessionAttendance(db.Model):
     __tablename__ = "session_attendances"
@@ -416,6 +445,10 @@ class SessionAttendance(db.Model):
     individual_notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_session_attendances_student_session", "student_id", "session_id"),
+    )
+
 
 class WeeklyReport(db.Model):
     __tablename__ = "weekly_reports"
@@ -40,13 +40,18 @@ class Student(BaseModel, SoftDeleteMixin):
         db.Text, nullable=True
     )  # JSON string avec les performances
 
-    # Métadonnées
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Métadonnées (created_at : clé de la pagination par curseur, jamais NULL)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
     is_active = db.Column(db.Boolean, default=True)
 
+    # Liste paginée par curseur (created_at, id), étudiants actifs d'abord filtrés
+    __table_args__ = (
+        db.Index("ix_students_active_created", "is_active", "created_at", "id"),
+    )
+
     # Relations
     sessions = db.relationship(
         "LearningSession", backref="student", lazy=True, cascade="all, delete-orphan"
@@ -279,6 +284,10 @@ class LearningSession(db.Model):
     completed_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_learning_sessions_student_created", "student_id", "created_at"),
+    )
+
     def to_dict(self):
         """Convertit l'objet LearningSession en dictionnaire"""
         return {
@@ -344,6 +353,15 @@ class Assessment(db.Model):
     completed_at = db.Column(db.DateTime, nullable=True)
     is_completed = db.Column(db.Boolean, default=False)
 
+    __table_args__ = (
+        db.Index(
+            "ix_assessments_student_completed",
+            "student_id",
+            "is_completed",
+            "completed_at",
+        ),
+    )
+
     def to_dict(self):
         """Convertit l'objet Assessment en dictionnaire"""
         return {
@@ -410,3 +428,88 @@ class ARIAInteraction(db.Model):
             "feedback_rating": self.feedback_rating,
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
+
+
+class StudentStats(db.Model):
+    """Agrégats précalculés du tableau de bord d'un étudiant
+
+    Tenus à jour de façon incrémentale à chaque écriture d'une
+    LearningSession ou d'une Assessment (voir services/student_stats.py).
+    """
+
+    __tablename__ = "student_stats"
+
+    student_id = db.Column(db.Integer, db.ForeignKey("students.id"), primary_key=True)
+    total_sessions = db.Column(db.Integer, default=0, nullable=False)
+    total_minutes = db.Column(db.Integer, default=0, nullable=False)
+
+    # Dernières activités, déjà sérialisées (JSON string)
+    recent_sessions = db.Column(db.Text, nullable=True)
+    recent_assessments = db.Column(db.Text, nullable=True)
+
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    subjects = db.relationship(
+        "StudentSubjectStats", lazy="selectin", cascade="all, delete-orphan"
+    )
+
+    def subject_progress(self):
+        """Progression par matière, au format du tableau de bord"""
+        return {subject.subject: subject.to_dict() for subject in self.subjects}
+
+
+class StudentSubjectStats(db.Model):
+    """Agrégats par matière des sessions d'un étudiant
+
+    Les moyennes sont conservées sous forme de sommes et de comptes (les
+    valeurs NULL sont ignorées, comme AVG en SQL) pour rester exactes lors
+    des mises à jour incrémentales.
+    """
+
+    __tablename__ = "student_subject_stats"
+
+    student_id = db.Column(
+        db.Integer, db.ForeignKey("student_stats.student_id"), primary_key=True
+    )
+    subject = db.Column(db.String(50), primary_key=True)
+    session_count = db.Column(db.Integer, default=0, nullable=False)
+    completion_sum = db.Column(db.Float, default=0.0, nullable=False)
+    completion_count = db.Column(db.Integer, default=0, nullable=False)
+    accuracy_sum = db.Column(db.Float, default=0.0, nullable=False)
+    accuracy_count = db.Column(db.Integer, default=0, nullable=False)
+
+    def to_dict(self):
+        """Convertit les agrégats en moyennes"""
+        return {
+            "session_count": self.session_count,
+            "avg_completion": (
+                self.completion_sum / self.completion_count
+                if self.completion_count
+                else 0.0
+            ),
+            "avg_accuracy": (
+                self.accuracy_sum / self.accuracy_count if self.accuracy_count else 0.0
+            ),
+        }
+
+
+class GlobalStatCounter(db.Model):
+    """Compteur agrégé des statistiques globales (tous étudiants)
+
+    Une ligne par (dimension, clé) : ex. ("grade", "terminale") pour le
+    nombre d'étudiants actifs de terminale. `total` porte la somme des
+    valeurs quand le compteur sert à une moyenne. Tenus à jour de façon
+    incrémentale et réconciliés périodiquement (voir services/global_stats.py).
+    """
+
+    __tablename__ = "global_stat_counters"
+
+    dimension = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String(100), primary_key=True, default="")
+    count = db.Column(db.Integer, default=0, nullable=False)
+    total = db.Column(db.Float, default=0.0, nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
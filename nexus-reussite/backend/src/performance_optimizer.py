@@ -25,15 +25,16 @@ except ImportError:
     current_app = g = request = None
 
 try:
-    from sqlalchemy import event
-    from sqlalchemy.engine import Engine
+    from services.sql_profiler import sql_profiler
 except ImportError:
-    event = Engine = None
+    sql_profiler = None
 
 try:
     from services.cache_service import cache_service
+    from services.single_flight import single_flight_cache
 except ImportError:
     cache_service = None
+    single_flight_cache = None
 
 logger = logging.getLogger(__name__)
 
@@ -43,69 +44,21 @@ class PerformanceOptimizer:
 
     def __init__(self):
         self.redis_client = None
-        self.query_stats = {
-            'total_queries': 0,
-            'slow_queries': 0,
-            'total_time': 0.0,
-            'slowest_query': None,
-            'query_history': []
-        }
         self.performance_metrics = {}
 
     def init_app(self, app):
         """Initialise l'optimiseur avec l'application Flask"""
         self.redis_client = cache_service.redis_client
 
-        # Configuration du monitoring des requêtes SQL
-        self._setup_query_monitoring()
+        # Monitoring des requêtes SQL : profiler partagé (services/sql_profiler.py)
+        if sql_profiler:
+            sql_profiler.init_app(app)
 
         # Configuration du monitoring des performances
         self._setup_performance_monitoring(app)
 
         logger.info("✅ Performance Optimizer initialisé")
 
-    def _setup_query_monitoring(self):
-        """Configure le monitoring des requêtes SQL"""
-
-        if not event or not Engine:
-            logger.warning("SQLAlchemy not available - query monitoring disabled")
-            return
-
-        @event.listens_for(Engine, "before_cursor_execute")
-        def receive_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-            context._query_start_time = time.time()
-
-        @event.listens_for(Engine, "after_cursor_execute")
-        def receive_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-            total = time.time() - context._query_start_time
-
-            self.query_stats['total_queries'] += 1
-            self.query_stats['total_time'] += total
-
-            # Détecter les requêtes lentes (> 100ms)
-            if total > 0.1:
-                self.query_stats['slow_queries'] += 1
-
-                if not self.query_stats['slowest_query'] or total > self.query_stats['slowest_query']['time']:
-                    self.query_stats['slowest_query'] = {
-                        'statement': statement[:200] + "..." if len(statement) > 200 else statement,
-                        'time': total,
-                        'timestamp': datetime.utcnow()
-                    }
-
-                logger.warning(f"Requête SQL lente ({total:.3f}s): {statement[:100]}...")
-
-            # Garder un historique des 100 dernières requêtes
-            self.query_stats['query_history'].append({
-                'statement': statement[:100] + "..." if len(statement) > 100 else statement,
-                'time': total,
-                'timestamp': datetime.utcnow()
-            })
-
-            # Limiter l'historique
-            if len(self.query_stats['query_history']) > 100:
-                self.query_stats['query_history'] = self.query_stats['query_history'][-100:]
-
     def _setup_performance_monitoring(self, app):
         """Configure le monitoring des performances système"""
 
@@ -113,16 +66,16 @@ class PerformanceOptimizer:
             logger.warning("Flask not available - performance monitoring disabled")
             return
 
+        # Pas d'échantillon système (psutil) par requête : la répartition fine
+        # du temps est fournie par services/request_trace.py
         @app.before_request
         def before_request():
-            g.request_start_time = time.time()
-            if psutil:
-                g.request_cpu_start = psutil.cpu_percent()
+            g.request_start_time = time.perf_counter()
 
         @app.after_request
         def after_request(response):
             if hasattr(g, 'request_start_time'):
-                duration = time.time() - g.request_start_time
+                duration = time.perf_counter() - g.request_start_time
 
                 # Log les requêtes lentes (> 1s)
                 if duration > 1.0:
@@ -165,15 +118,7 @@ class PerformanceOptimizer:
                 'memory_available_mb': round(memory.available / 1024 / 1024, 2),
                 'timestamp': datetime.utcnow().isoformat()
             },
-            'database': {
-                'total_queries': self.query_stats['total_queries'],
-                'slow_queries': self.query_stats['slow_queries'],
-                'average_query_time': (
-                    round(self.query_stats['total_time'] / self.query_stats['total_queries'], 4)
-                    if self.query_stats['total_queries'] > 0 else 0
-                ),
-                'slowest_query': self.query_stats['slowest_query']
-            },
+            'database': sql_profiler.summary() if sql_profiler else {"status": "not_available"},
             'endpoints': self.performance_metrics,
             'cache': cache_service.get_stats() if cache_service else {"status": "not_available"}
         }
@@ -198,39 +143,23 @@ class PerformanceOptimizer:
 
     def clear_performance_stats(self):
         """Remet à zéro les statistiques de performance"""
-        self.query_stats = {
-            'total_queries': 0,
-            'slow_queries': 0,
-            'total_time': 0.0,
-            'slowest_query': None,
-            'query_history': []
-        }
+        if sql_profiler:
+            sql_profiler.reset()
         self.performance_metrics = {}
         logger.info("Statistiques de performance remises à zéro")
 
 
-def cache_result(ttl: int = 300, key_prefix: str = ""):
-    """Décorateur pour mettre en cache les résultats de fonction"""
-    def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # Générer une clé de cache unique
-            cache_key = f"{key_prefix}:{func.__name__}:{hash(str(args) + str(sorted(kwargs.items())))}"
-
-            # Essayer de récupérer depuis le cache
-            cached_result = performance_optimizer.get_cached_query(cache_key)
-            if cached_result is not None:
-                logger.debug(f"Cache hit: {cache_key}")
-                return cached_result
-
-            # Exécuter la fonction et mettre en cache
-            result = func(*args, **kwargs)
-            performance_optimizer.optimize_query_cache(cache_key, result, ttl)
-            logger.debug(f"Cache miss: {cache_key}")
-
-            return result
-        return wrapper
-    return decorator
+def cache_result(ttl: int = 300, key_prefix: str = "", stale_ttl: int = 0, **options):
+    """Décorateur pour mettre en cache les résultats de fonction
+
+    Clé stable entre workers, un seul recalcul par expiration (voir
+    `services.single_flight.single_flight_cache` pour les options).
+    """
+    if single_flight_cache is None:
+        return lambda func: func
+    return single_flight_cache(
+        ttl=ttl, key_prefix=key_prefix, stale_ttl=stale_ttl, **options
+    )
 
 
 def monitor_performance(func: Callable) -> Callable:
@@ -3,12 +3,14 @@ Routes API pour ARIA avec intégration de la base documentaire
 """
 
 import logging
+import sqlite3
 from datetime import datetime
 
 from flask import Blueprint, jsonify, request
 
 from services.aria_ai import ARIAService
 from services.document_database import DocumentDatabase
+from services.streaming import sse_response
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
@@ -30,23 +32,8 @@ def chat_with_aria():
         if not message:
             return jsonify({"error": "Message requis"}), 400
 
-        # Profil étudiant par défaut ou récupéré de la base
-        # NOTE: Replace with actual student profile retrieval using student_id
-        student_profile = {
-            "student_id": student_id,  # Include in profile for future use
-            "grade_level": "terminale",
-            "current_subject": "mathematiques",
-            "learning_style": "visual",
-            "difficulty_preference": 3,
-        }
-
-        # Rechercher des documents pertinents
-        relevant_docs = doc_db.search_documents(
-            query=message,
-            subject=student_profile.get("current_subject"),
-            grade_level=student_profile.get("grade_level"),
-            max_results=3,
-        )
+        student_profile = _student_profile(student_id)
+        relevant_docs = _relevant_documents(message, student_profile)
 
         # Obtenir des suggestions contextuelles
         contextual_suggestions = doc_db.get_contextual_suggestions(
@@ -78,6 +65,58 @@ def chat_with_aria():
         return jsonify({"error": "Internal server error"}), 500
 
 
+@aria_bp.route("/chat/stream", methods=["POST"])
+def chat_with_aria_stream():
+    """Discuter avec ARIA en flux SSE : fragments puis badges et usage"""
+    try:
+        data = request.get_json()
+        message = data.get("message", "")
+        context = data.get("context", "")
+
+        if not message:
+            return jsonify({"error": "Message requis"}), 400
+
+        student_profile = _student_profile(data.get("student_id"))
+        relevant_docs = _relevant_documents(message, student_profile)
+
+        return sse_response(
+            aria_service.stream_response(
+                message=message,
+                student_profile=student_profile,
+                context=context,
+                relevant_documents=relevant_docs,
+            )
+        )
+
+    except (ValueError, KeyError) as e:
+        return jsonify({"error": f"Invalid request data: {str(e)}"}), 400
+    except (RuntimeError, OSError) as e:  # pylint: disable=broad-exception-caught
+        logger.error("Error in chat_with_aria_stream: %s", str(e))
+        return jsonify({"error": "Internal server error"}), 500
+
+
+def _student_profile(student_id) -> dict:
+    """Profil étudiant par défaut ou récupéré de la base"""
+    # NOTE: Replace with actual student profile retrieval using student_id
+    return {
+        "student_id": student_id,  # Include in profile for future use
+        "grade_level": "terminale",
+        "current_subject": "mathematiques",
+        "learning_style": "visual",
+        "difficulty_preference": 3,
+    }
+
+
+def _relevant_documents(message: str, student_profile: dict) -> list:
+    """Rechercher des documents pertinents"""
+    return doc_db.search_documents(
+        query=message,
+        subject=student_profile.get("current_subject"),
+        grade_level=student_profile.get("grade_level"),
+        max_results=3,
+    )
+
+
 @aria_bp.route("/recommendations", methods=["POST"])
 def get_recommendations():
     """Obtenir des recommandations personnalisées"""
@@ -178,6 +217,48 @@ def add_document():
         return jsonify({"error": "Internal server error"}), 500
 
 
+@aria_bp.route("/documents/bulk_add", methods=["POST"])
+def bulk_add_documents():
+    """Ajouter un lot de documents en une seule transaction (imports de contenu)"""
+    try:
+        data = request.get_json()
+        documents = data.get("documents", [])
+
+        if not documents or not isinstance(documents, list):
+            return jsonify({"error": "Liste de documents requise"}), 400
+
+        required_fields = [
+            "title",
+            "content",
+            "subject",
+            "grade_level",
+            "document_type",
+        ]
+        for index, document in enumerate(documents):
+            for field in required_fields:
+                if not document.get(field):
+                    return (
+                        jsonify({"error": f"Document {index}: champ requis {field}"}),
+                        400,
+                    )
+
+        inserted = doc_db.add_documents(documents)
+
+        return jsonify(
+            {
+                "success": True,
+                "inserted": inserted,
+                "message": f"{inserted} documents ajoutés avec succès",
+            }
+        )
+
+    except (ValueError, KeyError, AttributeError) as e:
+        return jsonify({"error": f"Invalid request data: {str(e)}"}), 400
+    except (RuntimeError, OSError, sqlite3.Error) as e:
+        logger.error("Error in bulk_add_documents: %s", str(e))
+        return jsonify({"error": "Internal server error"}), 500
+
+
 @aria_bp.route("/analyze_learning_style", methods=["POST"])
 def analyze_learning_style():
     """Analyser le style d'apprentissage d'un élève"""
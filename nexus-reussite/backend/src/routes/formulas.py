@@ -12,13 +12,13 @@ from models.formulas import (
     GroupSession,
     IndividualSession,
     ParentCommunication,
-    SessionAttendance,
     StudentObjective,
     Teacher,
     WeeklyReport,
     db,
 )
 from models.student import Student
+from services.session_timeline import DEFAULT_PAGE_SIZE, get_session_timeline
 
 formulas_bp = Blueprint("formulas", __name__)
 
@@ -253,103 +253,19 @@ def enroll_student(student_id):
 @formulas_bp.route("/api/students/<int:student_id>/sessions", methods=["GET"])
 @cross_origin()
 def get_student_sessions(student_id):
-    """Récupérer les séances d'un étudiant"""
-    try:
-        # Séances individuelles
-        individual_sessions = IndividualSession.query.filter_by(
-            student_id=student_id
-        ).all()
-
-        # Séances de groupe
-        enrollments = Enrollment.query.filter_by(
-            student_id=student_id, is_active=True
-        ).all()
-        group_sessions = []
-        for enrollment in enrollments:
-            if enrollment.group_id:
-                sessions = GroupSession.query.filter_by(
-                    group_id=enrollment.group_id
-                ).all()
-                group_sessions.extend(sessions)
-
-        sessions_data = []
-
-        # Ajouter les séances individuelles
-        for session in individual_sessions:
-            teacher = Teacher.query.get(session.teacher_id)
-            sessions_data.append(
-                {
-                    "id": session.id,
-                    "type": "individual",
-                    "subject": session.subject,
-                    "scheduled_at": session.scheduled_at.isoformat(),
-                    "duration_minutes": session.duration_minutes,
-                    "status": session.status,
-                    "teacher": (
-                        {
-                            "name": f"{teacher.first_name} {teacher.last_name}",
-                            "email": teacher.email,
-                        }
-                        if teacher
-                        else None
-                    ),
-                    "topics_covered": session.topics_covered,
-                    "homework_assigned": session.homework_assigned,
-                    "teacher_notes": session.teacher_notes,
-                    "performance": session.student_performance,
-                }
-            )
+    """Récupérer les séances d'un étudiant (paginées, plus récentes d'abord)
 
-        # Ajouter les séances de groupe
-        for session in group_sessions:
-            group = Group.query.get(session.group_id)
-            teacher = Teacher.query.get(group.teacher_id) if group else None
-
-            # Récupérer les informations de présence
-            attendance = SessionAttendance.query.filter_by(
-                session_id=session.id, student_id=student_id
-            ).first()
-
-            sessions_data.append(
-                {
-                    "id": session.id,
-                    "type": "group",
-                    "subject": session.subject,
-                    "scheduled_at": session.scheduled_at.isoformat(),
-                    "duration_minutes": session.duration_minutes,
-                    "status": session.status,
-                    "group": (
-                        {"name": group.name, "level": group.level} if group else None
-                    ),
-                    "teacher": (
-                        {
-                            "name": f"{teacher.first_name} {teacher.last_name}",
-                            "email": teacher.email,
-                        }
-                        if teacher
-                        else None
-                    ),
-                    "topics_covered": session.topics_covered,
-                    "homework_assigned": session.homework_assigned,
-                    "teacher_notes": session.teacher_notes,
-                    "attendance": (
-                        {
-                            "is_present": attendance.is_present,
-                            "participation_score": attendance.participation_score,
-                            "individual_notes": attendance.individual_notes,
-                        }
-                        if attendance
-                        else None
-                    ),
-                }
-            )
-
-        # Trier par date
-        sessions_data.sort(key=lambda x: x["scheduled_at"], reverse=True)
-
-        return jsonify({"success": True, "sessions": sessions_data})
-    except (ValueError, json.JSONDecodeError) as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+    Paramètres : `limit` (50 par défaut, 200 au plus) et `cursor`, valeur
+    `next_cursor` de la page précédente.
+    """
+    try:
+        limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+        timeline = get_session_timeline(
+            student_id, cursor=request.args.get("cursor"), limit=limit
+        )
+        return jsonify({"success": True, **timeline})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
 
 @formulas_bp.route("/api/students/<int:student_id>/weekly-reports", methods=["GET"])
@@ -16,10 +16,13 @@ from config import get_config
 from database import (
     analyze_table_performance,
     create_database_indices,
+    get_n_plus_one_report,
     get_query_stats,
+    get_statement_stats,
     reset_query_stats,
 )
 from services.cache_service import cache_service
+from services.index_advisor import DEFAULT_REPORT_LIMIT, index_report
 
 logger = structlog.get_logger()
 
@@ -127,6 +130,59 @@ def database_stats():
         return jsonify({"error": "Erreur d'analyse", "message": str(e)}), 500
 
 
+@monitoring_bp.route("/database/statements", methods=["GET"])
+@jwt_required()
+@limiter.limit("10 per minute")
+def database_statements():
+    """
+    Statistiques agrégées par empreinte d'instruction SQL (profiler) :
+    exécutions, latences p50/p95/p99, lignes et endpoints appelants
+    Export lu par `flask index-advice --stats-file`
+    """
+    limit = request.args.get("limit", type=int)
+    return jsonify(get_statement_stats(limit)), 200
+
+
+@monitoring_bp.route("/database/n-plus-one", methods=["GET"])
+@jwt_required()
+@limiter.limit("20 per minute")
+def database_n_plus_one():
+    """
+    Motifs N+1 détectés : même empreinte répétée dans une requête HTTP
+    """
+    limit = request.args.get("limit", 20, type=int)
+    return (
+        jsonify(
+            {
+                "timestamp": datetime.utcnow().isoformat(),
+                **get_n_plus_one_report(limit),
+            }
+        ),
+        200,
+    )
+
+
+@monitoring_bp.route("/database/index-advice", methods=["GET"])
+@jwt_required()
+@limiter.limit("10 per minute")
+def database_index_advice():
+    """
+    Prédicats SQL les plus lents et index composites manquants
+    """
+    try:
+        limit = request.args.get("limit", DEFAULT_REPORT_LIMIT, type=int)
+        report = index_report(get_statement_stats(), limit=limit)
+
+        return (
+            jsonify({"timestamp": datetime.utcnow().isoformat(), **report}),
+            200,
+        )
+
+    except (RuntimeError, OSError, ValueError) as e:
+        logger.error("Erreur lors de l'analyse des index", error=str(e))
+        return jsonify({"error": "Erreur d'analyse", "message": str(e)}), 500
+
+
 @monitoring_bp.route("/database/optimize", methods=["POST"])
 @jwt_required()
 @limiter.limit("5 per hour")
@@ -289,12 +345,14 @@ def get_slow_queries():
                 {
                     "duration_ms": round(query["duration"] * 1000, 2),
                     "statement": (
-                        query["statement"][:200] + "..."
-                        if len(query["statement"]) > 200
-                        else query["statement"]
+                        query["fingerprint"][:200] + "..."
+                        if len(query["fingerprint"]) > 200
+                        else query["fingerprint"]
                     ),
+                    "rows": query["rows"],
                     "timestamp": datetime.fromtimestamp(query["timestamp"]).isoformat(),
-                    "context": query.get("context", "unknown"),
+                    "endpoint": query["endpoint"],
+                    "request_id": query["request_id"],
                 }
             )
 
@@ -4,7 +4,9 @@ from datetime import datetime
 
 from flask import Blueprint, jsonify, request
 from flask_cors import cross_origin
+from flask_jwt_extended import get_jwt_identity, jwt_required, verify_jwt_in_request
 
+from services.conversation_store import conversation_store, new_session_id
 from services.openai_integration import (
     ConversationContext,
     StudentProfile,
@@ -12,7 +14,9 @@ from services.openai_integration import (
     create_adaptive_quiz,
     generate_personalized_document,
     openai_service,
+    stream_chat_with_aria,
 )
+from services.streaming import sse_response
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -22,6 +26,24 @@ logger = logging.getLogger(__name__)
 openai_bp = Blueprint("openai", __name__, url_prefix="/api/openai")
 
 
+def _current_owner():
+    """Identité JWT de l'appelant, ou None pour un appel anonyme"""
+    verify_jwt_in_request(optional=True)
+    identity = get_jwt_identity()
+    return None if identity is None else str(identity)
+
+
+def _session_for(requested_id, owner):
+    """Session demandée si l'appelant y a accès, sinon (None, réponse 403)
+
+    Sans identifiant fourni, une nouvelle session aléatoire est ouverte.
+    """
+    session_id = requested_id or new_session_id()
+    if not conversation_store.can_access(session_id, owner):
+        return None, (jsonify({"error": "Session access denied"}), 403)
+    return session_id, None
+
+
 @openai_bp.route("/health", methods=["GET"])
 @cross_origin()
 def health_check():
@@ -60,12 +82,15 @@ def chat_endpoint():
 
         message = data["message"]
         student_id = data.get("student_id", "anonymous")
+        owner = _current_owner()
+        session_id, denied = _session_for(data.get("session_id"), owner)
+        if denied:
+            return denied
 
         # Construction du contexte
         context = {
-            "session_id": data.get(
-                "session_id", f"session_{datetime.now().timestamp()}"
-            ),
+            "session_id": session_id,
+            "owner_id": owner,
             "subject": data.get("subject", "général"),
             "topic": data.get("topic"),
             "type": data.get("conversation_type", "tutoring"),
@@ -86,6 +111,7 @@ def chat_endpoint():
                     {
                         "success": True,
                         "data": response,
+                        "session_id": session_id,
                         "timestamp": datetime.now().isoformat(),
                     }
                 ),
@@ -100,6 +126,45 @@ def chat_endpoint():
         return jsonify({"error": "Internal server error", "message": str(e)}), 500
 
 
+@openai_bp.route("/chat/stream", methods=["POST"])
+@cross_origin()
+def chat_stream_endpoint():
+    """Chat avec ARIA en flux SSE : un événement par fragment, puis `done`"""
+    try:
+        data = request.get_json()
+
+        # Validation des données requises
+        if not data or "message" not in data:
+            return jsonify({"error": "Message is required"}), 400
+
+        owner = _current_owner()
+        session_id, denied = _session_for(data.get("session_id"), owner)
+        if denied:
+            return denied
+
+        context = {
+            "session_id": session_id,
+            "owner_id": owner,
+            "subject": data.get("subject", "général"),
+            "topic": data.get("topic"),
+            "type": data.get("conversation_type", "tutoring"),
+            "difficulty_level": data.get("difficulty", "medium"),
+        }
+
+        response = sse_response(
+            stream_chat_with_aria(
+                data["message"], data.get("student_id", "anonymous"), context
+            )
+        )
+        # Identifiant à renvoyer au tour suivant pour garder l'historique
+        response.headers["X-Session-Id"] = session_id
+        return response
+
+    except (RuntimeError, OSError, ValueError) as e:
+        logger.error(f"Erreur dans le chat stream endpoint: {e}")
+        return jsonify({"error": "Internal server error", "message": str(e)}), 500
+
+
 @openai_bp.route("/chat/advanced", methods=["POST"])
 @cross_origin()
 def advanced_chat_endpoint():
@@ -131,11 +196,14 @@ def advanced_chat_endpoint():
 
         # Construction du contexte
         context_data = data["context"]
+        owner = _current_owner()
+        session_id, denied = _session_for(context_data.get("session_id"), owner)
+        if denied:
+            return denied
         context = ConversationContext(
             student_id=student_profile.id,
-            session_id=context_data.get(
-                "session_id", f"session_{datetime.now().timestamp()}"
-            ),
+            session_id=session_id,
+            owner_id=owner,
             subject=context_data.get("subject", "général"),
             topic=context_data.get("topic"),
             difficulty_level=context_data.get("difficulty_level", "medium"),
@@ -159,6 +227,7 @@ def advanced_chat_endpoint():
                     {
                         "success": True,
                         "data": response,
+                        "session_id": session_id,
                         "timestamp": datetime.now().isoformat(),
                     }
                 ),
@@ -531,9 +600,10 @@ def analyze_work_endpoint():
 @openai_bp.route("/usage/stats", methods=["GET"])
 @cross_origin()
 def usage_stats_endpoint():
-    """Statistiques d'utilisation de l'API OpenAI"""
+    """Statistiques d'utilisation de l'API OpenAI (`?days=30` par défaut)"""
     try:
-        stats = openai_service.get_usage_statistics()
+        days = min(max(request.args.get("days", 30, type=int), 1), 366)
+        stats = openai_service.get_usage_statistics(days)
 
         return (
             jsonify(
@@ -617,38 +687,58 @@ def available_models_endpoint():
 
 @openai_bp.route("/conversation/context", methods=["POST"])
 @cross_origin()
+@jwt_required()
 def save_conversation_context():
-    """Sauvegarde le contexte de conversation pour la continuité"""
+    """Ajoute des messages au journal d'une session de l'utilisateur
+
+    `messages` contient les nouveaux messages uniquement : le journal est en
+    ajout seul. Les tours échangés via /chat/advanced et /chat/stream y sont
+    déjà enregistrés. Sans `session_id`, une nouvelle session est ouverte.
+    """
     try:
         data = request.get_json()
 
         # Validation
-        required_fields = ["session_id", "student_id", "messages"]
+        required_fields = ["student_id", "messages"]
         for field in required_fields:
             if field not in data:
                 return jsonify({"error": f"{field} is required"}), 400
-
-        session_id = data["session_id"]
-        student_id = data["student_id"]
-        messages = data["messages"]
+        if not isinstance(data["messages"], list):
+            return jsonify({"error": "messages must be a list"}), 400
+
+        owner = str(get_jwt_identity())
+        session_id = data.get("session_id") or new_session_id()
+        # Les sessions anonymes ne se rattachent pas à un compte
+        if not conversation_store.can_access(session_id, owner, allow_anonymous=False):
+            return jsonify({"error": "Session access denied"}), 403
         context_metadata = data.get("metadata", {})
 
-        # En production, sauvegarder en base de données
-        # Pour la démo, on simule la sauvegarde
-        saved_context = {
-            "session_id": session_id,
-            "student_id": student_id,
-            "messages": messages,
-            "metadata": context_metadata,
-            "saved_at": datetime.now().isoformat(),
-            "status": "saved",
-        }
+        appended = conversation_store.append(
+            session_id,
+            data["student_id"],
+            data["messages"],
+            {
+                "subject": context_metadata.get("subject"),
+                "topic": context_metadata.get("topic"),
+                "conversation_type": context_metadata.get("conversation_type"),
+                "metadata": context_metadata,
+            },
+            owner_id=owner,
+        )
+        saved_context = conversation_store.get_session(session_id, owner)
+        if saved_context is None:
+            return jsonify({"error": "Conversation store unavailable"}), 503
 
         return (
             jsonify(
                 {
                     "success": True,
-                    "data": saved_context,
+                    "data": {
+                        **saved_context,
+                        "appended": appended,
+                        "saved_at": datetime.now().isoformat(),
+                        "status": "saved",
+                    },
                     "message": "Context saved successfully",
                 }
             ),
@@ -662,31 +752,29 @@ def save_conversation_context():
 
 @openai_bp.route("/conversation/context/<session_id>", methods=["GET"])
 @cross_origin()
+@jwt_required()
 def get_conversation_context(session_id):
-    """Récupère le contexte de conversation sauvegardé"""
+    """Contexte d'une session de l'utilisateur (`?limit=50` messages)
+
+    Une session inconnue ou d'un autre utilisateur répond 404.
+    """
     try:
-        # En production, récupérer depuis la base de données
-        # Pour la démo, on simule la récupération
-        demo_context = {
-            "session_id": session_id,
-            "student_id": "demo_student",
-            "messages": [
-                {
-                    "role": "assistant",
-                    "content": "Bonjour ! Comment puis-je vous aider aujourd'hui ?",
-                    "timestamp": datetime.now().isoformat(),
-                }
-            ],
-            "metadata": {
-                "subject": "mathématiques",
-                "topic": "fonctions",
-                "difficulty_level": "medium",
-            },
-            "created_at": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat(),
-        }
+        owner = str(get_jwt_identity())
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+        context = conversation_store.get_session(session_id, owner, limit=limit)
+        if context is None:
+            return jsonify({"success": True, "data": None, "found": False}), 404
+
+        # Historique tel qu'il sera injecté dans le prochain prompt
+        window = conversation_store.load_window(session_id, owner)
+        if window is not None:
+            context["prompt_window"] = {
+                "messages": len(window.messages),
+                "tokens": window.tokens,
+                "pending_messages": window.pending_messages,
+            }
 
-        return jsonify({"success": True, "data": demo_context, "found": True}), 200
+        return jsonify({"success": True, "data": context, "found": True}), 200
 
     except (RuntimeError, OSError, ValueError) as e:
         logger.error(f"Erreur lors de la récupération du contexte: {e}")
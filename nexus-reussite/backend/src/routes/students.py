@@ -3,12 +3,30 @@ from datetime import datetime, timedelta
 
 from flask import Blueprint, jsonify, request
 from flask_cors import cross_origin
-from sqlalchemy import or_
+from sqlalchemy.exc import SQLAlchemyError
 
 from models.student import Assessment, LearningSession, Student, db
+from performance_optimizer import cache_result
+from services.global_stats import GLOBAL_STATS_CACHE_KEY, get_global_stats
+from services.student_directory import filtered_query, list_students_page
+from services.student_stats import (
+    dashboard_cache_key,
+    get_student_stats,
+    recent_activity,
+)
 
 students_bp = Blueprint("students", __name__)
 
+# Durée de vie du tableau de bord en cache (secondes)
+DASHBOARD_CACHE_TTL = 30
+# Statistiques globales en cache, invalidées à chaque écriture validée
+GLOBAL_STATS_CACHE_TTL = 300
+
+
+@cache_result(ttl=GLOBAL_STATS_CACHE_TTL, key_func=lambda: GLOBAL_STATS_CACHE_KEY)
+def _cached_global_stats():
+    return get_global_stats()
+
 
 @students_bp.route("/register", methods=["POST"])
 @cross_origin()
@@ -157,57 +175,55 @@ def list_students():
         search = request.args.get("search")  # Recherche par nom ou email
         active_only = request.args.get("active_only", "true").lower() == "true"
 
-        # Construction de la requête
-        query = Student.query
-
-        if active_only:
-            query = query.filter_by(is_active=True)
-
-        if grade_level:
-            query = query.filter_by(grade_level=grade_level)
-
-        if school:
-            query = query.filter_by(school=school)
-
-        if search:
-            search_pattern = f"%{search}%"
-            query = query.filter(
-                or_(
-                    Student.full_name.ilike(search_pattern),
-                    Student.email.ilike(search_pattern),
+        # Pagination par curseur : ?pagination=cursor puis ?cursor=<next_cursor>
+        cursor = request.args.get("cursor")
+        if cursor or request.args.get("pagination") == "cursor":
+            try:
+                result = list_students_page(
+                    cursor=cursor,
+                    limit=per_page,
+                    active_only=active_only,
+                    grade_level=grade_level,
+                    school=school,
+                    search=search,
                 )
-            )
-
-        # Tri par date de création (plus récents en premier)
-        query = query.order_by(Student.created_at.desc())
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            students_data = result["students"]
+            pagination = {
+                "mode": "cursor",
+                "per_page": per_page,
+                "total": result["total"],
+                "total_is_estimate": result["total_is_estimate"],
+                "next_cursor": result["next_cursor"],
+                "has_next": result["has_more"],
+            }
+        else:
+            # Pagination par numéro de page (OFFSET), triée par date de création
+            query = filtered_query(active_only, grade_level, school, search)
+            query = query.order_by(Student.created_at.desc())
+            students = query.paginate(page=page, per_page=per_page, error_out=False)
+            students_data = [student.to_dict() for student in students.items]
+            pagination = {
+                "page": page,
+                "per_page": per_page,
+                "total": students.total,
+                "pages": students.pages,
+                "has_next": students.has_next,
+                "has_prev": students.has_prev,
+            }
 
-        # Pagination
-        students = query.paginate(page=page, per_page=per_page, error_out=False)
-
-        # Statistiques générales
-        total_students = Student.query.filter_by(is_active=True).count()
-        grade_distribution = (
-            db.session.query(Student.grade_level, db.func.count(Student.id))
-            .filter_by(is_active=True)
-            .group_by(Student.grade_level)
-            .all()
-        )
+        # Statistiques générales (compteurs incrémentaux, en cache)
+        global_stats = _cached_global_stats()
 
         return jsonify(
             {
                 "success": True,
-                "students": [student.to_dict() for student in students.items],
-                "pagination": {
-                    "page": page,
-                    "per_page": per_page,
-                    "total": students.total,
-                    "pages": students.pages,
-                    "has_next": students.has_next,
-                    "has_prev": students.has_prev,
-                },
+                "students": students_data,
+                "pagination": pagination,
                 "statistics": {
-                    "total_active_students": total_students,
-                    "grade_distribution": dict(grade_distribution),
+                    "total_active_students": global_stats["total_students"],
+                    "grade_distribution": global_stats["grade_levels"],
                 },
             }
         )
@@ -380,108 +396,9 @@ def get_student_dashboard(student_id):
     Récupère les données du tableau de bord d'un étudiant
     """
     try:
-        student = Student.query.get(student_id)
-        if not student:
-            return jsonify({"error": "Étudiant non trouvé"}), 404
-
-        # Sessions récentes (7 derniers jours)
-
-        week_ago = datetime.utcnow() - timedelta(days=7)
-
-        recent_sessions = (
-            LearningSession.query.filter(
-                LearningSession.student_id == student_id,
-                LearningSession.created_at >= week_ago,
-            )
-            .order_by(LearningSession.created_at.desc())
-            .limit(5)
-            .all()
-        )
-
-        # Évaluations récentes
-        recent_assessments = (
-            Assessment.query.filter(
-                Assessment.student_id == student_id, Assessment.is_completed == True
-            )
-            .order_by(Assessment.completed_at.desc())
-            .limit(3)
-            .all()
-        )
-
-        # Statistiques de progression
-        total_sessions = LearningSession.query.filter_by(student_id=student_id).count()
-        total_time = (
-            db.session.query(db.func.sum(LearningSession.duration_minutes))
-            .filter_by(student_id=student_id)
-            .scalar()
-            or 0
-        )
-
-        # Progression par matière
-        subject_stats = (
-            db.session.query(
-                LearningSession.subject,
-                db.func.count(LearningSession.id).label("session_count"),
-                db.func.avg(LearningSession.completion_rate).label("avg_completion"),
-                db.func.avg(LearningSession.accuracy_rate).label("avg_accuracy"),
-            )
-            .filter_by(student_id=student_id)
-            .group_by(LearningSession.subject)
-            .all()
-        )
-
-        subject_progress = {}
-        for stat in subject_stats:
-            subject_progress[stat.subject] = {
-                "session_count": stat.session_count,
-                "avg_completion": float(stat.avg_completion or 0),
-                "avg_accuracy": float(stat.avg_accuracy or 0),
-            }
-
-        # Objectifs et recommandations (basés sur le profil ARIA)
-        cognitive_profile = (
-            json.loads(student.cognitive_profile) if student.cognitive_profile else {}
-        )
-        performance_data = (
-            json.loads(student.performance_data) if student.performance_data else {}
-        )
-
-        # Calcul du niveau de progression global
-        if recent_assessments:
-            recent_scores = [a.score for a in recent_assessments if a.score]
-            progress_trend = (
-                "improving"
-                if len(recent_scores) >= 2 and recent_scores[0] > recent_scores[-1]
-                else "stable"
-            )
-        else:
-            progress_trend = "new"
-
-        return jsonify(
-            {
-                "success": True,
-                "student_profile": student.to_dict(),
-                "recent_activity": {
-                    "sessions": [session.to_dict() for session in recent_sessions],
-                    "assessments": [
-                        assessment.to_dict() for assessment in recent_assessments
-                    ],
-                },
-                "statistics": {
-                    "total_sessions": total_sessions,
-                    "total_time_hours": round(total_time / 60, 1),
-                    "subject_progress": subject_progress,
-                    "progress_trend": progress_trend,
-                },
-                "recommendations": {
-                    "next_session_suggestion": _get_next_session_suggestion(
-                        student, subject_progress
-                    ),
-                    "focus_areas": _get_focus_areas(performance_data),
-                    "study_tips": _get_personalized_study_tips(student.learning_style),
-                },
-            }
-        )
+        return jsonify(_build_student_dashboard(student_id))
+    except LookupError:
+        return jsonify({"error": "Étudiant non trouvé"}), 404
 
     except (RuntimeError, OSError, ValueError) as e:
         return (
@@ -494,6 +411,70 @@ def get_student_dashboard(student_id):
         )
 
 
+@cache_result(ttl=DASHBOARD_CACHE_TTL, key_func=dashboard_cache_key)
+def _build_student_dashboard(student_id):
+    """Tableau de bord servi depuis les agrégats matérialisés (student_stats)
+
+    Mis en cache quelques secondes ; invalidé au commit de toute écriture
+    d'une session ou d'une évaluation de l'étudiant. Lève LookupError si
+    l'étudiant n'existe pas (rien n'est alors mis en cache).
+    """
+    student = Student.query.get(student_id)
+    if not student:
+        raise LookupError(student_id)
+
+    stats = get_student_stats(student_id)
+    activity = recent_activity(stats)
+    subject_progress = stats.subject_progress()
+
+    # Sessions récentes (7 derniers jours)
+    week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat()
+    recent_sessions = [
+        session
+        for session in activity["sessions"]
+        if session["created_at"] and session["created_at"] >= week_ago
+    ]
+    recent_assessments = activity["assessments"]
+
+    # Objectifs et recommandations (basés sur le profil ARIA)
+    performance_data = (
+        json.loads(student.performance_data) if student.performance_data else {}
+    )
+
+    # Calcul du niveau de progression global
+    if recent_assessments:
+        recent_scores = [a["score"] for a in recent_assessments if a["score"]]
+        progress_trend = (
+            "improving"
+            if len(recent_scores) >= 2 and recent_scores[0] > recent_scores[-1]
+            else "stable"
+        )
+    else:
+        progress_trend = "new"
+
+    return {
+        "success": True,
+        "student_profile": student.to_dict(),
+        "recent_activity": {
+            "sessions": recent_sessions,
+            "assessments": recent_assessments,
+        },
+        "statistics": {
+            "total_sessions": stats.total_sessions,
+            "total_time_hours": round(stats.total_minutes / 60, 1),
+            "subject_progress": subject_progress,
+            "progress_trend": progress_trend,
+        },
+        "recommendations": {
+            "next_session_suggestion": _get_next_session_suggestion(
+                student, subject_progress
+            ),
+            "focus_areas": _get_focus_areas(performance_data),
+            "study_tips": _get_personalized_study_tips(student.learning_style),
+        },
+    }
+
+
 def _get_next_session_suggestion(student, subject_progress):
     """Suggère la prochaine session basée sur l'historique"""
     if not subject_progress:
@@ -592,64 +573,29 @@ def get_global_statistics():
     Récupère les statistiques globales des étudiants
     """
     try:
-        # Statistiques générales
-        total_students = Student.query.filter_by(is_active=True).count()
-        total_sessions = LearningSession.query.count()
-        total_assessments = Assessment.query.filter_by(is_completed=True).count()
-
-        # Répartition par niveau
-        grade_distribution = (
-            db.session.query(Student.grade_level, db.func.count(Student.id))
-            .filter_by(is_active=True)
-            .group_by(Student.grade_level)
-            .all()
-        )
-
-        # Répartition par école
-        school_distribution = (
-            db.session.query(Student.school, db.func.count(Student.id))
-            .filter(Student.is_active == True, Student.school.isnot(None))
-            .group_by(Student.school)
-            .all()
-        )
-
-        # Matières les plus populaires
-        subject_popularity = (
-            db.session.query(LearningSession.subject, db.func.count(LearningSession.id))
-            .group_by(LearningSession.subject)
-            .order_by(db.func.count(LearningSession.id).desc())
-            .limit(5)
-            .all()
-        )
-
-        # Performances moyennes
-        avg_completion = (
-            db.session.query(db.func.avg(LearningSession.completion_rate)).scalar() or 0
-        )
-
-        avg_accuracy = (
-            db.session.query(db.func.avg(LearningSession.accuracy_rate)).scalar() or 0
-        )
+        # Compteurs tenus à jour à chaque écriture (services/global_stats.py)
+        stats = _cached_global_stats()
 
         return jsonify(
             {
                 "success": True,
                 "global_statistics": {
-                    "total_students": total_students,
-                    "total_sessions": total_sessions,
-                    "total_assessments": total_assessments,
-                    "avg_completion_rate": float(avg_completion),
-                    "avg_accuracy_rate": float(avg_accuracy),
+                    "total_students": stats["total_students"],
+                    "total_sessions": stats["total_sessions"],
+                    "total_assessments": stats["total_assessments"],
+                    "avg_completion_rate": stats["avg_completion_rate"],
+                    "avg_accuracy_rate": stats["avg_accuracy_rate"],
                 },
                 "distributions": {
-                    "grade_levels": dict(grade_distribution),
-                    "schools": dict(school_distribution),
-                    "popular_subjects": dict(subject_popularity),
+                    "grade_levels": stats["grade_levels"],
+                    "schools": stats["schools"],
+                    "popular_subjects": stats["popular_subjects"],
                 },
             }
         )
 
-    except (RuntimeError, OSError, ValueError) as e:
+    except (RuntimeError, OSError, ValueError, SQLAlchemyError) as e:
+        db.session.rollback()
         return (
             jsonify(
                 {"error": f"Erreur lors de la récupération des statistiques: {str(e)}"}
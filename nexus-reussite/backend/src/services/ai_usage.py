@@ -0,0 +1,538 @@
+"""
+Comptabilité des appels à l'API OpenAI
+Nexus Réussite - AI Usage
+
+Chaque appel du client partagé (services/openai_client.py) est enregistré
+avec son type, son modèle, son résultat, l'élève, les jetons, la latence et
+le coût estimé :
+- l'enregistrement ne fait qu'un `deque.append` (atomique, sans verrou) dans
+  un tampon borné du processus ;
+- un lot dont l'écriture échoue est gardé à part et réécrit en premier au
+  passage suivant, sans évincer les événements arrivés entre-temps ;
+- un thread démon (`UsageFlusher`) vide le tampon par lots : insertion des
+  événements bruts (`ai_usage_events`) et UPSERT relatifs des agrégats
+  journaliers (`ai_usage_rollups`), dans une seule transaction ;
+- `get_usage_summary` lit uniquement les agrégats : totaux par modèle, par
+  type et par jour, coût, latence moyenne et p95 (borne supérieure du seau
+  de latence qui atteint 95 %).
+"""
+
+import atexit
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from flask import has_app_context
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import db
+from models.ai_usage import AIUsageEvent, AIUsageRollup
+
+logger = logging.getLogger(__name__)
+
+events_table = AIUsageEvent.__table__
+rollups_table = AIUsageRollup.__table__
+
+SUCCESS = "success"
+ERROR = "error"
+
+# Bornes supérieures (ms) des seaux de latence ; le dernier est ouvert
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+# Prix en USD par million de jetons (entrée, sortie)
+TOKEN_PRICES_USD = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo-preview": (10.00, 30.00),
+    "gpt-4-vision-preview": (10.00, 30.00),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+# Prix en USD par image générée
+IMAGE_PRICES_USD = {"dall-e-3": 0.04}
+
+DEFAULT_BUFFER_SIZE = 10000
+DEFAULT_FLUSH_INTERVAL = 10.0
+DEFAULT_RETENTION_DAYS = 90
+# Purge des événements bruts expirés au plus une fois par heure
+RETENTION_CHECK_INTERVAL = 3600
+FLUSH_BATCH_SIZE = 500
+DEFAULT_SUMMARY_DAYS = 30
+# Types présents dans les statistiques même sans appel
+REQUEST_TYPES = (
+    "chat",
+    "document_generation",
+    "quiz_generation",
+    "image_generation",
+    "work_analysis",
+)
+
+RollupKey = Tuple[date, str, str, str, int]
+
+
+@dataclass(frozen=True)
+class UsageEvent:
+    created_at: datetime
+    request_type: str
+    model: str
+    outcome: str
+    student_id: Optional[str]
+    prompt_tokens: int
+    completion_tokens: int
+    latency_ms: float
+    cost_usd: float
+
+
+def latency_bucket(latency_ms: float) -> int:
+    return bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)
+
+
+def estimate_cost(
+    model: str, prompt_tokens: int, completion_tokens: int, images: int = 0
+) -> float:
+    """Coût estimé en USD ; 0 pour un modèle sans tarif connu"""
+    if images:
+        return images * IMAGE_PRICES_USD.get(model, 0.0)
+    input_price, output_price = TOKEN_PRICES_USD.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1e6
+
+
+class UsageAccounting:
+    """Tampon des appels OpenAI et écriture par lots"""
+
+    def __init__(self, max_buffer: int = DEFAULT_BUFFER_SIZE):
+        self._buffer: Deque[UsageEvent] = deque(maxlen=max_buffer)
+        # Lot en échec, réécrit avant le tampon (un lot au plus : le vidage
+        # s'arrête au premier échec)
+        self._retry: List[UsageEvent] = []
+        self._flush_lock = threading.Lock()
+        self.flusher: Optional["UsageFlusher"] = None
+        self.stats = {"recorded": 0, "flushed": 0, "flush_errors": 0, "dropped": 0}
+
+    def record(
+        self,
+        request_type: str,
+        model: Optional[str],
+        outcome: str,
+        latency_ms: float,
+        student_id: Any = None,
+        response: Any = None,
+    ):
+        """Enregistre un appel (sans verrou, sans accès à la base)"""
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        model = model or getattr(response, "model", None) or "unknown"
+        images = 0
+        if model in IMAGE_PRICES_USD and outcome == SUCCESS:
+            images = len(getattr(response, "data", None) or [])
+
+        if len(self._buffer) == self._buffer.maxlen:
+            self.stats["dropped"] += 1
+            logger.warning("Tampon de consommation OpenAI plein : événement perdu")
+        self._buffer.append(
+            UsageEvent(
+                created_at=datetime.utcnow(),
+                request_type=request_type,
+                model=model,
+                outcome=outcome,
+                student_id=None if student_id is None else str(student_id)[:64],
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                latency_ms=latency_ms,
+                cost_usd=estimate_cost(model, prompt_tokens, completion_tokens, images),
+            )
+        )
+        self.stats["recorded"] += 1
+        if self.flusher is not None:
+            self.flusher.notify(len(self._buffer))
+
+    @property
+    def pending(self) -> int:
+        return len(self._retry) + len(self._buffer)
+
+    def _drain(self, limit: int) -> List[UsageEvent]:
+        if self._retry:
+            events = self._retry[:limit]
+            del self._retry[:limit]
+            return events
+        events = []
+        while len(events) < limit:
+            try:
+                events.append(self._buffer.popleft())
+            except IndexError:
+                break
+        return events
+
+    def flush(self) -> int:
+        """Écrit le tampon en base par lots (contexte d'application requis)"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                events = self._drain(FLUSH_BATCH_SIZE)
+                if not events:
+                    return written
+                try:
+                    _write_batch(events)
+                    db.session.commit()
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    self.stats["flush_errors"] += 1
+                    # Remis dans le tampon plein, il en évincerait les
+                    # événements les plus récents
+                    self._retry[:0] = events
+                    logger.error(f"Écriture de la consommation OpenAI impossible: {e}")
+                    return written
+                written += len(events)
+                self.stats["flushed"] += len(events)
+
+
+def _write_batch(events: List[UsageEvent]):
+    connection = db.session.connection()
+    connection.execute(
+        events_table.insert(),
+        [
+            {
+                "created_at": event.created_at,
+                "request_type": event.request_type,
+                "model": event.model,
+                "outcome": event.outcome,
+                "student_id": event.student_id,
+                "prompt_tokens": event.prompt_tokens,
+                "completion_tokens": event.completion_tokens,
+                "latency_ms": event.latency_ms,
+                "cost_usd": event.cost_usd,
+            }
+            for event in events
+        ],
+    )
+
+    deltas: Dict[RollupKey, List[float]] = {}
+    for event in events:
+        key = (
+            event.created_at.date(),
+            event.model,
+            event.request_type,
+            event.outcome,
+            latency_bucket(event.latency_ms),
+        )
+        delta = deltas.setdefault(key, [0, 0, 0, 0.0, 0.0])
+        delta[0] += 1
+        delta[1] += event.prompt_tokens
+        delta[2] += event.completion_tokens
+        delta[3] += event.latency_ms
+        delta[4] += event.cost_usd
+    _write_rollups(connection, deltas)
+
+
+def _upsert_statement(connection):
+    """INSERT ... ON CONFLICT DO UPDATE relatif, si le dialecte le permet"""
+    # pylint: disable=import-outside-toplevel
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif connection.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    statement = insert(rollups_table)
+    columns = rollups_table.c
+    return statement.on_conflict_do_update(
+        index_elements=[
+            columns.day,
+            columns.model,
+            columns.request_type,
+            columns.outcome,
+            columns.latency_bucket,
+        ],
+        set_={
+            name: columns[name] + statement.excluded[name]
+            for name in (
+                "requests",
+                "prompt_tokens",
+                "completion_tokens",
+                "latency_ms_total",
+                "cost_usd",
+            )
+        }
+        | {"updated_at": statement.excluded.updated_at},
+    )
+
+
+def _write_rollups(connection, deltas: Dict[RollupKey, List[float]]):
+    now = datetime.utcnow()
+    rows = [
+        {
+            "day": day,
+            "model": model,
+            "request_type": request_type,
+            "outcome": outcome,
+            "latency_bucket": bucket,
+            "requests": requests,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms_total": latency_ms,
+            "cost_usd": cost,
+            "updated_at": now,
+        }
+        for (day, model, request_type, outcome, bucket), (
+            requests,
+            prompt_tokens,
+            completion_tokens,
+            latency_ms,
+            cost,
+        ) in deltas.items()
+    ]
+
+    upsert = _upsert_statement(connection)
+    if upsert is not None:
+        connection.execute(upsert, rows)
+        return
+
+    columns = rollups_table.c
+    for row in rows:
+        result = connection.execute(
+            rollups_table.update()
+            .where(
+                columns.day == row["day"],
+                columns.model == row["model"],
+                columns.request_type == row["request_type"],
+                columns.outcome == row["outcome"],
+                columns.latency_bucket == row["latency_bucket"],
+            )
+            .values(
+                requests=columns.requests + row["requests"],
+                prompt_tokens=columns.prompt_tokens + row["prompt_tokens"],
+                completion_tokens=columns.completion_tokens + row["completion_tokens"],
+                latency_ms_total=columns.latency_ms_total + row["latency_ms_total"],
+                cost_usd=columns.cost_usd + row["cost_usd"],
+                updated_at=now,
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(rollups_table.insert().values(**row))
+
+
+class UsageFlusher:
+    """Thread démon qui vide le tampon à intervalle régulier
+
+    Démarré paresseusement au premier appel enregistré dans le processus :
+    avec `gunicorn --preload`, un thread lancé avant le fork n'existerait pas
+    dans les workers. Réveillé plus tôt quand un lot complet attend.
+    """
+
+    def __init__(
+        self,
+        app,
+        accounting: UsageAccounting,
+        interval: float,
+        retention_days: int = DEFAULT_RETENTION_DAYS,
+    ):
+        self.app = app
+        self.accounting = accounting
+        self.interval = interval
+        self.retention_days = retention_days
+        self._last_purge = 0.0
+        self._pid: Optional[int] = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def notify(self, pending: int):
+        if self._pid != os.getpid():
+            self._start()
+        if pending >= FLUSH_BATCH_SIZE:
+            self._wake.set()
+
+    def _start(self):
+        with self._lock:
+            pid = os.getpid()
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._wake = threading.Event()
+            self._stop_event = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, name="ai-usage-flush", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.run_once()
+
+    def run_once(self) -> int:
+        with self.app.app_context():
+            try:
+                written = self.accounting.flush()
+                self._purge_expired()
+                return written
+            except Exception:  # pylint: disable=broad-except
+                db.session.rollback()
+                logger.exception("Échec de l'écriture de la consommation OpenAI")
+                return 0
+
+    def _purge_expired(self):
+        if self.retention_days <= 0:
+            return
+        now = time.monotonic()
+        if now - self._last_purge < RETENTION_CHECK_INTERVAL:
+            return
+        self._last_purge = now
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        db.session.execute(
+            events_table.delete().where(events_table.c.created_at < cutoff)
+        )
+        db.session.commit()
+
+    def stop(self):
+        """Arrête le thread après un dernier vidage du tampon"""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread and self._pid == os.getpid():
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+        if self.accounting.pending:
+            self.run_once()
+
+
+# Instance globale
+usage_accounting = UsageAccounting()
+
+
+def init_usage_accounting(app) -> UsageFlusher:
+    """Active l'écriture en base de la consommation (AI_USAGE_FLUSH_INTERVAL)"""
+    flusher = app.extensions.get("ai_usage_flusher")
+    if flusher is None:
+        flusher = UsageFlusher(
+            app,
+            usage_accounting,
+            float(app.config.get("AI_USAGE_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)),
+            int(app.config.get("AI_USAGE_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)),
+        )
+        usage_accounting.flusher = flusher
+        app.extensions["ai_usage_flusher"] = flusher
+        # Dernier vidage du tampon à l'arrêt du worker
+        atexit.register(flusher.stop)
+    return flusher
+
+
+def record_usage(
+    request_type: str,
+    model: Optional[str],
+    outcome: str,
+    latency_ms: float,
+    student_id: Any = None,
+    response: Any = None,
+):
+    """Enregistre un appel à l'API OpenAI"""
+    usage_accounting.record(
+        request_type, model, outcome, latency_ms, student_id, response
+    )
+
+
+# ----- Lecture des agrégats -----
+
+
+def _p95_ms(buckets: Dict[int, int]) -> Optional[float]:
+    total = sum(buckets.values())
+    if not total:
+        return None
+    threshold = 0.95 * total
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        if seen >= threshold:
+            # Seau ouvert : la dernière borne est un minorant (JSON sans Infinity)
+            return float(LATENCY_BUCKETS_MS[min(bucket, len(LATENCY_BUCKETS_MS) - 1)])
+    return None
+
+
+class _Totals:
+    __slots__ = ("requests", "errors", "prompt", "completion", "latency", "cost")
+
+    def __init__(self):
+        self.requests = self.errors = self.prompt = self.completion = 0
+        self.latency = self.cost = 0.0
+
+    def add(self, row):
+        self.requests += row.requests
+        if row.outcome != SUCCESS:
+            self.errors += row.requests
+        self.prompt += row.prompt_tokens
+        self.completion += row.completion_tokens
+        self.latency += row.latency_ms_total
+        self.cost += row.cost_usd
+
+    def to_dict(self, buckets: Dict[int, int]) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt,
+            "completion_tokens": self.completion,
+            "total_tokens": self.prompt + self.completion,
+            "average_latency_ms": (
+                round(self.latency / self.requests, 1) if self.requests else 0
+            ),
+            "p95_latency_ms": _p95_ms(buckets),
+            "cost_usd": round(self.cost, 6),
+        }
+
+
+def get_usage_summary(days: int = DEFAULT_SUMMARY_DAYS) -> Dict[str, Any]:
+    """Agrégats des `days` derniers jours, lus dans `ai_usage_rollups`
+
+    Les jours des agrégats sont des dates UTC (`created_at` en utcnow).
+    """
+    since = datetime.utcnow().date() - timedelta(days=max(days, 1) - 1)
+    rows = []
+    if has_app_context():
+        try:
+            rows = db.session.execute(
+                db.select(rollups_table).where(rollups_table.c.day >= since)
+            ).all()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Lecture des agrégats de consommation impossible: {e}")
+
+    overall = _Totals()
+    overall_buckets: Dict[int, int] = {}
+    groups: Dict[str, Dict[str, Tuple[_Totals, Dict[int, int]]]] = {
+        "by_model": {},
+        "by_type": {name: (_Totals(), {}) for name in REQUEST_TYPES},
+        "by_day": {},
+    }
+    for row in rows:
+        overall.add(row)
+        overall_buckets[row.latency_bucket] = (
+            overall_buckets.get(row.latency_bucket, 0) + row.requests
+        )
+        for group, key in (
+            ("by_model", row.model),
+            ("by_type", row.request_type),
+            ("by_day", row.day.isoformat()),
+        ):
+            totals, buckets = groups[group].setdefault(key, (_Totals(), {}))
+            totals.add(row)
+            buckets[row.latency_bucket] = (
+                buckets.get(row.latency_bucket, 0) + row.requests
+            )
+
+    return {
+        "since": since.isoformat(),
+        **overall.to_dict(overall_buckets),
+        **{
+            group: {
+                key: totals.to_dict(buckets)
+                for key, (totals, buckets) in sorted(entries.items())
+            }
+            for group, entries in groups.items()
+        },
+        "pending_events": usage_accounting.pending,
+    }
@@ -8,11 +8,20 @@ import logging
 import os
 import random
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
+
+import numpy as np
+
+from .openai_client import get_openai_client
+from .progress_analytics import rolling_mean, split_half_change, trend_slope
+from .streaming import DONE, ERROR, TOKEN, StreamEvent, simulated_stream
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
 
+# Nombre de scores de la moyenne glissante récente
+RECENT_SCORES_WINDOW = 3
+
 
 class ARIAService:
     """
@@ -154,12 +163,10 @@ class ARIAService:
 
     def _initialize_openai(self):
         """Initialise le client OpenAI si la clé API est disponible"""
-        # pylint: disable=import-outside-toplevel,reimported,redefined-outer-name
         try:
             if self.api_key and self.api_key.startswith("sk-"):
-                from openai import OpenAI
-
-                self.client = OpenAI(api_key=self.api_key)
+                # Client partagé : pool de connexions, concurrence bornée, retries
+                self.client = get_openai_client(self.api_key)
                 self.has_openai = True
                 logger.info("Service ARIA initialisé avec OpenAI API")
             else:
@@ -217,6 +224,81 @@ class ARIAService:
             )
         return self._generate_fallback_response(message, student_profile, context)
 
+    def stream_response(
+        self,
+        message: str,
+        student_profile: Dict,
+        context: str = "",
+        relevant_documents: List = None,
+    ) -> Iterator[StreamEvent]:
+        """Génère une réponse ARIA en flux : fragments puis badges et usage"""
+
+        if not self.has_openai:
+            yield from simulated_stream(
+                self._generate_fallback_response(message, student_profile, context)
+            )
+            return
+
+        parts: List[str] = []
+        usage = None
+        try:
+            for chunk in self.client.stream_chat_completion_sync(
+                tenant=student_profile.get("student_id"),
+                operation="aria.chat",
+                **self._chat_params(
+                    message, student_profile, context, relevant_documents
+                ),
+            ):
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content = chunk.choices[0].delta.content
+                    parts.append(content)
+                    yield TOKEN, {"content": content}
+        except (RuntimeError, OSError, ValueError) as exc:  # pylint: disable=broad-exception-caught
+            logger.error("Erreur flux OpenAI API: %s", exc)
+            if not parts:
+                yield from simulated_stream(
+                    self._generate_fallback_response(message, student_profile, context)
+                )
+            else:
+                yield ERROR, {"message": "Flux interrompu"}
+            return
+
+        yield DONE, {
+            "badges": self._generate_badges(student_profile, message),
+            "confidence_score": 0.95,
+            "message_type": self.detect_message_type(message),
+            "personalized": True,
+            "source": "openai",
+            "token_usage": {
+                "prompt_tokens": usage.prompt_tokens if usage else 0,
+                "completion_tokens": usage.completion_tokens if usage else 0,
+                "total_tokens": usage.total_tokens if usage else 0,
+            },
+        }
+
+    def _chat_params(
+        self,
+        message: str,
+        student_profile: Dict,
+        context: str,
+        relevant_documents: List,
+    ) -> Dict[str, Any]:
+        """Prompt personnalisé et paramètres de la complétion de chat"""
+        system_prompt = self._build_system_prompt(student_profile)
+        user_message = self._build_user_message(message, context, relevant_documents)
+        return {
+            "model": "gpt-4o-mini",  # Modèle plus économique
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message},
+            ],
+            "temperature": 0.7,
+            "max_tokens": 1000,
+            "top_p": 0.9,
+        }
+
     def _generate_openai_response(
         self,
         message: str,
@@ -226,21 +308,12 @@ class ARIAService:
     ) -> Dict[str, Any]:
         """Génère une réponse avec OpenAI API"""
         try:
-            # Construction du prompt personnalisé
-            system_prompt = self._build_system_prompt(student_profile)
-            user_message = self._build_user_message(
-                message, context, relevant_documents
-            )
-
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Modèle plus économique
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message},
-                ],
-                temperature=0.7,
-                max_tokens=1000,
-                top_p=0.9,
+            response = self.client.chat_completion_sync(
+                tenant=student_profile.get("student_id"),
+                operation="aria.chat",
+                **self._chat_params(
+                    message, student_profile, context, relevant_documents
+                ),
             )
 
             aria_response = response.choices[0].message.content
@@ -389,7 +462,9 @@ class ARIAService:
                 "explanation, exercises, methodology_tips, resources"
             )
 
-            response = self.client.chat.completions.create(
+            response = self.client.chat_completion_sync(
+                tenant=student_profile.get("student_id"),
+                operation="aria.content",
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.7,
@@ -714,28 +789,23 @@ class ARIAService:
             }
 
         # Calculs de base
-        average_score = sum(recent_scores) / len(recent_scores)
+        scores = np.asarray(recent_scores, dtype=np.float64)
+        average_score = float(scores.mean())
         latest_score = recent_scores[-1]
+        recent_average = float(rolling_mean(scores, RECENT_SCORES_WINDOW)[-1])
 
-        # Tendance (comparaison dernière moitié vs première moitié)
-        if len(recent_scores) >= 4:
-            mid_point = len(recent_scores) // 2
-            first_half_avg = sum(recent_scores[:mid_point]) / mid_point
-            second_half_avg = sum(recent_scores[mid_point:]) / (
-                len(recent_scores) - mid_point
-            )
-            if second_half_avg > first_half_avg:
+        # Tendance : pente des moindres carrés, évolution entre les deux moitiés
+        if len(scores) >= 4:
+            slope = trend_slope(scores)
+            if slope > 0:
                 trend = "amélioration"
-            elif second_half_avg < first_half_avg:
+            elif slope < 0:
                 trend = "déclin"
             else:
                 trend = "stable"
-            progress_percentage = (
-                ((second_half_avg - first_half_avg) / first_half_avg) * 100
-                if first_half_avg > 0
-                else 0
-            )
+            progress_percentage = split_half_change(scores)
         else:
+            slope = 0.0
             trend = "stable"
             progress_percentage = 0
 
@@ -799,10 +869,12 @@ class ARIAService:
             "subject": subject,
             "statistics": {
                 "average_score": round(average_score, 2),
+                "recent_average": round(recent_average, 2),
                 "latest_score": latest_score,
                 "total_evaluations": len(recent_scores),
                 "trend": trend,
                 "progress_percentage": round(progress_percentage, 2),
+                "trend_slope": round(slope, 3),
             },
             "assessment": {
                 "current_level": level,
@@ -1,76 +1,481 @@
 #!/usr/bin/env python3
-"""Cache Service with Redis for Production"""
+"""Cache Service with Redis for Production
+
+Cache à deux niveaux :
+- L1 : LRU borné en mémoire du processus, avec TTL par clé
+- L2 : Redis, partagé entre les workers gunicorn
+
+Les lectures servent d'abord le L1 ; un miss L1 interroge Redis et
+réalimente le L1. Toute écriture ou invalidation est publiée sur un canal
+Redis pub/sub pour que les autres workers évincent leur copie L1.
+Sans Redis, le L1 sert seul de cache (borné et respectant les TTL).
+
+Les deux niveaux stockent du texte : une valeur est relue sous forme de
+chaîne, quel que soit le niveau qui répond (voir `_as_text`).
+"""
+
+import fnmatch
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
 
 import redis
-from flask import current_app
 
-# Instance Redis globale
-redis_client = None
+from .metrics import record_cache_lookup
+from .request_trace import CACHE, span
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut, surchargeables via la configuration Flask
+DEFAULT_TIMEOUT = 300
+DEFAULT_KEY_PREFIX = "nexus:cache:"
+DEFAULT_L1_MAX_SIZE = 1024
+# Durée maximale de vie d'une copie L1 : borne l'obsolescence si un message
+# d'invalidation est perdu (coupure pub/sub)
+DEFAULT_L1_TTL = 60
+DEFAULT_INVALIDATION_CHANNEL = "nexus:cache:invalidate"
+# Nombre de clés demandées à Redis par itération de SCAN
+SCAN_BATCH_SIZE = 500
+# Délai avant une nouvelle tentative d'abonnement pub/sub après un échec
+LISTENER_RETRY_DELAY = 30.0
+
+_MISSING = object()
+
+
+def _as_text(value: Any) -> str:
+    """Valeur telle que Redis la stocke et la rend : du texte
+
+    Chaîne inchangée, bytes décodés en UTF-8, nombre converti comme le fait
+    redis-py ; tout autre type est refusé (TypeError), avec ou sans Redis.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    raise TypeError(f"valeur de cache non textuelle: {type(value).__name__}")
+
+
+class LocalLRUCache:
+    """Cache LRU en mémoire, borné, avec expiration par clé"""
+
+    def __init__(self, max_size: int = DEFAULT_L1_MAX_SIZE):
+        self.max_size = max_size
+        # clé -> (valeur, instant d'expiration en temps monotone)
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Any:
+        """Valeur de la clé, ou `_MISSING` si absente ou expirée"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def delete_matching(self, pattern: str) -> int:
+        """Supprime les clés correspondant à un motif glob (syntaxe Redis)"""
+        with self._lock:
+            keys = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class TwoTierCache:
+    """Cache L1 (mémoire) devant Redis, avec invalidation inter-workers"""
+
+    def __init__(self):
+        self.redis_client: Optional[redis.Redis] = None
+        self.local = LocalLRUCache()
+        self.key_prefix = DEFAULT_KEY_PREFIX
+        self.l1_ttl = DEFAULT_L1_TTL
+        self.channel = DEFAULT_INVALIDATION_CHANNEL
+        # Identifie ce processus pour ignorer ses propres messages pub/sub
+        self.instance_id = uuid.uuid4().hex
+        self._pid = os.getpid()
+        self._pubsub = None
+        self._listener = None
+        self._listener_retry_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {
+            "redis_hits": 0,
+            "redis_misses": 0,
+            "redis_errors": 0,
+            "invalidations_sent": 0,
+            "invalidations_received": 0,
+        }
+
+    # ----- Initialisation -----
+
+    def init_cache(self, app):
+        """Initialise le cache Redis et l'abonnement aux invalidations"""
+        self.key_prefix = app.config.get("CACHE_KEY_PREFIX", DEFAULT_KEY_PREFIX)
+        self.l1_ttl = app.config.get("CACHE_L1_TTL", DEFAULT_L1_TTL)
+        self.channel = app.config.get(
+            "CACHE_INVALIDATION_CHANNEL", DEFAULT_INVALIDATION_CHANNEL
+        )
+        self.local = LocalLRUCache(
+            app.config.get("CACHE_L1_MAX_SIZE", DEFAULT_L1_MAX_SIZE)
+        )
+
+        try:
+            redis_url = app.config.get("REDIS_URL", "redis://localhost:6379/0")
+            self.redis_client = redis.from_url(redis_url)
+            self.redis_client.ping()  # Test de connexion
+            app.logger.info("✅ Cache Redis initialisé avec succès")
+        except Exception as e:
+            app.logger.warning(
+                f"⚠️ Redis non disponible, utilisation du cache mémoire: {e}"
+            )
+            self.redis_client = None
+
+        return app
+
+    def _ensure_listener(self):
+        """Démarre (ou redémarre après un fork) le thread d'écoute pub/sub
+
+        Appelé paresseusement : avec `gunicorn --preload`, l'application est
+        créée avant le fork et un thread lancé à l'initialisation n'existerait
+        pas dans les workers.
+        """
+        if self.redis_client is None:
+            return
+        pid = os.getpid()
+        if self._listener is not None and self._pid == pid:
+            return
+        if self._pid == pid and time.monotonic() < self._listener_retry_at:
+            return
+
+        with self._lock:
+            if self._listener is not None and self._pid == pid:
+                return
+            if self._pid != pid:
+                # Processus fils : nouvel identifiant, L1 hérité du parent vidé
+                self._pid = pid
+                self.instance_id = uuid.uuid4().hex
+                self.local.clear()
+            try:
+                self._pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                self._pubsub.subscribe(**{self.channel: self._on_invalidation})
+                self._listener = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+            except redis.RedisError as e:
+                logger.warning(f"Abonnement aux invalidations impossible: {e}")
+                self._pubsub = self._listener = None
+                self._listener_retry_at = time.monotonic() + LISTENER_RETRY_DELAY
+
+    def _on_invalidation(self, message):
+        """Applique au L1 une invalidation publiée par un autre worker"""
+        try:
+            payload = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if payload.get("origin") == self.instance_id:
+            return
+
+        self.stats["invalidations_received"] += 1
+        if "keys" in payload:
+            for key in payload["keys"]:
+                self.local.delete(key)
+        elif "pattern" in payload:
+            self.local.delete_matching(payload["pattern"])
+        elif payload.get("clear"):
+            self.local.clear()
+
+    def _publish(self, pipe, **payload):
+        """Ajoute la publication d'une invalidation à un pipeline Redis"""
+        payload["origin"] = self.instance_id
+        pipe.publish(self.channel, json.dumps(payload))
+        self.stats["invalidations_sent"] += 1
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.key_prefix}{key}"
+
+    def _redis_error(self, operation: str, error: Exception):
+        self.stats["redis_errors"] += 1
+        logger.warning(f"Erreur Redis {operation}: {error}")
+
+    # ----- Opérations -----
+
+    def get_cache(self):
+        """Retourne l'instance Redis"""
+        return self.redis_client
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Récupère une valeur du cache (L1 puis Redis)"""
+        value = self.local.get(key)
+        record_cache_lookup("l1", value is not _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.redis_client is None:
+            return default
+
+        self._ensure_listener()
+        try:
+            # GET et PTTL en un seul aller-retour
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.get(self._redis_key(key))
+            pipe.pttl(self._redis_key(key))
+            with span(CACHE, "redis get"):
+                raw, ttl_ms = pipe.execute()
+        except redis.RedisError as e:
+            self._redis_error("get", e)
+            return default
+
+        value = None
+        if raw is not None:
+            try:
+                value = _as_text(raw)
+            except UnicodeDecodeError:
+                # Valeur écrite hors de ce service : traitée comme absente
+                logger.warning(f"Valeur de cache illisible ignorée: {key}")
+        record_cache_lookup("redis", value is not None)
+        if value is None:
+            self.stats["redis_misses"] += 1
+            return default
+
+        self.stats["redis_hits"] += 1
+        ttl = self.l1_ttl if ttl_ms is None or ttl_ms < 0 else ttl_ms / 1000
+        self.local.set(key, value, min(ttl, self.l1_ttl))
+        return value
+
+    def set(self, key: str, value: Any, timeout: int = DEFAULT_TIMEOUT) -> bool:
+        """Stocke une valeur dans le cache
+
+        La valeur (str, bytes UTF-8 ou nombre) est relue sous forme de
+        chaîne, avec ou sans Redis ; les autres types sont refusés (False).
+        """
+        try:
+            value = _as_text(value)
+        except (TypeError, UnicodeDecodeError) as e:
+            logger.warning(f"Valeur non mise en cache ({key}): {e}")
+            return False
+
+        if self.redis_client is None:
+            self.local.set(key, value, timeout)
+            return True
+
+        self._ensure_listener()
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(self._redis_key(key), timeout, value)
+            self._publish(pipe, keys=[key])
+            with span(CACHE, "redis set"):
+                pipe.execute()
+        except redis.RedisError as e:
+            self._redis_error("set", e)
+            self.local.delete(key)
+            return False
+
+        self.local.set(key, value, min(timeout, self.l1_ttl))
+        return True
+
+    def delete(self, key: str) -> bool:
+        """Supprime une clé du cache, sur tous les workers"""
+        self.local.delete(key)
+        if self.redis_client is None:
+            return True
+
+        self._ensure_listener()
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.delete(self._redis_key(key))
+            self._publish(pipe, keys=[key])
+            with span(CACHE, "redis delete"):
+                pipe.execute()
+            return True
+        except redis.RedisError as e:
+            self._redis_error("delete", e)
+            return False
+
+    def _scan_delete(self, pattern: str) -> int:
+        """Supprime par lots les clés Redis du motif, sans bloquer Redis (SCAN)"""
+        deleted = 0
+        batch = []
+        for redis_key in self.redis_client.scan_iter(
+            match=self._redis_key(pattern), count=SCAN_BATCH_SIZE
+        ):
+            batch.append(redis_key)
+            if len(batch) >= SCAN_BATCH_SIZE:
+                deleted += self._unlink(batch)
+                batch = []
+        if batch:
+            deleted += self._unlink(batch)
+        return deleted
+
+    def _unlink(self, keys: Iterable) -> int:
+        keys = list(keys)
+        try:
+            # UNLINK libère la mémoire en arrière-plan (Redis >= 4)
+            return self.redis_client.unlink(*keys)
+        except redis.ResponseError:
+            return self.redis_client.delete(*keys)
+
+    def invalidate_pattern(self, pattern: str) -> int:
+        """Invalide les clés correspondant à un motif glob (ex. `user:42:*`)
+
+        Returns:
+            Nombre de clés supprimées (Redis, ou L1 sans Redis)
+        """
+        local_deleted = self.local.delete_matching(pattern)
+        if self.redis_client is None:
+            return local_deleted
+
+        self._ensure_listener()
+        try:
+            with span(CACHE, "redis invalidate_pattern"):
+                deleted = self._scan_delete(pattern)
+                pipe = self.redis_client.pipeline(transaction=False)
+                self._publish(pipe, pattern=pattern)
+                pipe.execute()
+            return deleted
+        except redis.RedisError as e:
+            self._redis_error("invalidate_pattern", e)
+            return 0
+
+    def clear(self, key: Optional[str] = None) -> bool:
+        """Supprime une clé, ou vide tout le cache si aucune clé n'est donnée
+
+        Seules les clés de l'espace de noms du cache sont supprimées : la
+        base Redis est partagée (rate limiting).
+        """
+        if key is not None:
+            return self.delete(key)
+
+        self.local.clear()
+        if self.redis_client is None:
+            return True
+
+        self._ensure_listener()
+        try:
+            self._scan_delete("*")
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._publish(pipe, clear=True)
+            pipe.execute()
+            return True
+        except redis.RedisError as e:
+            self._redis_error("clear", e)
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques des deux niveaux de cache"""
+        stats: Dict[str, Any] = {
+            "backend": "redis" if self.redis_client is not None else "memory",
+            "l1": self.local.get_stats(),
+            **self.stats,
+        }
+        l1_hits = stats["l1"]["hits"]
+        total = l1_hits + stats["l1"]["misses"]
+        stats["hit_rate"] = (
+            round((l1_hits + self.stats["redis_hits"]) / total, 4) if total else 0.0
+        )
+
+        if self.redis_client is not None:
+            try:
+                info = self.redis_client.info(section="stats")
+                memory = self.redis_client.info(section="memory")
+                stats["redis"] = {
+                    "keyspace_hits": info.get("keyspace_hits", 0),
+                    "keyspace_misses": info.get("keyspace_misses", 0),
+                    "evicted_keys": info.get("evicted_keys", 0),
+                    "used_memory_human": memory.get("used_memory_human"),
+                }
+            except redis.RedisError as e:
+                stats["redis"] = {"status": "unavailable", "error": str(e)}
+        return stats
+
+
+# Instance globale du service de cache
+cache_service = TwoTierCache()
 
-# Cache mémoire local de fallback
-cache_store = {}
 
 def init_cache(app):
     """Initialise le cache Redis"""
-    global redis_client
-    try:
-        redis_url = app.config.get('REDIS_URL', 'redis://localhost:6379/0')
-        redis_client = redis.from_url(redis_url)
-        redis_client.ping()  # Test de connexion
-        app.logger.info("✅ Cache Redis initialisé avec succès")
-    except Exception as e:
-        app.logger.warning(f"⚠️ Redis non disponible, utilisation du cache mémoire: {e}")
-        redis_client = None
-
-    return app
+    return cache_service.init_cache(app)
+
 
 def get_cache():
     """Retourne l'instance cache"""
-    return redis_client
+    return cache_service.get_cache()
+
 
 def get(key):
     """Récupère une valeur du cache"""
-    if redis_client:
-        try:
-            value = redis_client.get(key)
-            return value.decode('utf-8') if value else None
-        except:
-            pass
-    return cache_store.get(key)
+    return cache_service.get(key)
 
-def set(key, value, timeout=300):
+
+def set(key, value, timeout=DEFAULT_TIMEOUT):  # pylint: disable=redefined-builtin
     """Stocke une valeur dans le cache"""
-    if redis_client:
-        try:
-            return redis_client.setex(key, timeout, value)
-        except:
-            pass
-    cache_store[key] = value
-    return True
+    return cache_service.set(key, value, timeout)
+
 
 def clear(key):
     """Supprime une clé du cache"""
-    if redis_client:
-        try:
-            redis_client.delete(key)
-            return True
-        except Exception as e:
-            print(f"Erreur Redis clear: {e}")
-            return False
-    else:
-        # Cache mémoire local
-        cache_store.pop(key, None)
-        return True
+    return cache_service.delete(key)
+
+
+def invalidate_pattern(pattern):
+    """Invalide les clés correspondant à un motif"""
+    return cache_service.invalidate_pattern(pattern)
+
+
+def get_stats():
+    """Statistiques du cache"""
+    return cache_service.get_stats()
+
 
 def setup_cache(app):
     """Alias pour compatibilité"""
     return init_cache(app)
-
-# Instance globale du service de cache
-cache_service = {
-    'get': get,
-    'set': set,
-    'clear': clear,
-    'get_cache': get_cache,
-    'init_cache': init_cache
-}
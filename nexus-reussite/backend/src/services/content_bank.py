@@ -3,10 +3,10 @@ Service de gestion de la banque de contenu modulaire
 Nexus Réussite - Content Bank Service
 """
 
-import json
-import os
+import atexit
 import uuid
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 from ..models.content_system import (
     BrickType,
@@ -15,6 +15,9 @@ from ..models.content_system import (
     Subject,
     TargetProfile,
 )
+from .content_index import ContentBrickIndex
+from .content_journal import ContentBankJournal
+from .counter_aggregator import BrickCounterAggregator, CounterDelta, merge_rating
 
 
 class ContentBankService:
@@ -23,35 +26,82 @@ class ContentBankService:
     def __init__(self, data_file: str = "content_bank.json"):
         self.data_file = data_file
         self.bricks: Dict[str, ContentBrick] = {}
+        self.index = ContentBrickIndex()
+        self.journal = ContentBankJournal(data_file)
+        self.counters = BrickCounterAggregator(self._apply_counter_deltas)
+        # Incrémentée à chaque ajout/modification/suppression de brique :
+        # les caches construits sur la banque s'invalident en la comparant
+        self.version = 0
         self.load_data()
+        atexit.register(self.flush)
 
     def load_data(self):
-        """Charge les données depuis le fichier JSON"""
-        if os.path.exists(self.data_file):
+        """Charge l'instantané JSON et rejoue le journal des modifications"""
+        if self.journal.exists():
             try:
-                with open(self.data_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    for brick_data in data.get("bricks", []):
-                        brick = ContentBrick.from_dict(brick_data)
-                        self.bricks[brick.id] = brick
-            except (RuntimeError, OSError, ValueError) as e:
+                for brick_data in self.journal.load().values():
+                    brick = ContentBrick.from_dict(brick_data)
+                    self.bricks[brick.id] = brick
+                    self.index.add(brick)
+            except (RuntimeError, OSError, ValueError, KeyError) as e:
                 print(f"Erreur lors du chargement des données: {e}")
                 self._initialize_sample_data()
         else:
             self._initialize_sample_data()
 
     def save_data(self):
-        """Sauvegarde les données dans le fichier JSON"""
+        """Écrit un instantané complet (compaction du journal)
+
+        Réservé au démarrage et à la compaction : les modifications
+        courantes passent par `_record`, qui n'ajoute qu'une ligne au journal.
+        """
         try:
-            data = {
-                "bricks": [brick.to_dict() for brick in self.bricks.values()],
-                "last_updated": datetime.now().isoformat(),
-            }
-            with open(self.data_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self.counters.flush()
+            # Les briques sont relues sous le verrou du journal
+            self.journal.write_snapshot(
+                lambda: [brick.to_dict() for brick in list(self.bricks.values())]
+            )
         except (RuntimeError, OSError, ValueError) as e:
             print(f"Erreur lors de la sauvegarde: {e}")
 
+    def _record(self, entry: Dict[str, Any]):
+        """Journalise une opération, puis compacte si le journal est trop long"""
+        try:
+            self.journal.append(entry)
+        except (RuntimeError, OSError, ValueError) as e:
+            print(f"Erreur lors de la journalisation: {e}")
+            return
+
+        if self.journal.needs_compaction():
+            self.save_data()
+
+    def _apply_counter_deltas(self, batch: Dict[str, CounterDelta]):
+        """Sink des compteurs : applique un lot en mémoire et le journalise"""
+        values = {}
+        for brick_id, delta in batch.items():
+            brick = self.bricks.get(brick_id)
+            if brick is None:
+                continue
+            brick.usage_count = (brick.usage_count or 0) + delta.usage
+            brick.average_rating, brick.total_ratings = merge_rating(
+                brick.average_rating,
+                brick.total_ratings,
+                delta.rating_sum,
+                delta.rating_count,
+            )
+            values[brick_id] = {
+                "usage_count": brick.usage_count,
+                "average_rating": brick.average_rating,
+                "total_ratings": brick.total_ratings,
+            }
+
+        if values:
+            self._record({"op": "counters", "values": values})
+
+    def flush(self):
+        """Persiste tout ce qui est encore en attente (appelé à l'arrêt)"""
+        self.counters.flush()
+
     def _initialize_sample_data(self):
         """Initialise la banque avec des données d'exemple"""
         sample_bricks = [
@@ -185,6 +235,7 @@ F: [C, E]
 
         for brick in sample_bricks:
             self.bricks[brick.id] = brick
+            self.index.add(brick)
 
         self.save_data()
 
@@ -197,7 +248,9 @@ F: [C, E]
         brick.updated_at = datetime.now()
 
         self.bricks[brick.id] = brick
-        self.save_data()
+        self.index.add(brick)
+        self.version += 1
+        self._record({"op": "put", "brick": brick.to_dict()})
         return brick.id
 
     def get_brick(self, brick_id: str) -> Optional[ContentBrick]:
@@ -215,14 +268,19 @@ F: [C, E]
                 setattr(brick, key, value)
 
         brick.updated_at = datetime.now()
-        self.save_data()
+        self.index.add(brick)
+        self.version += 1
+        self._record({"op": "put", "brick": brick.to_dict()})
         return True
 
     def delete_brick(self, brick_id: str) -> bool:
         """Supprime une brique de la banque"""
         if brick_id in self.bricks:
             del self.bricks[brick_id]
-            self.save_data()
+            self.index.remove(brick_id)
+            self.counters.discard(brick_id)
+            self.version += 1
+            self._record({"op": "delete", "id": brick_id})
             return True
         return False
 
@@ -238,45 +296,25 @@ F: [C, E]
         tags: Optional[List[str]] = None,
         limit: Optional[int] = None,
     ) -> List[ContentBrick]:
-        """Recherche des briques selon des critères"""
-
-        results = []
-
-        for brick in self.bricks.values():
-            # Filtrage par matière
-            if subject and brick.subject != subject:
-                continue
-
-            # Filtrage par chapitre
-            if chapter and brick.chapter.lower() != chapter.lower():
-                continue
-
-            # Filtrage par type
-            if brick_type and brick.type != brick_type:
-                continue
-
-            # Filtrage par difficulté
-            if difficulty_min and brick.difficulty < difficulty_min:
-                continue
-            if difficulty_max and brick.difficulty > difficulty_max:
-                continue
-
-            # Filtrage par profil cible
-            if target_profile and target_profile not in brick.target_profiles:
-                continue
-
-            # Filtrage par étape d'apprentissage
-            if learning_step and learning_step not in brick.learning_steps:
-                continue
-
-            # Filtrage par tags
-            if tags:
-                if not any(
-                    tag.lower() in [t.lower() for t in brick.tags] for tag in tags
-                ):
-                    continue
-
-            results.append(brick)
+        """Recherche des briques selon des critères
+
+        Les critères sont résolus par intersection des index inversés
+        (voir ContentBrickIndex) plutôt que par un parcours de la banque.
+        """
+
+        matching_ids = self.index.find(
+            subject=subject,
+            chapter=chapter,
+            brick_type=brick_type,
+            difficulty_min=difficulty_min,
+            difficulty_max=difficulty_max,
+            target_profile=target_profile,
+            learning_step=learning_step,
+            tags=tags,
+        )
+        results = [
+            self.bricks[brick_id] for brick_id in self.index.ordered(matching_ids)
+        ]
 
         # Tri par pertinence (usage_count et rating)
         results.sort(key=lambda b: (b.average_rating, b.usage_count), reverse=True)
@@ -316,15 +354,30 @@ F: [C, E]
         }
 
     def increment_usage(self, brick_id: str):
-        """Incrémente le compteur d'utilisation d'une brique"""
+        """Incrémente le compteur d'utilisation d'une brique (écriture différée)"""
         if brick_id in self.bricks:
-            self.bricks[brick_id].usage_count += 1
-            self.save_data()
+            self.counters.record_usage(brick_id)
 
     def update_rating(self, brick_id: str, rating: float):
-        """Met à jour la note moyenne d'une brique"""
+        """Ajoute une note à la moyenne d'une brique (écriture différée)"""
         if brick_id in self.bricks:
-            brick = self.bricks[brick_id]
-            # Calcul simple de moyenne pondérée (à améliorer avec un vrai système de votes)
-            brick.average_rating = (brick.average_rating + rating) / 2
-            self.save_data()
+            self.counters.record_rating(brick_id, rating)
+
+    def get_usage_and_rating(self, brick_id: str) -> Optional[Dict[str, Any]]:
+        """Usage et note moyenne exacts d'une brique, événements en attente compris"""
+        brick = self.bricks.get(brick_id)
+        if brick is None:
+            return None
+
+        pending = self.counters.pending(brick_id)
+        average_rating, total_ratings = merge_rating(
+            brick.average_rating,
+            brick.total_ratings,
+            pending.rating_sum,
+            pending.rating_count,
+        )
+        return {
+            "usage_count": (brick.usage_count or 0) + pending.usage,
+            "average_rating": average_rating,
+            "total_ratings": total_ratings,
+        }
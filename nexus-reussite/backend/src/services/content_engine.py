@@ -3,9 +3,11 @@ Moteur d'assemblage intelligent pour la génération de contenu personnalisé
 Nexus Réussite - Content Assembly Engine
 """
 
-import re
+import threading
 import uuid
+from collections import OrderedDict
 from datetime import datetime
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
 
 from ..models.content_system import (
     BrickType,
@@ -17,6 +19,59 @@ from ..models.content_system import (
     TargetProfile,
 )
 from .content_bank import ContentBankService
+from .markdown_renderer import render_markdown
+
+# Nombre de sélections de candidats (par créneau de template) gardées en cache
+CANDIDATE_CACHE_SIZE = 512
+# Nombre de fragments HTML de briques gardés en cache
+FRAGMENT_CACHE_SIZE = 4096
+
+
+class LRUCache:
+    """Cache LRU borné, sûr entre threads, avec compteurs de hits/misses"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def _normalize_topics(topics: Optional[List[str]]) -> FrozenSet[str]:
+    """Sujets en minuscules, sans doublons (clé de cache et scoring)"""
+    return frozenset(topic.strip().lower() for topic in topics or [] if topic)
 
 
 class ContentAssemblyEngine:
@@ -25,6 +80,8 @@ class ContentAssemblyEngine:
     def __init__(self, content_bank: ContentBankService):
         self.content_bank = content_bank
         self.document_templates = self._load_document_templates()
+        self.candidate_cache = LRUCache(CANDIDATE_CACHE_SIZE)
+        self.fragment_cache = LRUCache(FRAGMENT_CACHE_SIZE)
 
     def _load_document_templates(self) -> Dict[str, Dict[str, Any]]:
         """Charge les templates de documents disponibles"""
@@ -142,56 +199,108 @@ class ContentAssemblyEngine:
             count = brick_spec["count"]
             required = brick_spec["required"]
 
-            # Recherche des briques candidates
-            candidates = self.content_bank.search_bricks(
-                subject=request.subject,
-                chapter=request.chapter,
-                brick_type=brick_type,
-                difficulty_min=request.difficulty_range[0],
-                difficulty_max=request.difficulty_range[1],
-                target_profile=request.student_profile,
-                learning_step=request.learning_step,
-                tags=request.specific_topics if request.specific_topics else None,
-            )
+            candidates = self._get_slot_candidates(request, brick_type)
+            if not candidates and required:
+                # Aucune brique pour un type requis : recherche plus large
+                candidates = self._get_fallback_candidates(request, brick_type)
 
-            # Filtrage des sujets à exclure
-            if request.exclude_topics:
-                candidates = [
-                    brick
-                    for brick in candidates
-                    if not any(
-                        topic.lower() in [tag.lower() for tag in brick.tags]
-                        for topic in request.exclude_topics
-                    )
-                ]
-
-            # Sélection intelligente
-            if candidates:
-                # Tri par pertinence (rating, usage, difficulté adaptée)
-                candidates = self._rank_candidates(candidates, request)
-
-                # Sélection du nombre requis
-                selected_count = min(count, len(candidates))
-                selected = candidates[:selected_count]
-                selected_bricks.extend(selected)
-            elif required:
-                # Si aucune brique trouvée pour un type requis, on cherche plus largement
-                fallback_candidates = self.content_bank.search_bricks(
-                    subject=request.subject,
-                    brick_type=brick_type,
-                    target_profile=request.student_profile,
-                )
-                if fallback_candidates:
-                    selected_count = min(count, len(fallback_candidates))
-                    selected = fallback_candidates[:selected_count]
-                    selected_bricks.extend(selected)
+            # Sélection du nombre requis
+            selected_bricks.extend(candidates[:count])
 
         return selected_bricks
 
+    def _slot_cache_key(
+        self, request: DocumentRequest, brick_type: BrickType, fallback: bool = False
+    ) -> Hashable:
+        """Clé normalisée des facettes de la requête pour un créneau de template
+
+        La clé inclut la version de la banque de contenu : toute modification
+        de brique rend les anciennes entrées inaccessibles, qui sortent ensuite
+        du cache par éviction LRU. Les compteurs d'usage et de notes ne
+        changent pas la version ; le classement peut donc refléter des
+        compteurs légèrement anciens jusqu'à la prochaine modification.
+        """
+        if fallback:
+            return (
+                self.content_bank.version,
+                "fallback",
+                request.subject,
+                brick_type,
+                request.student_profile,
+            )
+        return (
+            self.content_bank.version,
+            request.subject,
+            (request.chapter or "").strip().lower(),
+            brick_type,
+            request.student_profile,
+            request.learning_step,
+            tuple(request.difficulty_range),
+            _normalize_topics(request.specific_topics),
+            _normalize_topics(request.exclude_topics),
+        )
+
+    def _get_slot_candidates(
+        self, request: DocumentRequest, brick_type: BrickType
+    ) -> Tuple[ContentBrick, ...]:
+        """Candidats classés pour un créneau, mémorisés par facettes de requête"""
+        cache_key = self._slot_cache_key(request, brick_type)
+        candidates = self.candidate_cache.get(cache_key)
+        if candidates is not None:
+            return candidates
+
+        # Recherche des briques candidates
+        found = self.content_bank.search_bricks(
+            subject=request.subject,
+            chapter=request.chapter,
+            brick_type=brick_type,
+            difficulty_min=request.difficulty_range[0],
+            difficulty_max=request.difficulty_range[1],
+            target_profile=request.student_profile,
+            learning_step=request.learning_step,
+            tags=request.specific_topics if request.specific_topics else None,
+        )
+
+        # Filtrage des sujets à exclure
+        excluded = _normalize_topics(request.exclude_topics)
+        if excluded:
+            normalized_tags = self.content_bank.index.normalized_tags
+            found = [
+                brick
+                for brick in found
+                if excluded.isdisjoint(normalized_tags(brick.id))
+            ]
+
+        # Tri par pertinence (rating, usage, difficulté adaptée)
+        ranked = tuple(self._rank_candidates(found, request) if found else [])
+        self.candidate_cache.put(cache_key, ranked)
+        return ranked
+
+    def _get_fallback_candidates(
+        self, request: DocumentRequest, brick_type: BrickType
+    ) -> Tuple[ContentBrick, ...]:
+        """Candidats élargis (matière, type, profil) pour un créneau requis"""
+        cache_key = self._slot_cache_key(request, brick_type, fallback=True)
+        candidates = self.candidate_cache.get(cache_key)
+        if candidates is not None:
+            return candidates
+
+        found = self.content_bank.search_bricks(
+            subject=request.subject,
+            brick_type=brick_type,
+            target_profile=request.student_profile,
+        )
+        found = tuple(found)
+        self.candidate_cache.put(cache_key, found)
+        return found
+
     def _rank_candidates(
         self, candidates: List[ContentBrick], request: DocumentRequest
     ) -> List[ContentBrick]:
         """Classe les candidats par pertinence pour la requête"""
+        target_difficulty = sum(request.difficulty_range) / 2
+        topics = _normalize_topics(request.specific_topics)
+        normalized_tags = self.content_bank.index.normalized_tags
 
         def calculate_score(brick: ContentBrick) -> float:
             score = 0.0
@@ -203,16 +312,14 @@ class ContentAssemblyEngine:
             score += min(brick.usage_count / 10, 2)  # Plafonné à 2 points
 
             # Score basé sur l'adéquation de difficulté
-            target_difficulty = sum(request.difficulty_range) / 2
             difficulty_diff = abs(brick.difficulty - target_difficulty)
             score += max(0, 3 - difficulty_diff)  # Plus proche = meilleur score
 
-            # Score basé sur les tags correspondants
-            if request.specific_topics:
+            # Score basé sur les tags correspondants (tags en minuscules précalculés)
+            if topics:
+                brick_tags = normalized_tags(brick.id)
                 matching_tags = sum(
-                    1
-                    for topic in request.specific_topics
-                    if any(topic.lower() in tag.lower() for tag in brick.tags)
+                    1 for topic in topics if any(topic in tag for tag in brick_tags)
                 )
                 score += matching_tags * 1.5
 
@@ -236,7 +343,13 @@ class ContentAssemblyEngine:
         template: Dict[str, Any],
         request: DocumentRequest,
     ) -> Tuple[str, str]:
-        """Assemble le contenu des briques sélectionnées"""
+        """Assemble le contenu des briques sélectionnées
+
+        Le Markdown et le HTML sont construits en parallèle : le HTML de
+        chaque brique est rendu une seule fois puis réutilisé d'un document
+        à l'autre (cache de fragments), seuls l'en-tête, les titres de
+        section et le pied de page sont rendus à chaque génération.
+        """
 
         # Organisation des briques par type
         bricks_by_type = {}
@@ -247,9 +360,10 @@ class ContentAssemblyEngine:
 
         # Construction du contenu selon la structure du template
         content_sections = []
+        html_sections = []
 
         # En-tête du document
-        header = """# {self._generate_title(request, template)}
+        header = f"""# {self._generate_title(request, template)}
 
 **Matière :** {request.subject.value.title()}
 **Chapitre :** {request.chapter}
@@ -261,6 +375,7 @@ class ContentAssemblyEngine:
 
 """
         content_sections.append(header)
+        html_sections.append(render_markdown(header))
 
         # Assemblage selon la structure du template
         section_order = {
@@ -279,66 +394,50 @@ class ContentAssemblyEngine:
         for brick_type, section_title in section_order.items():
             if brick_type in bricks_by_type:
                 content_sections.append(f"\n{section_title}\n")
+                html_sections.append(render_markdown(section_title))
 
                 for i, brick in enumerate(bricks_by_type[brick_type], 1):
                     if len(bricks_by_type[brick_type]) > 1:
-                        content_sections.append(f"\n### {i}. {brick.title}\n")
+                        brick_heading = f"### {i}. {brick.title}"
                     else:
-                        content_sections.append(f"\n### {brick.title}\n")
+                        brick_heading = f"### {brick.title}"
+                    content_sections.append(f"\n{brick_heading}\n")
+                    html_sections.append(render_markdown(brick_heading))
 
                     content_sections.append(brick.content)
                     content_sections.append("\n")
+                    html_sections.append(self._render_brick_html(brick))
 
         # Pied de page
-        footer = """
+        authors = ", ".join(sorted({brick.author_name for brick in bricks}))
+        footer = f"""
 ---
 
 **Document généré automatiquement par Nexus Réussite**
 *Système de personnalisation pédagogique - Version 1.0*
 
 **Briques utilisées :** {len(bricks)} éléments pédagogiques
-**Auteurs contributeurs :** {', '.join(set(brick.author_name for brick in bricks))}
+**Auteurs contributeurs :** {authors}
 
 Pour toute question, contactez votre coach Nexus Réussite.
 """
         content_sections.append(footer)
+        html_sections.append(render_markdown(footer))
 
         # Assemblage final
         content_markdown = "\n".join(content_sections)
-
-        # Conversion en HTML (simplifiée)
-        content_html = self._markdown_to_html(content_markdown)
+        content_html = "\n".join(html_sections)
 
         return content_html, content_markdown
 
-    def _markdown_to_html(self, markdown_content: str) -> str:
-        """Conversion basique Markdown vers HTML"""
-        html = markdown_content
-
-        # Conversion des titres
-        html = html.replace("# ", "<h1>").replace("\n", "</h1>\n", 1)
-        html = html.replace("## ", "<h2>").replace("\n", "</h2>\n")
-        html = html.replace("### ", "<h3>").replace("\n", "</h3>\n")
-
-        # Conversion du gras
-
-        html = re.sub(r"\*\*(.*?)\*\*", r"<strong>\1</strong>", html)
-        html = re.sub(r"\*(.*?)\*", r"<em>\1</em>", html)
-
-        # Conversion des listes
-        html = re.sub(r"^- (.*?)$", r"<li>\1</li>", html, flags=re.MULTILINE)
-        html = re.sub(r"(<li>.*?</li>)", r"<ul>\1</ul>", html, flags=re.DOTALL)
-
-        # Conversion des paragraphes
-        paragraphs = html.split("\n\n")
-        html_paragraphs = []
-        for p in paragraphs:
-            if p.strip() and not p.startswith("<"):
-                html_paragraphs.append(f"<p>{p.strip()}</p>")
-            else:
-                html_paragraphs.append(p)
-
-        return "\n".join(html_paragraphs)
+    def _render_brick_html(self, brick: ContentBrick) -> str:
+        """HTML du contenu d'une brique, mis en cache par version de la brique"""
+        cache_key = (brick.id, brick.updated_at)
+        fragment = self.fragment_cache.get(cache_key)
+        if fragment is None:
+            fragment = render_markdown(brick.content)
+            self.fragment_cache.put(cache_key, fragment)
+        return fragment
 
     def _generate_title(
         self, request: DocumentRequest, template: Dict[str, Any]
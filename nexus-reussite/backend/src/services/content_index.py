@@ -0,0 +1,222 @@
+"""
+Index inversés en mémoire pour la banque de contenu
+Nexus Réussite - Content Bank Index
+"""
+
+import itertools
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set
+
+
+def normalize_tag(tag: str) -> str:
+    """Forme normalisée d'un tag (ou d'un chapitre) pour l'indexation"""
+    return tag.strip().lower()
+
+
+class ContentBrickIndex:
+    """Index multi-attributs des briques de contenu
+
+    Chaque attribut filtrable (matière, chapitre, type, profil cible, étape
+    d'apprentissage, tag normalisé, niveau de difficulté) associe une valeur
+    à l'ensemble des IDs de briques qui la portent. Une recherche intersecte
+    ces ensembles au lieu de parcourir toutes les briques.
+
+    Les clés indexées de chaque brique sont mémorisées : une brique modifiée
+    en place peut ainsi être désindexée avec ses anciennes valeurs, et son
+    rang d'insertion est conservé pour garder un ordre de résultats stable.
+    """
+
+    FIELDS = (
+        "subject",
+        "chapter",
+        "type",
+        "target_profile",
+        "learning_step",
+        "tag",
+        "difficulty",
+    )
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[Hashable, Set[str]]] = {}
+        self._indexed_keys: Dict[str, Dict[str, FrozenSet[Hashable]]] = {}
+        self._normalized_tags: Dict[str, FrozenSet[str]] = {}
+        self._positions: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self.clear()
+
+    def clear(self):
+        """Vide tous les index"""
+        self._postings = {field: {} for field in self.FIELDS}
+        self._indexed_keys = {}
+        self._normalized_tags = {}
+        self._positions = {}
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._indexed_keys)
+
+    @staticmethod
+    def _extract_keys(brick: Any) -> Dict[str, FrozenSet[Hashable]]:
+        """Valeurs indexées d'une brique, par attribut"""
+        return {
+            "subject": frozenset([brick.subject]),
+            "chapter": frozenset([normalize_tag(brick.chapter or "")]),
+            "type": frozenset([brick.type]),
+            "target_profile": frozenset(brick.target_profiles or []),
+            "learning_step": frozenset(brick.learning_steps or []),
+            "tag": frozenset(normalize_tag(tag) for tag in brick.tags or []),
+            "difficulty": frozenset([brick.difficulty]),
+        }
+
+    def add(self, brick: Any):
+        """Indexe une brique (la réindexe si elle l'était déjà)"""
+        self._unindex(brick.id)
+
+        keys = self._extract_keys(brick)
+        for field, values in keys.items():
+            postings = self._postings[field]
+            for value in values:
+                postings.setdefault(value, set()).add(brick.id)
+
+        self._indexed_keys[brick.id] = keys
+        self._normalized_tags[brick.id] = keys["tag"]
+        if brick.id not in self._positions:
+            self._positions[brick.id] = next(self._sequence)
+
+    def remove(self, brick_id: str):
+        """Retire une brique de tous les index"""
+        self._unindex(brick_id)
+        self._positions.pop(brick_id, None)
+
+    def _unindex(self, brick_id: str):
+        """Retire une brique des postings (son rang d'insertion est conservé)"""
+        keys = self._indexed_keys.pop(brick_id, None)
+        if keys is None:
+            return
+
+        for field, values in keys.items():
+            postings = self._postings[field]
+            for value in values:
+                ids = postings.get(value)
+                if ids is None:
+                    continue
+                ids.discard(brick_id)
+                if not ids:
+                    del postings[value]
+
+        self._normalized_tags.pop(brick_id, None)
+
+    def rebuild(self, bricks: Iterable[Any]):
+        """Reconstruit entièrement les index"""
+        self.clear()
+        for brick in bricks:
+            self.add(brick)
+
+    def normalized_tags(self, brick_id: str) -> FrozenSet[str]:
+        """Tags en minuscules d'une brique, précalculés à l'indexation"""
+        return self._normalized_tags.get(brick_id, frozenset())
+
+    def ordered(self, brick_ids: Iterable[str]) -> List[str]:
+        """IDs triés dans l'ordre d'insertion des briques"""
+        if not isinstance(brick_ids, (set, frozenset)):
+            brick_ids = set(brick_ids)
+        # Grand sous-ensemble : un parcours linéaire bat le tri
+        if len(brick_ids) * 8 > len(self._positions):
+            return [brick_id for brick_id in self._positions if brick_id in brick_ids]
+        return sorted(brick_ids, key=self._positions.__getitem__)
+
+    def _in_difficulty_range(
+        self,
+        brick_id: str,
+        difficulty_min: Optional[int],
+        difficulty_max: Optional[int],
+    ) -> bool:
+        """Vrai si la difficulté de la brique est dans l'intervalle demandé"""
+        (difficulty,) = self._indexed_keys[brick_id]["difficulty"]
+        if difficulty_min and difficulty < difficulty_min:
+            return False
+        if difficulty_max and difficulty > difficulty_max:
+            return False
+        return True
+
+    def _difficulty_ids(
+        self, difficulty_min: Optional[int], difficulty_max: Optional[int]
+    ) -> Set[str]:
+        """Union des niveaux de difficulté compris dans l'intervalle"""
+        ids: Set[str] = set()
+        for difficulty, posting in self._postings["difficulty"].items():
+            if difficulty_min and difficulty < difficulty_min:
+                continue
+            if difficulty_max and difficulty > difficulty_max:
+                continue
+            ids |= posting
+        return ids
+
+    def find(
+        self,
+        subject: Optional[Hashable] = None,
+        chapter: Optional[str] = None,
+        brick_type: Optional[Hashable] = None,
+        difficulty_min: Optional[int] = None,
+        difficulty_max: Optional[int] = None,
+        target_profile: Optional[Hashable] = None,
+        learning_step: Optional[Hashable] = None,
+        tags: Optional[List[str]] = None,
+    ) -> Set[str]:
+        """IDs des briques satisfaisant tous les critères fournis
+
+        Les critères absents (ou vides) ne filtrent pas ; pour les tags,
+        il suffit qu'un des tags demandés soit porté par la brique.
+        """
+        candidate_sets: List[Set[str]] = []
+
+        for field, value in (
+            ("subject", subject),
+            ("chapter", normalize_tag(chapter) if chapter else None),
+            ("type", brick_type),
+            ("target_profile", target_profile),
+            ("learning_step", learning_step),
+        ):
+            if value:
+                candidate_sets.append(self._postings[field].get(value, set()))
+
+        wanted_tags = {normalize_tag(tag) for tag in tags} if tags else set()
+        filter_difficulty = bool(difficulty_min or difficulty_max)
+
+        if not candidate_sets:
+            # Aucun critère d'égalité : on matérialise les unions de postings
+            if filter_difficulty:
+                candidate_sets.append(
+                    self._difficulty_ids(difficulty_min, difficulty_max)
+                )
+                filter_difficulty = False
+            if wanted_tags:
+                tag_postings = self._postings["tag"]
+                candidate_sets.append(
+                    set().union(*(tag_postings.get(tag, set()) for tag in wanted_tags))
+                )
+                wanted_tags = set()
+            if not candidate_sets:
+                return set(self._indexed_keys)
+
+        # Intersection en partant de l'ensemble le plus petit
+        candidate_sets.sort(key=len)
+        result = set(candidate_sets[0])
+        for ids in candidate_sets[1:]:
+            if not result:
+                return result
+            result &= ids
+
+        # Difficulté et tags sont vérifiés sur les survivants, déjà peu nombreux
+        if filter_difficulty:
+            result = {
+                brick_id
+                for brick_id in result
+                if self._in_difficulty_range(brick_id, difficulty_min, difficulty_max)
+            }
+        if wanted_tags:
+            result = {
+                brick_id
+                for brick_id in result
+                if not wanted_tags.isdisjoint(self._normalized_tags[brick_id])
+            }
+        return result
@@ -0,0 +1,144 @@
+"""
+Persistance de la banque de contenu par journal d'opérations
+Nexus Réussite - Content Bank Journal
+"""
+
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable
+
+# Nombre d'opérations journalisées avant réécriture complète de l'instantané
+DEFAULT_COMPACTION_THRESHOLD = 500
+
+
+class ContentBankJournal:
+    """Instantané JSON + journal append-only des modifications
+
+    L'instantané (`content_bank.json`, même format qu'auparavant) n'est
+    réécrit qu'à la compaction ; entre deux compactions, chaque
+    modification ajoute une ligne JSON au journal (`content_bank.json.journal`).
+    Le coût d'une écriture est donc proportionnel à la modification et non
+    à la taille de la banque.
+
+    Opérations du journal :
+        {"op": "put", "brick": {...}}            création ou mise à jour
+        {"op": "delete", "id": "..."}            suppression
+        {"op": "counters", "values": {id: {...}}} compteurs (valeurs absolues)
+    """
+
+    def __init__(
+        self,
+        snapshot_path: str,
+        compaction_threshold: int = DEFAULT_COMPACTION_THRESHOLD,
+    ):
+        self.snapshot_path = snapshot_path
+        self.journal_path = f"{snapshot_path}.journal"
+        self.compaction_threshold = compaction_threshold
+        self.entries_since_snapshot = 0
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        """Vrai si un instantané ou un journal existe déjà sur disque"""
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Charge l'instantané puis rejoue le journal
+
+        Returns:
+            Dictionnaire {id de brique: données sérialisées}
+        """
+        records: Dict[str, Dict[str, Any]] = {}
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for brick_data in data.get("bricks", []):
+                records[brick_data["id"]] = brick_data
+
+        self.entries_since_snapshot = 0
+        if not os.path.exists(self.journal_path):
+            return records
+
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Dernière ligne tronquée par un arrêt brutal : on l'ignore
+                    print(
+                        f"Journal {self.journal_path}: ligne {line_number} "
+                        "illisible ignorée"
+                    )
+                    continue
+                self._apply(records, entry)
+                self.entries_since_snapshot += 1
+
+        return records
+
+    @staticmethod
+    def _apply(records: Dict[str, Dict[str, Any]], entry: Dict[str, Any]):
+        """Applique une opération du journal aux données chargées"""
+        op = entry.get("op")
+        if op == "put":
+            brick_data = entry["brick"]
+            records[brick_data["id"]] = brick_data
+        elif op == "delete":
+            records.pop(entry["id"], None)
+        elif op == "counters":
+            for brick_id, values in entry["values"].items():
+                if brick_id in records:
+                    records[brick_id].update(values)
+
+    def append(self, entry: Dict[str, Any]):
+        """Ajoute une opération en fin de journal"""
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.entries_since_snapshot += 1
+
+    def needs_compaction(self) -> bool:
+        """Vrai si le journal a assez grossi pour justifier un nouvel instantané"""
+        return self.entries_since_snapshot >= self.compaction_threshold
+
+    def write_snapshot(self, collect: Callable[[], Iterable[Dict[str, Any]]]):
+        """Écrit un instantané complet de façon atomique et vide le journal
+
+        `collect` est appelé sous le verrou de `append` : une modification
+        journalisée pendant la compaction est soit dans l'instantané, soit
+        dans le nouveau journal, jamais perdue entre les deux.
+
+        L'instantané est écrit dans un fichier temporaire du même dossier,
+        synchronisé sur disque puis renommé : un lecteur voit toujours soit
+        l'ancien, soit le nouvel instantané complet.
+        """
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+
+        with self._lock:
+            data = {
+                "bricks": list(collect()),
+                "last_updated": datetime.now().isoformat(),
+            }
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=".content_bank.", suffix=".tmp", dir=directory
+            )
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.snapshot_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            # Le journal est désormais intégré à l'instantané
+            with open(self.journal_path, "w", encoding="utf-8"):
+                pass
+            self.entries_since_snapshot = 0
@@ -0,0 +1,470 @@
+"""
+Historique persistant des conversations avec ARIA
+Nexus Réussite - Conversation Store
+
+Chaque session (`session_id`) a un journal de messages en ajout seul
+(`conversation_messages`) et un résumé glissant (`conversation_sessions`).
+Le prompt d'un tour reçoit :
+- le résumé des tours anciens (au plus ARIA_SUMMARY_MAX_TOKENS jetons) ;
+- les messages les plus récents qui tiennent dans le budget
+  ARIA_HISTORY_TOKEN_BUDGET (résumé compris), du plus récent au plus ancien.
+
+Les messages sortis de la fenêtre et pas encore résumés sont condensés par
+lot, dès qu'ils dépassent ARIA_SUMMARY_TRIGGER_TOKENS : `compaction_task`
+décrit le lot, l'appelant produit le nouveau résumé (modèle de résumé
+d'OpenAI, ou `fallback_summary` hors ligne) et `apply_summary` l'enregistre.
+La taille du prompt reste ainsi bornée, quelle que soit la longueur de la
+session.
+
+Les identifiants de session sont tirés au hasard côté serveur
+(`new_session_id`). Une session ouverte par un utilisateur authentifié lui
+appartient (`owner_id`) : les autres appelants ne lisent ni ne complètent
+son historique.
+
+Le stockage passe par la base SQL ; hors contexte d'application, ou si la
+base est indisponible, les conversations continuent sans historique.
+"""
+
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from flask import has_app_context
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from database import db
+from models.conversation import ConversationMessage, ConversationSession
+
+try:
+    import tiktoken
+
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut, surchargeables par variables d'environnement
+DEFAULT_HISTORY_TOKEN_BUDGET = 1500
+DEFAULT_SUMMARY_TRIGGER_TOKENS = 800
+DEFAULT_SUMMARY_MAX_TOKENS = 300
+# Messages non résumés lus au plus pour construire la fenêtre
+MAX_WINDOW_SCAN = 200
+# Jetons de structure ajoutés par l'API à chaque message (rôle, séparateurs)
+MESSAGE_OVERHEAD_TOKENS = 4
+ROLES = ("user", "assistant")
+
+sessions_table = ConversationSession.__table__
+
+
+def new_session_id() -> str:
+    """Identifiant de session aléatoire, impossible à deviner"""
+    return uuid.uuid4().hex
+
+
+def _owns(session: ConversationSession, owner_id: Optional[str]) -> bool:
+    return session.owner_id is None or session.owner_id == owner_id
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """Encodage tiktoken, ou None s'il ne peut pas être chargé (hors ligne)"""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning(f"Encodage tiktoken indisponible, jetons estimés: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Nombre de jetons d'un texte (tiktoken, sinon ~4 caractères par jeton)"""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    return count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def trim_to_budget(
+    messages: Sequence[Dict[str, Any]], budget: int
+) -> Tuple[List[Dict[str, str]], int]:
+    """Messages les plus récents tenant dans `budget` jetons, dans l'ordre"""
+    window: List[Dict[str, str]] = []
+    used = 0
+    for message in reversed(messages):
+        tokens = message.get("token_count") or message_tokens(message)
+        if used + tokens > budget:
+            break
+        used += tokens
+        window.append(
+            {"role": message.get("role", "user"), "content": message.get("content", "")}
+        )
+    window.reverse()
+    return window, used
+
+
+def fallback_summary(
+    previous_summary: Optional[str], messages: Sequence[Dict[str, Any]], max_tokens: int
+) -> str:
+    """Résumé extractif (sans modèle) : une ligne par message, les plus récentes"""
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        speaker = "Élève" if message.get("role") == "user" else "ARIA"
+        first_line = (message.get("content") or "").strip().splitlines() or [""]
+        lines.append(f"{speaker} : {first_line[0][:200]}")
+    kept: List[str] = []
+    used = 0
+    for line in reversed(lines):
+        tokens = count_tokens(line)
+        if used + tokens > max_tokens:
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(reversed(kept))
+
+
+@dataclass
+class ConversationWindow:
+    """Historique à injecter dans le prompt d'un tour"""
+
+    summary: Optional[str]
+    messages: List[Dict[str, str]]
+    tokens: int
+    # Messages sortis de la fenêtre et pas encore résumés
+    pending_messages: int = 0
+
+
+@dataclass
+class CompactionTask:
+    """Lot de messages à condenser dans le résumé d'une session"""
+
+    session_id: str
+    previous_summary: Optional[str]
+    # Rang couvert par le résumé actuel : garde contre deux résumés concurrents
+    summarized_from: int
+    summarized_through: int
+    messages: List[Dict[str, str]]
+
+
+class ConversationStore:
+    """Journal des messages par session, fenêtre de jetons et résumé glissant"""
+
+    def __init__(self):
+        self.history_budget = _env_int(
+            "ARIA_HISTORY_TOKEN_BUDGET", DEFAULT_HISTORY_TOKEN_BUDGET
+        )
+        self.summary_trigger = _env_int(
+            "ARIA_SUMMARY_TRIGGER_TOKENS", DEFAULT_SUMMARY_TRIGGER_TOKENS
+        )
+        self.summary_max_tokens = _env_int(
+            "ARIA_SUMMARY_MAX_TOKENS", DEFAULT_SUMMARY_MAX_TOKENS
+        )
+        self.stats = {
+            "appended_messages": 0,
+            "windows_loaded": 0,
+            "window_tokens": 0,
+            "compactions": 0,
+            "compacted_messages": 0,
+            "errors": 0,
+        }
+
+    @staticmethod
+    def available() -> bool:
+        return has_app_context()
+
+    def _failed(self, action: str, error: Exception):
+        db.session.rollback()
+        self.stats["errors"] += 1
+        logger.error(f"Historique de conversation ({action}) indisponible: {error}")
+
+    def can_access(
+        self, session_id: str, owner_id: Optional[str], allow_anonymous: bool = True
+    ) -> bool:
+        """Vrai si la session est inconnue ou appartient à `owner_id` (ou est
+        anonyme, avec `allow_anonymous`)"""
+        if not self.available():
+            return True
+        try:
+            session = db.session.get(ConversationSession, session_id)
+        except SQLAlchemyError as e:
+            self._failed("lecture", e)
+            return True
+        if session is None:
+            return True
+        if allow_anonymous:
+            return _owns(session, owner_id)
+        return session.owner_id == owner_id
+
+    # ----- Écriture -----
+
+    @staticmethod
+    def _create_session_row(values: Dict[str, Any]):
+        """INSERT de la session, sans effet si une requête concurrente l'a créée"""
+        # pylint: disable=import-outside-toplevel
+        dialect = db.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(sessions_table.insert().values(**values))
+            except IntegrityError:
+                pass
+            return
+        db.session.execute(
+            insert(sessions_table)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=[sessions_table.c.session_id])
+        )
+
+    def append(
+        self,
+        session_id: str,
+        student_id: Any,
+        messages: Sequence[Dict[str, Any]],
+        context: Optional[Dict[str, Any]] = None,
+        owner_id: Optional[str] = None,
+    ) -> int:
+        """Ajoute des messages au journal de la session (créée au besoin)
+
+        Rien n'est écrit si la session appartient à un autre utilisateur.
+        """
+        messages = [
+            message
+            for message in messages
+            if message.get("role") in ROLES and message.get("content")
+        ]
+        if not messages or not self.available():
+            return 0
+        context = context or {}
+        try:
+            self._create_session_row(
+                {
+                    "session_id": session_id,
+                    "student_id": str(student_id),
+                    "owner_id": owner_id,
+                    "subject": context.get("subject"),
+                    "topic": context.get("topic"),
+                    "conversation_type": context.get("conversation_type"),
+                    "context_metadata": context.get("metadata") or None,
+                    "message_count": 0,
+                    "summarized_through": 0,
+                    "summary_tokens": 0,
+                }
+            )
+            # Verrou de ligne (PostgreSQL) : rangs contigus entre workers
+            session = db.session.get(
+                ConversationSession,
+                session_id,
+                with_for_update=True,
+                populate_existing=True,
+            )
+            if not _owns(session, owner_id):
+                db.session.rollback()
+                logger.warning(f"Session {session_id} d'un autre utilisateur ignorée")
+                return 0
+            if context.get("metadata"):
+                session.context_metadata = {
+                    **(session.context_metadata or {}),
+                    **context["metadata"],
+                }
+
+            for message in messages:
+                session.message_count += 1
+                db.session.add(
+                    ConversationMessage(
+                        session_id=session_id,
+                        seq=session.message_count,
+                        role=message["role"],
+                        content=message["content"],
+                        token_count=message_tokens(message),
+                    )
+                )
+            session.updated_at = datetime.utcnow()
+            db.session.commit()
+        except SQLAlchemyError as e:
+            self._failed("écriture", e)
+            return 0
+        self.stats["appended_messages"] += len(messages)
+        return len(messages)
+
+    # ----- Lecture -----
+
+    def _unsummarized(self, session: ConversationSession) -> List[ConversationMessage]:
+        rows = (
+            ConversationMessage.query.filter(
+                ConversationMessage.session_id == session.session_id,
+                ConversationMessage.seq > session.summarized_through,
+            )
+            .order_by(ConversationMessage.seq.desc())
+            .limit(MAX_WINDOW_SCAN)
+            .all()
+        )
+        rows.reverse()
+        return rows
+
+    def _split(
+        self, session: ConversationSession, rows: List[ConversationMessage]
+    ) -> Tuple[List[ConversationMessage], List[ConversationMessage]]:
+        """(messages hors fenêtre, messages de la fenêtre)"""
+        budget = max(self.history_budget - (session.summary_tokens or 0), 0)
+        used = 0
+        start = len(rows)
+        while start > 0 and used + rows[start - 1].token_count <= budget:
+            start -= 1
+            used += rows[start].token_count
+        return rows[:start], rows[start:]
+
+    def load_window(
+        self, session_id: str, owner_id: Optional[str] = None
+    ) -> Optional[ConversationWindow]:
+        """Résumé et messages récents de la session, ou None si inconnue
+        (ou d'un autre utilisateur)"""
+        if not self.available():
+            return None
+        try:
+            session = db.session.get(ConversationSession, session_id)
+            if session is None or not _owns(session, owner_id):
+                return None
+            older, recent = self._split(session, self._unsummarized(session))
+        except SQLAlchemyError as e:
+            self._failed("lecture", e)
+            return None
+
+        tokens = (session.summary_tokens or 0) + sum(row.token_count for row in recent)
+        self.stats["windows_loaded"] += 1
+        self.stats["window_tokens"] += tokens
+        return ConversationWindow(
+            summary=session.summary,
+            messages=[{"role": row.role, "content": row.content} for row in recent],
+            tokens=tokens,
+            pending_messages=len(older),
+        )
+
+    def get_session(
+        self, session_id: str, owner_id: str, limit: int = 50
+    ) -> Optional[Dict[str, Any]]:
+        """Session de `owner_id` et ses `limit` derniers messages, ou None"""
+        if not self.available():
+            return None
+        try:
+            session = db.session.get(ConversationSession, session_id)
+            if session is None or session.owner_id != owner_id:
+                return None
+            rows = (
+                ConversationMessage.query.filter_by(session_id=session_id)
+                .order_by(ConversationMessage.seq.desc())
+                .limit(limit)
+                .all()
+            )
+        except SQLAlchemyError as e:
+            self._failed("lecture", e)
+            return None
+        return {
+            **session.to_dict(),
+            "messages": [row.to_dict() for row in reversed(rows)],
+        }
+
+    # ----- Résumé glissant -----
+
+    def compaction_task(self, session_id: str) -> Optional[CompactionTask]:
+        """Lot à résumer si les messages hors fenêtre dépassent le seuil
+
+        Le lot part du premier message non résumé, dans l'ordre, et s'arrête
+        au dernier message lu : `summarized_through` n'avance jamais au-delà
+        d'un message qui n'a pas été condensé (au plus MAX_WINDOW_SCAN
+        messages par lot).
+        """
+        if not self.available():
+            return None
+        try:
+            session = db.session.get(ConversationSession, session_id)
+            if session is None:
+                return None
+            _scanned_older, recent = self._split(session, self._unsummarized(session))
+            window_start = recent[0].seq if recent else session.message_count + 1
+            older = (
+                ConversationMessage.query.filter(
+                    ConversationMessage.session_id == session_id,
+                    ConversationMessage.seq > session.summarized_through,
+                    ConversationMessage.seq < window_start,
+                )
+                .order_by(ConversationMessage.seq)
+                .limit(MAX_WINDOW_SCAN)
+                .all()
+            )
+        except SQLAlchemyError as e:
+            self._failed("lecture", e)
+            return None
+        if not older or sum(row.token_count for row in older) < self.summary_trigger:
+            return None
+        return CompactionTask(
+            session_id=session_id,
+            previous_summary=session.summary,
+            summarized_from=session.summarized_through,
+            summarized_through=older[-1].seq,
+            messages=[{"role": row.role, "content": row.content} for row in older],
+        )
+
+    def apply_summary(self, task: CompactionTask, summary: str) -> bool:
+        """Enregistre le résumé, sauf si un autre worker l'a déjà avancé"""
+        if not summary or not self.available():
+            return False
+        try:
+            updated = ConversationSession.query.filter_by(
+                session_id=task.session_id,
+                summarized_through=task.summarized_from,
+            ).update(
+                {
+                    "summary": summary,
+                    "summary_tokens": count_tokens(summary) + MESSAGE_OVERHEAD_TOKENS,
+                    "summarized_through": task.summarized_through,
+                    "updated_at": datetime.utcnow(),
+                },
+                synchronize_session=False,
+            )
+            db.session.commit()
+        except SQLAlchemyError as e:
+            self._failed("résumé", e)
+            return False
+        if updated:
+            self.stats["compactions"] += 1
+            self.stats["compacted_messages"] += len(task.messages)
+        return bool(updated)
+
+    def get_stats(self) -> Dict[str, Any]:
+        loaded = self.stats["windows_loaded"]
+        return {
+            **self.stats,
+            "average_window_tokens": (
+                round(self.stats["window_tokens"] / loaded, 1) if loaded else 0
+            ),
+            "history_token_budget": self.history_budget,
+            "summary_trigger_tokens": self.summary_trigger,
+            "summary_max_tokens": self.summary_max_tokens,
+            "tokenizer": "tiktoken" if _encoding() is not None else "approximation",
+        }
+
+
+# Instance globale
+conversation_store = ConversationStore()
@@ -0,0 +1,179 @@
+"""
+Agrégation différée des compteurs d'utilisation et des notes des briques
+Nexus Réussite - Brick Counter Aggregator
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Un lot est écrit au plus tard après ce nombre d'événements ou ce délai
+DEFAULT_FLUSH_THRESHOLD = 50
+DEFAULT_FLUSH_INTERVAL = 30.0
+
+
+@dataclass
+class CounterDelta:
+    """Variations accumulées pour une brique depuis la dernière écriture"""
+
+    usage: int = 0
+    rating_sum: float = 0.0
+    rating_count: int = 0
+
+    def merge(self, other: "CounterDelta"):
+        self.usage += other.usage
+        self.rating_sum += other.rating_sum
+        self.rating_count += other.rating_count
+
+
+def merge_rating(
+    average: Optional[float],
+    total: Optional[int],
+    rating_sum: float,
+    rating_count: int,
+) -> Tuple[float, int]:
+    """Moyenne exacte après ajout de `rating_count` notes de somme `rating_sum`
+
+    Returns:
+        (nouvelle moyenne, nouveau nombre de notes)
+    """
+    average = average or 0.0
+    total = total or 0
+    new_total = total + rating_count
+    if new_total == 0:
+        return average, 0
+    return (average * total + rating_sum) / new_total, new_total
+
+
+CounterSink = Callable[[Dict[str, CounterDelta]], None]
+
+
+class BrickCounterAggregator:
+    """Tampon en mémoire des compteurs, vidé par lots vers un `sink`
+
+    Les incréments d'usage et les notes sont coalescés par brique ; le
+    `sink` reçoit un dictionnaire {id de brique: CounterDelta} et doit
+    l'appliquer en une seule écriture (ligne de journal JSON, UPDATE SQL
+    groupé...). Si le `sink` échoue, les variations sont réintégrées au
+    tampon et retentées au lot suivant.
+
+    Le vidage périodique démarre à la création (et redémarre dans un
+    processus forké) : un lot sous le seuil est écrit au plus tard après
+    `flush_interval` secondes, même sans nouvel événement.
+    """
+
+    def __init__(
+        self,
+        sink: CounterSink,
+        flush_threshold: int = DEFAULT_FLUSH_THRESHOLD,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        self.sink = sink
+        self.flush_threshold = flush_threshold
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, CounterDelta] = {}
+        self._pending_events = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        # Réentrant : le sink peut lui-même déclencher un flush (compaction)
+        self._flush_lock = threading.RLock()
+        self._stop_event: Optional[threading.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._thread_lock = threading.Lock()
+        if flush_interval > 0:
+            self.start()
+
+    def record_usage(self, brick_id: str, count: int = 1):
+        """Enregistre `count` utilisations d'une brique"""
+        self._record(brick_id, CounterDelta(usage=count))
+
+    def record_rating(self, brick_id: str, rating: float):
+        """Enregistre une note attribuée à une brique"""
+        self._record(brick_id, CounterDelta(rating_sum=rating, rating_count=1))
+
+    def _record(self, brick_id: str, delta: CounterDelta):
+        if self._thread_pid is not None and self._thread_pid != os.getpid():
+            # Les threads ne survivent pas au fork (gunicorn --preload)
+            self.start()
+        with self._lock:
+            self._pending.setdefault(brick_id, CounterDelta()).merge(delta)
+            self._pending_events += 1
+            due = (
+                self._pending_events >= self.flush_threshold
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def pending(self, brick_id: str) -> CounterDelta:
+        """Variations d'une brique pas encore écrites"""
+        with self._lock:
+            delta = self._pending.get(brick_id)
+            return CounterDelta(**vars(delta)) if delta else CounterDelta()
+
+    def discard(self, brick_id: str):
+        """Oublie les variations en attente d'une brique (brique supprimée)"""
+        with self._lock:
+            self._pending.pop(brick_id, None)
+
+    def flush(self) -> int:
+        """Écrit le lot en attente via le sink
+
+        Returns:
+            Nombre de briques écrites
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._pending_events = 0
+                self._last_flush = time.monotonic()
+
+            if not batch:
+                return 0
+
+            try:
+                self.sink(batch)
+            except Exception:
+                # Rien n'est perdu : le lot sera retenté avec le suivant
+                logger.exception("Échec de l'écriture des compteurs de briques")
+                with self._lock:
+                    for brick_id, delta in batch.items():
+                        self._pending.setdefault(brick_id, CounterDelta()).merge(delta)
+                return 0
+
+            return len(batch)
+
+    def start(self):
+        """Lance un thread démon qui vide le tampon à intervalle régulier"""
+        with self._thread_lock:
+            if self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread_pid = os.getpid()
+
+            self._stop_event = threading.Event()
+            stop_event = self._stop_event
+
+            def run():
+                while not stop_event.wait(self.flush_interval):
+                    self.flush()
+
+            self._thread = threading.Thread(
+                target=run, name="brick-counter-flush", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Arrête le thread périodique et écrit le dernier lot"""
+        if self._stop_event:
+            self._stop_event.set()
+        if self._thread and self._thread_pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval)
+        self._thread = None
+        self._thread_pid = None
+        self.flush()
@@ -3,19 +3,338 @@ Service de base de données documentaire pour ARIA
 Permet à l'IA d'accéder à une base de connaissances structurée
 """
 
+import html
+import logging
+import os
+import re
 import sqlite3
-from typing import Dict, List, Optional, Any
+import threading
+import unicodedata
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_COLUMNS = [
+    "id",
+    "title",
+    "content",
+    "subject",
+    "grade_level",
+    "document_type",
+    "tags",
+    "difficulty_level",
+    "url",
+    "created_at",
+]
+
+EXERCISE_COLUMNS = [
+    "id",
+    "title",
+    "content",
+    "solution",
+    "subject",
+    "grade_level",
+    "difficulty_level",
+    "tags",
+    "created_at",
+]
+
+INSERT_DOCUMENT_SQL = """
+    INSERT INTO documents (title, content, subject, grade_level, document_type, tags, difficulty_level, url)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Réglages appliqués à chaque connexion du pool : WAL pour que les lectures
+# ne bloquent pas les écritures, fsync allégé (sûr en WAL), cache de pages
+# de ~20 Mo et lecture par mmap de 256 Mo
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+# Nombre de requêtes préparées gardées en cache par connexion
+PREPARED_STATEMENTS_CACHE_SIZE = 256
+
+# Index plein texte : les accents sont repliés (é -> e) à l'indexation comme
+# à la requête, et le titre pèse plus lourd que les tags puis le contenu (BM25)
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+DOCUMENT_FTS_WEIGHTS = (10.0, 1.0, 5.0)
+EXERCISE_FTS_WEIGHTS = (10.0, 1.0, 5.0)
+
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Bornes du surlignage de snippet() : le texte de l'extrait est échappé en
+# HTML, puis elles seules deviennent des balises <mark>
+SNIPPET_START = "\x02"
+SNIPPET_END = "\x03"
+
+# Suggestions contextuelles : mots vides ignorés et plafond de mots-clés
+# pour qu'un long message ne produise pas une requête démesurée
+MAX_CONTEXT_KEYWORDS = 12
+MAX_CONTEXT_SUGGESTIONS = 5
+CONTEXT_STOP_WORDS = frozenset(
+    {
+        "aide",
+        "aider",
+        "alors",
+        "aussi",
+        "autre",
+        "avec",
+        "avoir",
+        "bonjour",
+        "cela",
+        "celle",
+        "celui",
+        "cette",
+        "comme",
+        "comment",
+        "dans",
+        "depuis",
+        "donc",
+        "elle",
+        "elles",
+        "encore",
+        "entre",
+        "etre",
+        "explique",
+        "expliquer",
+        "faire",
+        "fait",
+        "faut",
+        "leur",
+        "leurs",
+        "mais",
+        "meme",
+        "merci",
+        "mes",
+        "moins",
+        "notre",
+        "nous",
+        "peut",
+        "peux",
+        "pour",
+        "pourquoi",
+        "pouvez",
+        "quand",
+        "quel",
+        "quelle",
+        "quelles",
+        "quels",
+        "sans",
+        "sont",
+        "suis",
+        "tous",
+        "tout",
+        "toute",
+        "toutes",
+        "tres",
+        "vais",
+        "veux",
+        "voici",
+        "voila",
+        "votre",
+        "vous",
+    }
+)
+# Recherche plein texte : les termes de moins de 3 caractères et les mots
+# vides, y compris courts, sont ignorés (voir _build_match_query)
+MIN_SEARCH_TERM_LENGTH = 3
+SEARCH_STOP_WORDS = CONTEXT_STOP_WORDS | frozenset(
+    {
+        "au",
+        "aux",
+        "ce",
+        "ces",
+        "de",
+        "des",
+        "du",
+        "en",
+        "est",
+        "et",
+        "il",
+        "je",
+        "la",
+        "le",
+        "les",
+        "ma",
+        "me",
+        "mon",
+        "ne",
+        "nos",
+        "on",
+        "ou",
+        "par",
+        "pas",
+        "que",
+        "qui",
+        "sa",
+        "se",
+        "ses",
+        "son",
+        "sur",
+        "ta",
+        "te",
+        "ton",
+        "tu",
+        "un",
+        "une",
+        "vos",
+    }
+)
+
+
+def _highlight(snippet: Optional[str]) -> Optional[str]:
+    """Extrait FTS5 en HTML sûr : contenu échappé, termes entre <mark>"""
+    if snippet is None:
+        return None
+    return (
+        html.escape(snippet)
+        .replace(SNIPPET_START, "<mark>")
+        .replace(SNIPPET_END, "</mark>")
+    )
+
+
+def _fold_accents(text: str) -> str:
+    """Minuscules sans diacritiques (dérivée -> derivee), comme l'index FTS5"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def extract_context_keywords(
+    context: str, max_keywords: int = MAX_CONTEXT_KEYWORDS
+) -> List[str]:
+    """Extrait les mots-clés utiles d'un message (ordre d'apparition conservé)
+
+    Les mots de moins de 4 lettres et les mots vides sont ignorés, les
+    doublons (accents compris) supprimés. Les mots sont rendus avec leurs
+    accents : l'index FTS5 les ignore, mais pas la recherche LIKE de repli.
+    """
+    keywords: Dict[str, str] = {}
+    for term in _TERM_PATTERN.findall(context):
+        folded = _fold_accents(term)
+        if len(folded) <= 3 or folded.isdigit() or folded in CONTEXT_STOP_WORDS:
+            continue
+        keywords.setdefault(folded, term.lower())
+        if len(keywords) >= max_keywords:
+            break
+    return list(keywords.values())
+
+
+class _ThreadConnection:
+    """Connexion d'un thread ; fermée quand le thread se termine
+
+    Seul le stockage local du thread référence cet objet : à la fin du
+    thread il est collecté et son finaliseur ferme la connexion.
+    """
+
+    __slots__ = ("conn", "finalizer", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.finalizer = weakref.finalize(self, conn.close)
+
+
+class SQLiteConnectionPool:
+    """Pool de connexions SQLite : une connexion persistante par thread
+
+    Chaque thread réutilise sa connexion (et donc son cache de requêtes
+    préparées) au lieu d'ouvrir et fermer une connexion à chaque appel. La
+    connexion est fermée à la fin de son thread, et le pool repart de zéro
+    après un fork (`gunicorn --preload`) : une connexion SQLite ne doit pas
+    être partagée entre processus.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        cached_statements: int = PREPARED_STATEMENTS_CACHE_SIZE,
+    ):
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._connections: "weakref.WeakSet[_ThreadConnection]" = weakref.WeakSet()
+
+    def _after_fork(self):
+        """Abandonne les connexions héritées du processus parent
+
+        Elles ne sont ni utilisées ni fermées : fermer une connexion héritée
+        relâcherait les verrous de fichier POSIX du parent. Elles restent
+        référencées pour que le ramasse-miettes ne les ferme pas non plus.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            inherited = list(self._connections)
+            for holder in inherited:
+                holder.finalizer.detach()
+            self._inherited = [holder.conn for holder in inherited]
+            self._reset()
+
+    def connection(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant (créée au premier appel)"""
+        if self._pid != os.getpid():
+            self._after_fork()
+        holder = getattr(self._local, "connection", None)
+        if holder is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                cached_statements=self.cached_statements,
+                check_same_thread=False,
+            )
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            holder = _ThreadConnection(conn)
+            self._local.connection = holder
+            with self._lock:
+                self._connections.add(holder)
+        return holder.conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Curseur dans une transaction : commit en sortie, rollback sur erreur"""
+        conn = self.connection()
+        cursor = conn.cursor()
+        try:
+            with conn:
+                yield cursor
+        finally:
+            cursor.close()
+
+    @property
+    def open_connections(self) -> int:
+        return len(self._connections)
+
+    def close_all(self):
+        """Ferme toutes les connexions ouvertes par le pool (ce processus)"""
+        with self._lock:
+            holders = list(self._connections)
+            self._connections = weakref.WeakSet()
+            self._local = threading.local()
+        for holder in holders:
+            holder.finalizer()
 
 
 class DocumentDatabase:
     def __init__(self, db_path: str = "documents.db"):
         self.db_path = db_path
+        self.pool = SQLiteConnectionPool(db_path)
+        self.fts_enabled = False
         self.init_database()
         self.populate_sample_data()
 
     def init_database(self):
         """Initialise la base de données documentaire"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connection()
         cursor = conn.cursor()
 
         # Table des documents
@@ -69,18 +388,109 @@ class DocumentDatabase:
         """
         )
 
+        self.fts_enabled = self._init_search_index(cursor)
+
         conn.commit()
-        conn.close()
+        cursor.close()
+
+    def _init_search_index(self, cursor: sqlite3.Cursor) -> bool:
+        """Crée les index FTS5 (documents, exercices) et leurs triggers de synchro"""
+        try:
+            for table, columns in (
+                ("documents", ("title", "content", "tags")),
+                ("exercises", ("title", "content", "tags")),
+            ):
+                fts_table = f"{table}_fts"
+                column_list = ", ".join(columns)
+                new_values = ", ".join(f"new.{column}" for column in columns)
+                old_values = ", ".join(f"old.{column}" for column in columns)
+
+                cursor.execute(
+                    f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                        {column_list},
+                        content='{table}',
+                        content_rowid='id',
+                        tokenize='{FTS_TOKENIZER}'
+                    )
+                """
+                )
+
+                # Triggers : l'index reste synchronisé sans code applicatif
+                cursor.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table}
+                    BEGIN
+                        INSERT INTO {fts_table}(rowid, {column_list})
+                        VALUES (new.id, {new_values});
+                    END
+                """
+                )
+                cursor.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table}
+                    BEGIN
+                        INSERT INTO {fts_table}({fts_table}, rowid, {column_list})
+                        VALUES ('delete', old.id, {old_values});
+                    END
+                """
+                )
+                cursor.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE ON {table}
+                    BEGIN
+                        INSERT INTO {fts_table}({fts_table}, rowid, {column_list})
+                        VALUES ('delete', old.id, {old_values});
+                        INSERT INTO {fts_table}(rowid, {column_list})
+                        VALUES (new.id, {new_values});
+                    END
+                """
+                )
+
+                # Bases existantes créées avant l'index : reconstruction unique
+                cursor.execute(f"SELECT COUNT(*) FROM {fts_table}_docsize")
+                indexed = cursor.fetchone()[0]
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                if cursor.fetchone()[0] != indexed:
+                    cursor.execute(
+                        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"
+                    )
+        except sqlite3.OperationalError as e:
+            logger.warning(
+                "FTS5 indisponible, recherche documentaire en mode LIKE: %s", e
+            )
+            return False
+        return True
+
+    @staticmethod
+    def _build_match_query(query: str) -> str:
+        """Transforme une saisie libre en expression MATCH FTS5 sûre
+
+        Chaque terme est cité (pas d'injection de syntaxe FTS5) et recherché
+        par préfixe ; les termes sont combinés en OR, le classement BM25
+        faisant remonter les documents qui en contiennent le plus.
+
+        Les mots vides et les termes trop courts sont écartés : en préfixe
+        (`"de"*`), ils correspondraient à presque tous les documents. Une
+        saisie qui ne contient que des termes courts (« pi ») les garde.
+        """
+        folded = dict.fromkeys(
+            _fold_accents(term) for term in _TERM_PATTERN.findall(query)
+        )
+        terms = [term for term in folded if term not in SEARCH_STOP_WORDS]
+        long_terms = [term for term in terms if len(term) >= MIN_SEARCH_TERM_LENGTH]
+        short_terms = [term for term in terms if len(term) > 1]
+        return " OR ".join(f'"{term}"*' for term in long_terms or short_terms)
 
     def populate_sample_data(self):
         """Peuple la base avec des données d'exemple"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connection()
         cursor = conn.cursor()
 
         # Vérifier si des données existent déjà
         cursor.execute("SELECT COUNT(*) FROM documents")
         if cursor.fetchone()[0] > 0:
-            conn.close()
+            cursor.close()
             return
 
         # Documents d'exemple
@@ -127,23 +537,10 @@ class DocumentDatabase:
             },
         ]
 
-        for doc in sample_documents:
-            cursor.execute(
-                """
-                INSERT INTO documents (title, content, subject, grade_level, document_type, tags, difficulty_level, url)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-                (
-                    doc["title"],
-                    doc["content"],
-                    doc["subject"],
-                    doc["grade_level"],
-                    doc["document_type"],
-                    doc["tags"],
-                    doc["difficulty_level"],
-                    doc["url"],
-                ),
-            )
+        cursor.executemany(
+            INSERT_DOCUMENT_SQL,
+            [self._document_params(doc) for doc in sample_documents],
+        )
 
         # Liens utiles d'exemple
         sample_links = [
@@ -229,7 +626,29 @@ class DocumentDatabase:
             )
 
         conn.commit()
-        conn.close()
+        cursor.close()
+
+    @staticmethod
+    def _document_params(document: Dict[str, Any]) -> tuple:
+        """Paramètres de INSERT_DOCUMENT_SQL pour un document (valeurs par défaut incluses)"""
+        return (
+            document["title"],
+            document["content"],
+            document["subject"],
+            document["grade_level"],
+            document["document_type"],
+            document.get("tags", ""),
+            document.get("difficulty_level", 3),
+            document.get("url", ""),
+        )
+
+    def _fetchall(self, sql: str, params: Iterable[Any] = ()) -> List[tuple]:
+        """Exécute une lecture sur la connexion du thread courant"""
+        cursor = self.pool.connection().execute(sql, tuple(params))
+        try:
+            return cursor.fetchall()
+        finally:
+            cursor.close()
 
     def search_documents(
         self,
@@ -239,10 +658,80 @@ class DocumentDatabase:
         document_type: str = None,
         max_results: int = 10,
     ) -> List[Dict]:
-        """Recherche des documents selon les critères"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Recherche des documents selon les critères
 
+        Avec une requête non vide, les résultats sont classés par pertinence
+        (BM25) et portent un extrait surligné (`snippet`, HTML échappé) ; sans
+        requête, ils sont filtrés puis triés par difficulté croissante.
+        """
+        match_query = self._build_match_query(query) if query else ""
+        if query and not self.fts_enabled:
+            return self._search_documents_like(
+                query, subject, grade_level, document_type, max_results
+            )
+
+        filters = []
+        params: List[Any] = []
+
+        if subject:
+            filters.append("d.subject = ?")
+            params.append(subject)
+
+        if grade_level:
+            filters.append("d.grade_level = ?")
+            params.append(grade_level)
+
+        if document_type:
+            filters.append("d.document_type = ?")
+            params.append(document_type)
+
+        columns_sql = ", ".join(f"d.{column}" for column in DOCUMENT_COLUMNS)
+
+        if query:
+            if not match_query:
+                return []
+            sql = f"""
+                SELECT {columns_sql},
+                       snippet(documents_fts, 1, char(2), char(3), '…', 16),
+                       bm25(documents_fts, {", ".join(map(str, DOCUMENT_FTS_WEIGHTS))})
+                           AS score
+                FROM documents_fts
+                JOIN documents d ON d.id = documents_fts.rowid
+                WHERE documents_fts MATCH ?
+            """
+            params.insert(0, match_query)
+            order_by = "score ASC, d.difficulty_level ASC"
+        else:
+            sql = f"SELECT {columns_sql} FROM documents d WHERE 1 = 1"
+            order_by = "d.difficulty_level ASC"
+
+        for condition in filters:
+            sql += f" AND {condition}"
+
+        sql += f" ORDER BY {order_by} LIMIT ?"
+        params.append(max_results)
+
+        results = self._fetchall(sql, params)
+
+        documents = []
+        for row in results:
+            document = dict(zip(DOCUMENT_COLUMNS, row))
+            if query:
+                document["snippet"] = _highlight(row[len(DOCUMENT_COLUMNS)])
+                # bm25() est négatif : plus il est bas, plus le document est pertinent
+                document["relevance"] = round(-row[len(DOCUMENT_COLUMNS) + 1], 4)
+            documents.append(document)
+        return documents
+
+    def _search_documents_like(
+        self,
+        query: str,
+        subject: Optional[str],
+        grade_level: Optional[str],
+        document_type: Optional[str],
+        max_results: int,
+    ) -> List[Dict]:
+        """Recherche par LIKE, utilisée seulement si SQLite n'a pas FTS5"""
         sql = "SELECT * FROM documents WHERE (title LIKE ? OR content LIKE ? OR tags LIKE ?)"
         params = [f"%{query}%", f"%{query}%", f"%{query}%"]
 
@@ -261,24 +750,59 @@ class DocumentDatabase:
         sql += " ORDER BY difficulty_level ASC LIMIT ?"
         params.append(max_results)
 
-        cursor.execute(sql, params)
-        results = cursor.fetchall()
-        conn.close()
+        results = self._fetchall(sql, params)
 
-        # Convertir en dictionnaires
-        columns = [
-            "id",
-            "title",
-            "content",
-            "subject",
-            "grade_level",
-            "document_type",
-            "tags",
-            "difficulty_level",
-            "url",
-            "created_at",
-        ]
-        return [dict(zip(columns, row)) for row in results]
+        return [dict(zip(DOCUMENT_COLUMNS, row)) for row in results]
+
+    def search_exercises(
+        self,
+        query: str,
+        subject: str = None,
+        grade_level: str = None,
+        max_difficulty: int = None,
+        max_results: int = 10,
+    ) -> List[Dict]:
+        """Recherche plein texte des exercices, classée par pertinence (BM25)"""
+        match_query = self._build_match_query(query)
+        if not match_query or not self.fts_enabled:
+            return []
+
+        columns_sql = ", ".join(f"e.{column}" for column in EXERCISE_COLUMNS)
+        sql = f"""
+            SELECT {columns_sql},
+                   snippet(exercises_fts, 1, char(2), char(3), '…', 16),
+                   bm25(exercises_fts, {", ".join(map(str, EXERCISE_FTS_WEIGHTS))})
+                       AS score
+            FROM exercises_fts
+            JOIN exercises e ON e.id = exercises_fts.rowid
+            WHERE exercises_fts MATCH ?
+        """
+        params: List[Any] = [match_query]
+
+        if subject:
+            sql += " AND e.subject = ?"
+            params.append(subject)
+
+        if grade_level:
+            sql += " AND e.grade_level = ?"
+            params.append(grade_level)
+
+        if max_difficulty is not None:
+            sql += " AND e.difficulty_level <= ?"
+            params.append(max_difficulty)
+
+        sql += " ORDER BY score ASC, e.difficulty_level ASC LIMIT ?"
+        params.append(max_results)
+
+        results = self._fetchall(sql, params)
+
+        exercises = []
+        for row in results:
+            exercise = dict(zip(EXERCISE_COLUMNS, row))
+            exercise["snippet"] = _highlight(row[len(EXERCISE_COLUMNS)])
+            exercise["relevance"] = round(-row[len(EXERCISE_COLUMNS) + 1], 4)
+            exercises.append(exercise)
+        return exercises
 
     def get_recommendations_for_profile(self, student_profile: Dict) -> Dict:
         """Génère des recommandations basées sur le profil de l'élève"""
@@ -296,10 +820,7 @@ class DocumentDatabase:
         recommendations["documents"] = documents
 
         # Exercices adaptés au niveau
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(
+        exercise_results = self._fetchall(
             """
             SELECT * FROM exercises
             WHERE subject = ? AND grade_level = ? AND difficulty_level <= ?
@@ -307,25 +828,12 @@ class DocumentDatabase:
         """,
             (subject, grade_level, difficulty),
         )
-
-        exercise_results = cursor.fetchall()
-        exercise_columns = [
-            "id",
-            "title",
-            "content",
-            "solution",
-            "subject",
-            "grade_level",
-            "difficulty_level",
-            "tags",
-            "created_at",
-        ]
         recommendations["exercises"] = [
-            dict(zip(exercise_columns, row)) for row in exercise_results
+            dict(zip(EXERCISE_COLUMNS, row)) for row in exercise_results
         ]
 
         # Liens utiles
-        cursor.execute(
+        link_results = self._fetchall(
             """
             SELECT * FROM useful_links
             WHERE subject = ? OR grade_level = 'tous'
@@ -333,8 +841,6 @@ class DocumentDatabase:
         """,
             (subject,),
         )
-
-        link_results = cursor.fetchall()
         link_columns = [
             "id",
             "title",
@@ -349,7 +855,6 @@ class DocumentDatabase:
             dict(zip(link_columns, row)) for row in link_results
         ]
 
-        conn.close()
         return recommendations
 
     def add_document(
@@ -364,55 +869,70 @@ class DocumentDatabase:
         url: str = "",
     ) -> int:
         """Ajoute un nouveau document à la base"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.pool.transaction() as cursor:
+            cursor.execute(
+                INSERT_DOCUMENT_SQL,
+                (
+                    title,
+                    content,
+                    subject,
+                    grade_level,
+                    document_type,
+                    tags,
+                    difficulty_level,
+                    url,
+                ),
+            )
+            return cursor.lastrowid
 
-        cursor.execute(
-            """
-            INSERT INTO documents (title, content, subject, grade_level, document_type, tags, difficulty_level, url)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-            (
-                title,
-                content,
-                subject,
-                grade_level,
-                document_type,
-                tags,
-                difficulty_level,
-                url,
-            ),
-        )
+    def add_documents(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """Ajoute des documents en masse dans une seule transaction
 
-        doc_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return doc_id
+        Chaque document est un dictionnaire avec les mêmes champs que
+        `add_document`. En cas d'erreur, aucun document n'est inséré.
+
+        Returns:
+            Nombre de documents insérés
+        """
+        with self.pool.transaction() as cursor:
+            cursor.executemany(
+                INSERT_DOCUMENT_SQL,
+                (self._document_params(document) for document in documents),
+            )
+            return cursor.rowcount
 
     def get_contextual_suggestions(
         self, context: str, student_profile: Dict
     ) -> List[Dict]:
-        """Suggestions contextuelles basées sur la conversation en cours"""
+        """Suggestions contextuelles basées sur la conversation en cours
+
+        Les mots-clés du message sont regroupés dans une seule requête
+        plein texte classée par BM25 : les documents couvrant le plus de
+        mots-clés (et les plus rares) remontent en tête.
+        """
         subject = student_profile.get("current_subject", "mathematiques")
         grade_level = student_profile.get("grade_level", "terminale")
 
-        # Analyser le contexte pour extraire des mots-clés
-        keywords = context.lower().split()
+        keywords = extract_context_keywords(context)
+        if not keywords:
+            return []
 
-        suggestions = []
-        for keyword in keywords:
-            if len(keyword) > 3:  # Ignorer les mots trop courts
-                docs = self.search_documents(
-                    keyword, subject=subject, grade_level=grade_level, max_results=2
-                )
-                suggestions.extend(docs)
-
-        # Supprimer les doublons
-        seen_ids = set()
-        unique_suggestions = []
-        for doc in suggestions:
-            if doc["id"] not in seen_ids:
-                unique_suggestions.append(doc)
-                seen_ids.add(doc["id"])
+        if self.fts_enabled:
+            return self.search_documents(
+                " ".join(keywords),
+                subject=subject,
+                grade_level=grade_level,
+                max_results=MAX_CONTEXT_SUGGESTIONS,
+            )
 
-        return unique_suggestions[:5]  # Limiter à 5 suggestions
+        # Sans FTS5 : une recherche LIKE par mot-clé, doublons supprimés
+        suggestions: Dict[int, Dict] = {}
+        for keyword in keywords:
+            for doc in self._search_documents_like(
+                keyword, subject, grade_level, None, max_results=2
+            ):
+                suggestions.setdefault(doc["id"], doc)
+            if len(suggestions) >= MAX_CONTEXT_SUGGESTIONS:
+                break
+
+        return list(suggestions.values())[:MAX_CONTEXT_SUGGESTIONS]
@@ -0,0 +1,603 @@
+"""
+Statistiques globales tenues à jour par compteurs incrémentaux
+Nexus Réussite - Global Stats Counters
+
+La table `global_stat_counters` est mise à jour dans la transaction même
+qui écrit un Student, une LearningSession ou une Assessment (événements
+SQLAlchemy after_insert / after_update / after_delete) : chaque écriture
+retire la contribution de l'ancienne version de la ligne et ajoute celle
+de la nouvelle, par des UPSERT relatifs (`count = count + :delta`).
+
+Les compteurs sont recalculés intégralement :
+- à la première lecture (ligne marqueur absente) ;
+- après une écriture dont l'ancienne version n'est pas connue (attribut
+  expiré, suppression d'une ligne non chargée) ;
+- périodiquement par `GlobalStatsReconciler`, qui corrige et journalise
+  les dérives (écritures SQL directes, migrations...).
+
+Une seule réconciliation s'exécute à la fois (verrou du processus, plus un
+verrou consultatif sous PostgreSQL) et la réconciliation périodique est
+faite par un seul worker par intervalle : les autres voient la date de la
+ligne marqueur et passent leur tour. Les compteurs sont réécrits par UPSERT,
+sans suppression préalable. Elle utilise sa propre session : le travail en
+attente de la requête qui la déclenche n'est ni validé ni annulé.
+"""
+
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.orm import Session, object_session
+
+from database import db
+from models.student import Assessment, GlobalStatCounter, LearningSession, Student
+
+logger = logging.getLogger(__name__)
+
+counters_table = GlobalStatCounter.__table__
+
+# Dimensions des compteurs
+ACTIVE_STUDENTS = "students"
+GRADE = "grade"
+SCHOOL = "school"
+SESSIONS = "sessions"
+SUBJECT = "subject"
+COMPLETION = "completion"
+ACCURACY = "accuracy"
+COMPLETED_ASSESSMENTS = "assessments"
+# Ligne marqueur : présente quand les compteurs sont initialisés
+META = "meta"
+INITIALIZED = "initialized"
+
+POPULAR_SUBJECTS_LIMIT = 5
+# Clé des statistiques mises en cache (voir routes/students.py), invalidée
+# après chaque commit qui modifie les compteurs
+GLOBAL_STATS_CACHE_KEY = "global_statistics"
+_DIRTY_KEY = "global_stats_dirty"
+DEFAULT_RECONCILE_INTERVAL = 3600.0
+# Verrou consultatif PostgreSQL de la réconciliation (valeur arbitraire)
+RECONCILE_LOCK_ID = 720_015_001
+
+CounterKey = Tuple[str, str]
+# (dimension, clé) -> (variation du compte, variation du total)
+Deltas = Dict[CounterKey, Tuple[int, float]]
+
+
+def _key(value: Optional[str]) -> str:
+    """Clé de compteur : NULL est stocké comme chaîne vide"""
+    return "" if value is None else value
+
+
+# ----- Contributions de chaque modèle -----
+
+
+def _student_contributions(values: Dict[str, Any]) -> List[Tuple[CounterKey, float]]:
+    if not values["is_active"]:
+        return []
+    contributions = [
+        ((ACTIVE_STUDENTS, ""), 0.0),
+        ((GRADE, _key(values["grade_level"])), 0.0),
+    ]
+    if values["school"] is not None:
+        contributions.append(((SCHOOL, values["school"]), 0.0))
+    return contributions
+
+
+def _session_contributions(values: Dict[str, Any]) -> List[Tuple[CounterKey, float]]:
+    contributions = [((SESSIONS, ""), 0.0), ((SUBJECT, _key(values["subject"])), 0.0)]
+    if values["completion_rate"] is not None:
+        contributions.append(((COMPLETION, ""), values["completion_rate"]))
+    if values["accuracy_rate"] is not None:
+        contributions.append(((ACCURACY, ""), values["accuracy_rate"]))
+    return contributions
+
+
+def _assessment_contributions(values: Dict[str, Any]) -> List[Tuple[CounterKey, float]]:
+    return [((COMPLETED_ASSESSMENTS, ""), 0.0)] if values["is_completed"] else []
+
+
+# Modèle -> (attributs suivis, contributions)
+_TRACKED = {
+    Student: (("is_active", "grade_level", "school"), _student_contributions),
+    LearningSession: (
+        ("subject", "completion_rate", "accuracy_rate"),
+        _session_contributions,
+    ),
+    Assessment: (("is_completed",), _assessment_contributions),
+}
+
+
+# ----- Mise à jour incrémentale -----
+
+
+def _old_values(
+    target, names: Iterable[str], deleted: bool = False
+) -> Optional[Dict[str, Any]]:
+    """Valeurs des attributs suivis d'avant la modification
+
+    Returns:
+        None si une valeur n'est pas connue sans relire la ligne
+    """
+    state = inspect(target)
+    values = {}
+    for name in names:
+        history = state.attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif history.added:
+            if state.committed_state.get(name) is not None:
+                # Attribut expiré au moment de la modification
+                return None
+            values[name] = None
+        elif name in state.unloaded:
+            if deleted:
+                return None
+            # Attribut non modifié : la valeur en base n'a pas changé
+            values[name] = getattr(target, name)
+        else:
+            values[name] = state.dict.get(name)
+    return values
+
+
+def _new_values(target, names: Iterable[str], old: Dict[str, Any]) -> Dict[str, Any]:
+    """Valeurs des attributs suivis après l'écriture"""
+    state = inspect(target)
+    values = dict(old)
+    for name in names:
+        history = state.attrs[name].history
+        if history.added:
+            values[name] = history.added[0]
+        elif name not in values:
+            # Insertion : un attribut jamais renseigné a été écrit à NULL
+            values[name] = state.dict.get(name)
+    return values
+
+
+def _apply(deltas: Deltas, contributions, sign: int):
+    for counter_key, total in contributions:
+        count_delta, total_delta = deltas.get(counter_key, (0, 0.0))
+        deltas[counter_key] = (count_delta + sign, total_delta + sign * total)
+
+
+def _upsert_statement(connection, relative: bool = True):
+    """INSERT ... ON CONFLICT DO UPDATE, si le dialecte le permet
+
+    Args:
+        relative: ajoute les valeurs à celles stockées (`count + :delta`),
+            sinon les remplace
+    """
+    # pylint: disable=import-outside-toplevel
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif connection.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    statement = insert(counters_table)
+    count = statement.excluded.count
+    total = statement.excluded.total
+    if relative:
+        count = counters_table.c.count + count
+        total = counters_table.c.total + total
+    return statement.on_conflict_do_update(
+        index_elements=[counters_table.c.dimension, counters_table.c.key],
+        set_={
+            "count": count,
+            "total": total,
+            "updated_at": statement.excluded.updated_at,
+        },
+    )
+
+
+def _write_deltas(connection, deltas: Deltas):
+    now = datetime.utcnow()
+    rows = [
+        {
+            "dimension": dimension,
+            "key": key,
+            "count": count,
+            "total": total,
+            "updated_at": now,
+        }
+        for (dimension, key), (count, total) in deltas.items()
+        if count or total
+    ]
+    if not rows:
+        return
+
+    upsert = _upsert_statement(connection)
+    if upsert is not None:
+        connection.execute(upsert, rows)
+        return
+
+    for row in rows:
+        result = connection.execute(
+            counters_table.update()
+            .where(
+                counters_table.c.dimension == row["dimension"],
+                counters_table.c.key == row["key"],
+            )
+            .values(
+                count=counters_table.c.count + row["count"],
+                total=counters_table.c.total + row["total"],
+                updated_at=now,
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(counters_table.insert().values(**row))
+
+
+def _initialized(connection) -> bool:
+    return (
+        connection.execute(
+            db.select(counters_table.c.count).where(
+                counters_table.c.dimension == META,
+                counters_table.c.key == INITIALIZED,
+            )
+        ).first()
+        is not None
+    )
+
+
+def _invalidate(connection):
+    """Supprime les compteurs : ils seront recalculés à la prochaine lecture"""
+    connection.execute(counters_table.delete())
+
+
+def _on_write(kind: str):
+    """Listener after_insert / after_update / after_delete d'un modèle suivi"""
+
+    def listener(mapper, connection, target):
+        names, contributions = _TRACKED[mapper.class_]
+        if kind == "update" and not any(
+            inspect(target).attrs[name].history.has_changes() for name in names
+        ):
+            return
+        if not _initialized(connection):
+            return
+
+        session = object_session(target)
+        if session is not None:
+            session.info[_DIRTY_KEY] = True
+
+        deltas: Deltas = {}
+        old_values: Dict[str, Any] = {}
+        if kind in ("update", "delete"):
+            old_values = _old_values(target, names, deleted=kind == "delete")
+            if old_values is None:
+                logger.info("Ancienne valeur inconnue : recalcul des statistiques")
+                _invalidate(connection)
+                return
+            _apply(deltas, contributions(old_values), -1)
+        if kind in ("insert", "update"):
+            _apply(deltas, contributions(_new_values(target, names, old_values)), 1)
+
+        _write_deltas(connection, deltas)
+
+    return listener
+
+
+def _on_commit(session: Session):
+    if session.info.pop(_DIRTY_KEY, False):
+        # pylint: disable=import-outside-toplevel
+        from services.cache_service import cache_service
+
+        cache_service.delete(GLOBAL_STATS_CACHE_KEY)
+
+
+def _on_rollback(session: Session, _previous_transaction):
+    session.info.pop(_DIRTY_KEY, None)
+
+
+for _model in _TRACKED:
+    event.listen(_model, "after_insert", _on_write("insert"))
+    event.listen(_model, "after_update", _on_write("update"))
+    event.listen(_model, "after_delete", _on_write("delete"))
+event.listen(Session, "after_commit", _on_commit)
+event.listen(Session, "after_soft_rollback", _on_rollback)
+
+
+# ----- Recalcul complet et réconciliation -----
+
+
+def compute_counters(session=None) -> Dict[CounterKey, Tuple[int, float]]:
+    """Compteurs recalculés depuis les tables sources
+
+    Args:
+        session: session de lecture (`db.session` par défaut)
+    """
+    session = session or db.session
+    counters: Dict[CounterKey, Tuple[int, float]] = {}
+
+    active = session.query(Student).filter(Student.is_active.is_(True))
+    counters[(ACTIVE_STUDENTS, "")] = (active.count(), 0.0)
+    for grade_level, count in (
+        session.query(Student.grade_level, func.count(Student.id))
+        .filter(Student.is_active.is_(True))
+        .group_by(Student.grade_level)
+    ):
+        counters[(GRADE, _key(grade_level))] = (count, 0.0)
+    for school, count in (
+        session.query(Student.school, func.count(Student.id))
+        .filter(Student.is_active.is_(True), Student.school.isnot(None))
+        .group_by(Student.school)
+    ):
+        counters[(SCHOOL, school)] = (count, 0.0)
+
+    for subject, count in session.query(
+        LearningSession.subject, func.count(LearningSession.id)
+    ).group_by(LearningSession.subject):
+        counters[(SUBJECT, _key(subject))] = (count, 0.0)
+    sessions, completion_count, completion_sum, accuracy_count, accuracy_sum = (
+        session.query(
+            func.count(LearningSession.id),
+            func.count(LearningSession.completion_rate),
+            func.coalesce(func.sum(LearningSession.completion_rate), 0.0),
+            func.count(LearningSession.accuracy_rate),
+            func.coalesce(func.sum(LearningSession.accuracy_rate), 0.0),
+        ).one()
+    )
+    counters[(SESSIONS, "")] = (sessions, 0.0)
+    counters[(COMPLETION, "")] = (completion_count, float(completion_sum))
+    counters[(ACCURACY, "")] = (accuracy_count, float(accuracy_sum))
+
+    counters[(COMPLETED_ASSESSMENTS, "")] = (
+        session.query(Assessment).filter(Assessment.is_completed.is_(True)).count(),
+        0.0,
+    )
+    return counters
+
+
+_reconcile_lock = threading.Lock()
+
+
+def _try_lock_reconcile(connection) -> bool:
+    """Verrou consultatif de la transaction en cours (PostgreSQL seulement)
+
+    Ailleurs, le verrou du processus suffit : SQLite sérialise les écritures
+    et l'UPSERT ne peut pas entrer en conflit avec une autre réconciliation.
+    """
+    if connection.dialect.name != "postgresql":
+        return True
+    return bool(
+        connection.execute(
+            text("SELECT pg_try_advisory_xact_lock(:lock_id)"),
+            {"lock_id": RECONCILE_LOCK_ID},
+        ).scalar()
+    )
+
+
+def _reconciled_within(connection, seconds: float) -> bool:
+    """Vrai si une réconciliation a été enregistrée depuis moins de `seconds`"""
+    reconciled_at = connection.execute(
+        db.select(counters_table.c.updated_at).where(
+            counters_table.c.dimension == META,
+            counters_table.c.key == INITIALIZED,
+        )
+    ).scalar()
+    return (
+        reconciled_at is not None
+        and (datetime.utcnow() - reconciled_at).total_seconds() < seconds
+    )
+
+
+def _store_counters(connection, rows: List[Dict[str, Any]]):
+    """Remplace les compteurs donnés, sans supprimer de ligne"""
+    upsert = _upsert_statement(connection, relative=False)
+    if upsert is not None:
+        connection.execute(upsert, rows)
+        return
+    for row in rows:
+        result = connection.execute(
+            counters_table.update()
+            .where(
+                counters_table.c.dimension == row["dimension"],
+                counters_table.c.key == row["key"],
+            )
+            .values(
+                count=row["count"], total=row["total"], updated_at=row["updated_at"]
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(counters_table.insert().values(**row))
+
+
+def reconcile_global_stats(min_interval: float = 0) -> Optional[Dict[str, Any]]:
+    """Recalcule les compteurs et remplace ceux stockés
+
+    Les écritures validées pendant le recalcul peuvent être comptées deux
+    fois ou pas du tout ; la réconciliation suivante les corrige.
+
+    Args:
+        min_interval: ne fait rien si la dernière réconciliation date de
+            moins de `min_interval` secondes (réconciliation périodique)
+
+    Returns:
+        {"drift": {"dimension:clé": (stocké, recalculé)}, "counters": n}, ou
+        None si une autre réconciliation est en cours ou vient d'avoir lieu
+    """
+    if not _reconcile_lock.acquire(blocking=False):
+        return None
+    try:
+        with Session(db.engine) as session, session.begin():
+            return _reconcile(session, min_interval)
+    finally:
+        _reconcile_lock.release()
+
+
+def _reconcile(session: Session, min_interval: float) -> Optional[Dict[str, Any]]:
+    """Réconciliation dans la transaction de `session`"""
+    connection = session.connection()
+    if not _try_lock_reconcile(connection) or (
+        min_interval and _reconciled_within(connection, min_interval)
+    ):
+        return None
+
+    fresh = compute_counters(session)
+    stored = {
+        (row.dimension, row.key): (row.count, row.total)
+        for row in session.query(GlobalStatCounter).filter(
+            GlobalStatCounter.dimension != META
+        )
+    }
+
+    drift = {}
+    for counter_key in set(fresh) | set(stored):
+        before = stored.get(counter_key, (0, 0.0))
+        after = fresh.get(counter_key, (0, 0.0))
+        if before[0] != after[0] or abs(before[1] - after[1]) > 1e-6:
+            drift[f"{counter_key[0]}:{counter_key[1]}"] = (before[0], after[0])
+
+    # Les compteurs disparus des tables sources sont remis à zéro
+    now = datetime.utcnow()
+    counters = {counter_key: (0, 0.0) for counter_key in stored}
+    counters.update(fresh)
+    counters[(META, INITIALIZED)] = (1, 0.0)
+    _store_counters(
+        connection,
+        [
+            {
+                "dimension": dimension,
+                "key": key,
+                "count": count,
+                "total": total,
+                "updated_at": now,
+            }
+            for (dimension, key), (count, total) in counters.items()
+        ],
+    )
+    if drift and stored:
+        logger.warning(f"Dérive des statistiques globales corrigée: {drift}")
+    return {"drift": drift, "counters": len(fresh)}
+
+
+class GlobalStatsReconciler:
+    """Thread démon qui réconcilie les compteurs à intervalle régulier
+
+    Démarré paresseusement à la première requête de chaque processus : avec
+    `gunicorn --preload`, un thread lancé dans le maître n'existerait pas
+    dans les workers.
+    """
+
+    def __init__(self, app, interval: float = DEFAULT_RECONCILE_INTERVAL):
+        self.app = app
+        self.interval = interval
+        self._pid: Optional[int] = None
+        self._stop_event: Optional[threading.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """Réconcilie, sauf si un autre worker l'a fait pendant l'intervalle"""
+        with self.app.app_context():
+            try:
+                return reconcile_global_stats(min_interval=self.interval)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Échec de la réconciliation des statistiques")
+                return None
+
+    def ensure_started(self):
+        """Hook before_request : démarre le thread du processus courant"""
+        if self._pid != os.getpid():
+            self.start()
+
+    def start(self):
+        with self._lock:
+            pid = os.getpid()
+            if self._pid == pid and self._thread and self._thread.is_alive():
+                return
+            self._pid = pid
+
+            self._stop_event = threading.Event()
+            stop_event = self._stop_event
+
+            def run():
+                while not stop_event.wait(self.interval):
+                    self.run_once()
+
+            self._thread = threading.Thread(
+                target=run, name="global-stats-reconcile", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        if self._stop_event:
+            self._stop_event.set()
+        if self._thread and self._pid == os.getpid():
+            self._thread.join(timeout=self.interval)
+        self._thread = None
+        self._pid = None
+
+
+def init_global_stats(app) -> Optional[GlobalStatsReconciler]:
+    """Active la réconciliation périodique (GLOBAL_STATS_RECONCILE_INTERVAL)
+
+    Un intervalle nul ou négatif la désactive.
+    """
+    interval = float(
+        app.config.get("GLOBAL_STATS_RECONCILE_INTERVAL", DEFAULT_RECONCILE_INTERVAL)
+    )
+    if interval <= 0:
+        return None
+    reconciler = GlobalStatsReconciler(app, interval)
+    app.before_request(reconciler.ensure_started)
+    app.extensions["global_stats_reconciler"] = reconciler
+    return reconciler
+
+
+# ----- Lecture -----
+
+
+def _load_counters() -> Dict[CounterKey, Tuple[int, float]]:
+    return {
+        (row.dimension, row.key): (row.count, row.total)
+        for row in GlobalStatCounter.query.all()
+    }
+
+
+def _distribution(
+    counters: Dict[CounterKey, Tuple[int, float]], dimension: str
+) -> Dict[Optional[str], int]:
+    return {
+        (key or None): count
+        for (counter_dimension, key), (count, _) in counters.items()
+        if counter_dimension == dimension and count > 0
+    }
+
+
+def get_global_stats() -> Dict[str, Any]:
+    """Statistiques globales lues dans les compteurs (une requête)"""
+    counters = _load_counters()
+    if (META, INITIALIZED) not in counters:
+        logger.info("Initialisation des compteurs de statistiques globales")
+        # Session propre à la réconciliation : celle de la requête est intacte
+        if reconcile_global_stats() is not None:
+            counters = _load_counters()
+        else:
+            # Initialisation en cours dans une autre requête : calcul direct
+            counters = compute_counters()
+
+    def count(dimension: str) -> int:
+        return counters.get((dimension, ""), (0, 0.0))[0]
+
+    def average(dimension: str) -> float:
+        value_count, total = counters.get((dimension, ""), (0, 0.0))
+        return total / value_count if value_count else 0.0
+
+    subjects = _distribution(counters, SUBJECT)
+    popular_subjects = Counter(subjects).most_common(POPULAR_SUBJECTS_LIMIT)
+
+    return {
+        "total_students": count(ACTIVE_STUDENTS),
+        "total_sessions": count(SESSIONS),
+        "total_assessments": count(COMPLETED_ASSESSMENTS),
+        "avg_completion_rate": average(COMPLETION),
+        "avg_accuracy_rate": average(ACCURACY),
+        "grade_levels": _distribution(counters, GRADE),
+        "schools": _distribution(counters, SCHOOL),
+        "popular_subjects": dict(popular_subjects),
+    }
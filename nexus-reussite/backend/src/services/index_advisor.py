@@ -0,0 +1,381 @@
+"""
+Conseiller d'index à partir du profiler SQL
+Nexus Réussite - Index Advisor
+
+Lit les statistiques par instruction du profiler `after_cursor_execute`
+(`database.get_statement_stats`), en extrait les prédicats de chaque table
+(égalités, bornes, tri), et propose pour les plus coûteux un index composite
+dans l'ordre usuel : colonnes d'égalité, puis une colonne de plage ou de tri.
+
+Un prédicat déjà servi par un index existant (ou par une contrainte unique,
+ou par la clé primaire) est signalé comme couvert. Les index manquants
+peuvent être rendus sous forme de révision Alembic (`render_migration`,
+`write_migration`), à relire avant de l'appliquer.
+"""
+
+import re
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from alembic.script import ScriptDirectory
+
+from database import db
+
+# Longueur maximale d'un identifiant PostgreSQL
+MAX_INDEX_NAME_LENGTH = 63
+DEFAULT_REPORT_LIMIT = 20
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE)\s+\"?(\w+)\"?(?:\s+(?:AS\s+)?\"?(\w+)\"?)?",
+    re.IGNORECASE,
+)
+_COMPARISON = re.compile(
+    r"\"?(\w+)\"?\.\"?(\w+)\"?\s*"
+    r"(=|!=|<>|<=|>=|<|>|\bNOT\s+IN\b|\bIN\b|\bIS\b|\bBETWEEN\b|\bI?LIKE\b)"
+    r"\s*(\"?\w+\"?\.\"?\w+\"?)?",
+    re.IGNORECASE,
+)
+_ORDER_BY = re.compile(
+    r"\bORDER\s+BY\s+(.+?)(?:\bLIMIT\b|\bOFFSET\b|\bFOR\b|\)|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+_QUALIFIED_COLUMN = re.compile(r"\"?(\w+)\"?\.\"?(\w+)\"?")
+# Mots-clés que la regex des tables prendrait pour un alias
+_NOT_ALIASES = {
+    "where",
+    "join",
+    "inner",
+    "left",
+    "right",
+    "outer",
+    "on",
+    "group",
+    "order",
+    "limit",
+    "offset",
+    "union",
+    "using",
+}
+
+_EQUALITY_OPERATORS = {"=", "in", "is"}
+_RANGE_OPERATORS = {"<", ">", "<=", ">=", "between", "like", "ilike"}
+
+
+@dataclass(frozen=True)
+class Predicate:
+    """Colonnes filtrées ou triées sur une table par une instruction"""
+
+    table: str
+    equality: Tuple[str, ...]
+    range: Tuple[str, ...] = ()
+    order: Tuple[str, ...] = ()
+
+    @property
+    def index_columns(self) -> Tuple[str, ...]:
+        """Colonnes de l'index composite adapté au prédicat"""
+        columns = list(self.equality)
+        # Une seule colonne de plage est exploitable après les égalités ;
+        # à défaut, la première colonne de tri évite un tri explicite
+        trailing = self.range[:1] or self.order[:1]
+        for column in trailing:
+            if column not in columns:
+                columns.append(column)
+        return tuple(columns)
+
+
+@dataclass
+class IndexRecommendation:
+    """Index composite proposé pour un prédicat, avec son coût observé"""
+
+    table: str
+    columns: Tuple[str, ...]
+    calls: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    covered_by: Optional[str] = None
+    statements: List[str] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return index_name(self.table, self.columns)
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "table": self.table,
+            "columns": list(self.columns),
+            "index_name": self.name,
+            "calls": self.calls,
+            "total_time_ms": round(self.total_time * 1000, 2),
+            "mean_time_ms": round(self.mean_time * 1000, 3),
+            "max_time_ms": round(self.max_time * 1000, 2),
+            "covered_by": self.covered_by,
+            "sample_statement": self.statements[0] if self.statements else None,
+        }
+
+
+def index_name(table: str, columns: Sequence[str]) -> str:
+    """Nom conventionnel `ix_<table>_<colonnes>`, tronqué pour PostgreSQL"""
+    return f"ix_{table}_{'_'.join(columns)}"[:MAX_INDEX_NAME_LENGTH]
+
+
+# ----- Analyse des instructions -----
+
+
+def _table_aliases(statement: str) -> Dict[str, str]:
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(statement):
+        if table.lower() == "select":
+            continue
+        aliases[table] = table
+        if alias and alias.lower() not in _NOT_ALIASES:
+            aliases[alias] = table
+    return aliases
+
+
+def _add_column(columns: Dict[str, List[str]], table: str, column: str):
+    table_columns = columns.setdefault(table, [])
+    if column not in table_columns:
+        table_columns.append(column)
+
+
+def extract_predicates(statement: str) -> List[Predicate]:
+    """Prédicats par table d'une instruction SELECT, UPDATE ou DELETE
+
+    Seules les colonnes qualifiées (`table.colonne`, telles qu'émises par
+    SQLAlchemy) comparées à un paramètre ou à une constante sont retenues ;
+    les conditions de jointure (`a.x = b.y`) sont ignorées.
+    """
+    aliases = _table_aliases(statement)
+    if not aliases:
+        return []
+
+    equality: Dict[str, List[str]] = {}
+    ranges: Dict[str, List[str]] = {}
+    order: Dict[str, List[str]] = {}
+
+    where_start = re.search(r"\bWHERE\b", statement, re.IGNORECASE)
+    if where_start:
+        for qualifier, column, operator, other in _COMPARISON.findall(
+            statement[where_start.end() :]
+        ):
+            table = aliases.get(qualifier)
+            if table is None or other:
+                continue
+            operator = " ".join(operator.lower().split())
+            if operator in _EQUALITY_OPERATORS:
+                _add_column(equality, table, column)
+            elif operator in _RANGE_OPERATORS:
+                _add_column(ranges, table, column)
+
+    order_by = _ORDER_BY.search(statement)
+    if order_by:
+        for qualifier, column in _QUALIFIED_COLUMN.findall(order_by.group(1)):
+            table = aliases.get(qualifier)
+            if table is not None:
+                _add_column(order, table, column)
+
+    predicates = []
+    for table in dict.fromkeys([*equality, *ranges, *order]):
+        table_equality = tuple(equality.get(table, ()))
+        predicates.append(
+            Predicate(
+                table=table,
+                equality=table_equality,
+                range=tuple(
+                    c for c in ranges.get(table, ()) if c not in table_equality
+                ),
+                order=tuple(c for c in order.get(table, ()) if c not in table_equality),
+            )
+        )
+    return predicates
+
+
+def is_covered(predicate: Predicate, index_columns: Sequence[str]) -> bool:
+    """Vrai si l'index sert le prédicat aussi bien que l'index proposé
+
+    Les colonnes d'égalité doivent former le préfixe de l'index (dans un ordre
+    quelconque), suivies de la colonne de plage ou de tri éventuelle.
+    """
+    wanted = predicate.index_columns
+    if not wanted or len(index_columns) < len(wanted):
+        return False
+    prefix = index_columns[: len(predicate.equality)]
+    if set(prefix) != set(predicate.equality):
+        return False
+    return tuple(index_columns[len(prefix) : len(wanted)]) == wanted[len(prefix) :]
+
+
+# ----- Index existants -----
+
+
+def existing_indexes(tables: Iterable[str]) -> Dict[str, Dict[str, Tuple[str, ...]]]:
+    """Index, contraintes uniques et clé primaire de chaque table (par nom)"""
+    inspector = db.inspect(db.engine)
+    indexes: Dict[str, Dict[str, Tuple[str, ...]]] = {}
+    for table in tables:
+        if not inspector.has_table(table):
+            continue
+        table_indexes = indexes[table] = {}
+        primary_key = inspector.get_pk_constraint(table)
+        if primary_key.get("constrained_columns"):
+            table_indexes[primary_key.get("name") or f"{table}_pkey"] = tuple(
+                primary_key["constrained_columns"]
+            )
+        for unique in inspector.get_unique_constraints(table):
+            table_indexes[unique["name"]] = tuple(unique["column_names"])
+        for index in inspector.get_indexes(table):
+            table_indexes[index["name"]] = tuple(
+                column for column in index["column_names"] if column
+            )
+    return indexes
+
+
+# ----- Conseil -----
+
+
+def advise(
+    statement_stats: Iterable[Dict[str, Any]],
+    indexes: Optional[Dict[str, Dict[str, Tuple[str, ...]]]] = None,
+) -> List[IndexRecommendation]:
+    """Prédicats observés, du plus coûteux au moins coûteux
+
+    Args:
+        statement_stats: entrées de `database.get_statement_stats()`
+            ({"statement", "calls", "total_time", "max_time"})
+        indexes: index existants par table (lus dans la base par défaut)
+    """
+    by_predicate: Dict[Predicate, IndexRecommendation] = {}
+    for entry in statement_stats:
+        statement = entry["statement"]
+        for predicate in extract_predicates(statement):
+            columns = predicate.index_columns
+            if not columns:
+                continue
+            recommendation = by_predicate.get(predicate)
+            if recommendation is None:
+                recommendation = by_predicate[predicate] = IndexRecommendation(
+                    table=predicate.table, columns=columns
+                )
+            recommendation.calls += entry.get("calls", 1)
+            recommendation.total_time += entry.get("total_time", 0.0)
+            recommendation.max_time = max(
+                recommendation.max_time, entry.get("max_time", 0.0)
+            )
+            if len(recommendation.statements) < 3:
+                recommendation.statements.append(statement)
+
+    if indexes is None:
+        indexes = existing_indexes({p.table for p in by_predicate})
+    for predicate, recommendation in by_predicate.items():
+        for name, columns in indexes.get(predicate.table, {}).items():
+            if is_covered(predicate, columns):
+                recommendation.covered_by = name
+                break
+
+    # Plusieurs prédicats peuvent conduire au même index : on les fusionne
+    merged: Dict[Tuple[str, Tuple[str, ...]], IndexRecommendation] = {}
+    for recommendation in by_predicate.values():
+        key = (recommendation.table, recommendation.columns)
+        current = merged.get(key)
+        if current is None:
+            merged[key] = recommendation
+            continue
+        current.calls += recommendation.calls
+        current.total_time += recommendation.total_time
+        current.max_time = max(current.max_time, recommendation.max_time)
+        current.covered_by = current.covered_by or recommendation.covered_by
+        current.statements = (current.statements + recommendation.statements)[:3]
+
+    return sorted(merged.values(), key=lambda r: r.total_time, reverse=True)
+
+
+def index_report(
+    statement_stats: Iterable[Dict[str, Any]], limit: int = DEFAULT_REPORT_LIMIT
+) -> Dict[str, Any]:
+    """Rapport des prédicats les plus lents et des index manquants"""
+    recommendations = advise(statement_stats)
+    missing = [r for r in recommendations if r.covered_by is None]
+    return {
+        "slowest_predicates": [r.to_dict() for r in recommendations[:limit]],
+        "missing_indexes": [r.to_dict() for r in missing[:limit]],
+    }
+
+
+# ----- Migrations -----
+
+
+def render_migration(
+    recommendations: Sequence[IndexRecommendation],
+    revision: str,
+    down_revision: Optional[str],
+    message: str = "Index des prédicats fréquents",
+) -> str:
+    """Source d'une révision Alembic créant les index proposés"""
+    lines = []
+    for recommendation in recommendations:
+        lines.append(
+            f"    ('{recommendation.name}', '{recommendation.table}', "
+            f"{list(recommendation.columns)!r}),  "
+            f"# {recommendation.calls} appels, "
+            f"{recommendation.total_time * 1000:.0f} ms"
+        )
+    indexes = "\n".join(lines)
+    return f'''"""{message}
+
+Générée par services/index_advisor.py à partir du profiler SQL.
+
+Revision ID: {revision}
+Revises: {down_revision or ''}
+Create Date: {datetime.utcnow().isoformat(sep=' ')}
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '{revision}'
+down_revision = {down_revision!r}
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+{indexes}
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
+'''
+
+
+def write_migration(
+    recommendations: Sequence[IndexRecommendation],
+    message: str = "Index des prédicats fréquents",
+    migrations_dir: Path = MIGRATIONS_DIR,
+) -> Path:
+    """Écrit la révision dans migrations/versions, à la suite de la tête"""
+    down_revision = ScriptDirectory(str(migrations_dir)).get_current_head()
+    revision = uuid.uuid4().hex[-12:]
+    slug = re.sub(r"\W+", "_", message.lower()).strip("_")[:40]
+    path = migrations_dir / "versions" / f"{revision}_{slug}.py"
+    path.write_text(
+        render_migration(recommendations, revision, down_revision, message),
+        encoding="utf-8",
+    )
+    return path
@@ -0,0 +1,197 @@
+"""
+Rendu Markdown -> HTML des documents générés
+Nexus Réussite - Markdown Renderer
+
+Rendu ligne par ligne en une seule passe, avec des motifs compilés une
+fois pour toutes. Sous-ensemble supporté : titres (#), paragraphes, listes
+à puces et numérotées (imbriquées par indentation), blocs de code (```),
+citations (>), séparateurs (---), gras, italique et code en ligne.
+"""
+
+import html
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_UNORDERED_ITEM = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+_ORDERED_ITEM = re.compile(r"^(\s*)\d+[.)]\s+(.*)$")
+_FENCE = re.compile(r"^\s*```\s*([\w+-]*)\s*$")
+_RULE = re.compile(r"^\s*(?:-{3,}|\*{3,}|_{3,})\s*$")
+_QUOTE = re.compile(r"^\s*>\s?(.*)$")
+
+_INLINE_CODE = re.compile(r"`([^`]+)`")
+_BOLD = re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*")
+_ITALIC = re.compile(r"(?<![*\w])\*(?=[^\s*])(.+?)(?<=[^\s*])\*(?![*\w])")
+
+
+def render_inline(text: str) -> str:
+    """Échappe le texte puis applique le formatage en ligne"""
+    parts = _INLINE_CODE.split(text)
+    rendered = []
+    # Indices impairs : contenu des `code`, non formaté
+    for position, part in enumerate(parts):
+        escaped = html.escape(part, quote=False)
+        if position % 2:
+            rendered.append(f"<code>{escaped}</code>")
+        else:
+            escaped = _BOLD.sub(r"<strong>\1</strong>", escaped)
+            rendered.append(_ITALIC.sub(r"<em>\1</em>", escaped))
+    return "".join(rendered)
+
+
+class MarkdownRenderer:
+    """Machine à états produisant le HTML bloc par bloc"""
+
+    def __init__(self):
+        self._paragraph: List[str] = []
+        self._quote: List[str] = []
+        # Pile des listes ouvertes : (balise, indentation)
+        self._lists: List[Tuple[str, int]] = []
+        self._item_open = False
+        self._code: List[str] = []
+        self._code_lang = ""
+        self._in_code = False
+
+    def render(self, markdown_content: str) -> str:
+        """Rend un texte Markdown complet"""
+        return "\n".join(self.iter_html(markdown_content.splitlines()))
+
+    def iter_html(self, lines: Iterable[str]) -> Iterator[str]:
+        """Rend un flux de lignes Markdown en fragments HTML successifs"""
+        for line in lines:
+            yield from self._feed(line)
+        yield from self._close_all()
+
+    def _feed(self, line: str) -> Iterator[str]:
+        if self._in_code:
+            if _FENCE.match(line):
+                yield from self._close_code()
+            else:
+                self._code.append(line)
+            return
+
+        fence = _FENCE.match(line)
+        if fence:
+            yield from self._close_all()
+            self._in_code = True
+            self._code_lang = fence.group(1)
+            return
+
+        if not line.strip():
+            yield from self._close_paragraph()
+            yield from self._close_quote()
+            # Une ligne vide ne ferme pas une liste : elle peut continuer
+            return
+
+        heading = _HEADING.match(line)
+        if heading:
+            yield from self._close_all()
+            level = len(heading.group(1))
+            yield f"<h{level}>{render_inline(heading.group(2))}</h{level}>"
+            return
+
+        if _RULE.match(line):
+            yield from self._close_all()
+            yield "<hr>"
+            return
+
+        quote = _QUOTE.match(line)
+        if quote:
+            yield from self._close_paragraph()
+            yield from self._close_lists()
+            self._quote.append(quote.group(1))
+            return
+
+        item = _UNORDERED_ITEM.match(line) or _ORDERED_ITEM.match(line)
+        if item:
+            tag = "ul" if item.re is _UNORDERED_ITEM else "ol"
+            yield from self._close_paragraph()
+            yield from self._close_quote()
+            yield from self._open_item(tag, len(item.group(1).expandtabs(4)))
+            self._paragraph.append(item.group(2))
+            return
+
+        if self._lists and not self._paragraph and line[:1].isspace():
+            # Ligne indentée après une ligne vide : suite de l'élément courant
+            self._paragraph.append(line.strip())
+            return
+
+        if self._lists and not line[:1].isspace() and not self._paragraph:
+            yield from self._close_lists()
+
+        self._paragraph.append(line.strip())
+
+    def _open_item(self, tag: str, indent: int) -> Iterator[str]:
+        """Ouvre un élément de liste, en imbriquant ou fermant selon l'indentation"""
+        while self._lists and indent < self._lists[-1][1]:
+            yield from self._close_list()
+
+        same_level = bool(self._lists) and indent == self._lists[-1][1]
+        if same_level and self._lists[-1][0] != tag:
+            # Changement de type de liste au même niveau
+            yield from self._close_list()
+            same_level = False
+
+        if same_level:
+            if self._item_open:
+                yield "</li>"
+        else:
+            # Nouvelle liste, à la racine ou dans l'élément ouvert
+            yield f"<{tag}>"
+            self._lists.append((tag, indent))
+
+        yield "<li>"
+        self._item_open = True
+
+    def _close_paragraph(self) -> Iterator[str]:
+        if not self._paragraph:
+            return
+        text = render_inline(" ".join(self._paragraph))
+        self._paragraph = []
+        if self._lists and self._item_open:
+            # Texte d'un élément de liste : pas de <p> englobant
+            yield text
+        else:
+            yield f"<p>{text}</p>"
+
+    def _close_quote(self) -> Iterator[str]:
+        if not self._quote:
+            return
+        text = render_inline(" ".join(part.strip() for part in self._quote))
+        self._quote = []
+        yield f"<blockquote><p>{text}</p></blockquote>"
+
+    def _close_list(self) -> Iterator[str]:
+        yield from self._close_paragraph()
+        tag, _ = self._lists.pop()
+        if self._item_open:
+            yield "</li>"
+        yield f"</{tag}>"
+        # L'élément parent reste ouvert pour accueillir la suite
+        self._item_open = bool(self._lists)
+
+    def _close_lists(self) -> Iterator[str]:
+        yield from self._close_paragraph()
+        while self._lists:
+            yield from self._close_list()
+        self._item_open = False
+
+    def _close_code(self) -> Iterator[str]:
+        code = html.escape("\n".join(self._code), quote=False)
+        css_class = f' class="language-{self._code_lang}"' if self._code_lang else ""
+        self._code = []
+        self._code_lang = ""
+        self._in_code = False
+        yield f"<pre><code{css_class}>{code}</code></pre>"
+
+    def _close_all(self) -> Iterator[str]:
+        yield from self._close_paragraph()
+        yield from self._close_quote()
+        yield from self._close_lists()
+        if self._in_code:
+            yield from self._close_code()
+
+
+def render_markdown(markdown_content: str) -> str:
+    """Convertit un texte Markdown en HTML"""
+    return MarkdownRenderer().render(markdown_content)
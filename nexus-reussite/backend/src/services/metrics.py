@@ -0,0 +1,234 @@
+"""
+Métriques Prometheus de l'application
+Nexus Réussite - Metrics
+
+- http_request_duration_seconds{method, endpoint, status} : latence par
+  endpoint Flask (`request.endpoint`, jamais le chemin brut : `/students/123`
+  et `/students/456` partagent la série `students.get_student`) ;
+- http_requests_in_flight{endpoint} : requêtes en cours ;
+- db_query_duration_seconds{operation} : requêtes SQL par verbe ;
+- cache_lookups_total{tier, result} : hits et misses du L1 et de Redis, le
+  taux de hit se calcule en PromQL ;
+- openai_request_duration_seconds{operation} et
+  openai_tokens{operation, type} : latence et jetons par appel OpenAI ;
+- pdf_render_duration_seconds{document} : génération des PDF.
+
+Les durées SQL, OpenAI et PDF proviennent des spans de
+services/request_trace.py : aucune instrumentation en double.
+
+Sous gunicorn, chaque worker écrit ses valeurs dans PROMETHEUS_MULTIPROC_DIR
+(défini par gunicorn.conf.py avant l'import de prometheus_client) et
+`/metrics` agrège tous les workers ; la jauge des requêtes en cours ne
+compte que les workers vivants (mode `livesum`).
+"""
+
+import logging
+import os
+import time
+from typing import Any, Optional, Tuple
+
+from flask import g, request
+
+from .request_trace import OPENAI, PDF, SQL, add_span_observer
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        REGISTRY,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+except ImportError:
+    Counter = Gauge = Histogram = None
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+UNMATCHED_ENDPOINT = "<route inconnue>"
+# Endpoints exclus des métriques HTTP (exposition des métriques elle-même)
+EXCLUDED_ENDPOINTS = frozenset({"prometheus_metrics"})
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+OPENAI_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+PDF_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+
+
+class Metrics:
+    """Collecteurs Prometheus, créés une fois par processus"""
+
+    def __init__(self):
+        self.enabled = False
+
+    def init_app(self, app):
+        if Histogram is None:
+            logger.warning("prometheus_client non disponible - métriques désactivées")
+            return
+        if "metrics" in app.extensions:
+            return
+        app.extensions["metrics"] = self
+
+        if not self.enabled:
+            self._create_collectors()
+            add_span_observer(self._observe_span)
+            self.enabled = True
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        logger.info(
+            "📈 Métriques Prometheus activées (multiprocess: %s)",
+            bool(os.environ.get(MULTIPROC_DIR_ENV)),
+        )
+
+    def _create_collectors(self):
+        self.request_latency = Histogram(
+            "http_request_duration_seconds",
+            "Latence des requêtes HTTP par endpoint",
+            ["method", "endpoint", "status"],
+            buckets=REQUEST_BUCKETS,
+        )
+        self.in_flight = Gauge(
+            "http_requests_in_flight",
+            "Requêtes HTTP en cours de traitement",
+            ["endpoint"],
+            multiprocess_mode="livesum",
+        )
+        self.db_latency = Histogram(
+            "db_query_duration_seconds",
+            "Durée des requêtes SQL",
+            ["operation"],
+            buckets=DB_BUCKETS,
+        )
+        self.cache_lookups = Counter(
+            "cache_lookups_total",
+            "Lectures du cache par niveau et résultat",
+            ["tier", "result"],
+        )
+        self.openai_latency = Histogram(
+            "openai_request_duration_seconds",
+            "Durée des appels à l'API OpenAI",
+            ["operation"],
+            buckets=OPENAI_BUCKETS,
+        )
+        self.openai_tokens = Histogram(
+            "openai_tokens",
+            "Jetons consommés par appel à l'API OpenAI",
+            ["operation", "type"],
+            buckets=TOKEN_BUCKETS,
+        )
+        self.pdf_render = Histogram(
+            "pdf_render_duration_seconds",
+            "Durée de génération des documents PDF",
+            ["document"],
+            buckets=PDF_BUCKETS,
+        )
+
+    # ----- Requêtes HTTP -----
+
+    @staticmethod
+    def _endpoint() -> str:
+        return request.endpoint or UNMATCHED_ENDPOINT
+
+    def _before_request(self):
+        endpoint = self._endpoint()
+        if endpoint in EXCLUDED_ENDPOINTS:
+            return
+        g._metrics_start = time.perf_counter()
+        g._metrics_endpoint = endpoint
+        self.in_flight.labels(endpoint=endpoint).inc()
+
+    def _after_request(self, response):
+        # Attributs absents si un before_request antérieur (limiteur de
+        # débit...) a répondu avant `_before_request`
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            self.request_latency.labels(
+                method=request.method,
+                endpoint=g.get("_metrics_endpoint", UNMATCHED_ENDPOINT),
+                status=f"{response.status_code // 100}xx",
+            ).observe(time.perf_counter() - start)
+        return response
+
+    def _teardown_request(self, exc=None):  # pylint: disable=unused-argument
+        # Toujours exécuté, même si la vue lève une exception
+        g.pop("_metrics_start", None)
+        endpoint = g.pop("_metrics_endpoint", None)
+        if endpoint is not None:
+            self.in_flight.labels(endpoint=endpoint).dec()
+
+    # ----- Spans (SQL, OpenAI, PDF) -----
+
+    def _observe_span(self, category: str, name: Optional[str], duration_ns: int):
+        seconds = duration_ns / 1e9
+        if category == SQL:
+            self.db_latency.labels(operation=name or "OTHER").observe(seconds)
+        elif category == OPENAI:
+            self.openai_latency.labels(operation=name or "unknown").observe(seconds)
+        elif category == PDF:
+            self.pdf_render.labels(document=_document_label(name)).observe(seconds)
+
+    # ----- Enregistrements explicites -----
+
+    def record_cache_lookup(self, tier: str, hit: bool):
+        if self.enabled:
+            self.cache_lookups.labels(tier=tier, result="hit" if hit else "miss").inc()
+
+    def record_openai_usage(self, operation: str, response: Any):
+        """Jetons de la réponse OpenAI (`response.usage`), si présents"""
+        usage = getattr(response, "usage", None)
+        if not self.enabled or usage is None:
+            return
+        for token_type in ("prompt_tokens", "completion_tokens"):
+            count = getattr(usage, token_type, None)
+            if count is not None:
+                self.openai_tokens.labels(
+                    operation=operation, type=token_type.split("_")[0]
+                ).observe(count)
+
+    # ----- Exposition -----
+
+    @staticmethod
+    def render() -> Tuple[bytes, str]:
+        """Corps et type de contenu de `/metrics`, tous workers agrégés"""
+        multiproc_dir = os.environ.get(MULTIPROC_DIR_ENV)
+        if multiproc_dir:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry, path=multiproc_dir)
+        else:
+            registry = REGISTRY
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def _document_label(name: Optional[str]) -> str:
+    # "NexusPDFGenerator.generate_revision_sheet" -> "revision_sheet"
+    if not name:
+        return "unknown"
+    return name.rsplit(".", 1)[-1].removeprefix("generate_")
+
+
+# Instance globale
+metrics = Metrics()
+
+
+def init_metrics(app):
+    """Initialise les métriques Prometheus pour l'application"""
+    multiproc_dir = os.environ.get(MULTIPROC_DIR_ENV)
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+    metrics.init_app(app)
+
+
+def record_cache_lookup(tier: str, hit: bool):
+    """Compte une lecture du cache (tier: "l1" ou "redis")"""
+    metrics.record_cache_lookup(tier, hit)
+
+
+def record_openai_usage(operation: str, response: Any):
+    """Observe les jetons consommés par un appel OpenAI"""
+    metrics.record_openai_usage(operation, response)
@@ -0,0 +1,518 @@
+"""
+Client OpenAI asynchrone partagé
+Nexus Réussite - OpenAI Client
+
+Un seul `AsyncOpenAI` par processus (et par clé API), adossé à un pool de
+connexions HTTP keep-alive, exécuté dans une boucle asyncio dédiée (thread
+démon) : les routes Flask créent une boucle par requête, or un pool httpx
+asynchrone ne peut pas être partagé entre boucles. Toutes les requêtes passent
+donc par cette boucle, que l'appelant soit :
+- asynchrone (`await client.chat_completion(...)`, depuis n'importe quelle
+  boucle) ;
+- synchrone (`client.chat_completion_sync(...)`, depuis un worker Flask) ;
+- en flux (`client.stream_chat_completion_sync(...)`, fragments au fil de
+  l'eau pour les réponses SSE).
+
+Concurrence bornée par deux sémaphores : un global (OPENAI_MAX_CONCURRENCY)
+et un par tenant (OPENAI_TENANT_CONCURRENCY, ex. un élève), pris dans cet
+ordre pour qu'un tenant en file d'attente n'occupe pas de place globale.
+Les erreurs 429, 5xx et de connexion sont retentées avec un backoff
+exponentiel à jitter complet (en respectant `Retry-After`) ; une fois les
+tentatives épuisées, `OpenAIUnavailableError` (une RuntimeError) est levée
+pour que les services basculent sur leur mode simulation.
+
+Chaque appel terminé (succès ou échec) est compté dans les métriques
+Prometheus et dans la comptabilité en base (services/ai_usage.py) : type
+d'opération, modèle, élève, jetons, latence et coût estimé.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .ai_usage import ERROR, SUCCESS, record_usage
+from .metrics import record_openai_usage
+from .request_trace import OPENAI, record_span, span
+
+try:
+    import httpx
+    from openai import (
+        APIConnectionError,
+        APIError,
+        APIStatusError,
+        AsyncOpenAI,
+        DefaultAsyncHttpxClient,
+    )
+except ImportError:
+    AsyncOpenAI = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+# Valeurs par défaut, surchargeables par variables d'environnement
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_TENANT_CONCURRENCY = 2
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_TIMEOUT = 60.0
+# Attente maximale d'une place dans les sémaphores avant abandon
+DEFAULT_QUEUE_TIMEOUT = 30.0
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+
+# Fabrique d'appel : reçoit le client AsyncOpenAI, renvoie la coroutine
+RequestFactory = Callable[[Any], Awaitable[Any]]
+
+# Fin de flux, déposée dans la file des fragments
+_END_OF_STREAM = object()
+
+
+class OpenAIUnavailableError(RuntimeError):
+    """L'API OpenAI n'a pas pu répondre (tentatives épuisées, file saturée)"""
+
+
+def _env_number(name: str, default, cast=int):
+    try:
+        return cast(os.getenv(name, default))
+    except (TypeError, ValueError):
+        logger.warning("%s invalide, valeur par défaut %s utilisée", name, default)
+        return default
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, APIConnectionError):  # inclut APITimeoutError
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Backoff exponentiel à jitter complet, au moins `Retry-After`"""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, BACKOFF_MAX))
+    return delay
+
+
+class PooledOpenAIClient:
+    """Client AsyncOpenAI partagé, à concurrence bornée et avec retries"""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = DEFAULT_API_BASE,
+        max_concurrency: Optional[int] = None,
+        tenant_concurrency: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        timeout: Optional[float] = None,
+        queue_timeout: Optional[float] = None,
+    ):
+        if AsyncOpenAI is None:
+            raise ImportError("Package openai non installé")
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency or _env_number(
+            "OPENAI_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY
+        )
+        self.tenant_concurrency = tenant_concurrency or _env_number(
+            "OPENAI_TENANT_CONCURRENCY", DEFAULT_TENANT_CONCURRENCY
+        )
+        self.max_connections = max_connections or _env_number(
+            "OPENAI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS
+        )
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else _env_number("OPENAI_MAX_RETRIES", DEFAULT_MAX_RETRIES)
+        )
+        self.timeout = timeout or _env_number("OPENAI_TIMEOUT", DEFAULT_TIMEOUT, float)
+        self.queue_timeout = queue_timeout or _env_number(
+            "OPENAI_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT, float
+        )
+
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0}
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client = None
+        self._global_slots: Optional[asyncio.Semaphore] = None
+        # tenant -> [sémaphore, nombre d'appels en cours ou en attente] ;
+        # l'entrée disparaît avec le dernier appel : taille bornée par les
+        # tenants actifs
+        self._tenant_slots: Dict[str, List[Any]] = {}
+
+    # ----- Boucle dédiée -----
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Démarre (ou redémarre après un fork) la boucle et le client
+
+        Paresseux pour la même raison que l'écoute pub/sub du cache : avec
+        `gunicorn --preload`, un thread lancé avant le fork n'existe pas dans
+        les workers, et le pool de connexions hérité ne doit pas être partagé.
+        """
+        pid = os.getpid()
+        if self._loop is not None and self._pid == pid:
+            return self._loop
+        with self._lock:
+            if self._loop is not None and self._pid == pid:
+                return self._loop
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=self._run_loop, args=(loop,), name="openai-client", daemon=True
+            )
+            thread.start()
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=self.timeout,
+                # Les retries sont gérés ici, sous les sémaphores
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                    ),
+                    timeout=self.timeout,
+                ),
+            )
+            self._global_slots = None
+            self._tenant_slots = {}
+            self._pid, self._loop, self._thread = pid, loop, thread
+            logger.info(
+                "Client OpenAI partagé démarré (concurrence %d, %d par tenant)",
+                self.max_concurrency,
+                self.tenant_concurrency,
+            )
+            return loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def close(self):
+        """Ferme le pool de connexions et arrête la boucle dédiée"""
+        with self._lock:
+            loop, client, thread = self._loop, self._client, self._thread
+            self._loop = self._client = self._thread = None
+        if loop is None or self._pid != os.getpid():
+            return
+        asyncio.run_coroutine_threadsafe(client.close(), loop).result(
+            timeout=self.timeout
+        )
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=self.timeout)
+        loop.close()
+
+    # ----- Exécution dans la boucle dédiée -----
+
+    async def _acquire(self, semaphore: asyncio.Semaphore):
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError as exc:
+            self.stats["rejected"] += 1
+            raise OpenAIUnavailableError(
+                f"File d'attente OpenAI saturée après {self.queue_timeout}s"
+            ) from exc
+
+    async def _execute(
+        self, operation: str, tenant: Optional[str], factory: RequestFactory
+    ) -> Any:
+        # Sémaphores créés dans la boucle dédiée, qui est leur seule utilisatrice
+        if self._global_slots is None:
+            self._global_slots = asyncio.Semaphore(self.max_concurrency)
+
+        entry = None
+        if tenant is not None:
+            entry = self._tenant_slots.get(tenant)
+            if entry is None:
+                entry = self._tenant_slots[tenant] = [
+                    asyncio.Semaphore(self.tenant_concurrency),
+                    0,
+                ]
+            entry[1] += 1
+        try:
+            if entry is not None:
+                await self._acquire(entry[0])
+            try:
+                await self._acquire(self._global_slots)
+                try:
+                    return await self._with_retries(operation, factory)
+                finally:
+                    self._global_slots.release()
+            finally:
+                if entry is not None:
+                    entry[0].release()
+        finally:
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._tenant_slots[tenant]
+
+    async def _with_retries(self, operation: str, factory: RequestFactory) -> Any:
+        attempt = 0
+        while True:
+            self.stats["requests"] += 1
+            try:
+                return await factory(self._client)
+            except APIError as exc:
+                if not _is_retryable(exc) or attempt == self.max_retries:
+                    self.stats["failures"] += 1
+                    raise OpenAIUnavailableError(
+                        f"Échec OpenAI {operation} après {attempt + 1} tentative(s)"
+                        f": {exc}"
+                    ) from exc
+                delay = backoff_delay(attempt, _retry_after(exc))
+                self.stats["retries"] += 1
+                logger.warning(
+                    "OpenAI %s: %s, nouvelle tentative dans %.2fs (%d/%d)",
+                    operation,
+                    type(exc).__name__,
+                    delay,
+                    attempt + 1,
+                    self.max_retries,
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def _submit(self, operation: str, tenant: Optional[str], factory: RequestFactory):
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Appel bloquant depuis la boucle du client OpenAI")
+        return asyncio.run_coroutine_threadsafe(
+            self._execute(operation, tenant, factory), loop
+        )
+
+    # ----- API publique -----
+
+    async def request(
+        self,
+        operation: str,
+        factory: RequestFactory,
+        tenant: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> Any:
+        """Exécute `factory(client)` dans la boucle dédiée (appelant async)"""
+        start = time.perf_counter()
+        # Span mesuré côté appelant : la trace de la requête est dans son contexte
+        try:
+            with span(OPENAI, operation):
+                response = await asyncio.wrap_future(
+                    self._submit(operation, tenant, factory)
+                )
+        except Exception:
+            _record(operation, model, tenant, start, ERROR)
+            raise
+        _record(operation, model, tenant, start, SUCCESS, response)
+        return response
+
+    def request_sync(
+        self,
+        operation: str,
+        factory: RequestFactory,
+        tenant: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> Any:
+        """Exécute `factory(client)` et attend le résultat (appelant sync)"""
+        start = time.perf_counter()
+        try:
+            with span(OPENAI, operation):
+                response = self._submit(operation, tenant, factory).result()
+        except Exception:
+            _record(operation, model, tenant, start, ERROR)
+            raise
+        _record(operation, model, tenant, start, SUCCESS, response)
+        return response
+
+    async def chat_completion(
+        self,
+        tenant: Optional[str] = None,
+        operation: str = "chat.completions",
+        **params: Any,
+    ) -> Any:
+        return await self.request(
+            operation,
+            lambda client: client.chat.completions.create(**params),
+            tenant,
+            params.get("model"),
+        )
+
+    def chat_completion_sync(
+        self,
+        tenant: Optional[str] = None,
+        operation: str = "chat.completions",
+        **params: Any,
+    ) -> Any:
+        return self.request_sync(
+            operation,
+            lambda client: client.chat.completions.create(**params),
+            tenant,
+            params.get("model"),
+        )
+
+    async def image_generation(
+        self,
+        tenant: Optional[str] = None,
+        operation: str = "images.generate",
+        **params: Any,
+    ) -> Any:
+        return await self.request(
+            operation,
+            lambda client: client.images.generate(**params),
+            tenant,
+            params.get("model"),
+        )
+
+    def stream_chat_completion_sync(
+        self,
+        tenant: Optional[str] = None,
+        operation: str = "chat.completions",
+        **params: Any,
+    ) -> Iterator[Any]:
+        """Itère sur les fragments d'une complétion en flux (appelant sync)
+
+        Les places des sémaphores sont tenues jusqu'à la fin du flux. Seul
+        l'établissement du flux est retenté : une erreur après le premier
+        fragment lève OpenAIUnavailableError sans nouvelle tentative (le texte
+        déjà transmis serait dupliqué). Le dernier fragment porte l'usage des
+        jetons. Fermer l'itérateur (client déconnecté) annule la requête.
+        """
+        chunks: "queue.Queue[Any]" = queue.Queue()
+
+        async def consume(client):
+            stream = await client.chat.completions.create(
+                stream=True, stream_options={"include_usage": True}, **params
+            )
+            started = False
+            try:
+                async for chunk in stream:
+                    started = True
+                    chunks.put(chunk)
+            except (APIError, httpx.HTTPError) as exc:
+                # Erreur de lecture brute (httpx) : non retentée non plus
+                if started or not isinstance(exc, APIError):
+                    raise OpenAIUnavailableError(
+                        f"Flux OpenAI {operation} interrompu: {exc}"
+                    ) from exc
+                raise
+            finally:
+                await stream.close()
+
+        start = time.perf_counter_ns()
+        outcome = ERROR
+        future = self._submit(operation, tenant, consume)
+        future.add_done_callback(lambda _future: chunks.put(_END_OF_STREAM))
+        last_chunk = None
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _END_OF_STREAM:
+                    break
+                last_chunk = chunk
+                yield chunk
+            future.result()
+            outcome = SUCCESS
+        finally:
+            if not future.done():
+                future.cancel()
+            elapsed_ns = time.perf_counter_ns() - start
+            record_span(OPENAI, elapsed_ns, operation)
+            record_usage(
+                operation,
+                params.get("model"),
+                outcome,
+                elapsed_ns / 1e6,
+                tenant,
+                last_chunk,
+            )
+        record_openai_usage(operation, last_chunk)
+
+    async def embedding(
+        self,
+        tenant: Optional[str] = None,
+        operation: str = "embeddings",
+        **params: Any,
+    ) -> Any:
+        return await self.request(
+            operation,
+            lambda client: client.embeddings.create(**params),
+            tenant,
+            params.get("model"),
+        )
+
+    def embedding_sync(
+        self,
+        tenant: Optional[str] = None,
+        operation: str = "embeddings",
+        **params: Any,
+    ) -> Any:
+        return self.request_sync(
+            operation,
+            lambda client: client.embeddings.create(**params),
+            tenant,
+            params.get("model"),
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "max_concurrency": self.max_concurrency,
+            "tenant_concurrency": self.tenant_concurrency,
+            "active_tenants": len(self._tenant_slots),
+        }
+
+
+def _record(
+    operation: str,
+    model: Optional[str],
+    tenant: Optional[str],
+    start: float,
+    outcome: str,
+    response: Any = None,
+):
+    """Métriques Prometheus et comptabilité en base d'un appel terminé"""
+    if response is not None:
+        record_openai_usage(operation, response)
+    record_usage(
+        operation,
+        model,
+        outcome,
+        (time.perf_counter() - start) * 1000,
+        tenant,
+        response,
+    )
+
+
+# Clients partagés du processus, par (clé API, URL de base)
+_clients: Dict[Tuple[str, str], PooledOpenAIClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(
+    api_key: str, base_url: Optional[str] = None
+) -> PooledOpenAIClient:
+    """Client partagé pour cette clé API (créé au premier appel)"""
+    key = (api_key, base_url or DEFAULT_API_BASE)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = PooledOpenAIClient(api_key, key[1])
+        return client
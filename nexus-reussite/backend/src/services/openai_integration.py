@@ -1,16 +1,33 @@
-import asyncio
 import json
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
-
-from openai import OpenAI
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from flask import current_app, has_app_context
+
+from .ai_usage import DEFAULT_SUMMARY_DAYS, get_usage_summary
+from .conversation_store import (
+    CompactionTask,
+    conversation_store,
+    fallback_summary,
+    new_session_id,
+    trim_to_budget,
+)
+from .openai_client import get_openai_client
+from .response_cache import CacheLookup, SemanticResponseCache, normalized_embedding
+from .streaming import DONE, ERROR, TOKEN, StreamEvent, simulated_stream
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Résumés de sessions calculés en parallèle, hors des requêtes
+SUMMARY_WORKERS = 2
+
 
 @dataclass
 class StudentProfile:
@@ -44,6 +61,10 @@ class ConversationContext:
     previous_messages: List[Dict] = None
     learning_objectives: List[str] = None
     time_limit: Optional[int] = None  # minutes
+    # Résumé des tours anciens de la session (services/conversation_store.py)
+    summary: Optional[str] = None
+    # Utilisateur authentifié propriétaire de la session (identité JWT)
+    owner_id: Optional[str] = None
 
     def __post_init__(self):
         if self.previous_messages is None:
@@ -62,6 +83,7 @@ class OpenAIIntegration:
         self.model_chat = "gpt-4-turbo-preview"
         self.model_vision = "gpt-4-vision-preview"
         self.model_embedding = "text-embedding-3-small"
+        self.model_summary = "gpt-4o-mini"
         self.model_image = "dall-e-3"
         self.max_tokens = 4000
         self.temperature = 0.7
@@ -69,6 +91,18 @@ class OpenAIIntegration:
         # Initialisation du client
         self._initialize_client()
 
+        # Réponses mutualisées entre élèves (niveaux exact et sémantique)
+        self.response_cache = SemanticResponseCache()
+
+        # Historique des sessions : fenêtre de jetons et résumé glissant
+        self.conversations = conversation_store
+        # Résumés en arrière-plan : pool recréé après un fork, une session à
+        # la fois
+        self._summary_pool: Optional[ThreadPoolExecutor] = None
+        self._summary_pool_pid: Optional[int] = None
+        self._summary_lock = threading.Lock()
+        self._summaries_in_flight: Set[str] = set()
+
         # Prompts système pour différents contextes
         self.system_prompts = {
             "tutoring": self._get_tutoring_prompt(),
@@ -77,13 +111,15 @@ class OpenAIIntegration:
             "motivation": self._get_motivation_prompt(),
             "document_generation": self._get_document_generation_prompt(),
             "quiz_generation": self._get_quiz_generation_prompt(),
+            "conversation_summary": self._get_summary_prompt(),
         }
 
     def _initialize_client(self):
         """Initialise le client OpenAI"""
         try:
             if self.api_key:
-                self.client = OpenAI(api_key=self.api_key, base_url=self.api_base)
+                # Client partagé : pool de connexions, concurrence bornée, retries
+                self.client = get_openai_client(self.api_key, self.api_base)
                 logger.info("Client OpenAI initialisé avec succès")
             else:
                 logger.warning("Clé API OpenAI non trouvée - Mode simulation activé")
@@ -309,6 +345,14 @@ FORMAT DE SORTIE:
 }
 ```"""
 
+    def _get_summary_prompt(self) -> str:
+        """Prompt système pour le résumé glissant des sessions"""
+        return """Tu résumes une séance de tutorat entre ARIA et un élève.
+Le résumé sert de mémoire à ARIA pour la suite de la séance : notions
+abordées, difficultés et erreurs de l'élève, exercices en cours, méthodes
+expliquées, engagements pris. Style télégraphique, en français, sans
+formule de politesse, sans inventer d'information."""
+
     async def chat_with_aria(
         self,
         message: str,
@@ -320,26 +364,33 @@ FORMAT DE SORTIE:
         if not self.client:
             return self._simulate_aria_response(message, context, student_profile)
 
-        try:
-            # Construction du prompt personnalisé
-            system_prompt = self._build_personalized_prompt(context, student_profile)
-
-            # Historique de conversation
-            messages = [{"role": "system", "content": system_prompt}]
-
-            # Ajout de l'historique
-            for msg in context.previous_messages[
-                -10:
-            ]:  # Garde les 10 derniers messages
-                messages.append(
-                    {"role": msg.get("role", "user"), "content": msg.get("content", "")}
-                )
+        self._attach_history(context)
+        lookup = self.response_cache.prepare(message, context, student_profile)
+        cached = self.response_cache.get_exact(lookup)
+        if cached is None:
+            if self.response_cache.needs_embedding(lookup):
+                try:
+                    self._set_cache_embedding(
+                        lookup,
+                        await self.client.embedding(
+                            tenant=context.student_id,
+                            operation="cache_embedding",
+                            model=self.model_embedding,
+                            input=lookup.normalized,
+                        ),
+                    )
+                except RuntimeError as e:
+                    logger.warning(f"Plongement indisponible pour le cache: {e}")
+            cached = self.response_cache.get_similar(lookup)
+        if cached is not None:
+            self._remember_turn(context, message, cached["response"])
+            return cached
 
-            # Message actuel
-            messages.append({"role": "user", "content": message})
+        try:
+            messages = self._build_chat_messages(message, context, student_profile)
 
             # Appel à l'API OpenAI
-            response = await self._make_openai_request(messages, context)
+            response = await self._make_openai_request(messages, context, "chat")
 
             # Traitement de la réponse
             aria_response = response.choices[0].message.content
@@ -347,7 +398,7 @@ FORMAT DE SORTIE:
             # Analyse de la réponse pour extraire des métadonnées
             metadata = self._analyze_response(aria_response, context)
 
-            return {
+            result = {
                 "response": aria_response,
                 "metadata": metadata,
                 "usage": {
@@ -358,11 +409,258 @@ FORMAT DE SORTIE:
                 "model": response.model,
                 "timestamp": datetime.now().isoformat(),
             }
+            self.response_cache.store(lookup, result)
+            self._remember_turn(context, message, aria_response)
+            return result
 
         except (RuntimeError, OSError, ValueError) as e:
             logger.error(f"Erreur lors de la conversation avec ARIA: {e}")
             return self._simulate_aria_response(message, context, student_profile)
 
+    def stream_chat_with_aria(
+        self,
+        message: str,
+        context: ConversationContext,
+        student_profile: StudentProfile,
+    ) -> Iterator[StreamEvent]:
+        """Conversation avec ARIA en flux : fragments puis métadonnées
+
+        Même prompt et mêmes paramètres que `chat_with_aria` ; l'événement
+        final porte les métadonnées de `_analyze_response` et l'usage. Le tour
+        est enregistré après l'envoi de `done` ; le résumé éventuel de
+        l'historique est calculé en arrière-plan.
+        """
+
+        if not self.client:
+            yield from simulated_stream(
+                self._simulate_aria_response(message, context, student_profile)
+            )
+            return
+
+        self._attach_history(context)
+        lookup = self.response_cache.prepare(message, context, student_profile)
+        cached = self.response_cache.get_exact(lookup)
+        if cached is None:
+            if self.response_cache.needs_embedding(lookup):
+                try:
+                    self._set_cache_embedding(
+                        lookup,
+                        self.client.embedding_sync(
+                            tenant=context.student_id,
+                            operation="cache_embedding",
+                            model=self.model_embedding,
+                            input=lookup.normalized,
+                        ),
+                    )
+                except RuntimeError as e:
+                    logger.warning(f"Plongement indisponible pour le cache: {e}")
+            cached = self.response_cache.get_similar(lookup)
+        if cached is not None:
+            yield from simulated_stream(cached)
+            self._remember_turn(context, message, cached["response"])
+            return
+
+        messages = self._build_chat_messages(message, context, student_profile)
+        parts: List[str] = []
+        usage = None
+        model = self.model_chat
+        try:
+            for chunk in self.client.stream_chat_completion_sync(
+                tenant=context.student_id,
+                operation="chat",
+                messages=messages,
+                **self._completion_params(context),
+            ):
+                model = chunk.model or model
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content = chunk.choices[0].delta.content
+                    parts.append(content)
+                    yield TOKEN, {"content": content}
+        except (RuntimeError, OSError, ValueError) as e:
+            logger.error(f"Erreur lors du flux de conversation avec ARIA: {e}")
+            if not parts:
+                # Rien n'a été transmis : bascule sur la réponse simulée
+                yield from simulated_stream(
+                    self._simulate_aria_response(message, context, student_profile)
+                )
+            else:
+                yield ERROR, {"message": "Flux interrompu"}
+            return
+
+        aria_response = "".join(parts)
+        result = {
+            "response": aria_response,
+            "metadata": self._analyze_response(aria_response, context),
+            "usage": {
+                "prompt_tokens": usage.prompt_tokens if usage else 0,
+                "completion_tokens": usage.completion_tokens if usage else 0,
+                "total_tokens": usage.total_tokens if usage else 0,
+            },
+            "model": model,
+            "timestamp": datetime.now().isoformat(),
+        }
+        self.response_cache.store(lookup, result)
+        yield DONE, {key: value for key, value in result.items() if key != "response"}
+        self._remember_turn(context, message, aria_response)
+
+    # ----- Historique des sessions -----
+
+    def _attach_history(self, context: ConversationContext):
+        """Charge résumé et fenêtre récente de la session si le client n'envoie
+        pas lui-même l'historique (`previous_messages`)"""
+        if context.previous_messages or context.summary:
+            return
+        window = self.conversations.load_window(context.session_id, context.owner_id)
+        if window is not None:
+            context.summary = window.summary
+            context.previous_messages = window.messages
+
+    def _turn_to_store(self, context: ConversationContext, message: str, reply: str):
+        """Ajoute le tour au journal ; retourne le lot à résumer, le cas échéant"""
+        appended = self.conversations.append(
+            context.session_id,
+            context.student_id,
+            [
+                {"role": "user", "content": message},
+                {"role": "assistant", "content": reply},
+            ],
+            {
+                "subject": context.subject,
+                "topic": context.topic,
+                "conversation_type": context.conversation_type,
+            },
+            owner_id=context.owner_id,
+        )
+        if not appended:
+            return None
+        return self.conversations.compaction_task(context.session_id)
+
+    def _remember_turn(self, context: ConversationContext, message: str, reply: str):
+        """Enregistre le tour ; le résumé éventuel est calculé en arrière-plan
+
+        La réponse n'attend pas l'appel au modèle de résumé. Une seule
+        compaction par session est en cours dans le processus ; une compaction
+        concurrente d'un autre worker est écartée par `apply_summary`.
+        """
+        task = self._turn_to_store(context, message, reply)
+        if task is None or not has_app_context():
+            return
+        with self._summary_lock:
+            if task.session_id in self._summaries_in_flight:
+                return
+            self._summaries_in_flight.add(task.session_id)
+            pool = self._summary_executor()
+        pool.submit(
+            self._compact,
+            current_app._get_current_object(),  # pylint: disable=protected-access
+            task,
+            context.student_id,
+        )
+
+    def _summary_executor(self) -> ThreadPoolExecutor:
+        """Pool des résumés (appelé sous `_summary_lock`)"""
+        if self._summary_pool_pid != os.getpid():
+            # Après un fork, les threads du pool hérité n'existent plus
+            self._summary_pool = ThreadPoolExecutor(
+                max_workers=SUMMARY_WORKERS, thread_name_prefix="aria-summary"
+            )
+            self._summary_pool_pid = os.getpid()
+            self._summaries_in_flight = set()
+        return self._summary_pool
+
+    def _compact(self, app, task: CompactionTask, tenant: str):
+        """Résume un lot de messages et enregistre le résumé (thread du pool)"""
+        try:
+            with app.app_context():
+                try:
+                    response = self.client.chat_completion_sync(
+                        tenant=tenant, **self._summary_params(task)
+                    )
+                    summary = response.choices[0].message.content
+                except RuntimeError as e:
+                    logger.warning(
+                        f"Résumé de conversation par le modèle indisponible: {e}"
+                    )
+                    summary = self._fallback_summary(task)
+                self.conversations.apply_summary(task, summary)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(f"Échec du résumé de la session {task.session_id}")
+        finally:
+            with self._summary_lock:
+                self._summaries_in_flight.discard(task.session_id)
+
+    def _summary_params(self, task: CompactionTask) -> Dict[str, Any]:
+        """Requête de résumé : ancien résumé + tours sortis de la fenêtre"""
+        transcript = "\n".join(
+            f"{'Élève' if msg['role'] == 'user' else 'ARIA'} : {msg['content']}"
+            for msg in task.messages
+        )
+        prompt = f"""
+RÉSUMÉ ACTUEL:
+{task.previous_summary or 'Aucun'}
+
+NOUVEAUX ÉCHANGES:
+{transcript}
+
+Mets à jour le résumé en intégrant les nouveaux échanges.
+"""
+        return {
+            "operation": "conversation_summary",
+            "model": self.model_summary,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": self.system_prompts["conversation_summary"],
+                },
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": 0.2,
+            "max_tokens": self.conversations.summary_max_tokens,
+        }
+
+    def _fallback_summary(self, task: CompactionTask) -> str:
+        return fallback_summary(
+            task.previous_summary, task.messages, self.conversations.summary_max_tokens
+        )
+
+    def _set_cache_embedding(self, lookup: CacheLookup, response: Any):
+        """Associe à la demande le plongement de son message normalisé"""
+        self.response_cache.record_embedding_usage(response)
+        lookup.embedding = normalized_embedding(response.data[0].embedding)
+
+    def _build_chat_messages(
+        self,
+        message: str,
+        context: ConversationContext,
+        student_profile: StudentProfile,
+    ) -> List[Dict]:
+        """Prompt système personnalisé, historique récent et message actuel"""
+
+        # Construction du prompt personnalisé
+        system_prompt = self._build_personalized_prompt(context, student_profile)
+
+        # Historique de conversation
+        messages = [{"role": "system", "content": system_prompt}]
+
+        # Résumé des tours anciens, puis fenêtre récente bornée en jetons
+        if context.summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": f"Résumé des échanges précédents:\n{context.summary}",
+                }
+            )
+        window, _tokens = trim_to_budget(
+            context.previous_messages, self.conversations.history_budget
+        )
+        messages.extend(window)
+
+        # Message actuel
+        messages.append({"role": "user", "content": message})
+        return messages
+
     def _build_personalized_prompt(
         self, context: ConversationContext, student_profile: StudentProfile
     ) -> str:
@@ -394,26 +692,30 @@ CONTEXTE DE LA SESSION:
 
         return base_prompt + "\n" + personalization
 
+    def _completion_params(self, context: ConversationContext) -> Dict[str, Any]:
+        """Paramètres adaptatifs selon le contexte"""
+        return {
+            "model": self.model_chat,
+            "temperature": 0.3 if context.conversation_type == "evaluation" else 0.7,
+            "max_tokens": (
+                2000
+                if context.time_limit and context.time_limit < 30
+                else self.max_tokens
+            ),
+            "top_p": 0.9,
+            "frequency_penalty": 0.1,
+            "presence_penalty": 0.1,
+        }
+
     async def _make_openai_request(
-        self, messages: List[Dict], context: ConversationContext
+        self, messages: List[Dict], context: ConversationContext, operation: str
     ) -> Any:
-        """Effectue la requête vers l'API OpenAI"""
-
-        # Paramètres adaptatifs selon le contexte
-        temperature = 0.3 if context.conversation_type == "evaluation" else 0.7
-        max_tokens = (
-            2000 if context.time_limit and context.time_limit < 30 else self.max_tokens
-        )
-
-        return await asyncio.to_thread(
-            self.client.chat.completions.create,
-            model=self.model_chat,
+        """Effectue la requête vers l'API OpenAI (`operation` : type comptabilisé)"""
+        return await self.client.chat_completion(
+            tenant=context.student_id,
+            operation=operation,
             messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            top_p=0.9,
-            frequency_penalty=0.1,
-            presence_penalty=0.1,
+            **self._completion_params(context),
         )
 
     def _analyze_response(
@@ -530,6 +832,7 @@ CONTEXTE DE LA SESSION:
                     topic=topic,
                     conversation_type="document_generation",
                 ),
+                "document_generation",
             )
 
             document_content = response.choices[0].message.content
@@ -701,6 +1004,7 @@ Format de sortie JSON requis avec questions variées (QCM, Vrai/Faux, réponses
                     difficulty_level=difficulty,
                     conversation_type="evaluation",
                 ),
+                "quiz_generation",
             )
 
             quiz_content = response.choices[0].message.content
@@ -834,8 +1138,8 @@ suitable for French high school students, clean background,
 high contrast, pedagogical diagram
 """
 
-            response = await asyncio.to_thread(
-                self.client.images.generate,
+            response = await self.client.image_generation(
+                operation="image_generation",
                 model=self.model_image,
                 prompt=educational_prompt,
                 size=size,
@@ -925,6 +1229,7 @@ Sois bienveillant mais rigoureux dans ton analyse.
                     subject=subject,
                     conversation_type="evaluation",
                 ),
+                "work_analysis",
             )
 
             analysis = response.choices[0].message.content
@@ -1001,21 +1306,44 @@ Continuez vos efforts, vous êtes sur la bonne voie ! 🎯
             },
         }
 
-    def get_usage_statistics(self) -> Dict[str, Any]:
-        """Retourne les statistiques d'utilisation de l'API"""
-        # En production, ces données seraient stockées en base
+    def get_usage_statistics(self, days: int = DEFAULT_SUMMARY_DAYS) -> Dict[str, Any]:
+        """Statistiques d'utilisation de l'API sur les `days` derniers jours
+
+        Lues dans les agrégats journaliers (services/ai_usage.py) ; les appels
+        encore dans le tampon du processus apparaissent dans `pending_events`.
+        """
+        summary = get_usage_summary(days)
+        requests = summary["requests"]
         return {
-            "total_requests": 0,
-            "total_tokens": 0,
+            "total_requests": requests,
+            "total_tokens": summary["total_tokens"],
+            "prompt_tokens": summary["prompt_tokens"],
+            "completion_tokens": summary["completion_tokens"],
             "requests_by_type": {
-                "chat": 0,
-                "document_generation": 0,
-                "quiz_generation": 0,
-                "image_generation": 0,
-                "work_analysis": 0,
+                request_type: totals["requests"]
+                for request_type, totals in summary["by_type"].items()
             },
-            "average_response_time": 0,
-            "success_rate": 100,
+            "average_response_time": round(summary["average_latency_ms"] / 1000, 3),
+            "p95_response_time": (
+                summary["p95_latency_ms"] / 1000
+                if summary["p95_latency_ms"] is not None
+                else None
+            ),
+            "success_rate": (
+                round(100 * (requests - summary["errors"]) / requests, 2)
+                if requests
+                else 100
+            ),
+            "estimated_cost_usd": summary["cost_usd"],
+            "by_model": summary["by_model"],
+            "by_type": summary["by_type"],
+            "by_day": summary["by_day"],
+            "period_start": summary["since"],
+            "pending_events": summary["pending_events"],
+            # Taux de hit et jetons économisés par le cache des réponses
+            "response_cache": self.response_cache.get_stats(),
+            # Fenêtres d'historique chargées et résumés produits (ce processus)
+            "conversation_history": self.conversations.get_stats(),
             "last_updated": datetime.now().isoformat(),
         }
 
@@ -1025,8 +1353,8 @@ openai_service = OpenAIIntegration()
 
 
 # Fonctions utilitaires pour l'utilisation dans l'application
-async def chat_with_aria(message: str, student_id: str, context: Dict = None) -> Dict:
-    """Interface simplifiée pour le chat avec ARIA"""
+def _default_conversation(student_id: str, context: Dict = None):
+    """Profil et contexte par défaut des interfaces simplifiées de chat"""
 
     # Profil étudiant par défaut (à remplacer par une vraie base de données)
     default_profile = StudentProfile(
@@ -1038,26 +1366,40 @@ async def chat_with_aria(message: str, student_id: str, context: Dict = None) ->
         strengths=["logique", "analyse"],
         weaknesses=["calcul mental", "gestion du temps"],
         goals=["réussir le bac", "intégrer une CPGE"],
+        preferred_difficulty="adaptive",
     )
 
     # Contexte par défaut
     default_context = ConversationContext(
         student_id=student_id,
-        session_id=(
-            context.get("session_id", f"session_{datetime.now().timestamp()}")
-            if context
-            else f"session_{datetime.now().timestamp()}"
-        ),
+        session_id=(context.get("session_id") if context else None) or new_session_id(),
         subject=context.get("subject", "général") if context else "général",
         topic=context.get("topic") if context else None,
         conversation_type=context.get("type", "tutoring") if context else "tutoring",
+        previous_messages=context.get("previous_messages") if context else None,
+        owner_id=context.get("owner_id") if context else None,
     )
+    return default_context, default_profile
+
 
+async def chat_with_aria(message: str, student_id: str, context: Dict = None) -> Dict:
+    """Interface simplifiée pour le chat avec ARIA"""
+    default_context, default_profile = _default_conversation(student_id, context)
     return await openai_service.chat_with_aria(
         message, default_context, default_profile
     )
 
 
+def stream_chat_with_aria(
+    message: str, student_id: str, context: Dict = None
+) -> Iterator[StreamEvent]:
+    """Interface simplifiée pour le chat avec ARIA en flux"""
+    default_context, default_profile = _default_conversation(student_id, context)
+    return openai_service.stream_chat_with_aria(
+        message, default_context, default_profile
+    )
+
+
 async def generate_personalized_document(
     document_type: str, subject: str, topic: str, student_id: str
 ) -> Dict:
@@ -1,352 +1,550 @@
-from datetime import date, datetime, timedelta
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
 
-from src.models.formulas import (
+import numpy as np
+from sqlalchemy import case, func
+from sqlalchemy.orm import joinedload
+
+from database import db
+from models.formulas import (
     Enrollment,
     Group,
     GroupSession,
     IndividualSession,
     StudentObjective,
-    Teacher,
 )
-from src.models.student import Assessment, Student
+from models.student import Student
+from models.user import ParentChildRelation
+
+from .progress_analytics import (
+    ScoreSeries,
+    confidence_score,
+    fetch_scores,
+    monthly_subject_means,
+    subject_best_scores,
+)
+
+# Fenêtres d'historique utilisées par les panneaux
+NOTIFICATION_WINDOW_DAYS = 7
+CONFIDENCE_WINDOW_DAYS = 90
+DEFAULT_CHART_MONTHS = 5
+
+
+@dataclass
+class StudentDashboardContext:
+    """Données d'un étudiant chargées une fois et partagées par les panneaux"""
+
+    student: Student
+    enrollment: Optional[Enrollment] = None
+    # Notes des évaluations, en colonnes (voir progress_analytics)
+    scores: ScoreSeries = field(default_factory=ScoreSeries.empty)
+    # Séances individuelles récentes (notifications, mois en cours) et à venir
+    individual_sessions: List[IndividualSession] = field(default_factory=list)
+    # Séances du groupe de l'inscription active, depuis le début du mois
+    group_sessions: List[GroupSession] = field(default_factory=list)
+    objectives: List[StudentObjective] = field(default_factory=list)
+    # Comptes sur tout l'historique des séances individuelles
+    total_individual_sessions: int = 0
+    completed_individual_sessions: int = 0
+    now: datetime = field(default_factory=datetime.utcnow)
+
+
+def _teacher_name(teacher) -> str:
+    return f"{teacher.first_name} {teacher.last_name}" if teacher else "Non assigné"
 
 
 class ParentDashboardService:
-    """Service pour générer les données du tableau de bord parent"""
+    """Service pour générer les données du tableau de bord parent
+
+    `build_snapshot` / `build_snapshots` chargent en quelques requêtes
+    groupées (une par table, quel que soit le nombre d'enfants) les données
+    de chaque étudiant dans un `StudentDashboardContext`, dont tous les
+    panneaux sont ensuite dérivés sans nouvel accès à la base. Les méthodes
+    `get_*` individuelles restent disponibles et passent par le même
+    chargement pour un seul étudiant.
+    """
 
     def __init__(self):
         pass
 
-    def get_student_overview(self, student_id):
-        """Récupérer la vue d'ensemble d'un étudiant"""
+    # ----- Chargement groupé -----
+
+    def load_contexts(
+        self, student_ids: Iterable[int]
+    ) -> Dict[int, StudentDashboardContext]:
+        """Charge les données de plusieurs étudiants en une passe"""
+        student_ids = list(dict.fromkeys(student_ids))
+        if not student_ids:
+            return {}
+
+        now = datetime.utcnow()
+        students = Student.query.filter(Student.id.in_(student_ids)).all()
+        contexts = {
+            student.id: StudentDashboardContext(student=student, now=now)
+            for student in students
+        }
+        if not contexts:
+            return {}
+        ids = list(contexts)
+
+        enrollments = (
+            Enrollment.query.options(
+                joinedload(Enrollment.formula),
+                joinedload(Enrollment.group).joinedload(Group.teacher),
+            )
+            .filter(Enrollment.student_id.in_(ids), Enrollment.is_active.is_(True))
+            .order_by(Enrollment.id)
+            .all()
+        )
+        for enrollment in enrollments:
+            context = contexts[enrollment.student_id]
+            if context.enrollment is None:
+                context.enrollment = enrollment
+
+        for student_id, scores in fetch_scores(ids).split_by_student().items():
+            contexts[student_id].scores = scores
+
+        for objective in StudentObjective.query.filter(
+            StudentObjective.student_id.in_(ids)
+        ).all():
+            contexts[objective.student_id].objectives.append(objective)
+
+        # Séances individuelles : comptes globaux agrégés en base...
+        counts = (
+            db.session.query(
+                IndividualSession.student_id,
+                func.count(IndividualSession.id),
+                func.sum(case((IndividualSession.status == "completed", 1), else_=0)),
+            )
+            .filter(IndividualSession.student_id.in_(ids))
+            .group_by(IndividualSession.student_id)
+            .all()
+        )
+        for student_id, total, completed in counts:
+            contexts[student_id].total_individual_sessions = total
+            contexts[student_id].completed_individual_sessions = int(completed or 0)
+
+        # ... et seules les séances utiles aux panneaux sont chargées
+        month_start = datetime.combine(now.date().replace(day=1), datetime.min.time())
+        window_start = min(month_start, now - timedelta(days=NOTIFICATION_WINDOW_DAYS))
+        for session in (
+            IndividualSession.query.options(joinedload(IndividualSession.teacher))
+            .filter(
+                IndividualSession.student_id.in_(ids),
+                IndividualSession.scheduled_at >= window_start,
+            )
+            .order_by(IndividualSession.scheduled_at)
+            .all()
+        ):
+            contexts[session.student_id].individual_sessions.append(session)
+
+        contexts_by_group: Dict[int, List[StudentDashboardContext]] = {}
+        for context in contexts.values():
+            if context.enrollment and context.enrollment.group_id:
+                contexts_by_group.setdefault(context.enrollment.group_id, []).append(
+                    context
+                )
+        if contexts_by_group:
+            for session in (
+                GroupSession.query.filter(
+                    GroupSession.group_id.in_(list(contexts_by_group)),
+                    GroupSession.scheduled_at >= month_start,
+                )
+                .order_by(GroupSession.scheduled_at)
+                .all()
+            ):
+                for context in contexts_by_group[session.group_id]:
+                    context.group_sessions.append(session)
+
+        return contexts
+
+    def load_context(self, student_id) -> Optional[StudentDashboardContext]:
+        """Charge les données d'un seul étudiant"""
+        return self.load_contexts([student_id]).get(student_id)
+
+    def get_children_ids(self, parent_user_id) -> List[int]:
+        """IDs des fiches étudiant des enfants d'un parent"""
+        rows = (
+            db.session.query(Student.id)
+            .join(
+                ParentChildRelation,
+                ParentChildRelation.child_user_id == Student.user_id,
+            )
+            .filter(ParentChildRelation.parent_user_id == parent_user_id)
+            .order_by(Student.id)
+            .all()
+        )
+        return [row[0] for row in rows]
+
+    # ----- Instantanés -----
+
+    def build_snapshot_from_context(self, context: StudentDashboardContext):
+        """Tous les panneaux du tableau de bord d'un étudiant"""
+        objectives = self._safe(
+            self._objectives_progress,
+            context,
+            "get_objectives_progress",
+            self._empty_objectives(),
+        )
+        return {
+            "overview": self._safe(
+                self._student_overview, context, "get_student_overview"
+            ),
+            "next_session": self._safe(self._next_session, context, "get_next_session"),
+            "monthly_stats": self._safe(
+                self._monthly_stats,
+                context,
+                "get_monthly_stats",
+                self._empty_monthly_stats(),
+            ),
+            "objectives": objectives,
+            "learning_style": self._safe(
+                self._learning_style_analysis, context, "get_learning_style_analysis"
+            ),
+            "subject_progress": self._safe(
+                self._subject_progress, context, "get_subject_progress", []
+            ),
+            "notifications": self._safe(
+                self._recent_notifications, context, "get_recent_notifications", []
+            ),
+            "progress_chart": self._safe(
+                self._progress_chart_data,
+                context,
+                "get_progress_chart_data",
+                self._default_chart_data(),
+            ),
+            "aria_confidence": self._safe(
+                lambda ctx: self._aria_confidence(ctx, objectives),
+                context,
+                "calculate_aria_confidence",
+                94,
+            ),
+        }
+
+    def build_snapshots(self, student_ids: Iterable[int]) -> Dict[int, dict]:
+        """Instantanés de plusieurs étudiants, chargés en une passe groupée"""
+        return {
+            student_id: self.build_snapshot_from_context(context)
+            for student_id, context in self.load_contexts(student_ids).items()
+        }
+
+    def build_snapshot(self, student_id) -> Optional[dict]:
+        """Instantané du tableau de bord d'un étudiant"""
+        return self.build_snapshots([student_id]).get(student_id)
+
+    def build_parent_snapshot(self, parent_user_id) -> Dict[int, dict]:
+        """Instantanés de tous les enfants d'un parent"""
+        return self.build_snapshots(self.get_children_ids(parent_user_id))
+
+    @staticmethod
+    def _safe(panel, context, name, default=None):
         try:
-            student = Student.query.get(student_id)
-            if not student:
-                return None
-
-            # Inscription active
-            enrollment = Enrollment.query.filter_by(
-                student_id=student_id, is_active=True
-            ).first()
-
-            # Informations de base
-            overview = {
-                "student": {
-                    "id": student.id,
-                    "name": f"{student.first_name} {student.last_name}",
-                    "grade": student.grade_level,
-                    "school": student.school,
-                    "formula": (
-                        enrollment.formula.name
-                        if enrollment and enrollment.formula
-                        else None
-                    ),
-                    "formula_type": (
-                        enrollment.formula.type.value
-                        if enrollment and enrollment.formula
-                        else None
-                    ),
-                },
-                "enrollment": (
-                    {
-                        "start_date": (
-                            enrollment.start_date.isoformat() if enrollment else None
-                        ),
-                        "formula_level": (
-                            enrollment.formula.level.value
-                            if enrollment and enrollment.formula
-                            else None
-                        ),
-                        "group_name": (
-                            enrollment.group.name
-                            if enrollment and enrollment.group
-                            else None
-                        ),
-                    }
-                    if enrollment
-                    else None
-                ),
-            }
-
-            return overview
+            return panel(context)
         except (RuntimeError, OSError, ValueError) as e:
-            print(f"Erreur dans get_student_overview: {e}")
-            return None
+            print(f"Erreur dans {name}: {e}")
+            return default
 
-    def get_next_session(self, student_id):
-        """Récupérer la prochaine séance de l'étudiant"""
+    def _with_context(self, student_id, panel, name, default=None):
+        """Calcule un panneau isolé (API historique, un étudiant)"""
         try:
-            enrollment = Enrollment.query.filter_by(
-                student_id=student_id, is_active=True
-            ).first()
-            if not enrollment:
-                return None
-
-            next_session = None
-
-            if enrollment.group_id:
-                # Séance de groupe
-                next_group_session = (
-                    GroupSession.query.filter(
-                        GroupSession.group_id == enrollment.group_id,
-                        GroupSession.scheduled_at > datetime.utcnow(),
-                        GroupSession.status == "scheduled",
-                    )
-                    .order_by(GroupSession.scheduled_at.asc())
-                    .first()
-                )
+            context = self.load_context(student_id)
+        except (RuntimeError, OSError, ValueError) as e:
+            print(f"Erreur dans {name}: {e}")
+            return default
+        if context is None:
+            return default
+        return self._safe(panel, context, name, default)
 
-                if next_group_session:
-                    group = Group.query.get(enrollment.group_id)
-                    teacher = Teacher.query.get(group.teacher_id) if group else None
-                    next_session = {
-                        "type": "group",
-                        "date": next_group_session.scheduled_at.date().isoformat(),
-                        "time": next_group_session.scheduled_at.time().strftime(
-                            "%H:%M"
-                        ),
-                        "subject": next_group_session.subject,
-                        "teacher": (
-                            f"{teacher.first_name} {teacher.last_name}"
-                            if teacher
-                            else "Non assigné"
-                        ),
-                        "group_name": group.name if group else None,
-                    }
-            else:
-                # Séance individuelle
-                next_individual_session = (
-                    IndividualSession.query.filter(
-                        IndividualSession.student_id == student_id,
-                        IndividualSession.scheduled_at > datetime.utcnow(),
-                        IndividualSession.status == "scheduled",
-                    )
-                    .order_by(IndividualSession.scheduled_at.asc())
-                    .first()
-                )
+    # ----- API par panneau -----
 
-                if next_individual_session:
-                    teacher = Teacher.query.get(next_individual_session.teacher_id)
-                    next_session = {
-                        "type": "individual",
-                        "date": next_individual_session.scheduled_at.date().isoformat(),
-                        "time": next_individual_session.scheduled_at.time().strftime(
-                            "%H:%M"
-                        ),
-                        "subject": next_individual_session.subject,
-                        "teacher": (
-                            f"{teacher.first_name} {teacher.last_name}"
-                            if teacher
-                            else "Non assigné"
-                        ),
-                    }
+    def get_student_overview(self, student_id):
+        """Récupérer la vue d'ensemble d'un étudiant"""
+        return self._with_context(
+            student_id, self._student_overview, "get_student_overview"
+        )
 
-            return next_session
-        except (RuntimeError, OSError, ValueError) as e:
-            print(f"Erreur dans get_next_session: {e}")
-            return None
+    def get_next_session(self, student_id):
+        """Récupérer la prochaine séance de l'étudiant"""
+        return self._with_context(student_id, self._next_session, "get_next_session")
 
     def get_monthly_stats(self, student_id):
         """Récupérer les statistiques du mois"""
-        try:
-            current_month_start = date.today().replace(day=1)
-            enrollment = Enrollment.query.filter_by(
-                student_id=student_id, is_active=True
-            ).first()
-
-            stats = {
-                "sessions_this_month": 0,
-                "individual_sessions": 0,
-                "group_sessions": 0,
-                "total_hours": 0,
-            }
-
-            if enrollment:
-                if enrollment.group_id:
-                    # Séances de groupe
-                    group_sessions = GroupSession.query.filter(
-                        GroupSession.group_id == enrollment.group_id,
-                        GroupSession.scheduled_at >= current_month_start,
-                        GroupSession.status == "completed",
-                    ).all()
-
-                    stats["group_sessions"] = len(group_sessions)
-                    stats["sessions_this_month"] += len(group_sessions)
-                    stats["total_hours"] += (
-                        sum(s.duration_minutes for s in group_sessions) / 60
-                    )
-
-                if enrollment.teacher_id:
-                    # Séances individuelles
-                    individual_sessions = IndividualSession.query.filter(
-                        IndividualSession.student_id == student_id,
-                        IndividualSession.scheduled_at >= current_month_start,
-                        IndividualSession.status == "completed",
-                    ).all()
-
-                    stats["individual_sessions"] = len(individual_sessions)
-                    stats["sessions_this_month"] += len(individual_sessions)
-                    stats["total_hours"] += (
-                        sum(s.duration_minutes for s in individual_sessions) / 60
-                    )
-
-            return stats
-        except (RuntimeError, OSError, ValueError) as e:
-            print(f"Erreur dans get_monthly_stats: {e}")
-            return {
-                "sessions_this_month": 0,
-                "individual_sessions": 0,
-                "group_sessions": 0,
-                "total_hours": 0,
-            }
+        return self._with_context(
+            student_id,
+            self._monthly_stats,
+            "get_monthly_stats",
+            self._empty_monthly_stats(),
+        )
 
     def get_objectives_progress(self, student_id):
         """Récupérer la progression des objectifs"""
-        try:
-            total_objectives = StudentObjective.query.filter_by(
-                student_id=student_id
-            ).count()
-            achieved_objectives = StudentObjective.query.filter_by(
-                student_id=student_id, is_achieved=True
-            ).count()
-
-            # Objectifs en cours
-            current_objectives = (
-                StudentObjective.query.filter_by(
-                    student_id=student_id, is_achieved=False
-                )
-                .filter(StudentObjective.target_date >= date.today())
-                .all()
-            )
-
-            return {
-                "total_objectives": total_objectives,
-                "achieved_objectives": achieved_objectives,
-                "current_objectives": len(current_objectives),
-                "achievement_rate": (
-                    (achieved_objectives / total_objectives * 100)
-                    if total_objectives > 0
-                    else 0
-                ),
-            }
-        except (RuntimeError, OSError, ValueError) as e:
-            print(f"Erreur dans get_objectives_progress: {e}")
-            return {
-                "total_objectives": 0,
-                "achieved_objectives": 0,
-                "current_objectives": 0,
-                "achievement_rate": 0,
-            }
+        return self._with_context(
+            student_id,
+            self._objectives_progress,
+            "get_objectives_progress",
+            self._empty_objectives(),
+        )
 
     def get_learning_style_analysis(self, student_id):
         """Récupérer l'analyse du style d'apprentissage"""
-        try:
-            student = Student.query.get(student_id)
-            if not student or not student.learning_profile:
-                # Données par défaut si pas de profil
-                return {
-                    "dominant_style": "Visuel",
-                    "confidence": 85,
-                    "styles": [
-                        {"style": "Visuel", "score": 85},
-                        {"style": "Auditi", "score": 60},
-                        {"style": "Kinesthésique", "score": 45},
-                        {"style": "Lecture/Écriture", "score": 75},
-                    ],
-                    "recommendations": [
-                        "Utiliser des diagrammes pour les concepts complexes",
-                        "Privilégier les couleurs pour organiser l'information",
-                        "Créer des cartes mentales pour les révisions",
-                        "Utiliser des vidéos explicatives",
-                    ],
-                }
+        return self._with_context(
+            student_id, self._learning_style_analysis, "get_learning_style_analysis"
+        )
 
-            # Analyser le profil d'apprentissage existant
-            profile = student.learning_profile
-            styles = profile.get("learning_styles", {})
+    def get_subject_progress(self, student_id):
+        """Récupérer la progression par matière"""
+        return self._with_context(
+            student_id, self._subject_progress, "get_subject_progress", []
+        )
+
+    def get_recent_notifications(self, student_id, limit=5):
+        """Récupérer les notifications récentes"""
+        return self._with_context(
+            student_id,
+            lambda ctx: self._recent_notifications(ctx, limit),
+            "get_recent_notifications",
+            [],
+        )
+
+    def get_progress_chart_data(self, student_id, months=DEFAULT_CHART_MONTHS):
+        """Récupérer les données pour le graphique de progression"""
+        return self._with_context(
+            student_id,
+            lambda ctx: self._progress_chart_data(ctx, months),
+            "get_progress_chart_data",
+            self._default_chart_data(),
+        )
+
+    def calculate_aria_confidence(self, student_id):
+        """Calculer la confiance ARIA pour les prédictions"""
+        return self._with_context(
+            student_id,
+            lambda ctx: self._aria_confidence(ctx, self._objectives_progress(ctx)),
+            "calculate_aria_confidence",
+            94,  # Valeur par défaut
+        )
+
+    # ----- Panneaux (sans accès à la base) -----
+
+    def _student_overview(self, context: StudentDashboardContext):
+        student = context.student
+        enrollment = context.enrollment
+        formula = enrollment.formula if enrollment else None
+
+        return {
+            "student": {
+                "id": student.id,
+                "name": student.full_name,
+                "grade": student.grade_level,
+                "school": student.school,
+                "formula": formula.name if formula else None,
+                "formula_type": formula.type.value if formula else None,
+            },
+            "enrollment": (
+                {
+                    "start_date": enrollment.start_date.isoformat(),
+                    "formula_level": formula.level.value if formula else None,
+                    "group_name": enrollment.group.name if enrollment.group else None,
+                }
+                if enrollment
+                else None
+            ),
+        }
+
+    def _next_session(self, context: StudentDashboardContext):
+        enrollment = context.enrollment
+        if not enrollment:
+            return None
 
-            # Trouver le style dominant
-            dominant_style = (
-                max(styles.items(), key=lambda x: x[1]) if styles else ("Visuel", 85)
+        if enrollment.group_id:
+            # Séance de groupe
+            next_group_session = next(
+                (
+                    session
+                    for session in context.group_sessions
+                    if session.scheduled_at > context.now
+                    and session.status == "scheduled"
+                ),
+                None,
             )
+            if not next_group_session:
+                return None
 
+            group = enrollment.group
             return {
-                "dominant_style": dominant_style[0],
-                "confidence": dominant_style[1],
-                "styles": [{"style": k, "score": v} for k, v in styles.items()],
-                "recommendations": profile.get("recommendations", []),
+                "type": "group",
+                "date": next_group_session.scheduled_at.date().isoformat(),
+                "time": next_group_session.scheduled_at.time().strftime("%H:%M"),
+                "subject": next_group_session.subject,
+                "teacher": _teacher_name(group.teacher if group else None),
+                "group_name": group.name if group else None,
             }
-        except (RuntimeError, OSError, ValueError) as e:
-            print(f"Erreur dans get_learning_style_analysis: {e}")
+
+        # Séance individuelle
+        next_individual_session = next(
+            (
+                session
+                for session in context.individual_sessions
+                if session.scheduled_at > context.now and session.status == "scheduled"
+            ),
+            None,
+        )
+        if not next_individual_session:
             return None
 
-    def get_subject_progress(self, student_id):
-        """Récupérer la progression par matière"""
-        try:
-            # Récupérer les évaluations récentes par matière
-            assessments = Assessment.query.filter_by(student_id=student_id).all()
-
-            subjects_progress = {}
-
-            for assessment in assessments:
-                subject = assessment.subject
-                if subject not in subjects_progress:
-                    subjects_progress[subject] = {
-                        "subject": subject,
-                        "current_grade": 0,
-                        "progress_percentage": 0,
-                        "recent_topics": [],
-                        "status": "En cours",
-                    }
+        return {
+            "type": "individual",
+            "date": next_individual_session.scheduled_at.date().isoformat(),
+            "time": next_individual_session.scheduled_at.time().strftime("%H:%M"),
+            "subject": next_individual_session.subject,
+            "teacher": _teacher_name(next_individual_session.teacher),
+        }
+
+    @staticmethod
+    def _empty_monthly_stats():
+        return {
+            "sessions_this_month": 0,
+            "individual_sessions": 0,
+            "group_sessions": 0,
+            "total_hours": 0,
+        }
+
+    def _monthly_stats(self, context: StudentDashboardContext):
+        current_month_start = datetime.combine(
+            context.now.date().replace(day=1), datetime.min.time()
+        )
+        enrollment = context.enrollment
+        stats = self._empty_monthly_stats()
+        if not enrollment:
+            return stats
 
-                # Mettre à jour avec la note la plus récente
-                if assessment.score > subjects_progress[subject]["current_grade"]:
-                    subjects_progress[subject]["current_grade"] = assessment.score
-                    subjects_progress[subject]["progress_percentage"] = min(
-                        assessment.score * 5, 100
-                    )
-
-                # Ajouter les sujets récents
-                if (
-                    assessment.topic
-                    and assessment.topic
-                    not in subjects_progress[subject]["recent_topics"]
-                ):
-                    subjects_progress[subject]["recent_topics"].append(assessment.topic)
+        def completed_this_month(sessions):
+            return [
+                session
+                for session in sessions
+                if session.scheduled_at >= current_month_start
+                and session.status == "completed"
+            ]
 
-            # Déterminer le statut basé sur la note
-            for subject_data in subjects_progress.values():
-                grade = subject_data["current_grade"]
-                if grade >= 16:
-                    subject_data["status"] = "Maîtrisé"
-                elif grade >= 12:
-                    subject_data["status"] = "En cours"
-                else:
-                    subject_data["status"] = "À revoir"
-
-            return list(subjects_progress.values())
-        except (RuntimeError, OSError, ValueError) as e:
-            print(f"Erreur dans get_subject_progress: {e}")
-            return []
+        if enrollment.group_id:
+            # Séances de groupe
+            group_sessions = completed_this_month(context.group_sessions)
+            stats["group_sessions"] = len(group_sessions)
+            stats["sessions_this_month"] += len(group_sessions)
+            stats["total_hours"] += sum(s.duration_minutes for s in group_sessions) / 60
+
+        if enrollment.teacher_id:
+            # Séances individuelles
+            individual_sessions = completed_this_month(context.individual_sessions)
+            stats["individual_sessions"] = len(individual_sessions)
+            stats["sessions_this_month"] += len(individual_sessions)
+            stats["total_hours"] += (
+                sum(s.duration_minutes for s in individual_sessions) / 60
+            )
 
-    def get_recent_notifications(self, student_id, limit=5):
-        """Récupérer les notifications récentes"""
-        try:
-            notifications = []
+        return stats
+
+    @staticmethod
+    def _empty_objectives():
+        return {
+            "total_objectives": 0,
+            "achieved_objectives": 0,
+            "current_objectives": 0,
+            "achievement_rate": 0,
+        }
+
+    def _objectives_progress(self, context: StudentDashboardContext):
+        today = context.now.date()
+        total_objectives = len(context.objectives)
+        achieved_objectives = sum(1 for o in context.objectives if o.is_achieved)
+        # Objectifs en cours
+        current_objectives = sum(
+            1
+            for o in context.objectives
+            if not o.is_achieved and o.target_date >= today
+        )
+
+        return {
+            "total_objectives": total_objectives,
+            "achieved_objectives": achieved_objectives,
+            "current_objectives": current_objectives,
+            "achievement_rate": (
+                (achieved_objectives / total_objectives * 100)
+                if total_objectives > 0
+                else 0
+            ),
+        }
+
+    def _learning_style_analysis(self, context: StudentDashboardContext):
+        profile = getattr(context.student, "learning_profile", None)
+        if not profile:
+            # Données par défaut si pas de profil
+            return {
+                "dominant_style": "Visuel",
+                "confidence": 85,
+                "styles": [
+                    {"style": "Visuel", "score": 85},
+                    {"style": "Auditi", "score": 60},
+                    {"style": "Kinesthésique", "score": 45},
+                    {"style": "Lecture/Écriture", "score": 75},
+                ],
+                "recommendations": [
+                    "Utiliser des diagrammes pour les concepts complexes",
+                    "Privilégier les couleurs pour organiser l'information",
+                    "Créer des cartes mentales pour les révisions",
+                    "Utiliser des vidéos explicatives",
+                ],
+            }
 
-            # Objectifs récemment atteints
-            recent_achievements = (
-                StudentObjective.query.filter_by(
-                    student_id=student_id, is_achieved=True
-                )
-                .filter(
-                    StudentObjective.achievement_date
-                    >= date.today() - timedelta(days=7)
-                )
-                .all()
+        # Analyser le profil d'apprentissage existant
+        styles = profile.get("learning_styles", {})
+
+        # Trouver le style dominant
+        dominant_style = (
+            max(styles.items(), key=lambda x: x[1]) if styles else ("Visuel", 85)
+        )
+
+        return {
+            "dominant_style": dominant_style[0],
+            "confidence": dominant_style[1],
+            "styles": [{"style": k, "score": v} for k, v in styles.items()],
+            "recommendations": profile.get("recommendations", []),
+        }
+
+    def _subject_progress(self, context: StudentDashboardContext):
+        subjects_progress = []
+        # Note la plus élevée de chaque matière
+        for subject, grade in subject_best_scores(context.scores):
+            # Déterminer le statut basé sur la note
+            if grade >= 16:
+                status = "Maîtrisé"
+            elif grade >= 12:
+                status = "En cours"
+            else:
+                status = "À revoir"
+            subjects_progress.append(
+                {
+                    "subject": subject,
+                    "current_grade": grade,
+                    "progress_percentage": min(grade * 5, 100),
+                    "recent_topics": [],
+                    "status": status,
+                }
             )
-
-            for achievement in recent_achievements:
+        return subjects_progress
+
+    def _recent_notifications(self, context: StudentDashboardContext, limit=5):
+        notifications = []
+        window_start = context.now - timedelta(days=NOTIFICATION_WINDOW_DAYS)
+
+        # Objectifs récemment atteints
+        for achievement in context.objectives:
+            if (
+                achievement.is_achieved
+                and achievement.achievement_date
+                and achievement.achievement_date >= window_start.date()
+            ):
                 notifications.append(
                     {
                         "type": "success",
@@ -357,183 +555,105 @@ class ParentDashboardService:
                     }
                 )
 
-            # Séances reportées récentes
-            cancelled_sessions = IndividualSession.query.filter(
-                IndividualSession.student_id == student_id,
-                IndividualSession.status == "cancelled",
-                IndividualSession.scheduled_at >= datetime.utcnow() - timedelta(days=7),
-            ).all()
-
-            for session in cancelled_sessions:
+        # Séances reportées récentes
+        for session in context.individual_sessions:
+            if session.status == "cancelled" and session.scheduled_at >= window_start:
                 notifications.append(
                     {
                         "type": "warning",
                         "title": "Séance reportée",
-                        "message": f"{session.subject} du {session.scheduled_at.strftime('%d/%m')} reportée",
+                        "message": (
+                            f"{session.subject} du "
+                            f"{session.scheduled_at.strftime('%d/%m')} reportée"
+                        ),
                         "timestamp": session.scheduled_at.isoformat(),
                         "icon": "AlertCircle",
                     }
                 )
 
-            # Messages récents des enseignants
-            # (Simulation pour la démo)
-            notifications.append(
-                {
-                    "type": "info",
-                    "title": "Message de M. Dubois",
-                    "message": "Nouveau plan de révision disponible",
-                    "timestamp": (datetime.utcnow() - timedelta(days=1)).isoformat(),
-                    "icon": "MessageSquare",
-                }
-            )
-
-            # Trier par timestamp et limiter
-            notifications.sort(key=lambda x: x["timestamp"], reverse=True)
-            return notifications[:limit]
-        except (RuntimeError, OSError, ValueError) as e:
-            print(f"Erreur dans get_recent_notifications: {e}")
-            return []
-
-    def get_progress_chart_data(self, student_id, months=5):
-        """Récupérer les données pour le graphique de progression"""
-        try:
-            # Générer les données pour les derniers mois
-            end_date = date.today()
-            start_date = end_date - timedelta(days=30 * months)
-
-            # Récupérer les évaluations par mois
-            assessments = (
-                Assessment.query.filter(
-                    Assessment.student_id == student_id, Assessment.date >= start_date
-                )
-                .order_by(Assessment.date.asc())
-                .all()
-            )
-
-            # Organiser par mois et matière
-            monthly_data = {}
-
-            for assessment in assessments:
-                month_key = assessment.date.strftime("%Y-%m")
-                if month_key not in monthly_data:
-                    monthly_data[month_key] = {}
-
-                subject = assessment.subject
-                if subject not in monthly_data[month_key]:
-                    monthly_data[month_key][subject] = []
-
-                monthly_data[month_key][subject].append(assessment.score)
-
-            # Calculer les moyennes mensuelles
-            chart_data = []
-            month_names = [
-                "Sept",
-                "Oct",
-                "Nov",
-                "Déc",
-                "Jan",
-                "Fév",
-                "Mar",
-                "Avr",
-                "Mai",
-                "Juin",
-                "Juil",
-                "Août",
-            ]
-
-            for i in range(months):
-                month_date = end_date - timedelta(days=30 * (months - 1 - i))
-                month_key = month_date.strftime("%Y-%m")
-                month_name = month_names[month_date.month - 1]
-
-                data_point = {"month": month_name}
-
-                if month_key in monthly_data:
-                    for subject, scores in monthly_data[month_key].items():
-                        avg_score = sum(scores) / len(scores)
-                        data_point[subject.lower()] = round(avg_score, 1)
-                else:
-                    # Données par défaut si pas d'évaluations
-                    data_point.update(
-                        {
-                            "math": 12 + i * 1.5,
-                            "physics": 14 + i * 1,
-                            "french": 16 + i * 0.5,
-                        }
-                    )
-
-                chart_data.append(data_point)
-
-            return chart_data
-        except (RuntimeError, OSError, ValueError) as e:
-            print(f"Erreur dans get_progress_chart_data: {e}")
-            # Données par défaut en cas d'erreur
-            return [
-                {"month": "Sept", "math": 12, "physics": 14, "french": 16},
-                {"month": "Oct", "math": 14, "physics": 15, "french": 16},
-                {"month": "Nov", "math": 16, "physics": 16, "french": 17},
-                {"month": "Déc", "math": 17, "physics": 17, "french": 18},
-                {"month": "Jan", "math": 18, "physics": 18, "french": 18},
-            ]
-
-    def calculate_aria_confidence(self, student_id):
-        """Calculer la confiance ARIA pour les prédictions"""
-        try:
-            # Facteurs à considérer pour la confiance
-            factors = {
-                "consistency": 0,  # Régularité des performances
-                "progress_trend": 0,  # Tendance de progression
-                "engagement": 0,  # Niveau d'engagement
-                "completion_rate": 0,  # Taux de completion des objectifs
+        # Messages récents des enseignants
+        # (Simulation pour la démo)
+        notifications.append(
+            {
+                "type": "info",
+                "title": "Message de M. Dubois",
+                "message": "Nouveau plan de révision disponible",
+                "timestamp": (context.now - timedelta(days=1)).isoformat(),
+                "icon": "MessageSquare",
             }
-
-            # Analyser la régularité des performances
-            recent_assessments = Assessment.query.filter(
-                Assessment.student_id == student_id,
-                Assessment.date >= date.today() - timedelta(days=90),
-            ).all()
-
-            if recent_assessments:
-                scores = [a.score for a in recent_assessments]
-                # Calculer la variance (moins de variance = plus de régularité)
-                mean_score = sum(scores) / len(scores)
-                variance = sum((score - mean_score) ** 2 for score in scores) / len(
-                    scores
+        )
+
+        # Trier par timestamp et limiter
+        notifications.sort(key=lambda x: x["timestamp"], reverse=True)
+        return notifications[:limit]
+
+    @staticmethod
+    def _default_chart_data():
+        # Données par défaut en cas d'erreur
+        return [
+            {"month": "Sept", "math": 12, "physics": 14, "french": 16},
+            {"month": "Oct", "math": 14, "physics": 15, "french": 16},
+            {"month": "Nov", "math": 16, "physics": 16, "french": 17},
+            {"month": "Déc", "math": 17, "physics": 17, "french": 18},
+            {"month": "Jan", "math": 18, "physics": 18, "french": 18},
+        ]
+
+    def _progress_chart_data(
+        self, context: StudentDashboardContext, months=DEFAULT_CHART_MONTHS
+    ):
+        # Moyennes par mois calendaire et par matière sur les derniers mois
+        calendar, subjects, means = monthly_subject_means(
+            context.scores, context.now.date(), months
+        )
+        month_names = [
+            "Jan",
+            "Fév",
+            "Mar",
+            "Avr",
+            "Mai",
+            "Juin",
+            "Juil",
+            "Août",
+            "Sept",
+            "Oct",
+            "Nov",
+            "Déc",
+        ]
+
+        chart_data = []
+        for i, month in enumerate(calendar):
+            data_point = {"month": month_names[month.astype(object).month - 1]}
+            row = means[i]
+            if np.isnan(row).all():
+                # Données par défaut si pas d'évaluations
+                data_point.update(
+                    {
+                        "math": 12 + i * 1.5,
+                        "physics": 14 + i * 1,
+                        "french": 16 + i * 0.5,
+                    }
                 )
-                factors["consistency"] = max(0, 100 - variance * 5)  # Normaliser
-
-                # Tendance de progression
-                if len(scores) >= 3:
-                    recent_avg = sum(scores[-3:]) / 3
-                    older_avg = sum(scores[:3]) / 3
-                    improvement = (recent_avg - older_avg) / older_avg * 100
-                    factors["progress_trend"] = min(100, max(0, 50 + improvement * 10))
-
-            # Analyser l'engagement (basé sur la présence aux séances)
-            total_sessions = IndividualSession.query.filter_by(
-                student_id=student_id
-            ).count()
-            completed_sessions = IndividualSession.query.filter_by(
-                student_id=student_id, status="completed"
-            ).count()
-
-            if total_sessions > 0:
-                factors["engagement"] = (completed_sessions / total_sessions) * 100
-
-            # Taux de completion des objectifs
-            objectives_stats = self.get_objectives_progress(student_id)
-            factors["completion_rate"] = objectives_stats["achievement_rate"]
-
-            # Calculer la confiance globale (moyenne pondérée)
-            weights = {
-                "consistency": 0.3,
-                "progress_trend": 0.3,
-                "engagement": 0.2,
-                "completion_rate": 0.2,
-            }
-
-            confidence = sum(factors[key] * weights[key] for key in factors)
-            return min(100, max(0, round(confidence)))
-        except (RuntimeError, OSError, ValueError) as e:
-            print(f"Erreur dans calculate_aria_confidence: {e}")
-            return 94  # Valeur par défaut
+            else:
+                for subject, avg_score in zip(subjects, row):
+                    if not np.isnan(avg_score):
+                        data_point[subject.lower()] = round(float(avg_score), 1)
+            chart_data.append(data_point)
+
+        return chart_data
+
+    def _aria_confidence(self, context: StudentDashboardContext, objectives_stats):
+        # Engagement : taux de séances individuelles réalisées
+        engagement = (
+            context.completed_individual_sessions
+            / context.total_individual_sessions
+            * 100
+            if context.total_individual_sessions
+            else 0.0
+        )
+        window_start = context.now - timedelta(days=CONFIDENCE_WINDOW_DAYS)
+        return confidence_score(
+            context.scores.since(window_start),
+            context.student.id,
+            engagement=engagement,
+            completion_rate=objectives_stats["achievement_rate"],
+        )
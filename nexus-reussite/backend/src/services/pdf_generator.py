@@ -19,6 +19,8 @@ from reportlab.platypus import (
     TableStyle,
 )
 
+from .request_trace import PDF, traced
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -291,6 +293,7 @@ class NexusPDFGenerator:
 
         canvas.restoreState()
 
+    @traced(PDF)
     def generate_revision_sheet(
         self,
         content: Dict[str, Any],
@@ -474,6 +477,7 @@ class NexusPDFGenerator:
             buffer.seek(0)
             return buffer.getvalue()
 
+    @traced(PDF)
     def generate_exercise_sheet(
         self,
         content: Dict[str, Any],
@@ -602,6 +606,7 @@ class NexusPDFGenerator:
             buffer.seek(0)
             return buffer.getvalue()
 
+    @traced(PDF)
     def generate_evaluation_report(
         self,
         content: Dict[str, Any],
@@ -760,6 +765,7 @@ class NexusPDFGenerator:
             buffer.seek(0)
             return buffer.getvalue()
 
+    @traced(PDF)
     def generate_progress_report(
         self,
         student_data: Dict[str, Any],
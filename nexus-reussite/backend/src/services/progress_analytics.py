@@ -0,0 +1,325 @@
+"""
+Analyses vectorisées des notes d'évaluation
+Nexus Réussite - Progress Analytics
+
+Les notes sont lues par une seule requête de projection
+(étudiant, matière, date, note) et conservées en colonnes NumPy
+(`ScoreSeries`). Tous les calculs — regroupement par mois calendaire et par
+matière, moyennes glissantes, variance, pente de tendance, score de
+confiance — se font par `np.bincount` sur ces colonnes, pour un étudiant
+comme pour une cohorte entière, sans boucle Python par évaluation.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from database import db
+from models.student import Assessment
+
+# Pondération des facteurs du score de confiance ARIA
+CONFIDENCE_WEIGHTS = {
+    "consistency": 0.3,
+    "progress_trend": 0.3,
+    "engagement": 0.2,
+    "completion_rate": 0.2,
+}
+# Nombre minimal de notes pour estimer une tendance
+MIN_TREND_POINTS = 3
+
+
+@dataclass(frozen=True)
+class ScoreSeries:
+    """Notes en colonnes, triées par étudiant puis par date"""
+
+    student_ids: np.ndarray  # int64
+    subjects: np.ndarray  # str (object)
+    taken_at: np.ndarray  # datetime64[s]
+    scores: np.ndarray  # float64
+
+    @classmethod
+    def empty(cls) -> "ScoreSeries":
+        return cls(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=object),
+            np.empty(0, dtype="datetime64[s]"),
+            np.empty(0, dtype=np.float64),
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple]) -> "ScoreSeries":
+        """Construit les colonnes depuis des tuples (étudiant, matière, date, note)"""
+        rows = list(rows)
+        if not rows:
+            return cls.empty()
+        student_ids, subjects, taken_at, scores = zip(*rows)
+        return cls(
+            np.asarray(student_ids, dtype=np.int64),
+            np.asarray(subjects, dtype=object),
+            np.asarray(taken_at, dtype="datetime64[s]"),
+            np.asarray(scores, dtype=np.float64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def select(self, mask: np.ndarray) -> "ScoreSeries":
+        return ScoreSeries(
+            self.student_ids[mask],
+            self.subjects[mask],
+            self.taken_at[mask],
+            self.scores[mask],
+        )
+
+    def since(self, start) -> "ScoreSeries":
+        """Notes obtenues à partir de `start` (date ou datetime)"""
+        return self.select(self.taken_at >= np.datetime64(start, "s"))
+
+    def split_by_student(self) -> Dict[int, "ScoreSeries"]:
+        """Découpe en séries par étudiant (vues, sans copie des colonnes)"""
+        if not len(self):
+            return {}
+        ids, starts = np.unique(self.student_ids, return_index=True)
+        bounds = np.append(starts, len(self))
+        return {
+            int(student_id): self.select(slice(bounds[i], bounds[i + 1]))
+            for i, student_id in enumerate(ids)
+        }
+
+
+def fetch_scores(
+    student_ids: Optional[Iterable[int]] = None,
+    since: Optional[datetime] = None,
+) -> ScoreSeries:
+    """Notes des évaluations, en une requête de projection
+
+    Une évaluation est datée de sa fin si elle est terminée, sinon de sa
+    création ; les évaluations sans note sont ignorées.
+    """
+    taken_at = func.coalesce(Assessment.completed_at, Assessment.created_at)
+    query = db.session.query(
+        Assessment.student_id, Assessment.subject, taken_at, Assessment.score
+    ).filter(Assessment.score.isnot(None))
+    if student_ids is not None:
+        query = query.filter(Assessment.student_id.in_(list(student_ids)))
+    if since is not None:
+        query = query.filter(taken_at >= since)
+    return ScoreSeries.from_rows(
+        query.order_by(Assessment.student_id, taken_at, Assessment.id).all()
+    )
+
+
+# ----- Agrégats par groupe -----
+
+
+def group_index(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(clés distinctes triées, indice du groupe de chaque élément)"""
+    uniques, inverse = np.unique(keys, return_inverse=True)
+    return uniques, inverse.reshape(-1)
+
+
+def group_means(inverse: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Moyenne par groupe (NaN pour un groupe vide)"""
+    sums = np.bincount(inverse, weights=values, minlength=size)
+    counts = np.bincount(inverse, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def group_max(inverse: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Maximum par groupe (-inf pour un groupe vide)"""
+    maxima = np.full(size, -np.inf)
+    np.maximum.at(maxima, inverse, values)
+    return maxima
+
+
+def group_variance(inverse: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Variance (population) par groupe"""
+    counts = np.bincount(inverse, minlength=size)
+    means = group_means(inverse, values, size)
+    deviations = values - means[inverse]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.bincount(inverse, weights=deviations**2, minlength=size) / counts
+
+
+def group_trend_slope(
+    inverse: np.ndarray, x: np.ndarray, y: np.ndarray, size: int
+) -> np.ndarray:
+    """Pente de la droite des moindres carrés de y en x, par groupe
+
+    Nulle pour un groupe dont les x sont tous égaux.
+    """
+    dx = x - group_means(inverse, x, size)[inverse]
+    dy = y - group_means(inverse, y, size)[inverse]
+    covariance = np.bincount(inverse, weights=dx * dy, minlength=size)
+    spread = np.bincount(inverse, weights=dx * dx, minlength=size)
+    return np.divide(covariance, spread, out=np.zeros(size), where=spread > 0)
+
+
+def rank_in_group(inverse: np.ndarray) -> np.ndarray:
+    """Rang (0, 1, ...) de chaque élément dans son groupe, dans l'ordre d'origine"""
+    order = np.argsort(inverse, kind="stable")
+    sorted_groups = inverse[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    counts = np.diff(np.r_[starts, len(inverse)])
+    ranks = np.empty(len(inverse), dtype=np.int64)
+    ranks[order] = np.arange(len(inverse)) - np.repeat(starts, counts)
+    return ranks
+
+
+# ----- Séries simples -----
+
+
+def rolling_mean(values, window: int) -> np.ndarray:
+    """Moyenne glissante ; les premières fenêtres sont partielles"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+def trend_slope(values) -> float:
+    """Pente (par évaluation) de la droite des moindres carrés"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return 0.0
+    x = np.arange(len(values), dtype=np.float64)
+    inverse = np.zeros(len(values), dtype=np.int64)
+    return float(group_trend_slope(inverse, x, values, 1)[0])
+
+
+def split_half_change(values) -> float:
+    """Évolution (%) de la moyenne de la seconde moitié sur la première"""
+    values = np.asarray(values, dtype=np.float64)
+    mid_point = len(values) // 2
+    if mid_point == 0:
+        return 0.0
+    first_half = values[:mid_point].mean()
+    second_half = values[mid_point:].mean()
+    return float((second_half - first_half) / first_half * 100) if first_half else 0.0
+
+
+# ----- Regroupement mensuel -----
+
+
+def month_starts(end: date, months: int) -> np.ndarray:
+    """Les `months` derniers mois calendaires jusqu'à `end` inclus"""
+    last = np.datetime64(end, "M")
+    return last - np.arange(months - 1, -1, -1)
+
+
+def monthly_subject_means(
+    series: ScoreSeries, end: date, months: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Moyenne des notes par mois calendaire et par matière
+
+    Returns:
+        (mois datetime64[M], matières, matrice mois x matières ; NaN sans note)
+    """
+    calendar = month_starts(end, months)
+    month_offsets = (series.taken_at.astype("datetime64[M]") - calendar[0]).astype(
+        np.int64
+    )
+    in_range = (month_offsets >= 0) & (month_offsets < months)
+    subjects, subject_codes = group_index(series.subjects[in_range])
+    if not len(subjects):
+        return calendar, subjects, np.full((months, 0), np.nan)
+
+    cells = month_offsets[in_range] * len(subjects) + subject_codes
+    means = group_means(cells, series.scores[in_range], months * len(subjects))
+    return calendar, subjects, means.reshape(months, len(subjects))
+
+
+# ----- Score de confiance -----
+
+
+def cohort_confidence(
+    series: ScoreSeries,
+    student_ids: Iterable[int],
+    engagement: Optional[Dict[int, float]] = None,
+    completion_rate: Optional[Dict[int, float]] = None,
+) -> Dict[int, int]:
+    """Score de confiance ARIA (0-100) de chaque étudiant
+
+    Facteurs (sur 100), pondérés par CONFIDENCE_WEIGHTS :
+    - régularité : 100 - 5 x variance des notes ;
+    - tendance : 50 + 10 x évolution (%) prédite par la pente des moindres
+      carrés sur la fenêtre, rapportée à la moyenne ;
+    - engagement : taux de séances réalisées ;
+    - objectifs : taux d'objectifs atteints.
+
+    `series` doit déjà être restreinte à la fenêtre d'analyse voulue.
+    """
+    student_ids = np.asarray(list(student_ids), dtype=np.int64)
+    size = len(student_ids)
+    if not size:
+        return {}
+    engagement = engagement or {}
+    completion_rate = completion_rate or {}
+
+    # Rattache chaque note à la position de son étudiant dans student_ids
+    order = np.argsort(student_ids)
+    positions = np.searchsorted(student_ids[order], series.student_ids)
+    positions = np.minimum(positions, size - 1)
+    known = student_ids[order][positions] == series.student_ids
+    inverse = order[positions[known]]
+    scores = series.scores[known]
+
+    counts = np.bincount(inverse, minlength=size)
+    means = group_means(inverse, scores, size)
+    variance = group_variance(inverse, scores, size)
+    consistency = np.where(counts > 0, np.clip(100 - variance * 5, 0, None), 0.0)
+
+    ranks = rank_in_group(inverse).astype(np.float64)
+    slopes = group_trend_slope(inverse, ranks, scores, size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        improvement = slopes * (counts - 1) / means * 100
+    progress_trend = np.where(
+        (counts >= MIN_TREND_POINTS) & (means != 0),
+        np.clip(50 + improvement * 10, 0, 100),
+        0.0,
+    )
+
+    engagement_values = np.array(
+        [engagement.get(int(student_id), 0.0) for student_id in student_ids]
+    )
+    completion_values = np.array(
+        [completion_rate.get(int(student_id), 0.0) for student_id in student_ids]
+    )
+
+    confidence = (
+        CONFIDENCE_WEIGHTS["consistency"] * consistency
+        + CONFIDENCE_WEIGHTS["progress_trend"] * progress_trend
+        + CONFIDENCE_WEIGHTS["engagement"] * engagement_values
+        + CONFIDENCE_WEIGHTS["completion_rate"] * completion_values
+    )
+    confidence = np.clip(np.round(confidence), 0, 100).astype(int)
+    return dict(zip(student_ids.tolist(), confidence.tolist()))
+
+
+def confidence_score(
+    series: ScoreSeries,
+    student_id: int,
+    engagement: float = 0.0,
+    completion_rate: float = 0.0,
+) -> int:
+    """Score de confiance ARIA d'un seul étudiant"""
+    return cohort_confidence(
+        series,
+        [student_id],
+        {student_id: engagement},
+        {student_id: completion_rate},
+    )[student_id]
+
+
+def subject_best_scores(series: ScoreSeries) -> List[Tuple[str, float]]:
+    """Meilleure note de chaque matière, par ordre alphabétique des matières"""
+    subjects, inverse = group_index(series.subjects)
+    maxima = group_max(inverse, series.scores, len(subjects))
+    return list(zip(subjects.tolist(), maxima.tolist()))
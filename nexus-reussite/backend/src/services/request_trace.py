@@ -0,0 +1,268 @@
+"""
+Traçage léger des requêtes HTTP
+Nexus Réussite - Request Trace
+
+Chaque requête porte une trace (ContextVar, donc visible depuis les threads
+d'`asyncio.to_thread` et les tâches asyncio lancées pendant la requête) qui
+cumule, par catégorie, le nombre et la durée des spans mesurés avec
+`time.perf_counter_ns` :
+- sql : écouteur SQL unique (services/sql_profiler.py) ;
+- cache : allers-retours Redis (services/cache_service.py) ;
+- openai : appels à l'API OpenAI ;
+- pdf : génération des documents PDF ;
+- json : sérialisation des réponses (fournisseur JSON de Flask).
+
+La répartition est renvoyée dans l'en-tête `Server-Timing` (visible dans les
+outils de développement du navigateur) ; une requête qui dépasse le budget de
+son endpoint (`REQUEST_BUDGETS_MS`, sinon `REQUEST_BUDGET_MS`) est journalisée
+avec sa répartition et ses spans les plus longs.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import g, request
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+
+SQL = "sql"
+CACHE = "cache"
+OPENAI = "openai"
+PDF = "pdf"
+JSON = "json"
+CATEGORIES = (SQL, CACHE, OPENAI, PDF, JSON)
+
+DEFAULT_BUDGET_MS = 1000
+# Spans nommés conservés par requête (les totaux restent exacts au-delà)
+MAX_SPANS_PER_REQUEST = 64
+SLOWEST_SPANS_LOGGED = 5
+
+_NS_PER_MS = 1_000_000
+
+
+class RequestTrace:
+    """Durées cumulées par catégorie pour une requête"""
+
+    __slots__ = ("endpoint", "start_ns", "totals", "spans")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.start_ns = time.perf_counter_ns()
+        # catégorie -> [nombre de spans, durée cumulée en ns]
+        self.totals: Dict[str, List[int]] = {}
+        self.spans: List[Tuple[str, str, int]] = []
+
+    def add(self, category: str, duration_ns: int, name: Optional[str] = None):
+        total = self.totals.get(category)
+        if total is None:
+            total = self.totals[category] = [0, 0]
+        total[0] += 1
+        total[1] += duration_ns
+        if name is not None and len(self.spans) < MAX_SPANS_PER_REQUEST:
+            self.spans.append((category, name, duration_ns))
+
+    def elapsed_ns(self) -> int:
+        return time.perf_counter_ns() - self.start_ns
+
+    def server_timing(self, total_ns: int) -> str:
+        """Valeur de l'en-tête Server-Timing"""
+        metrics = []
+        for category in CATEGORIES:
+            if category in self.totals:
+                count, duration_ns = self.totals[category]
+                metrics.append(
+                    f'{category};dur={duration_ns / _NS_PER_MS:.1f};desc="{count}"'
+                )
+        metrics.append(f"total;dur={total_ns / _NS_PER_MS:.1f}")
+        return ", ".join(metrics)
+
+    def breakdown(self) -> Dict[str, Dict[str, float]]:
+        return {
+            category: {"count": count, "ms": round(duration_ns / _NS_PER_MS, 2)}
+            for category, (count, duration_ns) in self.totals.items()
+        }
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar(
+    "request_trace", default=None
+)
+
+# Observateurs des spans terminés (ex. histogrammes Prometheus) : appelés
+# avec (catégorie, nom, durée en ns), y compris hors requête HTTP
+SpanObserver = Callable[[str, Optional[str], int], None]
+_span_observers: List[SpanObserver] = []
+
+
+def add_span_observer(observer: SpanObserver):
+    """Abonne un observateur à tous les spans terminés"""
+    if observer not in _span_observers:
+        _span_observers.append(observer)
+
+
+def _notify(category: str, name: Optional[str], duration_ns: int):
+    for observer in _span_observers:
+        try:
+            observer(category, name, duration_ns)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Observateur de span en échec")
+
+
+def current_trace() -> Optional[RequestTrace]:
+    """Trace de la requête en cours (None hors requête)"""
+    return _current_trace.get()
+
+
+def record_span(category: str, duration_ns: int, name: Optional[str] = None):
+    """Ajoute un span déjà mesuré à la trace courante"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(category, duration_ns, name)
+    if _span_observers:
+        _notify(category, name, duration_ns)
+
+
+@contextmanager
+def span(category: str, name: Optional[str] = None):
+    """Mesure le bloc et l'ajoute à la trace courante"""
+    trace = _current_trace.get()
+    if trace is None and not _span_observers:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        duration_ns = time.perf_counter_ns() - start
+        if trace is not None:
+            trace.add(category, duration_ns, name)
+        if _span_observers:
+            _notify(category, name, duration_ns)
+
+
+def traced(category: str, name: Optional[str] = None) -> Callable:
+    """Décorateur : chaque appel de la fonction (sync ou async) est un span"""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(category, span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(category, span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracedJSONProvider(DefaultJSONProvider):
+    """Fournisseur JSON de Flask dont la sérialisation est un span"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        with span(JSON):
+            return super().dumps(obj, **kwargs)
+
+
+class RequestTracer:
+    """Hooks Flask : ouverture de la trace, Server-Timing, budgets"""
+
+    def __init__(self):
+        self.default_budget_ms = DEFAULT_BUDGET_MS
+        self.budgets_ms: Dict[str, float] = {}
+        self.server_timing = True
+
+    def init_app(self, app):
+        self.default_budget_ms = app.config.get("REQUEST_BUDGET_MS", DEFAULT_BUDGET_MS)
+        self.budgets_ms = dict(app.config.get("REQUEST_BUDGETS_MS") or {})
+        self.server_timing = app.config.get("SERVER_TIMING_ENABLED", True)
+
+        # Fournisseur JSON par défaut uniquement : un fournisseur personnalisé
+        # est laissé tel quel
+        # pylint: disable-next=unidiomatic-typecheck
+        if type(app.json) is DefaultJSONProvider:
+            app.json_provider_class = TracedJSONProvider
+            app.json = TracedJSONProvider(app)
+
+        # Spans SQL : alimentés par l'écouteur du profiler SQL
+        # pylint: disable-next=import-outside-toplevel
+        from .sql_profiler import sql_profiler
+
+        sql_profiler.install()
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        logger.info("⏱️ Traçage des requêtes activé")
+
+    def budget_ms(self, endpoint: str) -> float:
+        return self.budgets_ms.get(endpoint, self.default_budget_ms)
+
+    @staticmethod
+    def _before_request():
+        g._trace_token = _current_trace.set(
+            RequestTrace(request.endpoint or "<route inconnue>")
+        )
+
+    def _after_request(self, response):
+        trace = _current_trace.get()
+        if trace is None:
+            return response
+        total_ns = trace.elapsed_ns()
+        if self.server_timing:
+            response.headers["Server-Timing"] = trace.server_timing(total_ns)
+
+        total_ms = total_ns / _NS_PER_MS
+        budget_ms = self.budget_ms(trace.endpoint)
+        if budget_ms and total_ms > budget_ms:
+            slowest = sorted(trace.spans, key=lambda s: s[2], reverse=True)[
+                :SLOWEST_SPANS_LOGGED
+            ]
+            logger.warning(
+                "⏱️ Budget dépassé [%s %s] %.1f ms > %s ms, répartition=%s, "
+                "spans=%s",
+                request.method,
+                trace.endpoint,
+                total_ms,
+                budget_ms,
+                trace.breakdown(),
+                [
+                    f"{category}:{name}={duration_ns / _NS_PER_MS:.1f}ms"
+                    for category, name, duration_ns in slowest
+                ],
+            )
+        return response
+
+    @staticmethod
+    def _teardown_request(exc=None):  # pylint: disable=unused-argument
+        token = g.pop("_trace_token", None)
+        if token is None:
+            return
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # Jeton créé dans un autre contexte : on détache simplement la trace
+            _current_trace.set(None)
+
+
+# Instance globale
+request_tracer = RequestTracer()
+
+
+def init_request_tracing(app):
+    """Initialise le traçage des requêtes pour l'application"""
+    request_tracer.init_app(app)
@@ -0,0 +1,311 @@
+"""
+Cache sémantique des réponses d'ARIA
+Nexus Réussite - Response Cache
+
+Beaucoup d'élèves posent presque la même question sur le même chapitre.
+Les réponses sont mises en cache par portée (type de conversation, matière,
+sujet, niveau) et message normalisé (casse, accents, ponctuation, espaces) :
+- niveau exact : condensat SHA-256 de la portée et du message, stocké dans le
+  cache à deux niveaux (services/cache_service.py), donc partagé entre les
+  workers via Redis ;
+- niveau sémantique : index vectoriel local au processus, une matrice NumPy
+  de plongements normalisés par portée (recherche exhaustive par produit
+  scalaire), au-dessus d'un seuil de similarité cosinus configurable.
+
+Le cache ne fait aucun appel réseau : le plongement du message est calculé
+par l'appelant (modèle d'embedding d'OpenAI) et transmis via `CacheLookup`.
+
+Certaines demandes ne passent jamais par le cache (`bypass_reason`) :
+historique de conversation (la réponse en dépend), limite de temps
+(paramètres de génération différents), types de conversation non
+mutualisables (évaluation, motivation), profils à difficulté préférée
+exclue (ARIA_CACHE_BYPASS_DIFFICULTIES). Le prénom de l'élève est remplacé
+par un marqueur dans les réponses stockées et réinjecté à la lecture.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut, surchargeables par variables d'environnement
+DEFAULT_SIMILARITY_THRESHOLD = 0.93
+DEFAULT_TTL = 24 * 3600
+DEFAULT_CACHEABLE_TYPES = "tutoring,explanation"
+# Difficultés préférées dont les élèves reçoivent toujours une réponse dédiée
+DEFAULT_BYPASS_DIFFICULTIES = "hard"
+# Entrées de l'index sémantique : par portée et au total (LRU des portées)
+MAX_ENTRIES_PER_SCOPE = 2000
+MAX_SCOPES = 256
+# Messages trop courts ("merci", "ok") : aucune valeur à mutualiser
+MIN_MESSAGE_LENGTH = 12
+EXACT_KEY_PREFIX = "aria:response:"
+NAME_PLACEHOLDER = "{{eleve}}"
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+Scope = Tuple[str, str, str, str]
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_set(name: str, default: str) -> frozenset:
+    return frozenset(
+        item.strip() for item in os.getenv(name, default).split(",") if item.strip()
+    )
+
+
+def normalize_message(message: str) -> str:
+    """Minuscules, sans accents, sans ponctuation, espaces uniques"""
+    text = unicodedata.normalize("NFKD", message.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = _PUNCTUATION.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+@dataclass
+class CacheLookup:
+    """Clés d'une demande, calculées une fois pour la lecture et l'écriture"""
+
+    scope: Scope
+    normalized: str
+    exact_key: str
+    student_name: str
+    bypass_reason: Optional[str] = None
+    # Plongement normalisé du message, fourni par l'appelant
+    embedding: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def bypassed(self) -> bool:
+        return self.bypass_reason is not None
+
+
+class _ScopeIndex:
+    """Plongements normalisés d'une portée, avec réponses et expirations"""
+
+    __slots__ = ("vectors", "payloads", "expires_at")
+
+    def __init__(self, dimension: int):
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.payloads: List[Dict[str, Any]] = []
+        self.expires_at = np.empty(0, dtype=np.float64)
+
+    def prune(self, now: float):
+        alive = self.expires_at > now
+        if not alive.all():
+            self.vectors = self.vectors[alive]
+            self.expires_at = self.expires_at[alive]
+            self.payloads = [p for p, keep in zip(self.payloads, alive) if keep]
+
+    def add(self, vector: np.ndarray, payload: Dict[str, Any], expires_at: float):
+        if len(self.payloads) >= MAX_ENTRIES_PER_SCOPE:
+            # Les plus anciennes entrées sont en tête
+            self.vectors = self.vectors[1:]
+            self.expires_at = self.expires_at[1:]
+            self.payloads.pop(0)
+        self.vectors = np.vstack([self.vectors, vector[None, :]])
+        self.expires_at = np.append(self.expires_at, expires_at)
+        self.payloads.append(payload)
+
+    def best_match(self, vector: np.ndarray) -> Tuple[float, Optional[Dict]]:
+        if not self.payloads:
+            return 0.0, None
+        similarities = self.vectors @ vector
+        best = int(np.argmax(similarities))
+        return float(similarities[best]), self.payloads[best]
+
+
+class SemanticResponseCache:
+    """Cache des réponses ARIA : niveau exact partagé, niveau sémantique local"""
+
+    def __init__(self):
+        self.enabled = _env_flag("ARIA_CACHE_ENABLED", True)
+        self.semantic_enabled = _env_flag("ARIA_CACHE_SEMANTIC", True)
+        self.similarity_threshold = _env_float(
+            "ARIA_CACHE_SIMILARITY_THRESHOLD", DEFAULT_SIMILARITY_THRESHOLD
+        )
+        self.ttl = int(_env_float("ARIA_CACHE_TTL", DEFAULT_TTL))
+        self.cacheable_types = _env_set(
+            "ARIA_CACHE_CONVERSATION_TYPES", DEFAULT_CACHEABLE_TYPES
+        )
+        self.bypass_difficulties = _env_set(
+            "ARIA_CACHE_BYPASS_DIFFICULTIES", DEFAULT_BYPASS_DIFFICULTIES
+        )
+        self._indexes: "OrderedDict[Scope, _ScopeIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "tokens_saved": 0,
+            # Coût du niveau sémantique (plongements des messages)
+            "embedding_tokens": 0,
+        }
+
+    # ----- Clés et règles de contournement -----
+
+    def bypass_reason(self, context, student_profile) -> Optional[str]:
+        """Raison de ne pas utiliser le cache pour cette demande, ou None"""
+        if not self.enabled:
+            return "désactivé"
+        if context.conversation_type not in self.cacheable_types:
+            return f"type {context.conversation_type}"
+        if context.previous_messages or context.summary:
+            return "historique de conversation"
+        if context.time_limit:
+            return "limite de temps"
+        if student_profile.preferred_difficulty in self.bypass_difficulties:
+            return f"difficulté {student_profile.preferred_difficulty}"
+        return None
+
+    def prepare(self, message: str, context, student_profile) -> CacheLookup:
+        normalized = normalize_message(message)
+        scope = (
+            context.conversation_type,
+            normalize_message(context.subject or ""),
+            normalize_message(context.topic or ""),
+            student_profile.level,
+        )
+        digest = hashlib.sha256(
+            json.dumps([*scope, normalized], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        lookup = CacheLookup(
+            scope=scope,
+            normalized=normalized,
+            exact_key=f"{EXACT_KEY_PREFIX}{digest}",
+            student_name=student_profile.name,
+            bypass_reason=self.bypass_reason(context, student_profile),
+        )
+        if lookup.bypass_reason is None and len(normalized) < MIN_MESSAGE_LENGTH:
+            lookup.bypass_reason = "message trop court"
+        if lookup.bypassed:
+            self.stats["bypassed"] += 1
+        return lookup
+
+    def needs_embedding(self, lookup: CacheLookup) -> bool:
+        return self.semantic_enabled and not lookup.bypassed
+
+    # ----- Lecture -----
+
+    def get_exact(self, lookup: CacheLookup) -> Optional[Dict[str, Any]]:
+        if lookup.bypassed:
+            return None
+        raw = cache_service.get(lookup.exact_key)
+        if raw is None:
+            return None
+        payload = json.loads(raw) if isinstance(raw, str) else raw
+        self.stats["exact_hits"] += 1
+        return self._serve(payload, lookup, "exact", 1.0)
+
+    def get_similar(self, lookup: CacheLookup) -> Optional[Dict[str, Any]]:
+        """Niveau sémantique (après un miss exact) ; compte le miss final"""
+        if lookup.bypassed:
+            return None
+        if lookup.embedding is not None:
+            with self._lock:
+                index = self._indexes.get(lookup.scope)
+                if index is not None:
+                    self._indexes.move_to_end(lookup.scope)
+                    index.prune(time.time())
+                    similarity, payload = index.best_match(lookup.embedding)
+                    if payload is not None and similarity >= self.similarity_threshold:
+                        self.stats["semantic_hits"] += 1
+                        return self._serve(payload, lookup, "semantic", similarity)
+        self.stats["misses"] += 1
+        return None
+
+    def _serve(
+        self, payload: Dict[str, Any], lookup: CacheLookup, tier: str, similarity: float
+    ) -> Dict[str, Any]:
+        result = dict(payload)
+        result["response"] = result.get("response", "").replace(
+            NAME_PLACEHOLDER, lookup.student_name or ""
+        )
+        self.stats["tokens_saved"] += result.get("usage", {}).get("total_tokens", 0)
+        result["cache"] = {
+            "hit": True,
+            "tier": tier,
+            "similarity": round(similarity, 4),
+        }
+        return result
+
+    # ----- Écriture -----
+
+    def store(self, lookup: CacheLookup, result: Dict[str, Any]):
+        """Met en cache une réponse réelle (jamais une réponse simulée)"""
+        if lookup.bypassed or result.get("metadata", {}).get("simulated"):
+            return
+        payload = {key: value for key, value in result.items() if key != "cache"}
+        if lookup.student_name:
+            payload["response"] = re.sub(
+                rf"\b{re.escape(lookup.student_name)}\b",
+                NAME_PLACEHOLDER,
+                payload.get("response", ""),
+            )
+
+        cache_service.set(lookup.exact_key, json.dumps(payload), timeout=self.ttl)
+        if lookup.embedding is not None:
+            with self._lock:
+                index = self._indexes.get(lookup.scope)
+                if index is None:
+                    if len(self._indexes) >= MAX_SCOPES:
+                        self._indexes.popitem(last=False)
+                    index = self._indexes[lookup.scope] = _ScopeIndex(
+                        lookup.embedding.shape[0]
+                    )
+                else:
+                    self._indexes.move_to_end(lookup.scope)
+                index.add(lookup.embedding, payload, time.time() + self.ttl)
+        self.stats["stores"] += 1
+
+    # ----- Statistiques -----
+
+    def record_embedding_usage(self, response: Any):
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.stats["embedding_tokens"] += usage.total_tokens or 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        lookups = hits + self.stats["misses"]
+        with self._lock:
+            indexed = sum(len(index.payloads) for index in self._indexes.values())
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "semantic_entries": indexed,
+            "similarity_threshold": self.similarity_threshold,
+            "ttl": self.ttl,
+        }
+
+
+def normalized_embedding(vector: List[float]) -> np.ndarray:
+    """Plongement en float32 de norme 1 (similarité cosinus = produit scalaire)"""
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
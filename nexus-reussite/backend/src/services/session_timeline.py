@@ -0,0 +1,226 @@
+"""
+Chronologie paginée des séances d'un étudiant
+Nexus Réussite - Session Timeline
+
+Séances individuelles et séances des groupes suivis, triées de la plus
+récente à la plus ancienne. Le coût d'une page est constant :
+- une requête par type de séance, enseignant (et groupe) chargés par jointure ;
+- une seule requête IN pour les présences de la page ;
+- pagination par curseur (keyset) sur (scheduled_at, type, id) au lieu
+  d'un OFFSET, qui relirait tout l'historique déjà parcouru.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import joinedload
+
+from models.formulas import (
+    Enrollment,
+    Group,
+    GroupSession,
+    IndividualSession,
+    SessionAttendance,
+)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# À date égale, les séances individuelles précèdent les séances de groupe
+# (ordre décroissant sur le type, comme sur scheduled_at et id)
+INDIVIDUAL = "individual"
+GROUP = "group"
+
+TimelineCursor = Tuple[datetime, str, int]
+
+
+def encode_cursor(scheduled_at: datetime, kind: str, session_id: int) -> str:
+    """Curseur opaque désignant la dernière séance d'une page"""
+    raw = f"{scheduled_at.isoformat()}|{kind}|{session_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> TimelineCursor:
+    """Décode un curseur ; lève ValueError s'il est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        scheduled_at, kind, session_id = raw.split("|")
+        if kind not in (INDIVIDUAL, GROUP):
+            raise ValueError(kind)
+        return datetime.fromisoformat(scheduled_at), kind, int(session_id)
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError("Curseur de pagination invalide") from e
+
+
+def _after_cursor(model, kind: str, cursor: Optional[TimelineCursor]):
+    """Condition keyset : séances strictement après le curseur (ordre décroissant)"""
+    if cursor is None:
+        return None
+    cursor_at, cursor_kind, cursor_id = cursor
+    if kind == cursor_kind:
+        return or_(
+            model.scheduled_at < cursor_at,
+            and_(model.scheduled_at == cursor_at, model.id < cursor_id),
+        )
+    if kind > cursor_kind:
+        # Ce type précède celui du curseur à date égale : déjà servi
+        return model.scheduled_at < cursor_at
+    return model.scheduled_at <= cursor_at
+
+
+def _teacher_data(teacher) -> Optional[Dict[str, Any]]:
+    if teacher is None:
+        return None
+    return {
+        "name": f"{teacher.first_name} {teacher.last_name}",
+        "email": teacher.email,
+    }
+
+
+def _individual_data(session: IndividualSession) -> Dict[str, Any]:
+    return {
+        "id": session.id,
+        "type": INDIVIDUAL,
+        "subject": session.subject,
+        "scheduled_at": session.scheduled_at.isoformat(),
+        "duration_minutes": session.duration_minutes,
+        "status": session.status,
+        "teacher": _teacher_data(session.teacher),
+        "topics_covered": session.topics_covered,
+        "homework_assigned": session.homework_assigned,
+        "teacher_notes": session.teacher_notes,
+        "performance": session.student_performance,
+    }
+
+
+def _group_data(
+    session: GroupSession, attendance: Optional[SessionAttendance]
+) -> Dict[str, Any]:
+    group = session.group
+    return {
+        "id": session.id,
+        "type": GROUP,
+        "subject": session.subject,
+        "scheduled_at": session.scheduled_at.isoformat(),
+        "duration_minutes": session.duration_minutes,
+        "status": session.status,
+        "group": {"name": group.name, "level": group.level} if group else None,
+        "teacher": _teacher_data(group.teacher) if group else None,
+        "topics_covered": session.topics_covered,
+        "homework_assigned": session.homework_assigned,
+        "teacher_notes": session.teacher_notes,
+        "attendance": (
+            {
+                "is_present": attendance.is_present,
+                "participation_score": attendance.participation_score,
+                "individual_notes": attendance.individual_notes,
+            }
+            if attendance
+            else None
+        ),
+    }
+
+
+def _individual_page(
+    student_id: int, cursor: Optional[TimelineCursor], limit: int
+) -> List[IndividualSession]:
+    query = IndividualSession.query.options(
+        joinedload(IndividualSession.teacher)
+    ).filter(IndividualSession.student_id == student_id)
+    condition = _after_cursor(IndividualSession, INDIVIDUAL, cursor)
+    if condition is not None:
+        query = query.filter(condition)
+    return (
+        query.order_by(
+            IndividualSession.scheduled_at.desc(), IndividualSession.id.desc()
+        )
+        .limit(limit)
+        .all()
+    )
+
+
+def _group_page(
+    student_id: int, cursor: Optional[TimelineCursor], limit: int
+) -> List[GroupSession]:
+    # Sous-requête plutôt que jointure : une séance n'apparaît qu'une fois
+    # même si l'étudiant a plusieurs inscriptions actives dans le groupe
+    active_groups = select(Enrollment.group_id).where(
+        Enrollment.student_id == student_id,
+        Enrollment.is_active.is_(True),
+        Enrollment.group_id.isnot(None),
+    )
+    query = GroupSession.query.options(
+        joinedload(GroupSession.group).joinedload(Group.teacher)
+    ).filter(GroupSession.group_id.in_(active_groups))
+    condition = _after_cursor(GroupSession, GROUP, cursor)
+    if condition is not None:
+        query = query.filter(condition)
+    return (
+        query.order_by(GroupSession.scheduled_at.desc(), GroupSession.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def _attendances_by_session(
+    student_id: int, session_ids: List[int]
+) -> Dict[int, SessionAttendance]:
+    """Présences de l'étudiant pour les séances de la page, en une requête"""
+    if not session_ids:
+        return {}
+    attendances = (
+        SessionAttendance.query.filter(
+            SessionAttendance.student_id == student_id,
+            SessionAttendance.session_id.in_(session_ids),
+        )
+        .order_by(SessionAttendance.id)
+        .all()
+    )
+    by_session: Dict[int, SessionAttendance] = {}
+    for attendance in attendances:
+        by_session.setdefault(attendance.session_id, attendance)
+    return by_session
+
+
+def get_session_timeline(
+    student_id: int, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE
+) -> Dict[str, Any]:
+    """Une page de la chronologie des séances d'un étudiant
+
+    Returns:
+        {"sessions": [...], "next_cursor": str | None, "has_more": bool}
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    position = decode_cursor(cursor) if cursor else None
+
+    # limit + 1 de chaque côté : suffisant pour la fusion et pour has_more
+    candidates = [
+        (session.scheduled_at, INDIVIDUAL, session.id, session)
+        for session in _individual_page(student_id, position, limit + 1)
+    ]
+    candidates.extend(
+        (session.scheduled_at, GROUP, session.id, session)
+        for session in _group_page(student_id, position, limit + 1)
+    )
+    candidates.sort(key=lambda item: item[:3], reverse=True)
+
+    has_more = len(candidates) > limit
+    page = candidates[:limit]
+
+    attendances = _attendances_by_session(
+        student_id, [item[2] for item in page if item[1] == GROUP]
+    )
+    sessions = [
+        (
+            _individual_data(session)
+            if kind == INDIVIDUAL
+            else _group_data(session, attendances.get(session_id))
+        )
+        for _, kind, session_id, session in page
+    ]
+
+    next_cursor = encode_cursor(*page[-1][:3]) if has_more and page else None
+    return {"sessions": sessions, "next_cursor": next_cursor, "has_more": has_more}
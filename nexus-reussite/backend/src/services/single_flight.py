@@ -0,0 +1,385 @@
+"""
+Cache des calculs coûteux avec coalescence des requêtes (single-flight)
+Nexus Réussite - Single-Flight Cache
+
+Quand une entrée expire, un seul appelant la recalcule :
+- dans un processus, les threads concurrents attendent le résultat du
+  premier (un `_Flight` par clé) ;
+- entre workers, le premier pose un verrou Redis (SET NX PX), les autres
+  attendent que la valeur apparaisse dans le cache.
+
+Avec `stale_ttl`, une entrée expirée reste servie pendant ce délai
+supplémentaire (stale-while-revalidate) : seul le détenteur du verrou
+recalcule, les autres appelants reçoivent immédiatement l'ancienne valeur.
+"""
+
+import base64
+import dataclasses
+import enum
+import hashlib
+import json
+import logging
+import pickle
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from .cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+# Durée de vie maximale d'un verrou de recalcul entre workers
+DEFAULT_LOCK_TIMEOUT = 30.0
+# Intervalle de scrutation du cache par les workers qui attendent
+LOCK_POLL_INTERVAL = 0.05
+
+# Libère le verrou seulement s'il appartient encore à l'appelant
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+stats = {
+    "hits": 0,
+    "stale_hits": 0,
+    "misses": 0,
+    "computations": 0,
+    "coalesced": 0,
+    "lock_waits": 0,
+}
+
+
+# ----- Clés de cache stables -----
+
+
+def _key_default(value: Any) -> Any:
+    """Forme JSON déterministe des arguments non natifs"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return f"{type(value).__name__}.{value.name}"
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, "id"):
+        # Modèles SQLAlchemy : identifiés par leur classe et leur clé primaire
+        return f"{type(value).__name__}#{value.id}"
+    return repr(value)
+
+
+def make_cache_key(
+    func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any], key_prefix: str = ""
+) -> str:
+    """Clé identique d'un processus à l'autre pour les mêmes arguments
+
+    Contrairement à `hash()`, randomisé par processus, le condensat est
+    calculé sur une sérialisation JSON canonique des arguments.
+    """
+    canonical = json.dumps(
+        [args, kwargs], sort_keys=True, default=_key_default, separators=(",", ":")
+    )
+    digest = hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+    name = f"{func.__module__}.{func.__qualname__}"
+    return f"{key_prefix}:{name}:{digest}" if key_prefix else f"{name}:{digest}"
+
+
+# ----- Sérialisation -----
+
+
+# Types restitués à l'identique par json.loads
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def _check_json_native(value: Any, path: str = "$"):
+    """Refuse ce que JSON restituerait sous un autre type (tuple, datetime...)
+
+    Sans ce contrôle, le premier appel renverrait un tuple et les suivants,
+    servis par le cache, une liste.
+    """
+    if isinstance(value, _JSON_SCALARS):
+        return
+    if isinstance(value, list):
+        for index, item in enumerate(value):
+            _check_json_native(item, f"{path}[{index}]")
+        return
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if not isinstance(key, str):
+                raise TypeError(
+                    f"Clé non textuelle {key!r} en {path} : non restituable en JSON"
+                )
+            _check_json_native(item, f"{path}.{key}")
+        return
+    raise TypeError(
+        f"Valeur {type(value).__name__} en {path} non restituable en JSON "
+        "(convertir le résultat ou choisir un autre sérialiseur)"
+    )
+
+
+def _encode(value: Any, serializer: str) -> str:
+    if serializer == "json":
+        _check_json_native(value)
+        return json.dumps(value)
+    if serializer == "pickle":
+        raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    elif serializer == "msgpack":
+        raw = msgpack.packb(value, use_bin_type=True)
+    else:
+        raise ValueError(f"Sérialiseur inconnu: {serializer}")
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _decode(data: str, serializer: str) -> Any:
+    if serializer == "json":
+        return json.loads(data)
+    raw = base64.b64decode(data)
+    if serializer == "pickle":
+        return pickle.loads(raw)
+    return msgpack.unpackb(raw, raw=False)
+
+
+def _pack_entry(value: Any, fresh_until: float, serializer: str) -> str:
+    """Enveloppe stockée : valeur sérialisée + fin de fraîcheur (epoch)"""
+    return json.dumps(
+        {"f": fresh_until, "s": serializer, "d": _encode(value, serializer)},
+        separators=(",", ":"),
+    )
+
+
+def _unpack_entry(entry: Any, serializer: str) -> Optional[Tuple[Any, float]]:
+    """(valeur, fin de fraîcheur), ou None si l'entrée est illisible
+
+    L'entrée est toujours décodée avec le sérialiseur du décorateur : celui
+    inscrit dans l'enveloppe vient de Redis et n'est pas digne de confiance
+    (un "pickle" injecté ne doit jamais atteindre `pickle.loads`).
+    """
+    try:
+        envelope = json.loads(entry)
+        if envelope.get("s") != serializer:
+            logger.warning(
+                f"Entrée de cache rejetée : sérialiseur {envelope.get('s')!r} "
+                f"au lieu de {serializer!r}"
+            )
+            return None
+        return _decode(envelope["d"], serializer), envelope["f"]
+    except Exception:  # pylint: disable=broad-except
+        logger.warning("Entrée de cache illisible ignorée", exc_info=True)
+        return None
+
+
+# ----- Coalescence dans le processus -----
+
+
+class _Flight:
+    """Calcul en cours pour une clé, partagé par les threads concurrents"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_flights: Dict[str, _Flight] = {}
+# Protège `_flights` et les compteurs de `stats`
+_flights_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _flights_lock:
+        stats[name] += 1
+
+
+# ----- Verrou entre workers -----
+
+
+class _RedisLock:
+    """Verrou Redis à expiration, libéré seulement par son détenteur"""
+
+    _release_script = None
+
+    def __init__(self, key: str, timeout: float):
+        self.client = cache_service.redis_client
+        self.key = f"{cache_service.key_prefix}lock:{key}"
+        self.timeout_ms = int(timeout * 1000)
+        self.token = uuid.uuid4().hex
+
+    def acquire(self) -> bool:
+        if self.client is None:
+            return True
+        try:
+            return bool(
+                self.client.set(self.key, self.token, nx=True, px=self.timeout_ms)
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            # Redis indisponible : on calcule sans coordination
+            logger.warning(f"Verrou Redis indisponible ({self.key}): {e}")
+            return True
+
+    def release(self):
+        if self.client is None:
+            return
+        try:
+            if _RedisLock._release_script is None:
+                _RedisLock._release_script = self.client.register_script(
+                    _RELEASE_LOCK_SCRIPT
+                )
+            _RedisLock._release_script(keys=[self.key], args=[self.token])
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(f"Libération du verrou {self.key} impossible: {e}")
+
+
+# ----- Décorateur -----
+
+
+def single_flight_cache(
+    ttl: int = 300,
+    key_prefix: str = "",
+    stale_ttl: int = 0,
+    serializer: str = "json",
+    key_func: Optional[Callable[..., str]] = None,
+    lock_timeout: float = DEFAULT_LOCK_TIMEOUT,
+):
+    """Met en cache le résultat d'une fonction, recalculé une fois par expiration
+
+    Args:
+        ttl: durée de fraîcheur du résultat (secondes)
+        key_prefix: préfixe de la clé de cache
+        stale_ttl: durée pendant laquelle un résultat expiré reste servi
+            pendant son recalcul (0 : pas de stale-while-revalidate)
+        serializer: "json" (défaut, types JSON natifs uniquement : TypeError
+            sinon), "msgpack" ou "pickle" (à réserver à des données de
+            confiance : le cache Redis est partagé)
+        key_func: fonction (*args, **kwargs) -> clé, si les arguments ne se
+            sérialisent pas de façon stable (objets sans `id`, `self`...)
+        lock_timeout: durée maximale d'attente / de validité du verrou
+    """
+    if serializer == "msgpack" and msgpack is None:
+        raise ImportError("Le sérialiseur msgpack requiert le paquet `msgpack`")
+
+    def decorator(func: Callable) -> Callable:
+        def compute_and_store(cache_key: str, args, kwargs) -> Any:
+            result = func(*args, **kwargs)
+            _count("computations")
+            # Un résultat non sérialisable est une erreur de programmation :
+            # elle remonte au lieu de changer le type des réponses suivantes
+            entry = _pack_entry(result, time.time() + ttl, serializer)
+            cache_service.set(cache_key, entry, timeout=ttl + stale_ttl)
+            return result
+
+        def read(cache_key: str) -> Optional[Tuple[Any, float]]:
+            entry = cache_service.get(cache_key)
+            return _unpack_entry(entry, serializer) if entry is not None else None
+
+        def wait_for_other_worker(cache_key: str, args, kwargs) -> Any:
+            """Attend la valeur calculée par le worker détenteur du verrou"""
+            _count("lock_waits")
+            deadline = time.monotonic() + lock_timeout
+            delay = LOCK_POLL_INTERVAL
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                cached = read(cache_key)
+                if cached is not None:
+                    return cached[0]
+                delay = min(delay * 2, 0.5)
+            # Le détenteur a échoué ou expiré : on calcule nous-mêmes
+            return compute_and_store(cache_key, args, kwargs)
+
+        def lead(cache_key: str, args, kwargs, stale: Optional[Tuple[Any, float]]):
+            """Recalcul par le thread meneur de ce processus"""
+            lock = _RedisLock(cache_key, lock_timeout)
+            if lock.acquire():
+                try:
+                    # Un autre worker a pu écrire entre notre lecture et le verrou
+                    cached = read(cache_key)
+                    if cached is not None and cached[1] > time.time():
+                        return cached[0]
+                    return compute_and_store(cache_key, args, kwargs)
+                finally:
+                    lock.release()
+            if stale is not None:
+                # Un autre worker recalcule : l'ancienne valeur suffit
+                _count("stale_hits")
+                return stale[0]
+            return wait_for_other_worker(cache_key, args, kwargs)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if key_func is not None:
+                cache_key = key_func(*args, **kwargs)
+                if key_prefix:
+                    cache_key = f"{key_prefix}:{cache_key}"
+            else:
+                cache_key = make_cache_key(func, args, kwargs, key_prefix)
+
+            cached = read(cache_key)
+            if cached is not None and cached[1] > time.time():
+                _count("hits")
+                return cached[0]
+
+            with _flights_lock:
+                flight = _flights.get(cache_key)
+                leader = flight is None
+                if leader:
+                    flight = _flights[cache_key] = _Flight()
+                    stats["misses"] += 1
+                elif cached is not None:
+                    stats["stale_hits"] += 1
+                else:
+                    stats["coalesced"] += 1
+
+            if not leader:
+                if cached is not None:
+                    # Recalcul déjà en cours dans ce processus
+                    return cached[0]
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+
+            try:
+                flight.result = lead(cache_key, args, kwargs, cached)
+                return flight.result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with _flights_lock:
+                    _flights.pop(cache_key, None)
+                flight.done.set()
+
+        return wrapper
+
+    return decorator
+
+
+def get_stats() -> Dict[str, Any]:
+    """Compteurs du cache single-flight"""
+    with _flights_lock:
+        counters = dict(stats)
+        in_flight = len(_flights)
+    lookups = counters["hits"] + counters["stale_hits"] + counters["misses"]
+    return {
+        **counters,
+        "in_flight": in_flight,
+        "hit_rate": (
+            round((counters["hits"] + counters["stale_hits"]) / lookups, 4)
+            if lookups
+            else 0.0
+        ),
+    }
@@ -0,0 +1,355 @@
+"""
+Profiler SQL unique de l'application
+Nexus Réussite - SQL Profiler
+
+Un seul couple d'écouteurs `before/after_cursor_execute` sur Engine :
+- chaque instruction est réduite à son empreinte (littéraux, paramètres et
+  listes IN remplacés par `?`), aucune valeur liée n'est conservée ;
+- par empreinte : nombre d'exécutions, temps cumulé et maximal, lignes
+  (rowcount, quand le pilote le fournit), endpoints appelants, et un tampon
+  circulaire des dernières durées pour les percentiles p50 / p95 / p99 ;
+- chaque requête SQL est attribuée à l'endpoint Flask et au request id ;
+- à la fin d'une requête HTTP, une empreinte exécutée plus de
+  `SQL_N_PLUS_ONE_THRESHOLD` fois est signalée comme motif N+1.
+
+Toutes les structures sont bornées : nombre d'empreintes, échantillons par
+empreinte, requêtes lentes et détections N+1 récentes.
+"""
+
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .request_trace import SQL, record_span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_QUERY_THRESHOLD = 0.5  # secondes
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+# Empreintes distinctes suivies ; au-delà, agrégées dans OTHER_FINGERPRINT
+MAX_FINGERPRINTS = 1000
+OTHER_FINGERPRINT = "<autres instructions>"
+# Dernières durées conservées par empreinte pour les percentiles
+LATENCY_SAMPLES = 512
+# Endpoints distincts retenus par empreinte
+MAX_ENDPOINTS_PER_FINGERPRINT = 20
+RECENT_SLOW_QUERIES = 100
+RECENT_N_PLUS_ONE = 100
+MAX_FINGERPRINT_LENGTH = 2000
+
+# Verbes distingués dans les spans et métriques SQL (ensemble borné)
+SQL_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"})
+
+NO_ENDPOINT = "<hors requête>"
+# Route inconnue : jamais le chemin brut, pour borner les endpoints suivis
+UNMATCHED_ENDPOINT = "<route inconnue>"
+
+_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*", re.DOTALL)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PARAMETERS = re.compile(
+    r"%\(\w+\)s|%s|(?<![:\w]):\w+|\$\d+|\bTRUE\b|\bFALSE\b",
+    re.IGNORECASE,
+)
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROW_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_POSTCOMPILE = re.compile(r"\(?\s*__\[POSTCOMPILE_\w+\]\s*\)?")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Empreinte d'une instruction : même requête, valeurs différentes
+
+    >>> fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'x'")
+    'SELECT * FROM t WHERE id IN (?) AND name = ?'
+    """
+    normalized = _COMMENTS.sub(" ", statement)
+    normalized = _STRING_LITERAL.sub("?", normalized)
+    normalized = _POSTCOMPILE.sub("(?)", normalized)
+    normalized = _PARAMETERS.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _VALUE_LIST.sub("(?)", normalized)
+    normalized = _ROW_LIST.sub("(?)", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return normalized[:MAX_FINGERPRINT_LENGTH]
+
+
+def statement_operation(statement: str) -> str:
+    """Verbe SQL de l'instruction (SELECT, INSERT...), OTHER sinon"""
+    verb = statement.lstrip(" \t\n(").split(None, 1)[:1]
+    operation = verb[0].upper() if verb else ""
+    return operation if operation in SQL_OPERATIONS else "OTHER"
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class FingerprintStats:
+    """Agrégats bornés d'une empreinte"""
+
+    __slots__ = ("calls", "total_time", "max_time", "rows", "samples", "endpoints")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+        self.samples: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.endpoints: Counter = Counter()
+
+    def record(self, duration: float, rows: int, endpoint: str):
+        self.calls += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.rows += rows
+        self.samples.append(duration)
+        if (
+            endpoint in self.endpoints
+            or len(self.endpoints) < MAX_ENDPOINTS_PER_FINGERPRINT
+        ):
+            self.endpoints[endpoint] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        return {
+            "calls": self.calls,
+            "total_time": self.total_time,
+            "max_time": self.max_time,
+            "mean_time": self.total_time / self.calls if self.calls else 0.0,
+            "p50": _percentile(ordered, 0.50),
+            "p95": _percentile(ordered, 0.95),
+            "p99": _percentile(ordered, 0.99),
+            "rows": self.rows,
+            "endpoints": dict(self.endpoints.most_common(5)),
+        }
+
+
+class SQLProfiler:
+    """Profiler des requêtes SQL, partagé par tout le processus"""
+
+    def __init__(
+        self,
+        slow_query_threshold: float = DEFAULT_SLOW_QUERY_THRESHOLD,
+        n_plus_one_threshold: int = DEFAULT_N_PLUS_ONE_THRESHOLD,
+    ):
+        self.slow_query_threshold = slow_query_threshold
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self._listening = False
+        # Agrégation par empreinte (ENABLE_SQL_PROFILING) ; sinon, les
+        # écouteurs ne font qu'alimenter les spans SQL du traçage
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        """Remet à zéro toutes les statistiques"""
+        with self._lock:
+            self.total_queries = 0
+            self.total_time = 0.0
+            self.fingerprints: Dict[str, FingerprintStats] = {}
+            self.slow_queries: Deque[Dict[str, Any]] = deque(maxlen=RECENT_SLOW_QUERIES)
+            self.slowest_query: Optional[Dict[str, Any]] = None
+            self.n_plus_one: Deque[Dict[str, Any]] = deque(maxlen=RECENT_N_PLUS_ONE)
+            self.n_plus_one_counts: Counter = Counter()
+
+    # ----- Installation -----
+
+    def init_app(self, app):
+        """Installe les écouteurs SQL et les hooks de requête Flask
+
+        Sans effet si ENABLE_SQL_PROFILING n'est pas activé (production).
+        """
+        if "sql_profiler" in app.extensions:
+            return
+        if not app.config.get("ENABLE_SQL_PROFILING", False):
+            return
+        app.extensions["sql_profiler"] = self
+        self.slow_query_threshold = app.config.get(
+            "SQL_SLOW_QUERY_THRESHOLD", self.slow_query_threshold
+        )
+        self.n_plus_one_threshold = app.config.get(
+            "SQL_N_PLUS_ONE_THRESHOLD", self.n_plus_one_threshold
+        )
+        self.enabled = True
+        self.install()
+        logger.info("🔍 Profiling SQL activé")
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def install(self):
+        """Écouteurs globaux sur Engine, enregistrés une seule fois"""
+        if self._listening:
+            return
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+        self._listening = True
+
+    # ----- Écouteurs -----
+
+    @staticmethod
+    def _before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):  # pylint: disable=unused-argument,too-many-arguments
+        if context is not None:
+            context._query_start_ns = time.perf_counter_ns()
+
+    def _after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):  # pylint: disable=unused-argument,too-many-arguments
+        start = getattr(context, "_query_start_ns", None)
+        if start is None:
+            return
+        duration_ns = time.perf_counter_ns() - start
+        record_span(SQL, duration_ns, statement_operation(statement))
+        if not self.enabled:
+            return
+        rows = cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else 0
+        self.record(statement, duration_ns / 1e9, rows)
+
+    def record(self, statement: str, duration: float, rows: int = 0):
+        """Enregistre une exécution (appelé par l'écouteur after_cursor_execute)"""
+        key = fingerprint(statement)
+        endpoint, request_id = _request_attribution()
+
+        with self._lock:
+            self.total_queries += 1
+            self.total_time += duration
+            stats = self.fingerprints.get(key)
+            if stats is None:
+                if len(self.fingerprints) >= MAX_FINGERPRINTS:
+                    key = OTHER_FINGERPRINT
+                    stats = self.fingerprints.get(key)
+                if stats is None:
+                    stats = self.fingerprints[key] = FingerprintStats()
+            stats.record(duration, rows, endpoint)
+
+            if duration > self.slow_query_threshold:
+                slow_query = {
+                    "fingerprint": key,
+                    "duration": duration,
+                    "rows": rows,
+                    "endpoint": endpoint,
+                    "request_id": request_id,
+                    "timestamp": time.time(),
+                }
+                self.slow_queries.append(slow_query)
+                if (
+                    self.slowest_query is None
+                    or duration > self.slowest_query["duration"]
+                ):
+                    self.slowest_query = slow_query
+        if duration > self.slow_query_threshold:
+            logger.warning(
+                "🐌 Requête lente détectée (%.3fs) [%s]: %s...",
+                duration,
+                endpoint,
+                key[:100],
+            )
+
+        if has_request_context():
+            request_fingerprints = g.get("_sql_fingerprints")
+            if request_fingerprints is None:
+                request_fingerprints = g._sql_fingerprints = Counter()
+            request_fingerprints[key] += 1
+
+    # ----- Requêtes HTTP -----
+
+    @staticmethod
+    def _before_request():
+        if "request_id" not in g:
+            g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+
+    def _teardown_request(self, exc=None):  # pylint: disable=unused-argument
+        request_fingerprints = g.pop("_sql_fingerprints", None)
+        if not request_fingerprints:
+            return
+        endpoint, request_id = _request_attribution()
+        for key, count in request_fingerprints.items():
+            if count <= self.n_plus_one_threshold:
+                continue
+            with self._lock:
+                self.n_plus_one_counts[(endpoint, key)] += 1
+                self.n_plus_one.append(
+                    {
+                        "endpoint": endpoint,
+                        "request_id": request_id,
+                        "fingerprint": key,
+                        "executions": count,
+                        "timestamp": time.time(),
+                    }
+                )
+            logger.warning(
+                "🔁 Motif N+1 possible [%s] %d exécutions: %s...",
+                endpoint,
+                count,
+                key[:100],
+            )
+
+    # ----- Lecture -----
+
+    def fingerprint_stats(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Empreintes de la plus coûteuse (temps cumulé) à la moins coûteuse"""
+        with self._lock:
+            entries = [
+                {"statement": key, **stats.to_dict()}
+                for key, stats in self.fingerprints.items()
+            ]
+        entries.sort(key=lambda entry: entry["total_time"], reverse=True)
+        return entries[:limit] if limit else entries
+
+    def n_plus_one_report(self, limit: int = 20) -> Dict[str, Any]:
+        """Motifs N+1 détectés : les plus fréquents et les plus récents"""
+        with self._lock:
+            frequent = self.n_plus_one_counts.most_common(limit)
+            recent = list(self.n_plus_one)[-limit:]
+        return {
+            "threshold": self.n_plus_one_threshold,
+            "patterns": [
+                {"endpoint": endpoint, "fingerprint": key, "requests": requests}
+                for (endpoint, key), requests in frequent
+            ],
+            "recent": recent[::-1],
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Totaux, requêtes lentes récentes et requête la plus lente"""
+        with self._lock:
+            recent_slow = list(self.slow_queries)[-10:]
+            return {
+                "total_queries": self.total_queries,
+                "total_time": self.total_time,
+                "average_time": (
+                    self.total_time / self.total_queries if self.total_queries else 0
+                ),
+                "fingerprints": len(self.fingerprints),
+                "slow_query_threshold": self.slow_query_threshold,
+                "slow_queries_count": len(self.slow_queries),
+                "slowest_query": self.slowest_query,
+                "recent_slow_queries": recent_slow[::-1],
+                "n_plus_one_count": sum(self.n_plus_one_counts.values()),
+            }
+
+
+def _request_attribution():
+    """(endpoint, request id) de la requête HTTP en cours"""
+    if not has_request_context():
+        return NO_ENDPOINT, None
+    return request.endpoint or UNMATCHED_ENDPOINT, g.get("request_id")
+
+
+# Instance globale
+sql_profiler = SQLProfiler()
@@ -0,0 +1,67 @@
+"""
+Réponses en flux Server-Sent Events
+Nexus Réussite - Streaming
+
+Les générateurs de réponse d'ARIA produisent des événements `(nom, données)` :
+- `token` : fragment de texte (`{"content": "..."}`), dès sa réception ;
+- `done` : événement final avec les métadonnées et l'usage des jetons ;
+- `error` : échec après le début du flux (la réponse HTTP est déjà partie).
+
+`sse_response` les sérialise au format `text/event-stream` ; le client les lit
+avec `fetch` + `ReadableStream` (POST) ou `EventSource`.
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+from flask import Response, stream_with_context
+
+TOKEN = "token"
+DONE = "done"
+ERROR = "error"
+
+StreamEvent = Tuple[str, Dict[str, Any]]
+
+# Mot et espaces qui le suivent : découpage des réponses simulées
+_WORD = re.compile(r"\S+\s*|\s+")
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Sérialise un événement SSE (données JSON sur une seule ligne)"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def text_chunks(text: str) -> Iterator[str]:
+    """Découpe un texte en fragments mot par mot (flux simulés)"""
+    return (match.group(0) for match in _WORD.finditer(text))
+
+
+def simulated_stream(
+    result: Dict[str, Any], text_key: str = "response"
+) -> Iterator[StreamEvent]:
+    """Rejoue une réponse complète comme un flux : fragments puis `done`"""
+    for chunk in text_chunks(result.get(text_key, "")):
+        yield TOKEN, {"content": chunk}
+    yield DONE, {key: value for key, value in result.items() if key != text_key}
+
+
+def sse_response(events: Iterable[StreamEvent]) -> Response:
+    """Réponse Flask diffusant les événements au fil de leur production"""
+
+    def generate():
+        # Ouvre le flux immédiatement (proxys, délai avant le premier jeton)
+        yield ": flux ARIA\n\n"
+        for event, data in events:
+            yield sse_event(event, data)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx : pas de mise en tampon de la réponse (proxy_buffering on)
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -0,0 +1,205 @@
+"""
+Liste paginée et recherche des étudiants
+Nexus Réussite - Student Directory
+
+- Pagination par curseur (keyset) sur (created_at, id), décroissant : le coût
+  d'une page ne dépend pas de sa position, contrairement à OFFSET.
+- Total approché : compteur incrémental des étudiants actifs (voir
+  services/global_stats.py), estimation du planificateur PostgreSQL, ou
+  COUNT mis en cache pour une recherche filtrée.
+- Recherche par nom ou email adossée à un index : trigrammes pg_trgm sur
+  PostgreSQL (ILIKE indexé), table FTS5 à tokenizer trigram sur SQLite. Les
+  index sont créés par la migration `b7d41c2e9a10` ; sans eux (ou pour un
+  terme de moins de 3 caractères), la recherche retombe sur ILIKE.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, column, or_, text
+
+from database import db
+from models.student import Student
+from performance_optimizer import cache_result
+
+from .global_stats import get_global_stats
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Durée de vie des comptes filtrés mis en cache (secondes)
+COUNT_CACHE_TTL = 60
+# Longueur minimale d'un terme pour les index trigrammes
+MIN_INDEXED_TERM_LENGTH = 3
+
+FTS_TABLE = "students_fts"
+
+# Présence de la table FTS5, par URL de moteur
+_fts_available: Dict[str, bool] = {}
+
+StudentCursor = Tuple[datetime, int]
+
+
+def encode_cursor(created_at: datetime, student_id: int) -> str:
+    """Curseur opaque désignant le dernier étudiant d'une page"""
+    raw = f"{created_at.isoformat()}|{student_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> StudentCursor:
+    """Décode un curseur ; lève ValueError s'il est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, student_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(student_id)
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError("Curseur de pagination invalide") from e
+
+
+# ----- Recherche -----
+
+
+def _has_fts_table() -> bool:
+    url = str(db.engine.url)
+    if url not in _fts_available:
+        _fts_available[url] = db.inspect(db.engine).has_table(FTS_TABLE)
+    return _fts_available[url]
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_condition(term: str):
+    """Condition de recherche d'un terme dans le nom ou l'email"""
+    term = term.strip()
+    if db.engine.dialect.name == "sqlite" and (
+        len(term) >= MIN_INDEXED_TERM_LENGTH and _has_fts_table()
+    ):
+        # Tokenizer trigram : une chaîne entre guillemets = sous-chaîne
+        phrase = '"' + term.replace('"', '""') + '"'
+        matches = text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q")
+        return Student.id.in_(matches.bindparams(q=phrase).columns(column("rowid")))
+
+    # PostgreSQL : ILIKE servi par les index gin_trgm_ops
+    pattern = f"%{_escape_like(term)}%"
+    return or_(
+        Student.full_name.ilike(pattern, escape="\\"),
+        Student.email.ilike(pattern, escape="\\"),
+    )
+
+
+def filtered_query(
+    active_only: bool = True,
+    grade_level: Optional[str] = None,
+    school: Optional[str] = None,
+    search: Optional[str] = None,
+):
+    """Requête des étudiants correspondant aux filtres de la liste"""
+    query = Student.query
+    if active_only:
+        query = query.filter(Student.is_active.is_(True))
+    if grade_level:
+        query = query.filter(Student.grade_level == grade_level)
+    if school:
+        query = query.filter(Student.school == school)
+    if search and search.strip():
+        query = query.filter(search_condition(search))
+    return query
+
+
+# ----- Total -----
+
+
+@cache_result(ttl=COUNT_CACHE_TTL, key_prefix="student_count")
+def _cached_count(
+    active_only: bool,
+    grade_level: Optional[str],
+    school: Optional[str],
+    search: Optional[str],
+) -> int:
+    return filtered_query(active_only, grade_level, school, search).count()
+
+
+def _planner_estimate() -> Optional[int]:
+    """Nombre de lignes estimé par PostgreSQL (pg_class.reltuples)"""
+    if db.engine.dialect.name != "postgresql":
+        return None
+    estimate = db.session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'students'::regclass")
+    ).scalar()
+    # -1 : table jamais analysée
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+def estimated_total(
+    active_only: bool = True,
+    grade_level: Optional[str] = None,
+    school: Optional[str] = None,
+    search: Optional[str] = None,
+) -> Tuple[int, bool]:
+    """Total des étudiants correspondant aux filtres, sans COUNT(*) à chaque page
+
+    Returns:
+        (total, True si le total est une estimation ou peut dater)
+    """
+    if not (grade_level or school or (search and search.strip())):
+        if active_only:
+            return get_global_stats()["total_students"], False
+        estimate = _planner_estimate()
+        if estimate is not None:
+            return estimate, True
+    return _cached_count(active_only, grade_level, school, search), True
+
+
+# ----- Page -----
+
+
+def list_students_page(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    active_only: bool = True,
+    grade_level: Optional[str] = None,
+    school: Optional[str] = None,
+    search: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Une page d'étudiants, du plus récent au plus ancien
+
+    Returns:
+        {"students": [...], "next_cursor": str | None, "has_more": bool,
+         "total": int, "total_is_estimate": bool}
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = filtered_query(active_only, grade_level, school, search)
+
+    if cursor:
+        cursor_at, cursor_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                Student.created_at < cursor_at,
+                and_(Student.created_at == cursor_at, Student.id < cursor_id),
+            )
+        )
+
+    # Une ligne de plus que la page : suffit à savoir s'il en reste
+    students = (
+        query.order_by(Student.created_at.desc(), Student.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(students) > limit
+    students = students[:limit]
+
+    total, total_is_estimate = estimated_total(active_only, grade_level, school, search)
+    return {
+        "students": [student.to_dict() for student in students],
+        "next_cursor": (
+            encode_cursor(students[-1].created_at, students[-1].id)
+            if has_more
+            else None
+        ),
+        "has_more": has_more,
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+    }
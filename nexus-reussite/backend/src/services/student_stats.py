@@ -0,0 +1,402 @@
+"""
+Agrégats matérialisés du tableau de bord étudiant
+Nexus Réussite - Student Stats Rollup
+
+Les tables `student_stats` / `student_subject_stats` sont mises à jour dans
+la transaction même qui écrit une LearningSession ou une Assessment
+(événements SQLAlchemy after_insert / after_update / after_delete), par des
+UPDATE relatifs (`x = x + :delta`) qui ne perdent pas d'incrément entre
+écritures concurrentes.
+
+Un étudiant sans ligne d'agrégats (historique antérieur, suppression de
+session) est recalculé intégralement par la première écriture qui le
+concerne ; d'ici là, les lectures calculent les agrégats sans les
+enregistrer (une requête GET n'écrit rien).
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session, sessionmaker
+
+from database import db
+from models.student import (
+    Assessment,
+    LearningSession,
+    StudentStats,
+    StudentSubjectStats,
+)
+
+logger = logging.getLogger(__name__)
+
+RECENT_SESSIONS_LIMIT = 5
+RECENT_ASSESSMENTS_LIMIT = 3
+
+# Clés de Session.info : étudiants dont le tableau de bord mis en cache
+# doit être invalidé après le commit
+_DIRTY_STUDENTS_KEY = "student_stats_dirty"
+
+stats_table = StudentStats.__table__
+subject_table = StudentSubjectStats.__table__
+
+# Session ORM liée à la connexion d'un flush en cours (voir `_materialize`)
+_rollup_session = sessionmaker()
+
+SessionValues = Tuple[Optional[str], int, Optional[float], Optional[float]]
+
+
+def dashboard_cache_key(student_id: int) -> str:
+    """Clé du tableau de bord mis en cache (voir routes/students.py)"""
+    return f"student_dashboard:{student_id}"
+
+
+# ----- Mise à jour incrémentale -----
+
+
+def _mark_dirty(target, student_id: int):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY_STUDENTS_KEY, set()).add(student_id)
+
+
+def _session_values(
+    session: LearningSession, old: bool = False
+) -> Optional[SessionValues]:
+    """(matière, durée, complétion, précision) actuels ou d'avant la modification
+
+    Returns:
+        None si une ancienne valeur n'était pas chargée (inconnue)
+    """
+    state = inspect(session)
+    values = []
+    for name in ("subject", "duration_minutes", "completion_rate", "accuracy_rate"):
+        history = state.attrs[name].history
+        if old and history.deleted:
+            values.append(history.deleted[0])
+        elif old and history.added:
+            original = state.committed_state.get(name)
+            if original is not None:
+                # Attribut expiré au moment de la modification
+                return None
+            values.append(None)
+        else:
+            values.append(getattr(session, name))
+    subject, duration, completion, accuracy = values
+    return subject, duration or 0, completion, accuracy
+
+
+def _apply_session(connection, student_id: int, values: SessionValues, sign: int):
+    """Ajoute (sign=1) ou retire (sign=-1) la contribution d'une session"""
+    subject, duration, completion, accuracy = values
+    has_completion = int(completion is not None)
+    has_accuracy = int(accuracy is not None)
+
+    result = connection.execute(
+        subject_table.update()
+        .where(
+            subject_table.c.student_id == student_id,
+            subject_table.c.subject == subject,
+        )
+        .values(
+            session_count=subject_table.c.session_count + sign,
+            completion_sum=subject_table.c.completion_sum + sign * (completion or 0.0),
+            completion_count=subject_table.c.completion_count + sign * has_completion,
+            accuracy_sum=subject_table.c.accuracy_sum + sign * (accuracy or 0.0),
+            accuracy_count=subject_table.c.accuracy_count + sign * has_accuracy,
+        )
+    )
+    if result.rowcount == 0 and sign > 0:
+        # Première session de l'étudiant dans cette matière
+        connection.execute(
+            subject_table.insert().values(
+                student_id=student_id,
+                subject=subject,
+                session_count=1,
+                completion_sum=completion or 0.0,
+                completion_count=has_completion,
+                accuracy_sum=accuracy or 0.0,
+                accuracy_count=has_accuracy,
+            )
+        )
+
+
+def _load_recent(connection, student_id: int, column) -> Optional[List[Dict]]:
+    """Liste récente mémorisée, ligne verrouillée jusqu'à la fin de la transaction
+
+    Le verrou (FOR UPDATE, sans effet sous SQLite où les écritures sont
+    sérialisées) empêche deux écritures concurrentes de réécrire chacune la
+    liste lue avant l'autre.
+    """
+    raw = connection.execute(
+        db.select(column)
+        .where(stats_table.c.student_id == student_id)
+        .with_for_update()
+    ).scalar()
+    return json.loads(raw) if raw else []
+
+
+def _invalidate(connection, student_id: int):
+    """Supprime les agrégats : recalculés par la prochaine écriture"""
+    connection.execute(
+        subject_table.delete().where(subject_table.c.student_id == student_id)
+    )
+    connection.execute(
+        stats_table.delete().where(stats_table.c.student_id == student_id)
+    )
+
+
+def _materialize(connection, student_id: int) -> bool:
+    """Enregistre les agrégats recalculés, dans la transaction de l'écriture
+
+    Les tables sources contiennent déjà la ligne en cours d'écriture.
+
+    Returns:
+        False si une écriture concurrente les a créés entre-temps : il reste
+        alors à lui appliquer l'écriture en cours de façon incrémentale
+    """
+    with _rollup_session(bind=connection) as session:
+        values, subjects = _compute(session, student_id)
+    try:
+        with connection.begin_nested():
+            connection.execute(stats_table.insert().values(**values))
+            if subjects:
+                connection.execute(subject_table.insert(), subjects)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _rebuild(connection, student_id: int):
+    _invalidate(connection, student_id)
+    _materialize(connection, student_id)
+
+
+def _rollup_exists(connection, student_id: int) -> bool:
+    return (
+        connection.execute(
+            db.select(stats_table.c.student_id).where(
+                stats_table.c.student_id == student_id
+            )
+        ).first()
+        is not None
+    )
+
+
+def _on_session_insert(_mapper, connection, target: LearningSession):
+    _mark_dirty(target, target.student_id)
+    if not _rollup_exists(connection, target.student_id) and _materialize(
+        connection, target.student_id
+    ):
+        return
+
+    values = _session_values(target)
+    _apply_session(connection, target.student_id, values, 1)
+
+    recent = _load_recent(connection, target.student_id, stats_table.c.recent_sessions)
+    recent.insert(0, target.to_dict())
+    recent.sort(key=lambda item: item["created_at"] or "", reverse=True)
+    connection.execute(
+        stats_table.update()
+        .where(stats_table.c.student_id == target.student_id)
+        .values(
+            total_sessions=stats_table.c.total_sessions + 1,
+            total_minutes=stats_table.c.total_minutes + values[1],
+            recent_sessions=json.dumps(recent[:RECENT_SESSIONS_LIMIT]),
+        )
+    )
+
+
+def _on_session_update(_mapper, connection, target: LearningSession):
+    _mark_dirty(target, target.student_id)
+    if inspect(target).attrs.student_id.history.has_changes():
+        # Session réattribuée : les deux étudiants sont recalculés
+        for student_id in inspect(target).attrs.student_id.history.deleted:
+            _rebuild(connection, student_id)
+        _rebuild(connection, target.student_id)
+        return
+    if not _rollup_exists(connection, target.student_id) and _materialize(
+        connection, target.student_id
+    ):
+        return
+
+    old_values = _session_values(target, old=True)
+    if old_values is None:
+        _rebuild(connection, target.student_id)
+        return
+    new_values = _session_values(target)
+    if old_values != new_values:
+        _apply_session(connection, target.student_id, old_values, -1)
+        _apply_session(connection, target.student_id, new_values, 1)
+
+    recent = _load_recent(connection, target.student_id, stats_table.c.recent_sessions)
+    recent = [target.to_dict() if item["id"] == target.id else item for item in recent]
+    connection.execute(
+        stats_table.update()
+        .where(stats_table.c.student_id == target.student_id)
+        .values(
+            total_minutes=stats_table.c.total_minutes + new_values[1] - old_values[1],
+            recent_sessions=json.dumps(recent),
+        )
+    )
+
+
+def _on_session_delete(_mapper, connection, target: LearningSession):
+    _mark_dirty(target, target.student_id)
+    # La liste des sessions récentes devrait être complétée. Les agrégats ne
+    # sont pas recréés ici : l'étudiant peut être supprimé dans le même flush
+    _invalidate(connection, target.student_id)
+
+
+def _on_assessment_write(_mapper, connection, target: Assessment):
+    _mark_dirty(target, target.student_id)
+    if not _rollup_exists(connection, target.student_id) and _materialize(
+        connection, target.student_id
+    ):
+        return
+
+    recent = _load_recent(
+        connection, target.student_id, stats_table.c.recent_assessments
+    )
+    listed = any(item["id"] == target.id for item in recent)
+    if not target.is_completed:
+        if listed:
+            # Une évaluation retirée laisse un trou à combler : recalcul complet
+            _rebuild(connection, target.student_id)
+        return
+
+    recent = [item for item in recent if item["id"] != target.id]
+    recent.append(target.to_dict())
+    recent.sort(key=lambda item: item["completed_at"] or "", reverse=True)
+    connection.execute(
+        stats_table.update()
+        .where(stats_table.c.student_id == target.student_id)
+        .values(recent_assessments=json.dumps(recent[:RECENT_ASSESSMENTS_LIMIT]))
+    )
+
+
+def _on_assessment_delete(_mapper, connection, target: Assessment):
+    _mark_dirty(target, target.student_id)
+    _invalidate(connection, target.student_id)
+
+
+def _on_commit(session: Session):
+    """Invalide les tableaux de bord en cache des étudiants modifiés"""
+    student_ids = session.info.pop(_DIRTY_STUDENTS_KEY, None)
+    if not student_ids:
+        return
+    # pylint: disable=import-outside-toplevel
+    from services.cache_service import cache_service
+
+    for student_id in student_ids:
+        cache_service.delete(dashboard_cache_key(student_id))
+
+
+def _on_rollback(session: Session, _previous_transaction):
+    session.info.pop(_DIRTY_STUDENTS_KEY, None)
+
+
+event.listen(LearningSession, "after_insert", _on_session_insert)
+event.listen(LearningSession, "after_update", _on_session_update)
+event.listen(LearningSession, "after_delete", _on_session_delete)
+event.listen(Assessment, "after_insert", _on_assessment_write)
+event.listen(Assessment, "after_update", _on_assessment_write)
+event.listen(Assessment, "after_delete", _on_assessment_delete)
+event.listen(Session, "after_commit", _on_commit)
+event.listen(Session, "after_soft_rollback", _on_rollback)
+
+
+# ----- Lecture et recalcul complet -----
+
+
+def _compute(session: Session, student_id: int) -> Tuple[Dict, List[Dict]]:
+    """Agrégats d'un étudiant recalculés depuis les tables sources
+
+    Returns:
+        (ligne student_stats, lignes student_subject_stats)
+    """
+    totals = (
+        session.query(
+            func.count(LearningSession.id),
+            func.coalesce(func.sum(LearningSession.duration_minutes), 0),
+        )
+        .filter(LearningSession.student_id == student_id)
+        .one()
+    )
+    subject_rows = (
+        session.query(
+            LearningSession.subject,
+            func.count(LearningSession.id),
+            func.coalesce(func.sum(LearningSession.completion_rate), 0.0),
+            func.count(LearningSession.completion_rate),
+            func.coalesce(func.sum(LearningSession.accuracy_rate), 0.0),
+            func.count(LearningSession.accuracy_rate),
+        )
+        .filter(LearningSession.student_id == student_id)
+        .group_by(LearningSession.subject)
+        .all()
+    )
+    recent_sessions = (
+        session.query(LearningSession)
+        .filter(LearningSession.student_id == student_id)
+        .order_by(LearningSession.created_at.desc())
+        .limit(RECENT_SESSIONS_LIMIT)
+        .all()
+    )
+    recent_assessments = (
+        session.query(Assessment)
+        .filter(Assessment.student_id == student_id, Assessment.is_completed.is_(True))
+        .order_by(Assessment.completed_at.desc())
+        .limit(RECENT_ASSESSMENTS_LIMIT)
+        .all()
+    )
+
+    values = {
+        "student_id": student_id,
+        "total_sessions": totals[0],
+        "total_minutes": int(totals[1]),
+        "recent_sessions": json.dumps([item.to_dict() for item in recent_sessions]),
+        "recent_assessments": json.dumps(
+            [item.to_dict() for item in recent_assessments]
+        ),
+    }
+    subjects = [
+        {
+            "student_id": student_id,
+            "subject": row[0],
+            "session_count": row[1],
+            "completion_sum": float(row[2]),
+            "completion_count": row[3],
+            "accuracy_sum": float(row[4]),
+            "accuracy_count": row[5],
+        }
+        for row in subject_rows
+    ]
+    return values, subjects
+
+
+def compute_student_stats(student_id: int) -> StudentStats:
+    """Agrégats recalculés, non enregistrés (objet hors session)"""
+    values, subjects = _compute(db.session, student_id)
+    return StudentStats(
+        **values, subjects=[StudentSubjectStats(**row) for row in subjects]
+    )
+
+
+def get_student_stats(student_id: int) -> StudentStats:
+    """Agrégats d'un étudiant, calculés à la volée s'ils n'existent pas encore"""
+    stats = db.session.get(StudentStats, student_id)
+    if stats is None:
+        logger.info(f"Agrégats de l'étudiant {student_id} absents, calcul à la volée")
+        stats = compute_student_stats(student_id)
+    return stats
+
+
+def recent_activity(stats: StudentStats) -> Dict[str, Any]:
+    """Sessions et évaluations récentes mémorisées dans les agrégats"""
+    return {
+        "sessions": json.loads(stats.recent_sessions or "[]"),
+        "assessments": json.loads(stats.recent_assessments or "[]"),
+    }
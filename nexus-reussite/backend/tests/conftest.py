@@ -0,0 +1,29 @@
+"""Configuration commune des tests du backend"""
+
+import os
+import sys
+
+import pytest
+
+# Les modules s'importent depuis src/ (`from services...`, `from models...`)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+@pytest.fixture
+def app():
+    """Application minimale sur une base SQLite en mémoire"""
+    # pylint: disable=import-outside-toplevel,unused-import
+    from flask import Flask
+
+    import models.student  # noqa: F401
+    import models.user  # noqa: F401
+    from database import db
+
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(flask_app)
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,61 @@
+"""Comptabilité OpenAI : reprise après échec d'écriture et jours UTC"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from database import db
+from services import ai_usage
+from services.ai_usage import SUCCESS, UsageAccounting, get_usage_summary
+
+
+def record(accounting, request_type="chat", latency_ms=100.0):
+    accounting.record(request_type, "gpt-4o-mini", SUCCESS, latency_ms)
+
+
+def failing_write(_events):
+    raise OperationalError("INSERT", {}, Exception("base indisponible"))
+
+
+def test_failed_batch_does_not_evict_newer_events(app, monkeypatch):
+    accounting = UsageAccounting(max_buffer=3)
+    for index in range(3):
+        record(accounting, f"ancien-{index}")
+    monkeypatch.setattr(ai_usage, "_write_batch", failing_write)
+    assert accounting.flush() == 0
+
+    # Le tampon se remplit pendant la panne
+    for index in range(3):
+        record(accounting, f"nouveau-{index}")
+    assert accounting.pending == 6
+    assert accounting.stats["dropped"] == 0
+
+    monkeypatch.undo()
+    assert accounting.flush() == 6
+    types = [row.request_type for row in db.session.query(ai_usage.AIUsageEvent)]
+    assert sorted(types) == sorted(
+        [f"ancien-{index}" for index in range(3)]
+        + [f"nouveau-{index}" for index in range(3)]
+    )
+
+
+def test_pending_events_bounded_during_outage(app, monkeypatch):
+    accounting = UsageAccounting(max_buffer=2)
+    monkeypatch.setattr(ai_usage, "_write_batch", failing_write)
+    for _ in range(3):
+        record(accounting)
+        record(accounting)
+        accounting.flush()
+
+    # Un lot en reprise, plus le tampon plein ; le reste est compté perdu
+    assert accounting.pending == 4
+    assert accounting.stats["dropped"] == 2
+
+
+@pytest.mark.parametrize("days", [1, 7])
+def test_summary_window_uses_utc_days(app, days):
+    summary = get_usage_summary(days)
+
+    expected = datetime.utcnow().date() - timedelta(days=days - 1)
+    assert summary["since"] == expected.isoformat()
@@ -0,0 +1,70 @@
+"""Cache à deux niveaux : valeurs textuelles et lectures Redis illisibles"""
+
+import os
+
+import pytest
+
+from services.cache_service import TwoTierCache
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.results = []
+
+    def get(self, key):
+        self.results.append(self.client.store.get(key))
+
+    def pttl(self, _key):
+        self.results.append(60_000)
+
+    def setex(self, key, _timeout, value):
+        self.client.store[key] = value if isinstance(value, bytes) else value.encode()
+        self.results.append(True)
+
+    def publish(self, _channel, _message):
+        self.results.append(0)
+
+    def execute(self):
+        return self.results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+@pytest.fixture
+def redis_cache():
+    cache = TwoTierCache()
+    cache.redis_client = FakeRedis()
+    # Abonnement pub/sub déjà en place pour ce processus
+    cache._listener, cache._pid = object(), os.getpid()
+    return cache
+
+
+@pytest.mark.parametrize("with_redis", [False, True])
+def test_both_tiers_return_text(redis_cache, with_redis):
+    cache = redis_cache if with_redis else TwoTierCache()
+
+    assert cache.set("entier", 5)
+    assert cache.set("octets", "é".encode())
+    assert cache.get("entier") == "5"
+    assert cache.get("octets") == "é"
+    assert not cache.set("dict", {"a": 1})
+    assert cache.get("dict") is None
+
+    # Relu depuis Redis, une fois le L1 vidé : même type
+    cache.local.clear()
+    expected = "5" if with_redis else None
+    assert cache.get("entier") == expected
+
+
+def test_undecodable_redis_value_is_a_miss(redis_cache):
+    redis_cache.redis_client.store[redis_cache._redis_key("cle")] = b"\xff\xfe"
+
+    assert redis_cache.get("cle", "défaut") == "défaut"
+    assert redis_cache.stats["redis_misses"] == 1
@@ -0,0 +1,70 @@
+"""Journal de la banque de contenu : reprise et compaction"""
+
+import threading
+
+from services.content_journal import ContentBankJournal
+
+
+def brick(brick_id, title="Titre", **extra):
+    return {"id": brick_id, "title": title, **extra}
+
+
+def test_load_replays_journal_over_snapshot(tmp_path):
+    journal = ContentBankJournal(str(tmp_path / "content_bank.json"))
+    journal.write_snapshot(lambda: [brick("a"), brick("b")])
+    journal.append({"op": "put", "brick": brick("a", "Nouveau titre")})
+    journal.append({"op": "delete", "id": "b"})
+    journal.append({"op": "put", "brick": brick("c")})
+    journal.append({"op": "counters", "values": {"c": {"usage_count": 3}}})
+
+    records = ContentBankJournal(str(tmp_path / "content_bank.json")).load()
+
+    assert records == {
+        "a": brick("a", "Nouveau titre"),
+        "c": brick("c", usage_count=3),
+    }
+
+
+def test_load_ignores_truncated_last_line(tmp_path):
+    journal = ContentBankJournal(str(tmp_path / "content_bank.json"))
+    journal.append({"op": "put", "brick": brick("a")})
+    with open(journal.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "brick": {"id": "b"')  # arrêt brutal
+
+    reloaded = ContentBankJournal(str(tmp_path / "content_bank.json"))
+
+    assert reloaded.load() == {"a": brick("a")}
+    assert reloaded.entries_since_snapshot == 1
+
+
+def test_snapshot_truncates_journal(tmp_path):
+    journal = ContentBankJournal(str(tmp_path / "content_bank.json"))
+    journal.append({"op": "put", "brick": brick("a")})
+
+    journal.write_snapshot(lambda: [brick("a")])
+
+    with open(journal.journal_path, encoding="utf-8") as f:
+        assert f.read() == ""
+    assert journal.entries_since_snapshot == 0
+    assert not journal.needs_compaction()
+
+
+def test_append_during_compaction_is_not_lost(tmp_path):
+    journal = ContentBankJournal(str(tmp_path / "content_bank.json"))
+    writer = threading.Thread(
+        target=journal.append, args=({"op": "put", "brick": brick("late")},)
+    )
+
+    def collect():
+        # Modification concurrente : journalisée après la lecture des briques
+        writer.start()
+        writer.join(timeout=0.2)
+        return [brick("a")]
+
+    journal.write_snapshot(collect)
+    writer.join()
+
+    assert ContentBankJournal(journal.snapshot_path).load() == {
+        "a": brick("a"),
+        "late": brick("late"),
+    }
@@ -0,0 +1,161 @@
+"""Historique des conversations : propriétaire, création concurrente, résumé"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from flask_jwt_extended import JWTManager, create_access_token
+
+from database import db
+from models.conversation import ConversationSession
+from services import conversation_store as store_module
+from services.conversation_store import ConversationStore, new_session_id
+from services.openai_integration import ConversationContext, OpenAIIntegration
+
+
+def turn(index):
+    return [
+        {"role": "user", "content": f"question {index}"},
+        {"role": "assistant", "content": f"réponse {index}"},
+    ]
+
+
+@pytest.fixture
+def store(app):
+    return ConversationStore()
+
+
+def test_session_ids_are_random():
+    ids = {new_session_id() for _ in range(100)}
+
+    assert len(ids) == 100
+    assert all(len(session_id) == 32 for session_id in ids)
+
+
+def test_append_when_session_row_created_concurrently(store):
+    session_id = new_session_id()
+    # Ligne insérée par une autre requête, inconnue de cette session SQL
+    store._create_session_row(
+        {
+            "session_id": session_id,
+            "student_id": "1",
+            "message_count": 0,
+            "summarized_through": 0,
+            "summary_tokens": 0,
+        }
+    )
+    db.session.commit()
+
+    assert store.append(session_id, "1", turn(1)) == 2
+    assert store.append(session_id, "1", turn(2)) == 2
+    assert db.session.get(ConversationSession, session_id).message_count == 4
+
+
+def test_owned_session_is_private(store):
+    session_id = new_session_id()
+    store.append(session_id, "1", turn(1), owner_id="alice")
+
+    assert store.append(session_id, "1", turn(2), owner_id="bob") == 0
+    assert store.append(session_id, "1", turn(2)) == 0
+    assert store.load_window(session_id, "bob") is None
+    assert store.get_session(session_id, "bob") is None
+    assert not store.can_access(session_id, "bob")
+    assert len(store.get_session(session_id, "alice")["messages"]) == 2
+
+
+def test_anonymous_session_is_not_claimed(store):
+    session_id = new_session_id()
+    store.append(session_id, "1", turn(1))
+
+    assert store.can_access(session_id, "alice")
+    assert not store.can_access(session_id, "alice", allow_anonymous=False)
+    assert store.get_session(session_id, "alice") is None
+
+
+def test_compaction_stops_at_last_scanned_message(store, monkeypatch):
+    monkeypatch.setattr(store_module, "MAX_WINDOW_SCAN", 4)
+    store.history_budget = 20
+    store.summary_trigger = 1
+    session_id = new_session_id()
+    for index in range(6):
+        store.append(session_id, "1", turn(index))
+
+    task = store.compaction_task(session_id)
+
+    # Les 4 messages les plus anciens, sans trou avant le premier
+    assert task.summarized_from == 0
+    assert task.summarized_through == 4
+    assert [message["content"] for message in task.messages] == [
+        "question 0",
+        "réponse 0",
+        "question 1",
+        "réponse 1",
+    ]
+    assert store.apply_summary(task, "résumé")
+    assert store.compaction_task(session_id).summarized_from == 4
+
+
+def test_summary_computed_after_the_turn_returns(app):
+    service = OpenAIIntegration()
+    service.conversations = ConversationStore()
+    service.conversations.history_budget = 20
+    service.conversations.summary_trigger = 1
+    release = threading.Event()
+
+    def chat_completion_sync(**_params):
+        release.wait(5)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="résumé"))]
+        )
+
+    service.client = SimpleNamespace(chat_completion_sync=chat_completion_sync)
+    context = ConversationContext(
+        student_id="1", session_id=new_session_id(), subject="maths"
+    )
+
+    started = time.monotonic()
+    for index in range(4):
+        service._remember_turn(context, f"question {index}", f"réponse {index}")
+    assert time.monotonic() - started < 2
+
+    release.set()
+    service._summary_pool.shutdown(wait=True)
+    db.session.expire_all()
+    session = db.session.get(ConversationSession, context.session_id)
+    assert session.summary == "résumé"
+    assert session.summarized_through > 0
+
+
+def test_context_routes_require_the_owner(app):
+    # pylint: disable=import-outside-toplevel
+    from routes.openai_routes import openai_bp
+
+    app.config["JWT_SECRET_KEY"] = "test-secret-key-long-enough-for-hs256"
+    JWTManager(app)
+    app.register_blueprint(openai_bp)
+    client = app.test_client()
+    alice = {"Authorization": f"Bearer {create_access_token(identity='1')}"}
+    bob = {"Authorization": f"Bearer {create_access_token(identity='2')}"}
+    payload = {"student_id": "1", "messages": turn(1)}
+
+    assert (
+        client.post("/api/openai/conversation/context", json=payload).status_code == 401
+    )
+    created = client.post(
+        "/api/openai/conversation/context", json=payload, headers=alice
+    )
+    assert created.status_code == 200
+    session_id = created.get_json()["data"]["session_id"]
+    url = f"/api/openai/conversation/context/{session_id}"
+
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=bob).status_code == 404
+    assert client.get(url, headers=alice).status_code == 200
+    payload["session_id"] = session_id
+    assert (
+        client.post(
+            "/api/openai/conversation/context", json=payload, headers=bob
+        ).status_code
+        == 403
+    )
@@ -0,0 +1,71 @@
+"""Base documentaire : requête plein texte et extraits surlignés"""
+
+import pytest
+
+from services.document_database import DocumentDatabase
+
+
+@pytest.fixture
+def documents(tmp_path):
+    database = DocumentDatabase(db_path=str(tmp_path / "documents.db"))
+    if not database.fts_enabled:
+        pytest.skip("SQLite compilé sans FTS5")
+    yield database
+    database.pool.close_all()
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        (
+            "Comment je peux calculer la dérivée de f(x) ?",
+            '"calculer"* OR "derivee"*',
+        ),
+        ("NSI et SQL", '"nsi"* OR "sql"*'),
+        # Seulement des termes courts : gardés, sauf les mots vides
+        ("pi", '"pi"*'),
+        ("le la de", ""),
+    ],
+)
+def test_match_query_drops_stop_words_and_short_terms(query, expected):
+    assert DocumentDatabase._build_match_query(query) == expected
+
+
+def test_sentence_query_matches_only_relevant_documents(documents):
+    documents.add_document(
+        "Dérivée d'un produit", "La dérivée de u×v.", "maths", "terminale", "cours"
+    )
+    documents.add_document(
+        "Histoire de la Révolution",
+        "La prise de la Bastille.",
+        "histoire",
+        "terminale",
+        "cours",
+    )
+
+    results = documents.search_documents(
+        "Comment calculer la dérivée de la fonction ?", subject=None
+    )
+
+    titles = [document["title"] for document in results]
+    assert "Dérivée d'un produit" in titles
+    assert "Histoire de la Révolution" not in titles
+
+
+def test_snippet_escapes_document_html(documents):
+    documents.add_document(
+        "Balises",
+        "Une dérivée <script>alert(1)</script> & co",
+        "maths",
+        "terminale",
+        "cours",
+    )
+
+    results = documents.search_documents("dérivée script")
+
+    snippet = next(doc["snippet"] for doc in results if doc["title"] == "Balises")
+    assert "<script>" not in snippet
+    assert snippet == (
+        "Une <mark>dérivée</mark> &lt;<mark>script</mark>&gt;alert(1)"
+        "&lt;/<mark>script</mark>&gt; &amp; co"
+    )
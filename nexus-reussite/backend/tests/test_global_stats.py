@@ -0,0 +1,137 @@
+"""Statistiques globales : compteurs incrémentaux et réconciliation"""
+
+import os
+from datetime import datetime, timedelta
+
+from database import db
+from models.student import Assessment, GlobalStatCounter, LearningSession, Student
+from services.global_stats import (
+    INITIALIZED,
+    META,
+    _load_counters,
+    compute_counters,
+    get_global_stats,
+    init_global_stats,
+    reconcile_global_stats,
+)
+
+
+def stored_counters():
+    """Compteurs stockés non nuls, sans la ligne marqueur"""
+    return {
+        counter_key: value
+        for counter_key, value in _load_counters().items()
+        if counter_key[0] != META and value[0]
+    }
+
+
+def test_incremental_counters_match_recompute(app):
+    reconcile_global_stats()
+
+    students = [
+        Student(full_name="A", email="a@example.com", grade_level="terminale"),
+        Student(full_name="B", email="b@example.com", school="Lycée", is_active=True),
+    ]
+    db.session.add_all(students)
+    db.session.commit()
+    for student, subject, rate in (
+        (students[0], "maths", 0.5),
+        (students[1], "svt", None),
+    ):
+        db.session.add(
+            LearningSession(
+                student_id=student.id,
+                subject=subject,
+                topic=subject,
+                session_type="practice",
+                completion_rate=1.0,
+                accuracy_rate=rate,
+            )
+        )
+    db.session.add(
+        Assessment(
+            student_id=students[0].id,
+            title="Bilan",
+            subject="maths",
+            assessment_type="diagnostic",
+            questions_data="[]",
+            is_completed=True,
+        )
+    )
+    db.session.commit()
+
+    # Lignes relues, comme dans une route, avant leur modification
+    for student in students:
+        db.session.refresh(student)
+    students[1].grade_level = "premiere"
+    students[0].is_active = False
+    db.session.commit()
+
+    expected = {key: value for key, value in compute_counters().items() if value[0]}
+    assert (META, INITIALIZED) in _load_counters()
+    assert stored_counters() == expected
+    assert reconcile_global_stats()["drift"] == {}
+
+
+def test_reconcile_overwrites_drift_without_deleting(app):
+    db.session.add(Student(full_name="A", email="a@example.com", grade_level="seconde"))
+    db.session.commit()
+    reconcile_global_stats()
+    # Dérive : écriture SQL directe qui contourne les compteurs
+    GlobalStatCounter.query.filter_by(dimension="students", key="").update(
+        {"count": 42}
+    )
+    db.session.add(GlobalStatCounter(dimension="grade", key="inconnu", count=3))
+    db.session.commit()
+
+    report = reconcile_global_stats()
+
+    assert report["drift"] == {"students:": (42, 1), "grade:inconnu": (3, 0)}
+    assert stored_counters() == {
+        key: value for key, value in compute_counters().items() if value[0]
+    }
+
+
+def test_periodic_reconcile_skipped_after_recent_run(app):
+    assert reconcile_global_stats() is not None
+
+    assert reconcile_global_stats(min_interval=3600) is None
+
+    GlobalStatCounter.query.filter_by(dimension=META, key=INITIALIZED).update(
+        {"updated_at": datetime.utcnow() - timedelta(hours=2)}
+    )
+    db.session.commit()
+    assert reconcile_global_stats(min_interval=3600) is not None
+
+
+def test_first_read_keeps_caller_pending_work(app):
+    student = Student(full_name="A", email="a@example.com")
+    db.session.add(student)
+
+    with db.session.no_autoflush:
+        stats = get_global_stats()
+
+    # L'initialisation n'a ni validé ni annulé la session de la requête
+    assert stats["total_students"] == 0
+    assert student in db.session.new
+
+
+def test_reconciler_starts_once_per_process(app):
+    app.config["GLOBAL_STATS_RECONCILE_INTERVAL"] = 3600
+    reconciler = init_global_stats(app)
+    client = app.test_client()
+    try:
+        assert reconciler._thread is None
+
+        client.get("/")
+        first = reconciler._thread
+        assert reconciler._pid == os.getpid() and first.is_alive()
+        client.get("/")
+        assert reconciler._thread is first
+
+        # Processus forké : le pid enregistré n'est plus le sien
+        reconciler._pid = -1
+        client.get("/")
+        assert reconciler._thread is not first and reconciler._thread.is_alive()
+    finally:
+        reconciler.stop()
@@ -0,0 +1,37 @@
+"""Métriques HTTP : requêtes interrompues par un before_request antérieur"""
+
+from flask import Flask, g
+
+from services.metrics import init_metrics
+
+
+def make_app():
+    app = Flask(__name__)
+    limited = {"active": False}
+
+    @app.before_request
+    def rate_limit():
+        # Enregistré avant les métriques, comme le limiteur de débit
+        if limited["active"]:
+            return "Too Many Requests", 429
+        return None
+
+    init_metrics(app)
+
+    @app.route("/ping")
+    def ping():
+        return "pong"
+
+    return app, limited
+
+
+def test_short_circuited_request_after_completed_one():
+    app, limited = make_app()
+    client = app.test_client()
+
+    # Contexte d'application partagé : `g` survit d'une requête à l'autre
+    with app.app_context():
+        assert client.get("/ping").status_code == 200
+        assert "_metrics_start" not in g
+        limited["active"] = True
+        assert client.get("/ping").status_code == 429
@@ -0,0 +1,123 @@
+"""Cache single-flight : coalescence et sérialisation des entrées"""
+
+import json
+import pickle
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pytest
+
+from services.cache_service import cache_service
+from services.single_flight import _pack_entry, get_stats, single_flight_cache
+
+
+@pytest.fixture
+def prefix():
+    """Préfixe propre à chaque test : les entrées ne se croisent pas"""
+    return f"test-{uuid.uuid4().hex}"
+
+
+def test_concurrent_misses_compute_once(prefix):
+    calls = []
+    started = threading.Event()
+
+    @single_flight_cache(ttl=60, key_prefix=prefix)
+    def slow(value):
+        calls.append(value)
+        started.set()
+        time.sleep(0.1)
+        return {"value": value}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(slow(1))) for _ in range(8)
+    ]
+    threads[0].start()
+    started.wait(1)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [{"value": 1}] * 8
+
+
+def test_expired_entry_is_recomputed(prefix):
+    values = iter(["nouveau"])
+
+    @single_flight_cache(ttl=60, key_prefix=prefix, key_func=lambda: "k")
+    def compute():
+        return next(values)
+
+    key = f"{prefix}:k"
+    cache_service.set(key, _pack_entry("ancien", time.time() - 1, "json"), 60)
+
+    # Entrée expirée : le meneur recalcule, la valeur fraîche est servie
+    assert compute() == "nouveau"
+    assert compute() == "nouveau"
+
+
+def test_entry_with_other_serializer_is_rejected(prefix):
+    calls = []
+
+    @single_flight_cache(ttl=60, key_prefix=prefix, key_func=lambda: "k")
+    def compute():
+        calls.append(1)
+        return "calculé"
+
+    # Enveloppe « pickle » injectée dans le cache d'un décorateur JSON
+    forged = json.dumps(
+        {"f": time.time() + 60, "s": "pickle", "d": pickle.dumps("injecté").hex()}
+    )
+    cache_service.set(f"{prefix}:k", forged, 60)
+
+    assert compute() == "calculé"
+    assert calls == [1]
+
+
+@pytest.mark.parametrize(
+    "value", [(1, 2), {"date": datetime(2024, 1, 1)}, {1: "clé entière"}, {1, 2}]
+)
+def test_json_serializer_rejects_lossy_values(prefix, value):
+    @single_flight_cache(ttl=60, key_prefix=prefix)
+    def compute():
+        return value
+
+    with pytest.raises(TypeError):
+        compute()
+
+
+def test_json_round_trip_keeps_types(prefix):
+    calls = []
+
+    @single_flight_cache(ttl=60, key_prefix=prefix)
+    def compute():
+        calls.append(1)
+        return {"liste": [1, 2.5, None, True], "texte": "é"}
+
+    first = compute()
+    assert compute() == first
+    assert calls == [1]
+
+
+def test_stats_count_every_concurrent_lookup(prefix):
+    @single_flight_cache(ttl=60, key_prefix=prefix)
+    def compute():
+        return "valeur"
+
+    compute()
+    before = get_stats()["hits"]
+
+    threads = [
+        threading.Thread(target=lambda: [compute() for _ in range(500)])
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert get_stats()["hits"] - before == 8 * 500
@@ -0,0 +1,22 @@
+"""Profiler SQL : activation par ENABLE_SQL_PROFILING"""
+
+import pytest
+from flask import Flask
+
+from services.sql_profiler import SQLProfiler
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_init_app_respects_flag(monkeypatch, enabled):
+    profiler = SQLProfiler()
+    installed = []
+    monkeypatch.setattr(profiler, "install", lambda: installed.append(True))
+    app = Flask(__name__)
+    app.config["ENABLE_SQL_PROFILING"] = enabled
+
+    profiler.init_app(app)
+
+    assert profiler.enabled is enabled
+    assert bool(installed) is enabled
+    assert ("sql_profiler" in app.extensions) is enabled
+    assert bool(app.before_request_funcs.get(None)) is enabled
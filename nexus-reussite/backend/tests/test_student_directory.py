@@ -0,0 +1,68 @@
+"""Liste des étudiants : pagination par curseur"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+from models.student import Student
+from services.student_directory import decode_cursor, list_students_page
+
+
+@pytest.fixture
+def students(app):
+    base = datetime(2026, 1, 1)
+    rows = []
+    for index in range(7):
+        student = Student(full_name=f"Élève {index}", email=f"eleve{index}@example.com")
+        # Student.__init__ ignore created_at : affecté après construction.
+        # Deux étudiants par date : l'id départage
+        student.created_at = base + timedelta(days=index // 2)
+        rows.append(student)
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+def _pages(limit):
+    pages = []
+    cursor = None
+    while True:
+        page = list_students_page(cursor=cursor, limit=limit)
+        pages.append([student["id"] for student in page["students"]])
+        cursor = page["next_cursor"]
+        assert page["has_more"] == (cursor is not None)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [2, 3])
+def test_pages_cover_every_student_once(students, limit):
+    seen = [student_id for page in _pages(limit) for student_id in page]
+
+    expected = sorted(students, key=lambda s: (s.created_at, s.id), reverse=True)
+    assert seen == [student.id for student in expected]
+
+
+def test_pages_split_equal_timestamps_without_overlap(students):
+    created_at = {student.id: student.created_at for student in students}
+    assert len(set(created_at.values())) == 4
+
+    pages = _pages(2)
+
+    # La frontière entre les pages 1 et 2 coupe deux étudiants de même date
+    assert created_at[pages[0][-1]] == created_at[pages[1][0]]
+    for earlier, later in zip(pages, pages[1:]):
+        assert not set(earlier) & set(later)
+
+
+def test_cursor_points_at_last_student_of_page(students):
+    page = list_students_page(limit=2)
+
+    last = db.session.get(Student, page["students"][-1]["id"])
+    assert decode_cursor(page["next_cursor"]) == (last.created_at, last.id)
+
+
+def test_invalid_cursor_is_rejected(app):
+    with pytest.raises(ValueError):
+        list_students_page(cursor="pas-un-curseur")
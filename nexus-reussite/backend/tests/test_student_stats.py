@@ -0,0 +1,93 @@
+"""Agrégats du tableau de bord : mise à jour incrémentale et recalcul"""
+
+from database import db
+from models.student import Assessment, LearningSession, Student, StudentStats
+from services.student_stats import compute_student_stats, get_student_stats
+
+
+def snapshot(stats):
+    """Forme comparable des agrégats (persistés ou calculés)"""
+    return {
+        "total_sessions": stats.total_sessions,
+        "total_minutes": stats.total_minutes,
+        "subjects": stats.subject_progress(),
+        "recent_sessions": stats.recent_sessions,
+        "recent_assessments": stats.recent_assessments,
+    }
+
+
+def add_session(student, subject="maths", duration=30, accuracy=0.5):
+    session = LearningSession(
+        student_id=student.id,
+        subject=subject,
+        topic=subject,
+        session_type="practice",
+        duration_minutes=duration,
+        completion_rate=1.0,
+        accuracy_rate=accuracy,
+    )
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def make_student():
+    student = Student(full_name="Élève", email="eleve@example.com")
+    db.session.add(student)
+    db.session.commit()
+    return student
+
+
+def test_read_without_rollup_does_not_write(app):
+    student = make_student()
+
+    stats = get_student_stats(student.id)
+
+    assert stats.total_sessions == 0
+    assert db.session.get(StudentStats, student.id) is None
+    assert stats not in db.session
+
+
+def test_incremental_rollup_matches_full_recompute(app):
+    student = make_student()
+    first = add_session(student, "maths", 30, 0.5)
+    add_session(student, "physique", 45, None)
+    add_session(student, "maths", 20, 0.9)
+
+    first.duration_minutes = 60
+    first.accuracy_rate = 0.7
+    db.session.commit()
+    db.session.add(
+        Assessment(
+            student_id=student.id,
+            title="Bilan",
+            subject="maths",
+            assessment_type="diagnostic",
+            questions_data="[]",
+            score=80.0,
+            is_completed=True,
+        )
+    )
+    db.session.commit()
+
+    db.session.expire_all()
+    stored = db.session.get(StudentStats, student.id)
+    assert stored is not None
+    assert snapshot(stored) == snapshot(compute_student_stats(student.id))
+    assert stored.total_sessions == 3
+    assert stored.total_minutes == 125
+
+
+def test_deleted_session_rollup_rebuilt_by_next_write(app):
+    student = make_student()
+    session = add_session(student)
+    db.session.delete(session)
+    db.session.commit()
+    assert db.session.get(StudentStats, student.id) is None
+
+    add_session(student, "chimie", 15)
+
+    db.session.expire_all()
+    stored = db.session.get(StudentStats, student.id)
+    assert snapshot(stored) == snapshot(compute_student_stats(student.id))
+    assert stored.total_sessions == 1